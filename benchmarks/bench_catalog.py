@@ -0,0 +1,50 @@
+"""
+Catalog loading benchmarks.
+"""
+import os
+import kirk.utils
+import kirk.yaml_env as yaml_env
+from kirk.project import Project
+from kirk.synthetic import CatalogGenerator
+from harness import benchmark
+
+
+def write_catalog(folder, projects):
+    """
+    Write a synthetic catalog of ``projects`` files.
+
+    Returns:
+        list(str): projects files paths.
+    """
+    generator = CatalogGenerator(
+        projects=projects,
+        jobs=5,
+        parameters=2,
+        scm=dict(git=3, perforce=1, none=1),
+        env=0.2)
+
+    for name, value in generator.env_vars.items():
+        os.environ.setdefault(name, value)
+
+    return generator.generate(folder)
+
+
+@benchmark(name="yaml_env.load")
+def bench_yaml_load(ctx, _):
+    path = write_catalog(ctx.tmpdir, 1)[0]
+    return lambda: yaml_env.load(path)
+
+
+@benchmark(name="Project.load")
+def bench_project_load(ctx, _):
+    path = write_catalog(ctx.tmpdir, 1)[0]
+    return lambda: Project().load(path)
+
+
+@benchmark(
+    name="get_projects_from_folder",
+    params=[10, 1000, 10000],
+    slow=[10000])
+def bench_projects_folder(ctx, count):
+    write_catalog(ctx.tmpdir, count)
+    return lambda: kirk.utils.get_projects_from_folder(ctx.tmpdir)
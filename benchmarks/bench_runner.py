@@ -0,0 +1,57 @@
+"""
+Job runner benchmarks, using the fake Jenkins server.
+"""
+import os
+import kirk.utils
+from kirk.runner import JobRunner
+from harness import benchmark
+
+PROJECT = """
+name: project
+description: benchmark project
+author: kirk
+year: 2020
+version: 1.0
+location: bench
+defaults:
+    server: %(server)s
+    scm:
+        git:
+            url: https://github.com/acerv/marvin.git
+jobs:
+    - name: job
+      pipeline: pipeline.groovy
+      parameters:
+        - name: TARGET
+          label: Target
+          default: x86_64
+          show: true
+"""
+
+
+class _Credentials:
+    """
+    Credentials handler returning the fake server password.
+    """
+
+    @staticmethod
+    def get_password(section, username):
+        return "password"
+
+
+@benchmark(name="JobRunner.run", params=["seed", "user"])
+def bench_runner_run(ctx, mode):
+    server = ctx.server()
+
+    path = os.path.join(ctx.tmpdir, "project.yml")
+    with open(path, "w") as project_file:
+        project_file.write(PROJECT % dict(server=server.url.rstrip("/")))
+
+    job = kirk.utils.get_jobs_from_folder(ctx.tmpdir)[0]
+    runner = JobRunner(_Credentials())
+    user = "admin" if mode == "user" else None
+
+    # seed already exists, as it happens after the first run
+    runner.run(job, user=user)
+
+    return lambda: runner.run(job, user=user)
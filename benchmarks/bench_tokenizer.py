@@ -0,0 +1,25 @@
+"""
+Tokenizer benchmarks.
+"""
+from kirk.tokenizer import JobTokenizer
+from harness import benchmark
+
+PARAMS = dict(
+    TARGET="x86_64",
+    KERNEL="linux-5.10",
+    TESTS="syscalls,fs,mm",
+    ITERATIONS="10",
+)
+
+
+@benchmark(name="JobTokenizer.encode")
+def bench_encode(ctx, _):
+    tokenizer = JobTokenizer()
+    return lambda: tokenizer.encode("myproject", "myjob", PARAMS)
+
+
+@benchmark(name="JobTokenizer.decode")
+def bench_decode(ctx, _):
+    tokenizer = JobTokenizer()
+    token = tokenizer.encode("myproject", "myjob", PARAMS)
+    return lambda: tokenizer.decode(token)
@@ -0,0 +1,75 @@
+"""
+XML rendering benchmarks.
+"""
+import os
+from kirk.project import Project
+from kirk.workflow import WorkflowBuilder
+from harness import benchmark
+
+PROJECT = """
+name: project
+description: benchmark project
+author: kirk
+year: 2020
+version: 1.0
+location: bench
+defaults:
+    server: http://localhost:8080
+    scm:
+%(scm)s
+    parameters:
+        - name: TARGET
+          label: Target
+          default: x86_64
+          show: true
+        - name: KERNEL
+          label: Kernel
+          default: linux-5.10
+          show: true
+jobs:
+    - name: job
+      pipeline: pipeline.groovy
+"""
+
+SCM = dict(
+    git="""
+        git:
+            url: https://github.com/acerv/marvin.git
+            credential: fbf1e43a-3442-455e-9c7f-31421a122370
+            label: master
+""",
+    perforce="""
+        perforce:
+            stream: //depot/main
+            workspace: depot_main_workspace
+            credential: fbf1e43a-3442-455e-9c7f-31421a122370
+            changelist: 654321
+""",
+    none="""
+        none:
+            script: %(script)s
+            sandbox: true
+""",
+)
+
+
+@benchmark(
+    name="WorkflowBuilder.build_xml",
+    params=["git", "perforce", "none"])
+def bench_build_xml(ctx, scm):
+    script = os.path.join(ctx.tmpdir, "pipeline.groovy")
+    with open(script, "w") as script_file:
+        script_file.write("node {\n    echo 'hello'\n}\n" * 20)
+
+    path = os.path.join(ctx.tmpdir, "project.yml")
+    with open(path, "w") as project_file:
+        project_file.write(PROJECT % dict(
+            scm=SCM[scm] % dict(script=script)))
+
+    project = Project()
+    project.load(path)
+
+    builder = WorkflowBuilder()
+    job = project.jobs[0]
+
+    return lambda: builder.build_xml(job)
@@ -0,0 +1,205 @@
+"""
+Minimal benchmarks harness.
+
+Benchmarks are functions registered by :py:func:`benchmark`, which prepare
+the data they need and return the callable to measure. Each callable is
+run enough times to fill a time budget and the median time of a call is
+reported, so results can be compared with a stored baseline.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+
+CURRDIR = os.path.abspath(os.path.dirname(__file__))
+
+# kirk sources and the fake Jenkins server used by tests
+sys.path.insert(0, os.path.join(CURRDIR, ".."))
+sys.path.insert(0, os.path.join(CURRDIR, "..", "tests"))
+
+REGISTRY = list()
+
+
+class Case:
+    """
+    A registered benchmark, eventually parametrized.
+    """
+
+    def __init__(self, name, func, param=None, slow=False):
+        self.name = name
+        self.func = func
+        self.param = param
+        self.slow = slow
+
+    @property
+    def fullname(self):
+        """
+        str: benchmark name including its parameter.
+        """
+        if self.param is None:
+            return self.name
+
+        return "%s[%s]" % (self.name, self.param)
+
+
+def benchmark(name=None, params=None, slow=()):
+    """
+    Register a benchmark. The decorated function receives a
+    :py:class:`Context` and a parameter, and it returns the callable to
+    measure.
+
+    Args:
+        name(str): benchmark name. If None, function name is used.
+        params(list): parameters of the benchmark. If None, function is
+            called with None.
+        slow(list): parameters which are measured only on full runs.
+    """
+    def _register(func):
+        bench_name = name or func.__name__
+        for param in params or [None]:
+            REGISTRY.append(Case(bench_name, func, param, param in slow))
+        return func
+
+    return _register
+
+
+class Context:
+    """
+    Resources shared by a benchmark: a temporary folder and the fake
+    Jenkins server, which is started when it's used.
+    """
+
+    def __init__(self):
+        self._tmpdir = None
+        self._server = None
+
+    @property
+    def tmpdir(self):
+        """
+        str: temporary folder removed when benchmark completes.
+        """
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="kirk-bench-")
+        return self._tmpdir
+
+    def server(self, **kwargs):
+        """
+        Return the fake Jenkins server, which accepts the 'kirk' user with
+        'password'.
+
+        Args:
+            kwargs(dict): :py:class:`fake_jenkins.FakeJenkins` arguments.
+        """
+        if self._server is None:
+            from fake_jenkins import FakeJenkins
+            self._server = FakeJenkins(
+                users=dict(kirk="password"), **kwargs)
+            self._server.start()
+        return self._server
+
+    def close(self):
+        """
+        Release the resources.
+        """
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+
+def measure(func, budget=1.0, repeat=5):
+    """
+    Measure a callable.
+
+    Args:
+        func(callable): callable to measure.
+        budget(float): seconds spent measuring ``func``, which is called at
+            least once.
+        repeat(int): maximum number of samples.
+
+    Returns:
+        dict: 'median' and 'min' seconds of a call, number of 'loops' of
+        each sample and number of 'samples'.
+    """
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+
+    if first >= budget:
+        return dict(median=first, min=first, loops=1, samples=1)
+
+    # each sample lasts budget / repeat seconds
+    loops = max(1, int(budget / repeat / max(first, 1e-9)))
+
+    samples = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+
+    return dict(
+        median=statistics.median(samples),
+        min=min(samples),
+        loops=loops,
+        samples=len(samples))
+
+
+def run(cases, budget=1.0, repeat=5, report=None):
+    """
+    Run the benchmarks.
+
+    Args:
+        cases(list(:py:class:`Case`)): benchmarks to run.
+        budget(float): seconds spent measuring each benchmark.
+        repeat(int): maximum number of samples of each benchmark.
+        report(callable): function receiving the name and the result of
+            each benchmark when it completes.
+
+    Returns:
+        dict: results indexed by benchmark name.
+    """
+    results = dict()
+    for case in cases:
+        ctx = Context()
+        try:
+            func = case.func(ctx, case.param)
+            result = measure(func, budget=budget, repeat=repeat)
+        finally:
+            ctx.close()
+
+        results[case.fullname] = result
+        if report:
+            report(case.fullname, result)
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results(dict): benchmarks results.
+        baseline(dict): baseline results.
+        tolerance(float): allowed slowdown, as a fraction of the baseline.
+
+    Returns:
+        list((str, float, float)): name, baseline and current median of
+        the benchmarks which are slower than allowed.
+    """
+    regressions = list()
+    for name, result in sorted(results.items()):
+        base = baseline.get(name, None)
+        if not base:
+            continue
+
+        if result['median'] > base['median'] * (1.0 + tolerance):
+            regressions.append((name, base['median'], result['median']))
+
+    return regressions
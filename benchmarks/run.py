@@ -0,0 +1,157 @@
+"""
+Run the kirk benchmarks.
+
+Usage:
+
+    # run the benchmarks and show the results
+    python benchmarks/run.py
+
+    # store a new baseline
+    python benchmarks/run.py --save benchmarks/baseline.json
+
+    # fail if benchmarks are slower than the baseline
+    python benchmarks/run.py --compare benchmarks/baseline.json
+
+Baselines depend on the machine where they are created, so they should be
+stored again when CI machines change.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import argparse
+import importlib
+import platform
+import harness
+
+
+def _load_modules():
+    """
+    Import the benchmarks modules, which register their benchmarks.
+    """
+    pattern = os.path.join(harness.CURRDIR, "bench_*.py")
+    for path in sorted(glob.glob(pattern)):
+        importlib.import_module(os.path.basename(path)[:-3])
+
+
+def _format_time(seconds):
+    """
+    Format a duration.
+    """
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return "%.2f%s" % (seconds / scale, unit)
+
+    return "%.0fns" % (seconds / 1e-9)
+
+
+def _report(name, result):
+    """
+    Print a benchmark result.
+    """
+    print("%-45s %10s %10s %8d x %d" % (
+        name,
+        _format_time(result['median']),
+        _format_time(result['min']),
+        result['loops'],
+        result['samples']))
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    """
+    Benchmarks entry point.
+
+    Returns:
+        int: exit code, which is 1 if some benchmarks are slower than the
+        baseline.
+    """
+    parser = argparse.ArgumentParser(description="kirk benchmarks")
+    parser.add_argument(
+        "-k", "--filter",
+        default=None,
+        help="run benchmarks which name matches the regular expression")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="run the slow benchmarks as well, such as 10k files catalogs")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1.0,
+        help="seconds spent measuring each benchmark (default: 1.0)")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="maximum number of samples of each benchmark (default: 5)")
+    parser.add_argument(
+        "--save",
+        metavar="FILE",
+        default=None,
+        help="store results as a baseline")
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        default=None,
+        help="compare results with a baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown compared with the baseline (default: 0.25)")
+
+    args = parser.parse_args(argv)
+
+    _load_modules()
+
+    cases = [case for case in harness.REGISTRY if args.full or not case.slow]
+    if args.filter:
+        regexp = re.compile(args.filter)
+        cases = [case for case in cases if regexp.search(case.fullname)]
+
+    print("%-45s %10s %10s %12s" % ("benchmark", "median", "min", "loops"))
+    results = harness.run(
+        cases,
+        budget=args.budget,
+        repeat=args.repeat,
+        report=_report)
+
+    if args.save:
+        data = dict(
+            machine=dict(
+                python=platform.python_version(),
+                platform=platform.platform(),
+                processor=platform.processor()),
+            benchmarks=results)
+
+        with open(args.save, "w") as baseline_file:
+            json.dump(data, baseline_file, indent=4, sort_keys=True)
+
+        print("\nbaseline saved in %s" % args.save)
+
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)['benchmarks']
+
+        regressions = harness.compare(
+            results, baseline, tolerance=args.tolerance)
+
+        if regressions:
+            print("\nslower than %s:" % args.compare)
+            for name, base, current in regressions:
+                print("  %-43s %10s -> %s (+%.0f%%)" % (
+                    name,
+                    _format_time(base),
+                    _format_time(current),
+                    (current / base - 1.0) * 100))
+            return 1
+
+        print("\nno regressions compared with %s" % args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
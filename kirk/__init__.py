@@ -12,3 +12,16 @@ class KirkError(Exception):
     """
     A generic error for the kirk application.
     """
+
+
+def __getattr__(name):
+    """
+    Import the session API only when it's used, so kirk version can be read
+    without importing kirk dependencies.
+    """
+    if name == "Session":
+        # pylint: disable=import-outside-toplevel
+        from kirk.session import Session
+        return Session
+
+    raise AttributeError("module 'kirk' has no attribute '%s'" % name)
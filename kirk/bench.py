@@ -0,0 +1,242 @@
+"""
+.. module:: bench
+   :platform: Multiplatform
+   :synopsis: end-to-end throughput measurements of kirk
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import time
+import itertools
+import threading
+import statistics
+import collections
+import concurrent.futures
+import jenkins
+from kirk import KirkError
+from kirk.catalog import Catalog
+from kirk.render import SeedRenderer
+from kirk.stats import PERCENTILES
+from kirk.stats import percentile
+from kirk.sync import ensure_seed
+
+
+def _times(values):
+    """
+    Return the statistics of a list of durations.
+    """
+    stats = collections.OrderedDict()
+    stats['runs'] = len(values)
+    stats['min'] = min(values)
+    stats['median'] = statistics.median(values)
+    stats['max'] = max(values)
+
+    return stats
+
+
+def bench_catalog(folder, repeat=3):
+    """
+    Measure the time spent loading a projects folder. Cache is not used,
+    so every file is parsed and validated.
+
+    Args:
+        folder(str): projects folder.
+        repeat(int): number of loads.
+
+    Returns:
+        dict: number of 'projects' and 'jobs', load times statistics and
+        the loaded 'catalog'.
+
+    Raises:
+        :py:class:`KirkError`: raised if catalog can't be loaded.
+    """
+    if repeat < 1:
+        raise ValueError("repeat must be greater than zero")
+
+    times = list()
+    catalog = None
+    for _ in range(repeat):
+        catalog = Catalog(folder)
+
+        start = time.perf_counter()
+        catalog.load()
+        times.append(time.perf_counter() - start)
+
+    result = collections.OrderedDict()
+    result['projects'] = len(catalog.projects)
+    result['jobs'] = len(catalog.jobs)
+    result.update(_times(times))
+    result['catalog'] = catalog
+
+    return result
+
+
+def bench_render(jobs, workers=1, repeat=3):
+    """
+    Measure the rendering throughput of the seeds of ``jobs``. The
+    processes pool is used whatever the number of jobs, but each project is
+    rendered by a single process, so less than ``workers`` processes can be
+    used.
+
+    Args:
+        jobs(list(:py:class:`kirk.project.JobItem`)): jobs to render.
+        workers(int): maximum number of processes rendering seeds.
+        repeat(int): number of renderings.
+
+    Returns:
+        dict: number of 'seeds', number of 'workers' which rendered them,
+        rendering times statistics and 'rate' in seeds per second, computed
+        on the median time.
+
+    Raises:
+        :py:class:`KirkError`: raised if a seed can't be rendered.
+    """
+    if repeat < 1:
+        raise ValueError("repeat must be greater than zero")
+
+    renderer = SeedRenderer(workers=workers, threshold=0)
+
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        renderer.render(jobs)
+        times.append(time.perf_counter() - start)
+
+    result = collections.OrderedDict()
+    result['seeds'] = len(jobs)
+    result['workers'] = renderer.pool_size(jobs)
+    result.update(_times(times))
+    result['rate'] = len(jobs) / result['median'] if result['median'] else 0
+
+    return result
+
+
+class TriggerBench:
+    """
+    Measure the builds triggered on a server each second and the latency
+    of each trigger. Builds are triggered on a dedicated seed running an
+    empty pipeline, so real jobs are never started. Each build has its own
+    sequence number parameter, so Jenkins doesn't merge the queued builds.
+    """
+
+    SEED = "__kirk_bench"
+
+    # parameter identifying each triggered build
+    SEQUENCE = "KIRK_BENCH_SEQ"
+
+    SEED_XML = """<?xml version='1.1' encoding='UTF-8'?>
+<flow-definition plugin="workflow-job">
+  <description>Seed triggered by 'kirk bench'</description>
+  <keepDependencies>false</keepDependencies>
+  <properties>
+    <hudson.model.ParametersDefinitionProperty>
+      <parameterDefinitions>
+        <hudson.model.StringParameterDefinition>
+          <name>KIRK_BENCH_SEQ</name>
+          <defaultValue></defaultValue>
+          <trimmed>false</trimmed>
+        </hudson.model.StringParameterDefinition>
+      </parameterDefinitions>
+    </hudson.model.ParametersDefinitionProperty>
+  </properties>
+  <definition class="org.jenkinsci.plugins.workflow.cps.CpsFlowDefinition" plugin="workflow-cps">
+    <script></script>
+    <sandbox>true</sandbox>
+  </definition>
+  <triggers/>
+  <disabled>false</disabled>
+</flow-definition>"""
+
+    def __init__(self, pool, server):
+        """
+        Args:
+            pool(:py:class:`kirk.connection.ConnectionPool`): connections
+                pool.
+            server(str): jenkins server url.
+        """
+        self._pool = pool
+        self._server = server
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def setup(self):
+        """
+        Create the benchmark seed.
+
+        Raises:
+            :py:class:`KirkError`: raised if seed can't be created.
+        """
+        try:
+            ensure_seed(self._pool.get(self._server), self.SEED, self.SEED_XML)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+    def cleanup(self):
+        """
+        Delete the benchmark seed.
+
+        Raises:
+            :py:class:`KirkError`: raised if seed can't be deleted.
+        """
+        try:
+            self._pool.get(self._server).delete_job(self.SEED)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+    def _trigger(self):
+        """
+        Trigger a build.
+
+        Returns:
+            (float, str): seconds spent and error message or None.
+        """
+        with self._lock:
+            sequence = next(self._sequence)
+
+        start = time.perf_counter()
+        try:
+            self._pool.admit(self._server)
+            self._pool.get(self._server).build_job(
+                self.SEED,
+                parameters={self.SEQUENCE: str(sequence)})
+            error = None
+        except (jenkins.JenkinsException, KirkError) as err:
+            error = str(err)
+
+        return time.perf_counter() - start, error
+
+    def run(self, concurrency, count):
+        """
+        Trigger ``count`` builds, ``concurrency`` at the same time.
+
+        Args:
+            concurrency(int): number of builds triggered at the same time.
+            count(int): number of builds.
+
+        Returns:
+            dict: 'concurrency', number of 'builds' and 'errors', 'elapsed'
+            seconds, 'rate' in builds per second and latency percentiles
+            of the successful triggers.
+        """
+        if concurrency < 1 or count < 1:
+            raise ValueError("concurrency and count must be greater than zero")
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(
+                lambda _: self._trigger(), range(count)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(
+            duration for duration, error in results if error is None)
+        errors = [error for _, error in results if error is not None]
+
+        result = collections.OrderedDict()
+        result['concurrency'] = concurrency
+        result['builds'] = len(latencies)
+        result['errors'] = len(errors)
+        result['elapsed'] = elapsed
+        result['rate'] = len(latencies) / elapsed if elapsed else 0
+        for pct in PERCENTILES:
+            result['p%d' % pct] = percentile(latencies, pct)
+        result['error'] = errors[0] if errors else None
+
+        return result
@@ -0,0 +1,418 @@
+"""
+.. module:: catalog
+   :platform: Multiplatform
+   :synopsis: projects catalog with persistent cache
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import kirk.yaml_env as yaml_env
+from kirk import KirkError
+from kirk.project import Project
+from kirk.search import JobIndex
+from kirk.trace import span
+
+
+class Catalog:
+    """
+    Catalog of the projects defined inside a folder. Validated project
+    definitions and the jobs search index can be stored inside a cache
+    file, so next time the catalog is loaded, unchanged project files are
+    not parsed and validated again. Files using environment variables are
+    always parsed, since their definitions and the index built on them are
+    never stored, so variables values don't end up inside the cache.
+    """
+
+    CACHE_VERSION = 2
+
+    def __init__(self, folder, cache=None):
+        """
+        Args:
+            folder(str): folder containing projects files.
+            cache(str): path of the cache file. If None, cache is not used.
+        """
+        self._logger = logging.getLogger("catalog")
+        self._folder = folder
+        self._cache = cache
+        self._projects = list()
+        self._jobs = list()
+        self._tokens = dict()
+        self._index = None
+        self._files = dict()
+        self._signature = None
+        self._selected = None
+        self._re_env = re.compile(r"\${(\w+)}")
+        self._re_name = re.compile(
+            r"^(?P<indent> *)name:[ \t]*(?P<name>[\w.-]+)[ \t]*(#.*)?$",
+            re.MULTILINE)
+
+    @property
+    def folder(self):
+        """
+        str: folder containing projects files.
+        """
+        return self._folder
+
+    @property
+    def projects(self):
+        """
+        list(:py:class:`kirk.project.Project`): loaded projects.
+        """
+        return self._projects
+
+    @property
+    def jobs(self):
+        """
+        list(:py:class:`kirk.project.JobItem`): jobs of all loaded projects.
+        """
+        return self._jobs
+
+    @property
+    def index(self):
+        """
+        :py:class:`kirk.search.JobIndex`: jobs search index.
+        """
+        if self._index is None:
+            self._index = JobIndex()
+            self._index.build(self._jobs)
+
+        return self._index
+
+    def _read_cache(self):
+        """
+        Read the cache file content.
+        """
+        if not self._cache or not os.path.isfile(self._cache):
+            return dict()
+
+        try:
+            with open(self._cache, 'r') as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError) as err:
+            self._logger.warning("ignoring cache '%s': %s", self._cache, err)
+            return dict()
+
+        if not isinstance(data, dict) or \
+                data.get('version') != self.CACHE_VERSION or \
+                data.get('folder') != os.path.abspath(self._folder):
+            return dict()
+
+        return data
+
+    def _write_cache(self, files):
+        """
+        Atomically write the cache file.
+        """
+        data = dict(
+            version=self.CACHE_VERSION,
+            folder=os.path.abspath(self._folder),
+            files=dict(
+                (name, self._public_entry(entry))
+                for name, entry in files.items()),
+            index=None if self._uses_env(files) else self.index.dump(),
+        )
+
+        tmp_path = "%s.%d.tmp" % (self._cache, os.getpid())
+        try:
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(data, cache_file)
+            os.replace(tmp_path, self._cache)
+        except OSError as err:
+            self._logger.warning("cannot write cache '%s': %s",
+                                 self._cache, err)
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+
+    def _env_digest(self, names):
+        """
+        Digest of the environment variables used by a project file.
+        """
+        digest = hashlib.sha1()
+        for name in sorted(names):
+            value = os.environ.get(name)
+            digest.update(("%s=%r;" % (name, value)).encode('utf-8'))
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def _public_entry(entry):
+        """
+        Return the cache entry of a project file as it's stored on disk.
+        Definitions resolving environment variables are not stored.
+        """
+        if not entry.get('vars'):
+            return entry
+
+        return dict(
+            (key, value) for key, value in entry.items()
+            if key != 'definition')
+
+    @staticmethod
+    def _uses_env(files):
+        """
+        True if one of the project files uses environment variables.
+        """
+        return any(entry.get('vars') for entry in files.values())
+
+    def _is_fresh(self, cached, stat):
+        """
+        True if the cached entry of a project file is still valid.
+        """
+        return bool(cached) and \
+            cached.get('mtime') == stat.st_mtime_ns and \
+            cached.get('size') == stat.st_size and \
+            cached.get('env') == self._env_digest(cached.get('vars', []))
+
+    def _load_file(self, path, stat, cached):
+        """
+        Load a project file, using the cached definition when possible.
+
+        Returns:
+            (:py:class:`kirk.project.Project`, dict, bool): the project, its
+            cache entry and True if file has been parsed.
+        """
+        with span("load project", category="catalog", path=path) as trace:
+            return self._load_project(path, stat, cached, trace)
+
+    def _load_project(self, path, stat, cached, trace):
+        """
+        Load a project file inside the ``trace`` span.
+        """
+        project = Project()
+
+        fresh = self._is_fresh(cached, stat)
+        if fresh and 'definition' in cached:
+            self._logger.info("loading '%s' from cache", path)
+            trace.set(cached=True)
+            project.load_definition(cached['definition'], validate=False)
+            return project, cached, False
+
+        with span("parse yaml", category="catalog", path=path):
+            file_def = yaml_env.load(path)
+
+        project.load_definition(file_def)
+
+        if fresh:
+            # file uses environment variables which didn't change
+            return project, cached, False
+
+        with open(path, 'r') as stream:
+            env_vars = sorted(set(self._re_env.findall(stream.read())))
+
+        entry = dict(
+            mtime=stat.st_mtime_ns,
+            size=stat.st_size,
+            vars=env_vars,
+            env=self._env_digest(env_vars),
+            name=project.name,
+            definition=file_def,
+        )
+        return project, entry, True
+
+    def _peek_name(self, path, cached):
+        """
+        Return the project name defined inside a file without parsing it.
+        If name can't be read, None is returned.
+        """
+        if cached:
+            return cached['name']
+
+        with open(path, 'r') as stream:
+            content = stream.read()
+
+        # top level keys share the indentation of the first key
+        indent = None
+        for line in content.splitlines():
+            stripped = line.lstrip(' ')
+            if stripped and not stripped.startswith('#'):
+                indent = len(line) - len(stripped)
+                break
+
+        for match in self._re_name.finditer(content):
+            if len(match.group('indent')) == indent:
+                return match.group('name')
+
+        return None
+
+    def load(self, projects=None):
+        """
+        Load projects inside the catalog folder.
+
+        Args:
+            projects(list(str)): names of the projects to load. Files of the
+                other projects are not parsed, when it's possible to read
+                the project name from cache or from the file itself. If
+                None, all projects are loaded (default: None).
+
+        Raises:
+            ValueError: raised when folder argument is empty or folder doesn't exist.
+            :py:class:`KirkError`: raised when there are two projects with the same name.
+        """
+        if not self._folder:
+            raise ValueError("folder is empty")
+
+        if not os.path.isdir(self._folder):
+            raise ValueError("project folder doesn't exist")
+
+        cache = self._read_cache()
+        cached_files = cache.get('files', dict())
+
+        # entries of files loaded by this object are the most recent ones
+        disk_files = dict(cached_files)
+        cached_files.update(self._files)
+
+        selected = set(projects) if projects is not None else None
+
+        projects = list()
+        names = set()
+        files = dict()
+        changed = False
+
+        for currfile in sorted(os.listdir(self._folder)):
+            _, file_ext = os.path.splitext(currfile)
+            if file_ext not in ('.yml', '.yaml'):
+                continue
+
+            projectfile = os.path.join(self._folder, currfile)
+            stat = os.stat(projectfile)
+            cached = cached_files.get(currfile)
+
+            if selected is not None:
+                if not self._is_fresh(cached, stat):
+                    cached = None
+
+                name = self._peek_name(projectfile, cached)
+                if name and name not in selected:
+                    continue
+
+            project, entry, parsed = self._load_file(
+                projectfile, stat, cached)
+
+            if selected is not None and project.name not in selected:
+                continue
+
+            if project.name in names:
+                raise KirkError("Two projects with the same name")
+
+            names.add(project.name)
+            projects.append(project)
+
+            files[currfile] = entry
+            changed = changed or parsed
+
+        changed = changed or \
+            any(disk_files.get(key) is not entry
+                for key, entry in files.items()) or \
+            len(files) != len(disk_files)
+
+        self._files = files
+        self._signature = self._scan()
+        self._selected = selected
+        self._projects = projects
+        self._jobs = list()
+        self._tokens = dict()
+        for project in projects:
+            for job in project.jobs:
+                self._jobs.append(job)
+                self._tokens[str(job)] = job
+
+        self._index = None
+        if selected is not None:
+            # partial catalogs are never stored
+            return
+
+        if not changed and not self._uses_env(files):
+            index = JobIndex()
+            if index.load(cache.get('index')):
+                self._index = index
+            else:
+                changed = True
+
+        if self._cache and changed:
+            self._write_cache(files)
+
+    def _scan(self):
+        """
+        Return modification time and size of the projects files.
+        """
+        signature = dict()
+        for currfile in os.listdir(self._folder):
+            _, file_ext = os.path.splitext(currfile)
+            if file_ext not in ('.yml', '.yaml'):
+                continue
+
+            stat = os.stat(os.path.join(self._folder, currfile))
+            signature[currfile] = (stat.st_mtime_ns, stat.st_size)
+
+        return signature
+
+    def changed(self):
+        """
+        Check if projects files have been added, removed or modified since
+        the last time catalog has been loaded.
+
+        Returns:
+            bool: True if catalog has to be loaded again.
+        """
+        if self._signature is None:
+            return True
+
+        return self._scan() != self._signature
+
+    def refresh(self):
+        """
+        Load the catalog again if projects files changed. Only the modified
+        files are parsed and validated again.
+
+        Returns:
+            bool: True if catalog has been loaded again.
+        """
+        if not self.changed():
+            return False
+
+        self._logger.info("reloading catalog '%s'", self._folder)
+        projects = None
+        if self._selected is not None:
+            projects = list(self._selected)
+
+        self.load(projects=projects)
+        return True
+
+    def get_job(self, token):
+        """
+        Return the job identified by ``token``.
+
+        Args:
+            token(str): job token in the "<project>::<job>" format.
+
+        Returns:
+            :py:class:`kirk.project.JobItem`: the job or None if not found.
+        """
+        return self._tokens.get(token, None)
+
+    def search(self, query, mode="fuzzy", limit=0):
+        """
+        Search jobs using the catalog index.
+
+        Args:
+            query(str): string to search.
+            mode(str): one between 'prefix', 'substring' or 'fuzzy'
+                (default: 'fuzzy').
+            limit(int): maximum number of results. If 0, all results are
+                returned (default: 0).
+
+        Returns:
+            list(:py:class:`kirk.project.JobItem`): ranked list of jobs.
+        """
+        tokens = self.index.search(query, mode=mode, limit=limit)
+
+        found = list()
+        for token in tokens:
+            job = self.get_job(token)
+            if job:
+                found.append(job)
+
+        return found
@@ -0,0 +1,187 @@
+"""
+.. module:: changes
+   :platform: Multiplatform
+   :synopsis: selection of the jobs affected by modified files
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import posixpath
+import subprocess
+from kirk import KirkError
+
+
+def normalize_path(path, root=None):
+    """
+    Normalize a repository file path, so the same file is always written in
+    the same way.
+
+    Args:
+        path(str): file path.
+        root(str): repository root. If given, absolute paths are made
+            relative to it.
+
+    Returns:
+        str: normalized path, using '/' as separator.
+    """
+    if root and os.path.isabs(path):
+        path = os.path.relpath(path, root)
+
+    path = path.replace(os.sep, "/")
+    path = posixpath.normpath(path)
+    if path.startswith("./"):
+        path = path[2:]
+
+    return path
+
+
+class PathIndex:
+    """
+    Index mapping repository files to the jobs which use them. Files are
+    jobs pipelines and the scripts of the script flows.
+    """
+
+    def __init__(self, root=None):
+        """
+        Args:
+            root(str): repository root. Script paths are relative to the
+                current folder, so they are made relative to ``root``.
+        """
+        self._root = root
+        self._paths = dict()
+
+    @property
+    def paths(self):
+        """
+        list(str): indexed files.
+        """
+        return sorted(self._paths.keys())
+
+    def _add(self, path, job):
+        """
+        Add a job to the ``path`` entry.
+        """
+        jobs = self._paths.setdefault(path, list())
+        if job not in jobs:
+            jobs.append(job)
+
+    def build(self, jobs):
+        """
+        Build the index.
+
+        Args:
+            jobs(list(:py:class:`kirk.project.JobItem`)): jobs to index.
+        """
+        self._paths = dict()
+
+        for job in jobs:
+            if job.pipeline:
+                self._add(normalize_path(job.pipeline), job)
+
+            if job.scm and 'none' in job.scm:
+                script = job.scm['none'].get('script', None)
+                if script:
+                    if self._root:
+                        script = os.path.abspath(script)
+
+                    self._add(normalize_path(script, root=self._root), job)
+
+    def select(self, paths):
+        """
+        Return the jobs using the given files.
+
+        Args:
+            paths(list(str)): modified files.
+
+        Returns:
+            list(:py:class:`kirk.project.JobItem`): affected jobs, in the
+            same order of the files which select them.
+        """
+        found = list()
+        seen = set()
+
+        for path in paths:
+            path = normalize_path(path, root=self._root)
+            for job in self._paths.get(path, ()):
+                if job in seen:
+                    continue
+
+                seen.add(job)
+                found.append(job)
+
+        return found
+
+
+def _git(args, cwd=None):
+    """
+    Run a git command and return its output.
+    """
+    try:
+        proc = subprocess.run(
+            ["git"] + args,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=False)
+    except OSError as err:
+        raise KirkError("can't run git: %s" % err)
+
+    if proc.returncode != 0:
+        raise KirkError(proc.stderr.strip() or "git command failed")
+
+    return proc.stdout
+
+
+def git_root(cwd=None):
+    """
+    Return the root folder of a git repository.
+
+    Args:
+        cwd(str): folder inside the repository. If None, the current folder
+            is used.
+
+    Returns:
+        str: repository root folder.
+
+    Raises:
+        :py:class:`KirkError`: raised if git fails.
+    """
+    return _git(["rev-parse", "--show-toplevel"], cwd=cwd).strip()
+
+
+def default_root(cwd=None):
+    """
+    Return the folder which modified files are relative to: the root of the
+    git repository containing ``cwd`` or ``cwd`` itself, when it's not
+    inside a git work tree.
+
+    Args:
+        cwd(str): current folder. If None, the process current folder is
+            used.
+
+    Returns:
+        str: root folder.
+    """
+    try:
+        return git_root(cwd=cwd)
+    except KirkError:
+        return os.path.abspath(cwd or os.path.curdir)
+
+
+def git_changes(revisions, cwd=None):
+    """
+    Return the files modified inside a git revisions range.
+
+    Args:
+        revisions(str): git revisions range, such as "origin/master..HEAD".
+        cwd(str): folder inside the repository. If None, the current folder
+            is used.
+
+    Returns:
+        list(str): modified files, relative to the repository root.
+
+    Raises:
+        :py:class:`KirkError`: raised if git fails.
+    """
+    output = _git(["diff", "--name-only", revisions, "--"], cwd=cwd)
+    return [line for line in output.splitlines() if line]
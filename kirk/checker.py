@@ -7,9 +7,11 @@
 import os
 import time
 import xml.dom.minidom
+from concurrent.futures import ThreadPoolExecutor
 import yaml
 import jenkins
 from kirk import KirkError
+from kirk.connection import Connection
 
 
 class Tester:
@@ -67,7 +69,8 @@ class JenkinsTester(Tester):
 
     TEST_JOB = "__kirk_delete_me"
 
-    def __init__(self, url, username, password):
+    def __init__(self, url, username, password, throttle=None, policy=None,
+                 instrumentation=None):
         """
         :param url: jenkins server url
         :type url: str
@@ -75,14 +78,23 @@ class JenkinsTester(Tester):
         :type username: str
         :param password: jenkins user password
         :type password: str
+        :param throttle: limits on the requests sent to the server
+        :type throttle: :py:class:`kirk.throttle.Throttle`
+        :param policy: timeouts and retries of the requests
+        :type policy: :py:class:`kirk.resilience.RetryPolicy`
+        :param instrumentation: instrumentation measuring the requests
+        :type instrumentation: :py:class:`kirk.stats.Instrumentation`
         """
         self._url = url
         self._username = username
         self._password = password
-        self._server = jenkins.Jenkins(
+        self._server = Connection(
             self._url,
             self._username,
-            self._password)
+            self._password,
+            throttle=throttle,
+            policy=policy,
+            instrumentation=instrumentation)
         self._config = None
 
         currdir = os.path.abspath(os.path.dirname(__file__))
@@ -217,3 +229,39 @@ class JenkinsTester(Tester):
             self._server.delete_job(self.TEST_JOB)
         except jenkins.JenkinsException as err:
             raise KirkError(err)
+
+
+def check_credentials(entries, credentials, workers=8, throttle=None):
+    """
+    Verify concurrently that credentials are accepted by their servers.
+
+    Args:
+        entries(list((str, str))): list of (server url, username).
+        credentials(:py:class:`kirk.credentials.Credentials`): credentials
+            handler storing the passwords.
+        workers(int): maximum number of servers checked at the same time.
+        throttle(:py:class:`kirk.throttle.Throttle`): limits on the requests
+            sent to each server.
+
+    Returns:
+        list((str, str, str)): list of (server url, username, error), where
+        error is None if credential has been accepted.
+    """
+    def _check(entry):
+        url, username = entry
+        try:
+            password = credentials.get_password(url, username)
+            if password is None:
+                raise KirkError("password not found")
+
+            tester = JenkinsTester(url, username, password, throttle=throttle)
+            tester.test_connection()
+        except (KirkError, jenkins.JenkinsException, OSError) as err:
+            return url, username, str(err)
+
+        return url, username, None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_check, entries))
+
+    return results
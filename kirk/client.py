@@ -0,0 +1,111 @@
+"""
+.. module:: client
+   :platform: Multiplatform
+   :synopsis: kirk command line client forwarding commands to the daemon
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import sys
+
+# seconds waited for the commands running inside the daemon
+DAEMON_WAIT = 10.0
+
+# options of the kirk group which don't take a value
+FLAGS = ("-d", "--debug", "--stats", "--memprofile", "--help")
+
+
+def subcommand(argv):
+    """
+    Return the name of the kirk command inside the command line arguments,
+    skipping the options of the kirk group and their values.
+
+    Args:
+        argv(list(str)): command line arguments.
+
+    Returns:
+        str: command name or None if command is not given.
+    """
+    args = iter(argv)
+    for arg in args:
+        if arg == "--":
+            return next(args, None)
+
+        if not arg.startswith("-"):
+            return arg
+
+        if arg in FLAGS or (arg.startswith("--") and "=" in arg):
+            continue
+
+        if not arg.startswith("--"):
+            # short options can be grouped, such as '-dpprojects'
+            flags = arg[1:]
+            while flags and "-" + flags[0] in FLAGS:
+                flags = flags[1:]
+
+            if len(flags) > 1:
+                # value follows the option
+                continue
+
+            if not flags:
+                continue
+
+        # option value
+        next(args, None)
+
+    return None
+
+
+def main(argv=None):
+    """
+    kirk entry point. When the ``KIRK_DAEMON`` environment variable contains
+    the address of a running ``kirk serve`` daemon, the command is forwarded
+    to it, sending the token stored inside ``KIRK_DAEMON_TOKEN``. Standard
+    input is forwarded and output is shown while the command runs.
+    Otherwise, or when the daemon can't be reached, the command runs inside
+    the current process. Since the daemon runs one command at time, the
+    command runs inside the current process also when the daemon is busy
+    for more than ``KIRK_DAEMON_WAIT`` seconds (default: 10).
+
+    Args:
+        argv(list(str)): command line arguments. If None, ``sys.argv`` is
+            used.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    address = os.environ.get("KIRK_DAEMON", None)
+
+    if address and subcommand(argv) != "serve":
+        # pylint: disable=import-outside-toplevel
+        from kirk import KirkError
+        from kirk.daemon import DaemonBusyError
+        from kirk.daemon import send_command
+
+        try:
+            wait = float(os.environ.get("KIRK_DAEMON_WAIT", DAEMON_WAIT))
+        except ValueError:
+            wait = DAEMON_WAIT
+
+        try:
+            response = send_command(
+                address,
+                argv,
+                cwd=os.getcwd(),
+                token=os.environ.get("KIRK_DAEMON_TOKEN", None),
+                stdin=sys.stdin,
+                stdout=sys.stdout,
+                stderr=sys.stderr,
+                wait=wait)
+        except (OSError, DaemonBusyError) as err:
+            sys.stderr.write(
+                "kirk daemon not available (%s): running locally\n" % err)
+        except KirkError as err:
+            # command could have been executed, so it's not run again
+            sys.stderr.write("%s\n" % err)
+            sys.exit(1)
+        else:
+            sys.exit(response.get('exit_code', 1))
+
+    # pylint: disable=import-outside-toplevel
+    from kirk.commands import command_kirk
+    command_kirk.main(args=argv, prog_name="kirk")
@@ -4,18 +4,65 @@
    :synopsis: application entry point
 .. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
 """
+import io
 import os
+import json
 import sys
 import time
 import traceback
+import contextlib
+import collections
 import click
 import kirk.utils
+import kirk.credentials
 from kirk import __version__
 from kirk import KirkError
 from kirk.runner import JobRunner
+from kirk.catalog import Catalog
+from kirk.output import FORMATS
+from kirk.output import TextWriter
+from kirk.output import get_writer
+from kirk.credentials import BACKENDS
+from kirk.credentials import CachedCredentials
 from kirk.credentials import CredentialsHandler
+from kirk.credentials import get_credentials
 from kirk.tokenizer import JobTokenizer
 from kirk.checker import JenkinsTester
+from kirk.checker import check_credentials
+from kirk.changes import PathIndex
+from kirk.changes import default_root
+from kirk.changes import git_root
+from kirk.changes import git_changes
+from kirk.connection import ConnectionPool
+from kirk.daemon import KirkDaemon
+from kirk.daemon import WarmState
+from kirk.garbage import Collector
+from kirk.render import ARCHIVE_EXTENSIONS
+from kirk.render import SeedRenderer
+from kirk.render import seed_files
+from kirk.render import write_archive
+from kirk.render import write_tree
+from kirk.sync import SeedAction
+from kirk.sync import Synchronizer
+from kirk.sync import summary
+from kirk.metrics import MetricsCollector
+from kirk.metrics import write_textfile
+from kirk.profiling import MemoryProfiler
+from kirk.profiling import Profiler
+from kirk.synthetic import CatalogGenerator
+from kirk.bench import TriggerBench
+from kirk.bench import bench_catalog
+from kirk.bench import bench_render
+from kirk.journal import JournaledRunner
+from kirk.journal import RunJournal
+from kirk.resilience import RetryPolicy
+from kirk.stats import PERCENTILES
+from kirk.stats import Instrumentation
+from kirk.stats import LatencyStats
+from kirk.throttle import Throttle
+from kirk.trace import FORMATS as TRACE_FORMATS
+from kirk.trace import start_tracing
+from kirk.trace import stop_tracing
 
 
 class Arguments:
@@ -25,9 +72,15 @@ class Arguments:
 
     def __init__(self):
         self.credentials = "credentials.cfg"
+        self.credentials_hdl = None
+        self.owner = "kirk"
+        self.projects = "projects"
+        self.cache = None
         self.rootdir = os.path.abspath(os.path.curdir)
         self.runner = None
-        self.jobs = None
+        self.catalog = None
+        self.state = None
+        self.metrics = list()
         self.debug = False
 
 
@@ -51,21 +104,25 @@ def print_error(err, debug):
     sys.exit(1)
 
 
-def load_jobs(folder):
+def load_catalog(folder, cache=None, projects=None):
     """
-    Return the list of the available jobs inside ``folder``.
+    Return the catalog of the projects inside ``folder``.
 
     Args:
         folder(str): folder where projects are located.
+        cache(str): catalog cache file. If None, cache is not used.
+        projects(list(str)): names of the projects to load. If None, all
+            projects are loaded.
 
     Returns:
-        list(:py:class:`kirk.project.JobItem`): list of jobs fetched from ``folder``.
+        :py:class:`kirk.catalog.Catalog`: catalog of the projects.
     """
-    jobs = None
+    catalog = None
     try:
-        jobs = kirk.utils.get_jobs_from_folder(folder)
+        catalog = Catalog(folder, cache=cache)
+        catalog.load(projects=projects)
         click.secho("collected %d jobs\n" %
-                    len(jobs), fg="green", bold=True)
+                    len(catalog.jobs), fg="green", bold=True, err=True)
     except KirkError as err:
         print_error(err, True)
     except ValueError as err:
@@ -73,25 +130,64 @@ def load_jobs(folder):
     except TypeError as err:
         print_error(err, False)
 
-    return jobs
+    return catalog
+
+
+def get_catalog(args, projects=None):
+    """
+    Return the catalog of the projects folder. When kirk is served by a
+    daemon, the warm catalog is returned and it contains all the projects,
+    so commands must filter them by themselves.
+
+    Args:
+        args(:py:class:`Arguments`): program arguments.
+        projects(list(str)): names of the projects to load. If None, all
+            projects are loaded.
+
+    Returns:
+        :py:class:`kirk.catalog.Catalog`: catalog of the projects.
+    """
+    start = time.monotonic()
+
+    if not args.state:
+        catalog = load_catalog(
+            args.projects, cache=args.cache, projects=projects)
+    else:
+        catalog = None
+        try:
+            catalog = args.state.get_catalog(args.projects, cache=args.cache)
+            click.secho("collected %d jobs\n" %
+                        len(catalog.jobs), fg="green", bold=True, err=True)
+        except KirkError as err:
+            print_error(err, True)
+        except (ValueError, TypeError) as err:
+            print_error(err, False)
+
+    for metrics in args.metrics:
+        metrics.catalog_loaded(time.monotonic() - start)
 
+    return catalog
 
-def load_projects(jobs):
+
+def load_jobs(folder):
     """
-    Return the list of the available projects according to ``jobs``.
+    Return the list of the available jobs inside ``folder``.
 
     Args:
-        jobs(list(:py:class:`kirk.project.JobItem`)): list of jobs.
+        folder(str): folder where projects are located.
 
     Returns:
-        list(str): list of projects for all the given ``jobs``.
+        list(:py:class:`kirk.project.JobItem`): list of jobs fetched from ``folder``.
     """
-    projects = list()
-    for job in jobs:
-        if job.project not in projects:
-            projects.append(job.project)
+    catalog = load_catalog(folder)
+    return catalog.jobs
+
 
-    return projects
+# commands which don't read the projects folder
+NO_PROJECTS = ("generate",)
+
+# projects folder, which is validated by commands reading it only
+PROJECTS_FOLDER = click.Path(exists=True, readable=True, dir_okay=True)
 
 
 @click.group()
@@ -105,7 +201,7 @@ def load_projects(jobs):
     '--projects',
     '-p',
     default="projects",
-    type=click.Path(exists=True, readable=True, dir_okay=True),
+    type=click.Path(exists=False, readable=True, dir_okay=True),
     help="Folder containing projects definitions (default: projects)")
 @click.option(
     '--debug',
@@ -120,8 +216,114 @@ def load_projects(jobs):
     nargs=1,
     default='kirk',
     help="Jenkins user that will create and build jobs (default: kirk)")
+@click.option(
+    '--cache',
+    required=False,
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="File caching validated projects and search index (default: None)")
+@click.option(
+    '--credentials-backend',
+    default="keyring",
+    type=click.Choice(BACKENDS),
+    help="Credentials storage. 'env' reads KIRK_TOKEN_<URL>_<USER> or "
+    "KIRK_TOKEN variables, 'file' reads '<url> <user> <password>' lines "
+    "from the credentials file (default: keyring)")
+@click.option(
+    '--credentials-ttl',
+    default=300,
+    type=click.IntRange(min=0),
+    help="Seconds before a credential read in this session is read again. "
+    "0 means never (default: 300)")
+@click.option(
+    '--lock-dir',
+    default=None,
+    envvar="KIRK_LOCK_DIR",
+    type=click.Path(file_okay=False, writable=True),
+    help="Folder of the lock files used by kirk processes running on the "
+    "same host, so the same seed is setup by one process at time. It can be "
+    "set by KIRK_LOCK_DIR (default: None)")
+@click.option(
+    '--max-rate',
+    default=0,
+    type=click.FloatRange(min=0),
+    help="Maximum number of requests per second sent to each server. "
+    "0 means no limit (default: 0)")
+@click.option(
+    '--burst',
+    default=10,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests sent at once to each server, when "
+    "--max-rate is used (default: 10)")
+@click.option(
+    '--max-queue',
+    default=0,
+    type=click.IntRange(min=0),
+    help="Delay new builds while the server queue contains this number of "
+    "items. 0 means never (default: 0)")
+@click.option(
+    '--timeout',
+    default=60,
+    type=click.FloatRange(min=0),
+    help="Seconds before a request sent to a server is aborted. 0 means "
+    "never (default: 60)")
+@click.option(
+    '--retries',
+    default=3,
+    type=click.IntRange(min=0),
+    help="Number of times a read request is sent again when server fails "
+    "with a timeout or a 502/503/504 response (default: 3)")
+@click.option(
+    '--breaker-threshold',
+    default=5,
+    type=click.IntRange(min=0),
+    help="Consecutive failures after which requests to a server fail "
+    "immediately for 30 seconds. 0 means never (default: 5)")
+@click.option(
+    '--stats',
+    is_flag=True,
+    default=False,
+    help="Show requests latencies for each server and endpoint when "
+    "command completes (default: False)")
+@click.option(
+    '--metrics-file',
+    default=None,
+    envvar="KIRK_METRICS_FILE",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Prometheus textfile where jobs, requests and catalog metrics are "
+    "written when command completes. It can be set by KIRK_METRICS_FILE "
+    "(default: None)")
+@click.option(
+    '--trace',
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="File where catalog loading, XML rendering, credentials lookups, "
+    "requests and waits are recorded as spans when command completes "
+    "(default: None)")
+@click.option(
+    '--trace-format',
+    default="chrome",
+    type=click.Choice(TRACE_FORMATS),
+    help="Format of the --trace file: 'chrome' trace events, which can be "
+    "opened with Perfetto, or 'otlp' JSON (default: chrome)")
+@click.option(
+    '--profile',
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Profile the command using cProfile and write a pstats file "
+    "(default: None)")
+@click.option(
+    '--memprofile',
+    is_flag=True,
+    default=False,
+    help="Trace the command memory allocations and show the top "
+    "allocation sites (default: False)")
 @pass_arguments
-def command_kirk(args, credentials, projects, debug, owner):
+def command_kirk(args, credentials, projects, debug, owner, cache,
+                 credentials_backend, credentials_ttl, lock_dir, max_rate,
+                 burst, max_queue, timeout, retries, breaker_threshold,
+                 stats, metrics_file, trace, trace_format, profile,
+                 memprofile):
     """
     Kirk - Jenkins remote tester.
 
@@ -129,23 +331,86 @@ def command_kirk(args, credentials, projects, debug, owner):
     the need to create them by yourself and taking advantage of groovy scripts
     saved inside your project.
     """
-    # start session
+    # projects folder is checked only when command reads it
+    ctx = click.get_current_context()
+    if ctx.invoked_subcommand not in NO_PROJECTS:
+        param = [item for item in ctx.command.params
+                 if item.name == "projects"][0]
+        projects = PROJECTS_FOLDER.convert(projects, param, ctx)
+
+    # profile as much of the command as possible
+    if profile:
+        profile_command(profile)
+
+    if memprofile:
+        memprofile_command()
+
+    # start session. Session informations are written on stderr, so
+    # stdout can be used by other tools
     if debug:
-        click.secho("debugging session\n", fg="green", bold=True)
+        click.secho("debugging session\n", fg="green", bold=True, err=True)
 
     click.secho("kirk %s session started\n" %
-                __version__, fg="yellow", bold=True)
-    click.echo("owner: %s" % owner)
-    click.echo("rootdir: %s" % args.rootdir)
-    click.echo("projects: %s" % projects)
-    click.echo("credentials: %s\n" % credentials)
-
-    # initialize configurations
-    args.jobs = load_jobs(projects)
+                __version__, fg="yellow", bold=True, err=True)
+    click.echo("owner: %s" % owner, err=True)
+    click.echo("rootdir: %s" % args.rootdir, err=True)
+    click.echo("projects: %s" % projects, err=True)
+    click.echo("credentials: %s\n" % credentials, err=True)
+
+    # initialize configurations. Projects are loaded by commands, since
+    # they might need only some of them
+    args.credentials = credentials
+    args.owner = owner
+    args.projects = projects
+    args.cache = cache
     args.debug = debug
 
-    credentials_hdl = CredentialsHandler(credentials)
-    args.runner = JobRunner(credentials_hdl, owner=owner)
+    if trace:
+        record_trace(trace, trace_format)
+
+    if args.state:
+        # served by the daemon: reuse credentials, connections and limits
+        args.credentials_hdl = args.state.get_credentials(
+            credentials_backend, credentials, credentials_ttl)
+        throttle = args.state.get_throttle(max_rate, burst, max_queue)
+        policy = args.state.get_policy(
+            timeout or None, retries, breaker_threshold)
+        pool = args.state.get_pool(
+            args.credentials_hdl, owner, throttle=throttle, policy=policy)
+    else:
+        args.credentials_hdl = CachedCredentials(
+            get_credentials(credentials_backend, credentials),
+            ttl=credentials_ttl)
+        throttle = None
+        if max_rate or max_queue:
+            throttle = Throttle(
+                rate=max_rate, burst=burst, max_queue=max_queue)
+        policy = RetryPolicy(
+            timeout=timeout or None,
+            retries=retries,
+            threshold=breaker_threshold)
+        pool = ConnectionPool(
+            args.credentials_hdl,
+            owner=owner,
+            throttle=throttle,
+            policy=policy)
+
+    args.runner = JobRunner(
+        args.credentials_hdl,
+        owner=owner,
+        pool=pool,
+        lock_dir=lock_dir)
+
+    if stats:
+        collect_stats(pool.instrumentation)
+
+    args.metrics = list()
+    if args.state and args.state.metrics:
+        # the daemon writes its own metrics after each command
+        args.metrics.append(args.state.metrics)
+
+    if metrics_file:
+        args.metrics.append(export_metrics(pool, metrics_file))
 
 
 @command_kirk.command(name='list')
@@ -156,7 +421,19 @@ def command_kirk(args, credentials, projects, debug, owner):
     is_flag=True,
     default=False,
     help="List the available jobs")
-def show(args, jobs):
+@click.option(
+    '--project',
+    multiple=True,
+    help="Show only the given project. It can be used multiple times")
+@click.option(
+    '-f',
+    '--format',
+    'fmt',
+    default="text",
+    type=click.Choice(FORMATS),
+    help="Output format. Other than text, one record per job is written "
+    "(default: text)")
+def show(args, jobs, project, fmt):
     """
     Show informations about available projects and jobs.
 
@@ -164,55 +441,400 @@ def show(args, jobs):
 
         kirk list --jobs
 
+    To export the jobs of a project:
+
+        kirk list --project myproject --format ndjson
+
     """
-    if jobs:
-        if not args.jobs:
+    catalog = get_catalog(args, projects=project or None)
+    args.catalog = catalog
+
+    proj_list = catalog.projects
+    if project:
+        proj_list = [proj for proj in proj_list if proj.name in project]
+
+    jobs_list = [job for proj in proj_list for job in proj.jobs]
+
+    if fmt != "text":
+        writer = get_writer(fmt)
+        writer.begin()
+        for job in jobs_list:
+            writer.write(job)
+        writer.end()
+    elif jobs:
+        if not jobs_list:
             return
 
         click.secho("available jobs", fg="white", bold=True)
-        for job in args.jobs:
-            click.echo("  %s" % repr(job))
+        writer = TextWriter()
+        for job in jobs_list:
+            writer.write(job)
+        writer.end()
     else:
-        proj_list = load_projects(args.jobs)
+        proj_list = [proj for proj in proj_list if proj.jobs]
         if not proj_list:
             return
 
         click.secho("available projects", fg="white", bold=True)
-        for project in proj_list:
-            click.echo("  %s" % project.name)
-            for job in project.jobs:
-                click.echo("   - %s" % repr(job))
-            click.echo()
+        writer = TextWriter(prefix="   - ")
+        for proj in proj_list:
+            writer.write_line("  %s" % proj.name)
+            for job in proj.jobs:
+                writer.write(job)
+            writer.write_line("")
+        writer.end()
 
 
 @command_kirk.command()
 @pass_arguments
-@click.argument("regexp", nargs=1)
-def search(args, regexp):
+@click.option(
+    '--mode',
+    '-m',
+    default="regexp",
+    type=click.Choice(['regexp', 'prefix', 'substring', 'fuzzy']),
+    help="Search mode (default: regexp)")
+@click.option(
+    '--limit',
+    '-l',
+    default=0,
+    type=int,
+    help="Maximum number of shown jobs. 0 shows all of them (default: 0)")
+@click.option(
+    '--project',
+    multiple=True,
+    help="Search only inside the given project. It can be used multiple "
+    "times")
+@click.option(
+    '-f',
+    '--format',
+    'fmt',
+    default="text",
+    type=click.Choice(FORMATS),
+    help="Output format. Other than text, one record per job is written "
+    "(default: text)")
+@click.argument("query", nargs=1)
+def search(args, query, mode, limit, project, fmt):
     """
-    Search for available jobs using REGEXP.
+    Search for available jobs using QUERY.
+
+    QUERY is a regular expression matching jobs tokens by default. The other
+    search modes look for QUERY inside projects names, jobs names, parameters
+    names and descriptions, showing the best matches first.
 
     Usage:
 
         kirk search .*unittest.*
 
+        kirk search --mode fuzzy unitest
+
     """
-    projects = load_projects(args.jobs)
-    if not projects:
+    catalog = get_catalog(args, projects=project or None)
+    args.catalog = catalog
+
+    proj_list = catalog.projects
+    if project:
+        proj_list = [proj for proj in proj_list if proj.name in project]
+
+    if not proj_list:
         return
 
     try:
-        found = kirk.utils.get_project_regexp(regexp, projects)
+        if mode == 'regexp':
+            found = kirk.utils.get_project_regexp(query, proj_list)
+        elif project and args.state:
+            # warm catalog contains all projects, so filter results
+            found = catalog.search(query, mode=mode)
+            found = [job for job in found if job.project.name in project]
+        else:
+            found = catalog.search(query, mode=mode, limit=limit)
+
+        if limit > 0:
+            found = found[:limit]
+
+        if fmt != "text":
+            writer = get_writer(fmt)
+            writer.begin()
+            for job in found:
+                writer.write(job)
+            writer.end()
+            return
+
         if not found:
             raise KirkError("No jobs found.")
 
         click.secho("found jobs", fg="white", bold=True)
+        writer = TextWriter()
         for job in found:
-            click.echo("  %s" % repr(job))
+            writer.write(job)
+        writer.end()
     except KirkError as err:
         print_error(err, args.debug)
 
 
+def print_stats(summary):
+    """
+    Print the requests statistics.
+
+    Args:
+        summary(dict): statistics returned by
+            :py:meth:`kirk.stats.LatencyStats.summary`.
+    """
+    def _ms(value):
+        return "-" if value is None else "%.0fms" % (value * 1000)
+
+    def _line(name, item):
+        return "  %-40s %6d req %4d err %10d B  %s" % (
+            name, item['requests'], item['errors'], item['bytes'],
+            "  ".join("p%d %7s" % (pct, _ms(item['p%d' % pct]))
+                      for pct in PERCENTILES))
+
+    total = sum(item['total'] for item in summary['servers'].values())
+
+    click.echo(err=True)
+    click.secho(
+        "requests statistics (%.2fs elapsed, %.2fs inside requests)" %
+        (summary['elapsed'], total), fg="white", bold=True, err=True)
+
+    for server, item in summary['servers'].items():
+        click.echo(_line(server, item), err=True)
+
+    for (method, endpoint), item in summary['endpoints'].items():
+        click.echo(_line("%s %s" % (method, endpoint), item), err=True)
+
+
+def collect_stats(instrumentation):
+    """
+    Collect the requests statistics until the current command completes,
+    then print them.
+
+    Args:
+        instrumentation(:py:class:`kirk.stats.Instrumentation`): requests
+            instrumentation.
+    """
+    collector = LatencyStats()
+    instrumentation.add_hook(collector)
+
+    def _close():
+        instrumentation.remove_hook(collector)
+        print_stats(collector.summary())
+
+    click.get_current_context().call_on_close(_close)
+
+
+def export_metrics(pool, path):
+    """
+    Collect the metrics of the current command and write them when command
+    completes.
+
+    Args:
+        pool(:py:class:`kirk.connection.ConnectionPool`): connections pool
+            used by the command.
+        path(str): metrics file path.
+
+    Returns:
+        :py:class:`kirk.metrics.MetricsCollector`: metrics collector.
+    """
+    metrics = MetricsCollector()
+    metrics.add_pool(pool)
+    pool.instrumentation.add_hook(metrics)
+
+    def _close():
+        pool.instrumentation.remove_hook(metrics)
+        try:
+            write_textfile(path, metrics.render())
+        except KirkError as err:
+            click.secho(str(err), fg="red", err=True)
+
+    click.get_current_context().call_on_close(_close)
+
+    return metrics
+
+
+def profile_command(path):
+    """
+    Profile the current command and write a pstats file when it completes.
+
+    Args:
+        path(str): pstats file path.
+
+    Raises:
+        :py:class:`KirkError`: raised if profiler can't be started.
+    """
+    profiler = Profiler(path)
+    profiler.start()
+
+    def _close():
+        try:
+            profiler.stop()
+            click.echo("\nprofile written to %s" % path, err=True)
+        except KirkError as err:
+            click.secho(str(err), fg="red", err=True)
+
+    click.get_current_context().call_on_close(_close)
+
+
+def memprofile_command(limit=10):
+    """
+    Trace the memory allocations of the current command and show the top
+    allocation sites when it completes.
+
+    Args:
+        limit(int): number of allocation sites shown.
+    """
+    profiler = MemoryProfiler(limit=limit)
+    profiler.start()
+
+    def _close():
+        report = profiler.stop()
+
+        click.echo(err=True)
+        click.secho(
+            "memory profile (%.1f KiB in use, %.1f KiB peak)" %
+            (report['current'] / 1024, report['peak'] / 1024),
+            fg="white", bold=True, err=True)
+
+        for filename, lineno, size, count in report['top']:
+            click.echo("  %10.1f KiB %8d blocks  %s:%d" % (
+                size / 1024, count, filename, lineno), err=True)
+
+    click.get_current_context().call_on_close(_close)
+
+
+def record_trace(path, fmt="chrome"):
+    """
+    Record the spans of the current command and write them when command
+    completes.
+
+    Args:
+        path(str): trace file path.
+        fmt(str): trace file format. See :py:data:`kirk.trace.FORMATS`.
+
+    Returns:
+        :py:class:`kirk.trace.Tracer`: the active tracer.
+    """
+    tracer = start_tracing()
+
+    def _close():
+        stop_tracing()
+        try:
+            tracer.write(path, fmt=fmt)
+        except KirkError as err:
+            click.secho(str(err), fg="red", err=True)
+
+    click.get_current_context().call_on_close(_close)
+
+    return tracer
+
+
+def print_requests_summary(policy):
+    """
+    Print the outcomes of the requests sent to each server.
+
+    Args:
+        policy(:py:class:`kirk.resilience.RetryPolicy`): policy counting
+            the requests outcomes. If None, nothing is printed.
+    """
+    if not policy:
+        return
+
+    for server, stats in policy.stats().items():
+        line = "  %s: %s" % (server, ", ".join(
+            "%d %s" % (value, name) for name, value in stats.items()))
+
+        color = None
+        if stats['failures'] or stats['rejected']:
+            color = "red"
+        elif stats['retries']:
+            color = "yellow"
+
+        click.secho(line, fg=color, err=True)
+
+
+def run_jobs(args, jobs_to_run, user, shared=False, journal=None):
+    """
+    Run jobs, showing their build urls. A job which fails doesn't stop the
+    other ones and a summary is shown at the end.
+
+    Args:
+        args(:py:class:`Arguments`): program arguments.
+        jobs_to_run(dict): jobs to run, indexed by the token to show.
+        user(str): developer running the jobs.
+        shared(bool): if True, run the shared seeds.
+        journal(:py:class:`kirk.journal.RunJournal`): journal recording
+            the jobs progress. Jobs handled by a previous run continue
+            from the state they reached.
+
+    Raises:
+        :py:class:`KirkError`: raised if some jobs can't be run.
+    """
+    # read all the needed credentials at once
+    args.credentials_hdl.prefetch(
+        [(job.server, args.owner) for job in jobs_to_run.values()])
+
+    journaled = None
+    if journal:
+        journaled = JournaledRunner(args.runner, journal)
+
+    # run all tests
+    failed = list()
+    resumed = 0
+    for job_str, job in jobs_to_run.items():
+        click.secho("-> running %s (user='%s')" % (job_str, user))
+        try:
+            if journaled:
+                action, build, result = journaled.run(
+                    job_str, job, user=user, shared=shared)
+                job_location = build.url
+            elif shared:
+                action = JournaledRunner.STARTED
+                job_location = args.runner.run(job, user=user, shared=True)
+            else:
+                action = JournaledRunner.STARTED
+                job_location = args.runner.run(job, user=user)
+        except KirkError as err:
+            click.secho("-> failed %s: %s" % (job_str, err), fg="red")
+            failed.append(job_str)
+            for metrics in args.metrics:
+                metrics.job_done(job.server, failed=True)
+            continue
+
+        if action == JournaledRunner.FINISHED:
+            click.secho("-> finished %s (%s)" % (job_location, result))
+            resumed += 1
+            continue
+
+        if action == JournaledRunner.RUNNING:
+            click.secho("-> attached %s" % job_location, fg="green")
+            resumed += 1
+            continue
+
+        click.secho("-> configured %s" % job_location, fg="green")
+        for metrics in args.metrics:
+            metrics.job_done(job.server)
+
+    if len(jobs_to_run) > 1 or failed:
+        click.echo()
+        click.secho("summary", fg="white", bold=True, err=True)
+        if journal:
+            click.echo("  %d started, %d resumed, %d failed" % (
+                len(jobs_to_run) - len(failed) - resumed,
+                resumed,
+                len(failed)), err=True)
+        else:
+            click.echo("  %d started, %d failed" % (
+                len(jobs_to_run) - len(failed), len(failed)), err=True)
+        print_requests_summary(args.runner.pool.policy)
+
+    if failed:
+        if journal:
+            click.echo(
+                "  resume with 'kirk run --resume %s'" % journal.path,
+                err=True)
+
+        raise KirkError("%d jobs failed: %s" % (
+            len(failed), " ".join(failed)))
+
+
 @command_kirk.command()
 @pass_arguments
 @click.option(
@@ -221,8 +843,27 @@ def search(args, regexp):
     default="",
     type=str,
     help="Name of the developer that is running the job (default: None)")
+@click.option(
+    '--shared',
+    is_flag=True,
+    default=False,
+    help="Run the project seed, passing the user inside KIRK_USER, instead "
+    "of a seed inside the developer folder")
+@click.option(
+    '--journal',
+    '-j',
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Record the jobs progress inside a new journal file, so an "
+    "interrupted run can be resumed (default: None)")
+@click.option(
+    '--resume',
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Resume the run recorded inside a journal file. Completed jobs "
+    "are skipped and started builds are attached (default: None)")
 @click.argument("jobs_repr", nargs=-1)
-def run(args, jobs_repr, user):
+def run(args, jobs_repr, user, shared, journal, resume):
     """
     Run a list of jobs as USER with the specified CHANGE_ID.
 
@@ -234,9 +875,36 @@ def run(args, jobs_repr, user):
 
         kirk run -u <myuser> <myproject>::<mytest>
 
+    To run jobs as user, sharing the seeds with the other users:
+
+        kirk run --shared -u <myuser> <myproject>::<mytest>
+
+    To record the jobs progress and resume the run after an interruption:
+
+        kirk run --journal run.journal <myproject>::<mytest> ...
+
+        kirk run --resume run.journal
+
     """
-    if not args.jobs:
-        return
+    run_journal = None
+
+    if resume:
+        if jobs_repr or user or shared or journal:
+            raise click.UsageError(
+                "--resume can't be used with jobs, --user, --shared or "
+                "--journal")
+
+        try:
+            run_journal = RunJournal(resume).load()
+        except KirkError as err:
+            print_error(err, args.debug)
+            return
+
+        jobs_repr = run_journal.tokens
+        user = run_journal.user or ""
+        shared = run_journal.shared
+    elif journal:
+        run_journal = RunJournal(journal)
 
     # show found tests
     click.secho("selected jobs", fg="white", bold=True)
@@ -244,9 +912,12 @@ def run(args, jobs_repr, user):
         click.echo("  " + job_str)
     click.echo()
 
+    # parameters values overwritten by tokens
+    overwritten = list()
+
     try:
-        # get jobs to run
-        jobs_to_run = dict()
+        # decode jobs tokens
+        tokens = dict()
         tokenizer = JobTokenizer()
 
         for job_str in jobs_repr:
@@ -257,15 +928,22 @@ def run(args, jobs_repr, user):
                     "\n  <project>::<job>[<parameters>]\n"
                 )
 
+            tokens[job_str] = token
+
+        # load the needed projects only
+        args.catalog = get_catalog(
+            args,
+            projects=[token[0] for token in tokens.values()])
+
+        # get jobs to run
+        jobs_to_run = dict()
+
+        for job_str, token in tokens.items():
             project, job_name, params = token
 
-            # search for job inside the list of available jobs
-            found_job = None
-            for job in args.jobs:
-                if job_name == job.name and project == job.project.name:
-                    # we found the job
-                    found_job = job
-                    break
+            # search for job inside the catalog
+            found_job = args.catalog.get_job(
+                tokenizer.encode(project, job_name))
 
             # no job no party
             if not found_job:
@@ -275,6 +953,9 @@ def run(args, jobs_repr, user):
             for name, value in params.items():
                 for i in range(0, len(found_job.parameters)):
                     if found_job.parameters[i].name == name:
+                        overwritten.append(
+                            (found_job.parameters[i],
+                             found_job.parameters[i].value))
                         found_job.parameters[i].value = value
                         break
 
@@ -294,15 +975,1041 @@ def run(args, jobs_repr, user):
             err += "\nPlease use 'list' command to show available jobs"
             raise KirkError(err)
 
-        # run all tests
-        for job_str, job in jobs_to_run.items():
-            click.secho("-> running %s (user='%s')" % (job_str, user))
-            job_location = args.runner.run(job, user=user)
-            click.secho("-> configured %s" % job_location, fg="green")
+        if run_journal and not resume:
+            run_journal.create(jobs_repr, user=user, shared=shared)
+
+        run_jobs(args, jobs_to_run, user, shared=shared, journal=run_journal)
+    except KirkError as err:
+        print_error(err, args.debug)
+    finally:
+        # catalog can be reused by the daemon, so restore default values
+        for param, value in reversed(overwritten):
+            param.value = value
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--git',
+    '-g',
+    'revisions',
+    default=None,
+    help="Read modified files from a git revisions range, such as "
+    "'origin/master..HEAD'")
+@click.option(
+    '--root',
+    '-r',
+    default=None,
+    type=click.Path(exists=True, file_okay=False),
+    help="Folder which FILES are relative to (default: root of the current "
+    "git repository or current folder)")
+@click.option(
+    '--run',
+    'run_found',
+    is_flag=True,
+    default=False,
+    help="Run the affected jobs")
+@click.option(
+    '--user',
+    '-u',
+    default="",
+    type=str,
+    help="Name of the developer that is running the jobs (default: None)")
+@click.option(
+    '-f',
+    '--format',
+    'fmt',
+    default="text",
+    type=click.Choice(FORMATS),
+    help="Output format. Other than text, one record per job is written "
+    "(default: text)")
+@click.argument("files", nargs=-1)
+def changes(args, files, revisions, root, run_found, user, fmt):
+    """
+    Show the jobs affected by modified FILES, which are pipelines or
+    scripts used by jobs. Use '-' to read files from stdin. FILES are
+    relative to the git repository root, like the ones listed by git.
+
+    Usage:
+
+        kirk changes ci/unittest_pipeline.groovy
+
+        git diff --name-only HEAD~1 | kirk changes -
+
+        kirk changes --git origin/master..HEAD --run
+
+    """
+    try:
+        paths = list()
+        root = os.path.abspath(root) if root else default_root()
+
+        if revisions:
+            # git files are relative to the repository root
+            repo = git_root()
+            paths.extend(
+                os.path.join(repo, path) for path in git_changes(revisions))
+
+        for path in files:
+            if path == "-":
+                paths.extend(
+                    line.strip()
+                    for line in click.get_text_stream('stdin')
+                    if line.strip())
+            else:
+                paths.append(path)
+
+        if not paths:
+            raise click.UsageError("FILES or --git are required")
+
+        catalog = get_catalog(args)
+        args.catalog = catalog
+
+        index = PathIndex(root=root)
+        index.build(catalog.jobs)
+        found = index.select(paths)
+
+        if fmt != "text":
+            writer = get_writer(fmt)
+            writer.begin()
+            for job in found:
+                writer.write(job)
+            writer.end()
+        elif found:
+            click.secho("affected jobs", fg="white", bold=True)
+            writer = TextWriter()
+            for job in found:
+                writer.write(job)
+            writer.end()
+            click.echo()
+        else:
+            click.echo("no affected jobs", err=True)
+
+        if run_found and found:
+            run_jobs(args, dict((repr(job), job) for job in found), user)
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+def select_jobs(args, jobs_repr, projects, load_all=False):
+    """
+    Return the catalog jobs selected by tokens and projects names. Tokens
+    parameters are ignored.
+
+    Args:
+        args(:py:class:`Arguments`): program arguments.
+        jobs_repr(list(str)): jobs tokens.
+        projects(list(str)): projects names.
+        load_all(bool): if True, all the projects are loaded inside
+            ``args.catalog``, not only the selected ones.
+
+    Returns:
+        list(:py:class:`kirk.project.JobItem`): the selected jobs. If no
+        tokens and projects are given, all jobs are returned.
+
+    Raises:
+        :py:class:`KirkError`: raised if a token is not valid or a job is
+            not found.
+    """
+    tokenizer = JobTokenizer()
+
+    names = set(projects)
+    tokens = list()
+    for job_str in jobs_repr:
+        token = tokenizer.decode(job_str)
+        if not token:
+            raise KirkError("Invalid job token '%s'" % job_str)
+
+        tokens.append(tokenizer.encode(token[0], token[1]))
+        names.add(token[0])
+
+    catalog = get_catalog(
+        args, projects=None if load_all else list(names) or None)
+    args.catalog = catalog
+
+    jobs = list()
+    for token in tokens:
+        job = catalog.get_job(token)
+        if not job:
+            raise KirkError("Cannot find '%s'" % token)
+        jobs.append(job)
+
+    if projects:
+        jobs.extend(job for job in catalog.jobs
+                    if job.project.name in projects and job not in jobs)
+    elif not tokens:
+        jobs = list(catalog.jobs)
+
+    return jobs
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--project',
+    multiple=True,
+    help="Synchronize only the given project. It can be used multiple times")
+@click.option(
+    '--user',
+    '-u',
+    default="",
+    type=str,
+    help="Synchronize the seeds of a developer folder (default: None)")
+@click.option(
+    '--dry-run',
+    '-n',
+    is_flag=True,
+    default=False,
+    help="Show the needed changes without applying them")
+@click.option(
+    '--diff',
+    'show_diff',
+    is_flag=True,
+    default=False,
+    help="Show the configuration differences of the seeds to reconfigure")
+@click.option(
+    '--delete',
+    is_flag=True,
+    default=False,
+    help="Delete the seeds which don't belong to any job")
+@click.option(
+    '--workers',
+    '-w',
+    default=8,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests at the same time (default: 8)")
+@click.option(
+    '--max-per-server',
+    default=4,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests sent to the same server at the same "
+    "time (default: 4)")
+@click.argument("jobs_repr", nargs=-1)
+def sync(args, jobs_repr, project, user, dry_run, show_diff, delete,
+         workers, max_per_server):
+    """
+    Create, reconfigure or delete the seeds of the selected jobs, without
+    running them. If no jobs are given, all jobs are synchronized.
+
+    To show the changes without applying them:
+
+        kirk sync --dry-run --diff
+
+    To synchronize a project:
+
+        kirk sync --project myproject
+
+    """
+    try:
+        # seeds of the jobs which are not selected must not be deleted
+        jobs = select_jobs(args, jobs_repr, project, load_all=delete)
+
+        args.credentials_hdl.prefetch(
+            [(job.server, args.owner) for job in jobs])
+
+        syncer = Synchronizer(
+            args.runner.pool,
+            workers=workers,
+            per_server=max_per_server)
+
+        actions = syncer.plan(
+            jobs,
+            user=user,
+            delete=delete,
+            known=args.catalog.jobs if delete else None)
+
+        if not dry_run:
+            syncer.apply(actions)
+
+        colors = {
+            SeedAction.CREATE: "green",
+            SeedAction.RECONFIGURE: "yellow",
+            SeedAction.DELETE: "red",
+        }
+
+        for action in actions:
+            if action.action == SeedAction.UNCHANGED:
+                continue
+
+            click.secho(
+                "  %-12s%s" % (action.action, action.location),
+                fg=colors[action.action])
+            if action.error:
+                click.secho("    FAILED (%s)" % action.error, fg="red")
+
+            if show_diff and action.action == SeedAction.RECONFIGURE:
+                click.echo(action.diff())
+
+        counts = summary(actions)
+        click.echo()
+        click.secho(
+            ", ".join("%d %s" % (num, name) for name, num in counts.items()),
+            bold=True)
+
+        if counts['failed']:
+            raise KirkError("%d seeds failed" % counts['failed'])
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--project',
+    multiple=True,
+    help="Render only the given project. It can be used multiple times")
+@click.option(
+    '--user',
+    '-u',
+    default="",
+    type=str,
+    help="Render the seeds of a developer folder (default: None)")
+@click.option(
+    '--output',
+    '-o',
+    default="seeds",
+    type=click.Path(writable=True),
+    help="Destination folder or archive, if it ends with %s "
+    "(default: seeds)" % ", ".join(ARCHIVE_EXTENSIONS))
+@click.option(
+    '--clean',
+    is_flag=True,
+    default=False,
+    help="Remove the seeds of the destination folder which are not "
+    "rendered anymore")
+@click.option(
+    '--workers',
+    '-w',
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of rendering processes (default: number of CPUs)")
+@click.argument("jobs_repr", nargs=-1)
+def render(args, jobs_repr, project, user, output, clean, workers):
+    """
+    Render the seeds configurations of the selected jobs, without
+    connecting to the servers. Seeds are written using the Jenkins home
+    layout, such as 'jobs/<folder>/jobs/<job>/config.xml', and the same
+    jobs always produce the same files. If no jobs are given, all jobs are
+    rendered.
+
+    To render a project inside an archive:
+
+        kirk render --project myproject --output seeds.tar.gz
+
+    """
+    try:
+        jobs = select_jobs(args, jobs_repr, project)
+
+        renderer = SeedRenderer(workers=workers, user=user)
+        files = seed_files(renderer.render(jobs))
+
+        if output.endswith(ARCHIVE_EXTENSIONS):
+            write_archive(files, output)
+            click.secho(
+                "%d seeds written inside %s" % (len(jobs), output),
+                fg="green")
+        else:
+            written, removed = write_tree(files, output, clean=clean)
+            click.secho(
+                "%d seeds rendered inside %s: %d files written, %d removed" %
+                (len(jobs), output, written, removed),
+                fg="green")
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--project',
+    multiple=True,
+    help="Compare only the given project. It can be used multiple times")
+@click.option(
+    '--user',
+    '-u',
+    default="",
+    type=str,
+    help="Compare the seeds of a developer folder (default: None)")
+@click.option(
+    '--patch',
+    '-p',
+    is_flag=True,
+    default=False,
+    help="Show the configuration differences")
+@click.option(
+    '--exit-code',
+    is_flag=True,
+    default=False,
+    help="Exit with 1 if there are differences")
+@click.option(
+    '--workers',
+    '-w',
+    default=8,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests at the same time (default: 8)")
+@click.option(
+    '--max-per-server',
+    default=4,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests sent to the same server at the same "
+    "time (default: 4)")
+@click.option(
+    '-f',
+    '--format',
+    'fmt',
+    default="text",
+    type=click.Choice(["text", "json"]),
+    help="Output format (default: text)")
+@click.argument("jobs_repr", nargs=-1)
+def diff(args, jobs_repr, project, user, patch, exit_code, workers,
+         max_per_server, fmt):
+    """
+    Compare the seeds stored by the servers with the rendered ones, showing
+    only the seeds which are modified or missing. Configurations are
+    compared ignoring formatting, plugins versions and descriptions. If no
+    jobs are given, all jobs are compared.
+
+    Usage:
+
+        kirk diff --project myproject --patch
+
+    """
+    try:
+        jobs = select_jobs(args, jobs_repr, project)
+
+        args.credentials_hdl.prefetch(
+            [(job.server, args.owner) for job in jobs])
+
+        syncer = Synchronizer(
+            args.runner.pool,
+            workers=workers,
+            per_server=max_per_server)
+
+        status = {
+            SeedAction.CREATE: "missing",
+            SeedAction.RECONFIGURE: "modified",
+        }
+
+        actions = [
+            action for action in syncer.plan(jobs, user=user)
+            if action.action != SeedAction.UNCHANGED]
+
+        if fmt == "json":
+            records = list()
+            for action in actions:
+                record = dict(
+                    token=str(action.job),
+                    server=action.server,
+                    location=action.location,
+                    status=status[action.action])
+                if patch:
+                    record['diff'] = action.diff()
+                records.append(record)
+
+            click.echo(json.dumps(records, indent=1))
+        else:
+            for action in actions:
+                click.secho(
+                    "  %-10s%s" % (status[action.action], action.location),
+                    fg="yellow")
+                if patch:
+                    click.echo(action.diff())
+
+            click.secho(
+                "%d seeds differ out of %d" % (len(actions), len(jobs)),
+                bold=True,
+                err=True)
+
+        if exit_code and actions:
+            sys.exit(1)
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--user',
+    '-u',
+    default="",
+    type=str,
+    help="Show the builds of a developer (default: None)")
+@click.option(
+    '--shared',
+    is_flag=True,
+    default=False,
+    help="Read the builds of the shared seed started by the user")
+@click.option(
+    '--limit',
+    '-l',
+    default=10,
+    type=click.IntRange(min=0),
+    help="Maximum number of shown builds. 0 shows all of them "
+    "(default: 10)")
+@click.argument("job_repr", nargs=1)
+def builds(args, job_repr, user, shared, limit):
+    """
+    Show the latest builds of a job.
+
+    Usage:
+
+        kirk builds --shared -u <myuser> <myproject>::<mytest>
+
+    """
+    try:
+        jobs = select_jobs(args, [job_repr], [])
+
+        job_builds = args.runner.get_builds(
+            jobs[0],
+            user=user,
+            shared=shared,
+            limit=limit)
+
+        colors = dict(SUCCESS="green", FAILURE="red", UNSTABLE="yellow")
+        for build in job_builds:
+            result = build['result'] or ("BUILDING" if build['building']
+                                         else "QUEUED")
+            click.echo("  #%-6s" % build['number'], nl=False)
+            click.secho("%-10s" % result, fg=colors.get(result), nl=False)
+            click.echo("%-16s%s" % (build['user'] or "-", build['url']))
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+@command_kirk.command(name='gc')
+@pass_arguments
+@click.option(
+    '--project',
+    multiple=True,
+    help="Clean only the given project. It can be used multiple times")
+@click.option(
+    '--ttl',
+    default=30,
+    type=click.FloatRange(min=0),
+    help="Days after the last build when a developer seed expires "
+    "(default: 30)")
+@click.option(
+    '--dry-run',
+    '-n',
+    is_flag=True,
+    default=False,
+    help="Show the stale seeds without deleting them")
+@click.option(
+    '--rate',
+    default=5.0,
+    type=click.FloatRange(min=0),
+    help="Maximum number of deletions per second. 0 means no limit "
+    "(default: 5)")
+@click.option(
+    '--workers',
+    '-w',
+    default=4,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests at the same time (default: 4)")
+@click.option(
+    '--dev-folder',
+    default="dev",
+    help="Folder containing developers jobs (default: dev)")
+@click.option(
+    '--never-built',
+    is_flag=True,
+    default=False,
+    help="Delete the seeds which have never been built as well, including "
+    "the ones which have been just created")
+def collect(args, project, ttl, dry_run, rate, workers, dev_folder,
+            never_built):
+    """
+    Delete developers seeds which have not been built for TTL days, or
+    which don't belong to any job anymore. Developers folders containing
+    only stale seeds are deleted. Seeds which have never been built are
+    kept, unless --never-built is given.
+
+    Usage:
+
+        kirk gc --ttl 14 --dry-run
+
+    """
+    try:
+        # orphans are found on the whole catalog, since projects can share
+        # the same location
+        jobs = select_jobs(args, [], project, load_all=True)
+
+        args.credentials_hdl.prefetch(
+            [(job.server, args.owner) for job in jobs])
+
+        collector = Collector(
+            args.runner.pool,
+            ttl=ttl * 86400,
+            rate=rate,
+            workers=workers,
+            dev_folder=dev_folder,
+            never_built=never_built)
+
+        items = collector.scan(jobs, known=args.catalog.jobs)
+        if not dry_run:
+            collector.delete(items)
+
+        failures = 0
+        for item in items:
+            click.echo("  %-12s%s" % (item.reason, item.location), nl=False)
+            if item.error:
+                failures += 1
+                click.secho("  FAILED (%s)" % item.error, fg="red")
+            elif dry_run:
+                click.echo()
+            else:
+                click.secho("  DELETED", fg="green")
+
+        click.echo()
+        click.secho(
+            "%d stale items found, %d deleted" %
+            (len(items), 0 if dry_run else len(items) - failures),
+            bold=True)
+
+        if failures:
+            raise KirkError("%d items can't be deleted" % failures)
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+def parse_weights(value):
+    """
+    Parse a list of weights such as 'git=2,perforce=1'.
+
+    Args:
+        value(str): comma separated list of name=weight.
+
+    Returns:
+        dict: weights indexed by name.
+
+    Raises:
+        :py:class:`KirkError`: raised if ``value`` can't be parsed.
+    """
+    weights = dict()
+    for item in [item for item in value.split(",") if item.strip()]:
+        name, _, weight = item.partition("=")
+        try:
+            weights[name.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise KirkError("invalid weight '%s'" % item)
+
+    return weights
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--num-projects',
+    default=10,
+    type=click.IntRange(min=0),
+    help="Number of projects files (default: 10)")
+@click.option(
+    '--jobs',
+    default=10,
+    type=click.IntRange(min=1),
+    help="Number of jobs of each project (default: 10)")
+@click.option(
+    '--parameters',
+    default=3,
+    type=click.IntRange(min=0),
+    help="Number of parameters of each job (default: 3)")
+@click.option(
+    '--depends',
+    default=0.1,
+    type=click.FloatRange(min=0, max=1),
+    help="Probability that a job depends on each job defined before it in "
+    "the same project (default: 0.1)")
+@click.option(
+    '--scm',
+    default="git",
+    help="Relative weights of the SCM types used by projects, such as "
+    "'git=3,perforce=1,none=1' (default: git)")
+@click.option(
+    '--env',
+    default=0.0,
+    type=click.FloatRange(min=0, max=1),
+    help="Fraction of parameters which default is read from an environment "
+    "variable using '!ENV' (default: 0)")
+@click.option(
+    '--server',
+    multiple=True,
+    help="Server where jobs run. It can be used multiple times "
+    "(default: http://localhost:8080)")
+@click.option(
+    '--seed',
+    default=0,
+    type=int,
+    help="Random generator seed. The same seed generates the same "
+    "catalog (default: 0)")
+@click.argument("folder", type=click.Path(file_okay=False))
+def generate(args, folder, num_projects, jobs, parameters, depends, scm,
+             env, server, seed):
+    """
+    Generate a synthetic catalog of valid projects files inside FOLDER,
+    which can be used to measure kirk on large catalogs without sharing
+    real projects definitions.
+
+    Usage:
+
+        kirk generate --num-projects 1000 --jobs 20 --scm git=3,none=1 /tmp/cat
+
+    """
+    try:
+        try:
+            generator = CatalogGenerator(
+                projects=num_projects,
+                jobs=jobs,
+                parameters=parameters,
+                depends=depends,
+                scm=parse_weights(scm),
+                env=env,
+                servers=list(server),
+                seed=seed)
+        except ValueError as err:
+            raise KirkError(err)
+
+        paths = generator.generate(folder)
+
+        click.secho(
+            "%d projects with %d jobs generated in %s" %
+            (len(paths), len(paths) * jobs, folder),
+            bold=True)
+
+        if env:
+            click.echo("\nprojects read the following variables:")
+            for name, value in sorted(generator.env_vars.items()):
+                click.echo("  export %s=%s" % (name, value))
+    except KirkError as err:
+        print_error(err, args.debug)
+
+
+def parse_counts(value):
+    """
+    Parse a list of positive integers such as '1,2,4'.
+
+    Args:
+        value(str): comma separated list of integers.
+
+    Returns:
+        list(int): parsed integers.
+
+    Raises:
+        :py:class:`KirkError`: raised if ``value`` can't be parsed.
+    """
+    counts = list()
+    for item in [item for item in value.split(",") if item.strip()]:
+        try:
+            count = int(item)
+        except ValueError:
+            count = 0
+
+        if count < 1:
+            raise KirkError("invalid count '%s'" % item)
+
+        counts.append(count)
+
+    if not counts:
+        raise KirkError("no counts given")
+
+    return counts
+
+
+def print_bench(report):
+    """
+    Print the results of 'kirk bench' as a table.
+
+    Args:
+        report(dict): benchmark results.
+    """
+    def _ms(value):
+        return "-" if value is None else "%.0fms" % (value * 1000)
+
+    catalog = report['catalog']
+    click.secho("catalog", bold=True)
+    click.echo(
+        "  %d projects, %d jobs: min %.3fs, median %.3fs, max %.3fs" % (
+            catalog['projects'], catalog['jobs'], catalog['min'],
+            catalog['median'], catalog['max']))
+
+    click.secho("render", bold=True)
+    for item in report['render']:
+        click.echo(
+            "  %3d workers: %d seeds in %.3fs, %.1f seeds/s" % (
+                item['workers'], item['seeds'], item['median'],
+                item['rate']))
+
+    trigger = report.get('trigger', None)
+    if not trigger:
+        return
+
+    click.secho("trigger %s" % trigger['server'], bold=True)
+    for item in trigger['runs']:
+        click.echo(
+            "  %3d concurrent: %d builds, %d errors, %.1f builds/s  %s" % (
+                item['concurrency'], item['builds'], item['errors'],
+                item['rate'], "  ".join(
+                    "p%d %7s" % (pct, _ms(item['p%d' % pct]))
+                    for pct in PERCENTILES)))
+        if item['error']:
+            click.secho("    %s" % item['error'], fg="red")
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--repeat',
+    '-r',
+    default=3,
+    type=click.IntRange(min=1),
+    help="Number of catalog loads and renderings (default: 3)")
+@click.option(
+    '--render-workers',
+    default="1,%d" % (os.cpu_count() or 1),
+    help="Comma separated maximum numbers of processes rendering seeds. "
+    "Each project is rendered by one process (default: 1 and the number "
+    "of CPUs)")
+@click.option(
+    '--server',
+    default=None,
+    help="Server where builds are triggered. If not given, triggers are "
+    "not measured (default: None)")
+@click.option(
+    '--concurrency',
+    default="1,4,16",
+    help="Comma separated numbers of builds triggered at the same time "
+    "(default: 1,4,16)")
+@click.option(
+    '--triggers',
+    default=20,
+    type=click.IntRange(min=1),
+    help="Number of builds triggered for each concurrency (default: 20)")
+@click.option(
+    '-f',
+    '--format',
+    'fmt',
+    default="text",
+    type=click.Choice(["text", "json"]),
+    help="Output format (default: text)")
+def bench(args, repeat, render_workers, server, concurrency, triggers, fmt):
+    """
+    Measure this kirk installation on the configured projects: catalog
+    load time, seeds rendering throughput and, when --server is given,
+    builds triggering throughput and latency for each concurrency. Builds
+    are triggered on a '__kirk_bench' seed running an empty pipeline,
+    which is deleted at the end.
+
+    Usage:
+
+        kirk bench --server http://myserver:8080 --concurrency 1,8,32
+
+    """
+    try:
+        workers = sorted(set(parse_counts(render_workers)))
+        levels = parse_counts(concurrency)
+
+        report = collections.OrderedDict()
+        report['version'] = __version__
+
+        try:
+            catalog = bench_catalog(args.projects, repeat=repeat)
+        except ValueError as err:
+            raise KirkError(err)
+
+        jobs = catalog.pop('catalog').jobs
+        report['catalog'] = catalog
+
+        report['render'] = [
+            bench_render(jobs, workers=count, repeat=repeat)
+            for count in workers]
+
+        if server:
+            tester = TriggerBench(args.runner.pool, server)
+            tester.setup()
+            try:
+                report['trigger'] = dict(
+                    server=server,
+                    runs=[tester.run(level, triggers) for level in levels])
+            finally:
+                # don't hide the benchmark error
+                try:
+                    tester.cleanup()
+                except KirkError as err:
+                    click.secho(
+                        "can't delete '%s' seed: %s" % (tester.SEED, err),
+                        fg="red",
+                        err=True)
+
+        if fmt == "json":
+            click.echo(json.dumps(report, indent=1))
+        else:
+            print_bench(report)
     except KirkError as err:
         print_error(err, args.debug)
 
 
+def execute_command(argv, state=None, stdout=None, stderr=None,
+                    stdin=None):
+    """
+    Execute a kirk command, capturing its output. Errors are reported with
+    the exit code, so the calling process is never closed.
+
+    Args:
+        argv(list(str)): command line arguments, without the program name.
+        state(:py:class:`kirk.daemon.WarmState`): objects shared between
+            commands. If None, every command creates its own objects.
+        stdout(file): stream receiving the command output. If None, output
+            is captured and returned.
+        stderr(file): stream receiving the command errors. If None, errors
+            are captured and returned.
+        stdin(file): standard input of the command. If None, the process
+            standard input is used.
+
+    Returns:
+        (int, str, str): exit code, stdout and stderr. Output written on
+        the given streams is not returned.
+    """
+    args = Arguments()
+    args.state = state
+
+    out = stdout if stdout is not None else io.StringIO()
+    err_out = stderr if stderr is not None else io.StringIO()
+
+    process_stdin = sys.stdin
+    if stdin is not None:
+        sys.stdin = stdin
+
+    with contextlib.redirect_stdout(out), \
+            contextlib.redirect_stderr(err_out):
+        try:
+            exit_code = command_kirk.main(
+                args=list(argv),
+                prog_name="kirk",
+                obj=args,
+                standalone_mode=False)
+            if not isinstance(exit_code, int):
+                exit_code = 0
+        except click.ClickException as err:
+            err.show()
+            exit_code = err.exit_code
+        except click.Abort:
+            click.echo("Aborted!", err=True)
+            exit_code = 1
+        except SystemExit as err:
+            exit_code = err.code
+            if exit_code is None:
+                exit_code = 0
+            elif not isinstance(exit_code, int):
+                click.echo(exit_code, err=True)
+                exit_code = 1
+        except Exception:  # pylint: disable=broad-except
+            click.echo(traceback.format_exc(), err=True)
+            exit_code = 1
+        finally:
+            sys.stdin = process_stdin
+
+    return (
+        exit_code,
+        "" if stdout is not None else out.getvalue(),
+        "" if stderr is not None else err_out.getvalue())
+
+
+@command_kirk.command()
+@pass_arguments
+@click.option(
+    '--socket',
+    '-s',
+    'socket_path',
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Unix socket where commands are received (default: .kirk.sock)")
+@click.option(
+    '--port',
+    default=None,
+    type=click.IntRange(min=0, max=65535),
+    help="Local TCP port where commands are received, instead of a Unix "
+    "socket")
+@click.option(
+    '--poll',
+    default=2.0,
+    type=click.FloatRange(min=0),
+    help="Seconds between two checks of the projects files. 0 checks them "
+    "only when a command is received (default: 2.0)")
+@click.option(
+    '--metrics-file',
+    'daemon_metrics',
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Prometheus textfile where the metrics of all the served commands "
+    "are written after each command (default: None)")
+@click.option(
+    '--token',
+    default=None,
+    envvar="KIRK_DAEMON_TOKEN",
+    help="Token that clients must send inside KIRK_DAEMON_TOKEN. It's "
+    "required by --port and it can be set by KIRK_DAEMON_TOKEN "
+    "(default: None)")
+def serve(args, socket_path, port, poll, daemon_metrics, token):
+    """
+    Serve kirk commands, keeping projects catalog, credentials and Jenkins
+    connections in memory. Modified projects files are loaded again.
+    Commands run with the daemon user credentials, so only the same user
+    can send them. Daemon runs one command at time: a client waiting for
+    more than KIRK_DAEMON_WAIT seconds (default: 10) runs its command by
+    itself.
+
+    To forward kirk commands to the daemon:
+
+        kirk serve --socket /tmp/kirk.sock &
+
+        KIRK_DAEMON=/tmp/kirk.sock kirk list
+
+    """
+    if args.state:
+        raise click.UsageError("kirk daemon can't serve itself")
+
+    if port is not None and not token:
+        raise click.UsageError("--port requires --token or KIRK_DAEMON_TOKEN")
+
+    if port is None and not socket_path:
+        socket_path = ".kirk.sock"
+
+    state = WarmState(metrics=MetricsCollector() if daemon_metrics else None)
+
+    def _handler(argv, stdout=None, stderr=None, stdin=None):
+        result = execute_command(
+            argv,
+            state=state,
+            stdout=stdout,
+            stderr=stderr,
+            stdin=stdin)
+        if daemon_metrics:
+            try:
+                write_textfile(daemon_metrics, state.metrics.render())
+            except KirkError as err:
+                click.secho(str(err), fg="red", err=True)
+
+        return result
+
+    daemon = KirkDaemon(
+        _handler,
+        state,
+        socket_path=os.path.abspath(socket_path) if socket_path else None,
+        port=port,
+        poll=poll,
+        token=token)
+
+    try:
+        daemon.start()
+    except KirkError as err:
+        print_error(err, args.debug)
+
+    click.secho("serving on %s" % daemon.address, fg="green", err=True)
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("daemon stopped", err=True)
+
+
 @click.command()
 @click.option(
     '-c',
@@ -310,19 +2017,95 @@ def run(args, jobs_repr, user):
     default="credentials.cfg",
     type=click.Path(exists=False, writable=True),
     help="File that stores owners credentials (default: credentials.cfg)")
-@click.argument("url", nargs=1, required=True)
-@click.argument("user", nargs=1, required=True)
-def command_credential(credentials, url, user):
+@click.option(
+    '-b',
+    '--batch',
+    default=None,
+    type=click.File('r'),
+    help="Import '<url> <user> <password>' lines from a file. Use '-' to "
+    "read from stdin")
+@click.option(
+    '-l',
+    '--list',
+    'show',
+    is_flag=True,
+    default=False,
+    help="List the stored credentials")
+@click.option(
+    '--verify',
+    is_flag=True,
+    default=False,
+    help="Verify the stored credentials against their servers")
+@click.option(
+    '-w',
+    '--workers',
+    default=8,
+    type=click.IntRange(min=1),
+    help="Number of servers verified at the same time (default: 8)")
+@click.argument("url", nargs=1, required=False)
+@click.argument("user", nargs=1, required=False)
+def command_credential(credentials, batch, show, verify, workers, url, user):
     """
     Add a new credential for USER and the given URL.
+
+    To import many credentials at once:
+
+        kirk-credential --batch credentials.txt
+
+    To verify all the stored credentials:
+
+        kirk-credential --verify
+
     """
+    handler = CredentialsHandler(credentials)
+
+    if batch:
+        try:
+            entries = kirk.credentials.read_entries(batch)
+            handler.set_passwords(entries)
+        except KirkError as err:
+            print_error(err, True)
+
+        click.secho("%d credentials saved" % len(entries), fg="green")
+        return
+
+    if show or verify:
+        try:
+            entries = handler.list_entries()
+        except KirkError as err:
+            print_error(err, True)
+
+        click.secho("stored credentials:", fg="white", bold=True)
+        if not verify:
+            for entry_url, entry_user in entries:
+                click.echo("  %s  %s" % (entry_url, entry_user))
+            return
+
+        results = check_credentials(entries, handler, workers=workers)
+
+        failures = 0
+        for entry_url, entry_user, error in results:
+            click.echo("  %s  %s" % (entry_url, entry_user), nl=False)
+            if error:
+                failures += 1
+                click.secho("  FAILED (%s)" % error, fg="red")
+            else:
+                click.secho("  PASSED", fg="green")
+
+        if failures:
+            print_error(
+                KirkError("%d credentials failed" % failures), False)
+        return
+
+    if not url or not user:
+        raise click.UsageError("URL and USER are required")
+
     click.secho("saving credential:", fg="white", bold=True)
     click.echo("  url:  %s" % url)
     click.echo("  user: %s" % user)
     token = click.prompt("  password", hide_input=True)
 
     try:
-        handler = CredentialsHandler(credentials)
         handler.set_password(url, user, token)
     except KirkError as err:
         print_error(err, True)
@@ -335,12 +2118,38 @@ def command_credential(credentials, url, user):
 @click.argument("url", nargs=1, required=True)
 @click.argument("user", nargs=1, required=True)
 @click.argument("token", nargs=1, required=True)
-def command_check(url, user, token):
+@click.option(
+    '--timeout',
+    default=60,
+    type=click.FloatRange(min=0),
+    help="Seconds before a request is aborted. 0 means never (default: 60)")
+@click.option(
+    '--retries',
+    default=3,
+    type=click.IntRange(min=0),
+    help="Number of times a read request is sent again when server fails "
+    "with a timeout or a 502/503/504 response (default: 3)")
+@click.option(
+    '--stats',
+    is_flag=True,
+    default=False,
+    help="Show requests latencies when tests complete (default: False)")
+def command_check(url, user, token, timeout, retries, stats):
     """
     This tool performs tests to understand if USER is allowed to use kirk,
     as well as the URL is configured properly.
     """
-    tester = JenkinsTester(url, user, token)
+    policy = RetryPolicy(timeout=timeout or None, retries=retries)
+    instrumentation = Instrumentation()
+    if stats:
+        collect_stats(instrumentation)
+
+    tester = JenkinsTester(
+        url,
+        user,
+        token,
+        policy=policy,
+        instrumentation=instrumentation)
     tests = {
         'connection test': tester.test_connection,
         'plugins installed': tester.test_plugins,
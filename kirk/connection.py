@@ -0,0 +1,320 @@
+"""
+.. module:: connection
+   :platform: Multiplatform
+   :synopsis: Jenkins connections handling
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import time
+import random
+import logging
+import threading
+import requests
+import jenkins
+from kirk.resilience import RetryPolicy
+from kirk.resilience import CircuitOpenError
+from kirk.stats import Instrumentation
+from kirk.stats import endpoint_name
+from kirk.trace import span
+
+
+def retryable(err):
+    """
+    Check if a failed seed setup can succeed when it's done again. Folders
+    and seeds created by someone else in the meanwhile can be setup again,
+    as well as requests failed with transient errors which have not been
+    already retried by a :py:class:`kirk.resilience.RetryPolicy`.
+    Authentication errors and open circuits are never retried.
+
+    Args:
+        err(Exception): error raised by the seed setup.
+
+    Returns:
+        bool: True if seed setup can be retried.
+    """
+    if isinstance(err, CircuitOpenError):
+        return False
+
+    # python-jenkins hides the HTTP error raised by requests
+    causes = [err, err.__cause__ or err.__context__]
+    causes = [cause for cause in causes if cause is not None]
+
+    for cause in causes:
+        response = getattr(cause, 'response', None)
+        text = getattr(response, 'text', None) or ""
+        if "already exists" in str(cause) or "already exists" in text:
+            return True
+
+    if getattr(err, 'retried', False):
+        return False
+
+    return any(RetryPolicy.transient(cause) for cause in causes)
+
+
+def retry(func, attempts=3, delay=0.5, logger=None):
+    """
+    Call ``func`` until it doesn't raise a retryable error, according with
+    :py:func:`retryable`. Between two calls a random time up to ``delay``
+    seconds is waited, doubling ``delay`` at each failure, so processes
+    which failed together don't retry together.
+
+    Args:
+        func(callable): function to call, without arguments.
+        attempts(int): maximum number of calls.
+        delay(float): maximum waiting time after the first failure.
+        logger(logging.Logger): logger reporting the failures.
+
+    Returns:
+        object: the value returned by ``func``.
+
+    Raises:
+        jenkins.JenkinsException: raised by the last call.
+    """
+    if attempts < 1:
+        raise ValueError("attempts must be greater than zero")
+
+    for attempt in range(attempts):
+        try:
+            return func()
+        except (jenkins.JenkinsException,
+                requests.exceptions.RequestException) as err:
+            if attempt == attempts - 1 or not retryable(err):
+                raise
+
+            wait = random.uniform(0, delay * (2 ** attempt))
+            if logger:
+                logger.info("%s: retrying in %.2f seconds", err, wait)
+
+            time.sleep(wait)
+
+    return None
+
+
+class Connection(jenkins.Jenkins):
+    """
+    Jenkins connection which waits for the server throttle before sending
+    each request, and sends requests according with a retry policy. Each
+    request sent to the server is measured by the instrumentation.
+    """
+
+    def __init__(self, url, username=None, password=None, throttle=None,
+                 policy=None, instrumentation=None):
+        """
+        Args:
+            url(str): jenkins server url.
+            username(str): jenkins user.
+            password(str): jenkins user password or token.
+            throttle(:py:class:`kirk.throttle.Throttle`): limits shared by
+                the connections to the same servers. If None, requests are
+                not limited.
+            policy(:py:class:`kirk.resilience.RetryPolicy`): timeouts,
+                retries and circuit breakers shared by the connections to
+                the same servers. If None, each request is sent once.
+            instrumentation(:py:class:`kirk.stats.Instrumentation`):
+                requests instrumentation. If None, requests are not measured.
+        """
+        super().__init__(url, username, password)
+        self._url = url
+        self._throttle = throttle
+        self._policy = policy
+        self._instrumentation = instrumentation
+
+        if policy and policy.timeout:
+            self.timeout = policy.timeout
+
+    @property
+    def throttle(self):
+        """
+        :py:class:`kirk.throttle.Throttle`: server limits or None.
+        """
+        return self._throttle
+
+    @property
+    def policy(self):
+        """
+        :py:class:`kirk.resilience.RetryPolicy`: retry policy or None.
+        """
+        return self._policy
+
+    @property
+    def instrumentation(self):
+        """
+        :py:class:`kirk.stats.Instrumentation`: requests instrumentation or
+        None.
+        """
+        return self._instrumentation
+
+    def jenkins_request(self, req, *args, **kwargs):
+        method = (getattr(req, 'method', None) or "").upper()
+
+        def _request():
+            name = "%s %s" % (
+                method,
+                endpoint_name(getattr(req, 'url', None), base=self._url))
+
+            with span(name, category="http", server=self._url):
+                return super(Connection, self).jenkins_request(
+                    req, *args, **kwargs)
+
+        def _send():
+            if self._throttle:
+                with span("throttle wait", category="wait",
+                          server=self._url):
+                    self._throttle.wait(self._url)
+
+            # time spent waiting for the throttle is not measured
+            if self._instrumentation and self._instrumentation.hooks:
+                return self._instrumentation.measure(
+                    self._url, req, _request)
+
+            return _request()
+
+        if not self._policy:
+            return _send()
+
+        idempotent = method in self._policy.IDEMPOTENT
+
+        return self._policy.call(self._url, _send, idempotent=idempotent)
+
+
+class ConnectionPool:
+    """
+    Keep one Jenkins connection for each server, so the same HTTP session
+    is used by all the requests sent to a server. A connection is created
+    again when the owner password changes.
+    """
+
+    def __init__(self, credentials, owner="kirk", throttle=None,
+                 policy=None, instrumentation=None):
+        """
+        Args:
+            credentials(:py:class:`kirk.credentials.Credentials`): credentials
+                handler object.
+            owner(str): owner name that handles REST API communication with
+                the jenkins servers.
+            throttle(:py:class:`kirk.throttle.Throttle`): limits on the
+                requests and builds sent to each server. If None, load is
+                not limited.
+            policy(:py:class:`kirk.resilience.RetryPolicy`): retry policy
+                of the requests. If None, each request is sent once.
+            instrumentation(:py:class:`kirk.stats.Instrumentation`):
+                requests instrumentation. If None, a new one is created.
+        """
+        self._logger = logging.getLogger("connection")
+        self._credentials = credentials
+        self._owner = owner
+        self._throttle = throttle
+        self._policy = policy
+        self._instrumentation = instrumentation or Instrumentation()
+        self._connections = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def owner(self):
+        """
+        str: owner name used to connect to servers.
+        """
+        return self._owner
+
+    @property
+    def throttle(self):
+        """
+        :py:class:`kirk.throttle.Throttle`: servers limits or None.
+        """
+        return self._throttle
+
+    @property
+    def policy(self):
+        """
+        :py:class:`kirk.resilience.RetryPolicy`: retry policy or None.
+        """
+        return self._policy
+
+    @property
+    def instrumentation(self):
+        """
+        :py:class:`kirk.stats.Instrumentation`: requests instrumentation,
+        where hooks measuring requests can be registered.
+        """
+        return self._instrumentation
+
+    @property
+    def credentials(self):
+        """
+        :py:class:`kirk.credentials.Credentials`: credentials handler.
+        """
+        return self._credentials
+
+    def get(self, server):
+        """
+        Return the connection to ``server``.
+
+        Args:
+            server(str): jenkins server url.
+
+        Returns:
+            jenkins.Jenkins: Jenkins communication object.
+
+        Raises:
+            ValueError: raised when server is empty.
+            :py:class:`KirkError`: raised if credentials can't be read.
+        """
+        if not server:
+            raise ValueError("server is empty")
+
+        self._logger.info("getting '%s' credentials", self._owner)
+        password = self._credentials.get_password(server, self._owner)
+
+        with self._lock:
+            item = self._connections.get(server, None)
+            if item and item[0] == password:
+                return item[1]
+
+            self._logger.info("connecting to '%s'", server)
+            connection = Connection(
+                server,
+                self._owner,
+                password,
+                throttle=self._throttle,
+                policy=self._policy,
+                instrumentation=self._instrumentation)
+            self._connections[server] = (password, connection)
+
+        return connection
+
+    def admit(self, server):
+        """
+        Wait until a new build can be queued on ``server``, according with
+        the pool throttle.
+
+        Args:
+            server(str): jenkins server url.
+
+        Returns:
+            float: seconds spent waiting.
+
+        Raises:
+            :py:class:`KirkError`: raised if credentials can't be read.
+        """
+        if not self._throttle:
+            return 0.0
+
+        conn = self.get(server)
+
+        with span("queue admission", category="wait", server=server):
+            return self._throttle.admit(conn, server)
+
+    def clear(self):
+        """
+        Close all the connections.
+        """
+        with self._lock:
+            self._connections.clear()
+
+    @property
+    def servers(self):
+        """
+        list(str): servers with an open connection.
+        """
+        with self._lock:
+            return list(self._connections.keys())
+
@@ -4,9 +4,15 @@
    :synopsis: module handling credentials
 .. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
 """
-from keyring.errors import KeyringError
-from keyrings.alt.file import PlaintextKeyring
+import os
+import re
+import base64
+import time
+import configparser
+import threading
 from kirk import KirkError
+from kirk.lock import FileLock
+from kirk.trace import span
 
 
 class Credentials:
@@ -48,7 +54,8 @@ class Credentials:
 class CredentialsHandler(Credentials):
     """
     Inherit :py:class:`Credentials` and save/load credentials from a
-    keyrings file.
+    keyrings file. The keyring modules are imported only when the first
+    credential is requested.
     """
 
     def __init__(self, file_path):
@@ -57,21 +64,367 @@ class CredentialsHandler(Credentials):
             file_path(str): keyrings file path.
         """
         self._file_path = file_path
-        self._inkr = PlaintextKeyring()
+        self._inkr = None
+
+    def _keyring(self):
+        """
+        Return the keyring object, creating it if needed.
+        """
+        if self._inkr is None:
+            # pylint: disable=import-outside-toplevel
+            from keyrings.alt.file import PlaintextKeyring
+            self._inkr = PlaintextKeyring()
+
+        self._inkr.file_path = self._file_path
+        return self._inkr
 
     def get_password(self, section, username):
+        # pylint: disable=import-outside-toplevel
+        from keyring.errors import KeyringError
+
         password = ""
         try:
-            self._inkr.file_path = self._file_path
-            password = self._inkr.get_password(section, username)
+            password = self._keyring().get_password(section, username)
         except KeyringError as err:
             raise KirkError(err)
 
         return password
 
     def set_password(self, section, username, password):
+        # pylint: disable=import-outside-toplevel
+        from keyring.errors import KeyringError
+
         try:
-            self._inkr.file_path = self._file_path
-            self._inkr.set_password(section, username, password)
+            self._keyring().set_password(section, username, password)
         except KeyringError as err:
             raise KirkError(err)
+
+    def _read_config(self):
+        """
+        Read the keyrings file content.
+        """
+        config = configparser.RawConfigParser()
+        try:
+            config.read(self._file_path, encoding='utf-8')
+        except configparser.Error as err:
+            raise KirkError(err)
+
+        return config
+
+    def _encode(self, section, username, password):
+        """
+        Return a password as it's stored inside the keyrings file, using
+        the keyring encryption and the keyrings file escaping.
+        """
+        # pylint: disable=import-outside-toplevel
+        from keyrings.alt.escape import escape
+
+        if not username:
+            raise KirkError("username is empty")
+
+        if not isinstance(password, str):
+            raise KirkError("password must be a string")
+
+        # associated data has the same format used by keyrings.alt
+        assoc = (escape(section) + r'\0' + escape(username)).encode()
+        encrypted = self._keyring().encrypt(password.encode('utf-8'), assoc)
+
+        # line break untangles the keyrings file
+        return '\n' + base64.encodebytes(encrypted).decode()
+
+    def set_passwords(self, entries):
+        """
+        Store many passwords at once. The keyrings file is read and written
+        only once, replacing it atomically while other kirk processes are
+        kept out.
+
+        Args:
+            entries(list((str, str, str))): list of
+                (section, username, password).
+
+        Raises:
+            :py:class:`KirkError`: raised if an error occurs.
+        """
+        # pylint: disable=import-outside-toplevel
+        from keyring.errors import KeyringError
+        from keyrings.alt.escape import escape
+
+        try:
+            values = [
+                (escape(section), escape(username),
+                 self._encode(section, username, password))
+                for section, username, password in entries
+            ]
+        except (KeyringError, ValueError) as err:
+            raise KirkError(err)
+
+        folder = os.path.dirname(os.path.abspath(self._file_path))
+        tmp_path = os.path.join(
+            folder,
+            ".%s.%d.tmp" % (os.path.basename(self._file_path), os.getpid()))
+
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with FileLock(self._file_path + ".lock"):
+                config = self._read_config()
+                for section, username, value in values:
+                    if not config.has_section(section):
+                        config.add_section(section)
+                    config.set(section, username, value)
+
+                with open(tmp_path, 'w', encoding='utf-8') as config_file:
+                    os.chmod(tmp_path, 0o600)
+                    config.write(config_file)
+                os.replace(tmp_path, self._file_path)
+        except OSError as err:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            raise KirkError(err)
+
+    def list_entries(self):
+        """
+        Return the credentials stored inside the keyrings file.
+
+        Returns:
+            list((str, str)): list of (section, username).
+
+        Raises:
+            :py:class:`KirkError`: raised if an error occurs.
+        """
+        # pylint: disable=import-outside-toplevel
+        from keyrings.alt.escape import unescape
+
+        entries = list()
+        config = self._read_config()
+        for service in config.sections():
+            if service == "keyring-setting":
+                continue
+
+            for key in config.options(service):
+                entries.append((unescape(service), unescape(key)))
+
+        return entries
+
+
+class EnvCredentials(Credentials):
+    """
+    Inherit :py:class:`Credentials` and read credentials from environment
+    variables. The password of ``username`` for the ``section`` server is
+    read from the following variables, in this order:
+
+        * ``<prefix>TOKEN_<SECTION>_<USERNAME>``
+        * ``<prefix>TOKEN``
+
+    where ``<SECTION>`` and ``<USERNAME>`` are uppercase and any character
+    that is not alphanumeric is replaced with '_'. For example,
+    ``http://localhost:8080`` and ``kirk`` become
+    ``KIRK_TOKEN_HTTP___LOCALHOST_8080_KIRK``.
+    """
+
+    def __init__(self, prefix="KIRK_"):
+        """
+        Args:
+            prefix(str): prefix of the environment variables.
+        """
+        self._prefix = prefix
+        self._re_invalid = re.compile(r"[^A-Za-z0-9]")
+
+    def variable(self, section, username):
+        """
+        Return the name of the environment variable storing the ``username``
+        password for ``section``.
+
+        Args:
+            section(str): section of the ``username``.
+            username(str): user name.
+
+        Returns:
+            str: environment variable name.
+        """
+        suffix = self._re_invalid.sub("_", "%s_%s" % (section, username))
+        return "%sTOKEN_%s" % (self._prefix, suffix.upper())
+
+    def get_password(self, section, username):
+        password = os.environ.get(self.variable(section, username), None)
+        if password is None:
+            password = os.environ.get("%sTOKEN" % self._prefix, None)
+
+        return password
+
+    def set_password(self, section, username, password):
+        raise KirkError("environment credentials are read-only")
+
+
+def read_entries(stream):
+    """
+    Read credentials entries from a text stream. Each line contains server
+    url, user name and password, separated by whitespaces. Empty lines and
+    lines starting with '#' are ignored.
+
+    Args:
+        stream(file): text stream to read.
+
+    Returns:
+        list((str, str, str)): list of (section, username, password).
+
+    Raises:
+        :py:class:`KirkError`: raised if a line is not valid.
+    """
+    entries = list()
+    for num, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        items = line.split(None, 2)
+        if len(items) != 3:
+            raise KirkError(
+                "line %d: expected '<url> <user> <password>'" % num)
+
+        entries.append(tuple(items))
+
+    return entries
+
+
+class TokenFileCredentials(Credentials):
+    """
+    Inherit :py:class:`Credentials` and read credentials from a read-only
+    text file, which is parsed only once. See :py:func:`read_entries` for
+    the file format.
+    """
+
+    def __init__(self, file_path):
+        """
+        Args:
+            file_path(str): tokens file path.
+        """
+        self._file_path = file_path
+        self._tokens = None
+
+    def _load(self):
+        """
+        Parse the tokens file.
+        """
+        if self._tokens is not None:
+            return
+
+        tokens = dict()
+        try:
+            with open(self._file_path, 'r') as stream:
+                for section, username, password in read_entries(stream):
+                    tokens[(section, username)] = password
+        except OSError as err:
+            raise KirkError(err)
+
+        self._tokens = tokens
+
+    def get_password(self, section, username):
+        self._load()
+        return self._tokens.get((section, username), None)
+
+    def set_password(self, section, username, password):
+        raise KirkError("tokens file credentials are read-only")
+
+
+class CachedCredentials(Credentials):
+    """
+    Inherit :py:class:`Credentials` and keep in memory the passwords read
+    from another credentials handler, for ``ttl`` seconds.
+    """
+
+    def __init__(self, credentials, ttl=300):
+        """
+        Args:
+            credentials(:py:class:`Credentials`): credentials handler.
+            ttl(float): seconds before a cached password expires. If 0,
+                passwords never expire.
+        """
+        self._credentials = credentials
+        self._ttl = ttl
+        self._cache = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def credentials(self):
+        """
+        :py:class:`Credentials`: wrapped credentials handler.
+        """
+        return self._credentials
+
+    def get_password(self, section, username):
+        key = (section, username)
+        now = time.monotonic()
+
+        with self._lock:
+            item = self._cache.get(key, None)
+            if item and (not item[1] or item[1] > now):
+                return item[0]
+
+        with span("credential lookup", category="credentials",
+                  section=section, username=username):
+            password = self._credentials.get_password(section, username)
+
+        # not found passwords are not cached, so they can be added later
+        if password is not None:
+            expire = now + self._ttl if self._ttl else 0
+            with self._lock:
+                self._cache[key] = (password, expire)
+
+        return password
+
+    def set_password(self, section, username, password):
+        self._credentials.set_password(section, username, password)
+
+        with self._lock:
+            self._cache.pop((section, username), None)
+
+    def prefetch(self, entries):
+        """
+        Read and cache the passwords of the given entries.
+
+        Args:
+            entries(list((str, str))): list of (section, username).
+
+        Raises:
+            :py:class:`KirkError`: raised if an error occurs.
+        """
+        for section, username in set(entries):
+            self.get_password(section, username)
+
+    def clear(self):
+        """
+        Remove all cached passwords.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+BACKENDS = ('keyring', 'env', 'file')
+
+
+def get_credentials(backend, file_path=None):
+    """
+    Return a credentials handler.
+
+    Args:
+        backend(str): one of :py:data:`BACKENDS`. 'keyring' reads a keyrings
+            file, 'env' reads environment variables and 'file' reads a
+            read-only tokens file.
+        file_path(str): keyrings or tokens file path.
+
+    Returns:
+        :py:class:`Credentials`: credentials handler.
+
+    Raises:
+        ValueError: if backend is not supported.
+    """
+    if backend == 'keyring':
+        return CredentialsHandler(file_path)
+
+    if backend == 'env':
+        return EnvCredentials()
+
+    if backend == 'file':
+        return TokenFileCredentials(file_path)
+
+    raise ValueError("'%s' credentials backend is not supported" % backend)
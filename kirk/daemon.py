@@ -0,0 +1,817 @@
+"""
+.. module:: daemon
+   :platform: Multiplatform
+   :synopsis: kirk daemon keeping catalogs, credentials and connections warm
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import io
+import os
+import re
+import hmac
+import json
+import codecs
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from kirk import KirkError
+from kirk.catalog import Catalog
+from kirk.connection import ConnectionPool
+from kirk.credentials import CachedCredentials
+from kirk.credentials import get_credentials
+from kirk.resilience import RetryPolicy
+from kirk.throttle import Throttle
+
+
+class DaemonBusyError(KirkError):
+    """
+    Raised when the daemon didn't start a command in time, because it was
+    running other commands. The command has not been executed.
+    """
+
+
+class WarmState:
+    """
+    Objects which are kept alive between the commands served by the daemon.
+    Catalogs, credentials and connections pools are created the first time
+    they are requested and then they are reused.
+    """
+
+    def __init__(self, metrics=None):
+        """
+        Args:
+            metrics(:py:class:`kirk.metrics.MetricsCollector`): collector
+                measuring the requests of all the pools. If None, metrics
+                are not collected.
+        """
+        self._logger = logging.getLogger("daemon")
+        self._metrics = metrics
+        self._lock = threading.RLock()
+        self._catalogs = dict()
+        self._credentials = dict()
+        self._pools = dict()
+        self._throttles = dict()
+        self._policies = dict()
+
+    @property
+    def metrics(self):
+        """
+        :py:class:`kirk.metrics.MetricsCollector`: metrics collector or None.
+        """
+        return self._metrics
+
+    def get_catalog(self, folder, cache=None):
+        """
+        Return the catalog of ``folder``, loaded again only if projects files
+        changed.
+
+        Args:
+            folder(str): folder containing projects files.
+            cache(str): catalog cache file.
+
+        Returns:
+            :py:class:`kirk.catalog.Catalog`: projects catalog.
+        """
+        folder = os.path.abspath(folder)
+        if cache:
+            cache = os.path.abspath(cache)
+
+        key = (folder, cache)
+
+        with self._lock:
+            catalog = self._catalogs.get(key, None)
+            if catalog is None:
+                catalog = Catalog(folder, cache=cache)
+                catalog.load()
+                self._catalogs[key] = catalog
+            else:
+                catalog.refresh()
+
+        return catalog
+
+    def get_credentials(self, backend, file_path, ttl):
+        """
+        Return the cached credentials handler for the given configuration.
+
+        Args:
+            backend(str): credentials backend.
+            file_path(str): keyrings or tokens file path.
+            ttl(float): seconds before a cached password expires.
+
+        Returns:
+            :py:class:`kirk.credentials.CachedCredentials`: credentials.
+        """
+        path = os.path.abspath(file_path) if file_path else file_path
+        key = (backend, path, ttl)
+
+        with self._lock:
+            credentials = self._credentials.get(key, None)
+            if credentials is None:
+                credentials = CachedCredentials(
+                    get_credentials(backend, path),
+                    ttl=ttl)
+                self._credentials[key] = credentials
+
+        return credentials
+
+    def get_throttle(self, rate, burst, max_queue):
+        """
+        Return the servers limits for the given configuration, so they are
+        shared by all the requests served by the daemon.
+
+        Args:
+            rate(float): maximum number of requests per second.
+            burst(int): maximum number of requests sent at once.
+            max_queue(int): maximum length of a server queue.
+
+        Returns:
+            :py:class:`kirk.throttle.Throttle`: servers limits or None if
+            load is not limited.
+        """
+        if not rate and not max_queue:
+            return None
+
+        key = (rate, burst, max_queue)
+
+        with self._lock:
+            throttle = self._throttles.get(key, None)
+            if throttle is None:
+                throttle = Throttle(
+                    rate=rate, burst=burst, max_queue=max_queue)
+                self._throttles[key] = throttle
+
+        return throttle
+
+    def get_policy(self, timeout, retries, threshold):
+        """
+        Return the retry policy for the given configuration, so circuit
+        breakers are shared by all the requests served by the daemon.
+
+        Args:
+            timeout(float): seconds before a request is aborted.
+            retries(int): maximum number of times a request is sent again.
+            threshold(int): consecutive failures opening a server circuit.
+
+        Returns:
+            :py:class:`kirk.resilience.RetryPolicy`: retry policy.
+        """
+        key = (timeout, retries, threshold)
+
+        with self._lock:
+            policy = self._policies.get(key, None)
+            if policy is None:
+                policy = RetryPolicy(
+                    timeout=timeout, retries=retries, threshold=threshold)
+                self._policies[key] = policy
+
+        return policy
+
+    def get_pool(self, credentials, owner, throttle=None, policy=None):
+        """
+        Return the connections pool for ``owner``.
+
+        Args:
+            credentials(:py:class:`kirk.credentials.Credentials`): credentials
+                handler.
+            owner(str): owner name.
+            throttle(:py:class:`kirk.throttle.Throttle`): servers limits.
+            policy(:py:class:`kirk.resilience.RetryPolicy`): retry policy.
+
+        Returns:
+            :py:class:`kirk.connection.ConnectionPool`: connections pool.
+        """
+        key = (id(credentials), owner, id(throttle), id(policy))
+
+        with self._lock:
+            pool = self._pools.get(key, None)
+            if pool is None:
+                pool = ConnectionPool(
+                    credentials,
+                    owner=owner,
+                    throttle=throttle,
+                    policy=policy)
+                self._pools[key] = pool
+
+                if self._metrics:
+                    self._metrics.add_pool(pool)
+                    pool.instrumentation.add_hook(self._metrics)
+
+        return pool
+
+    def refresh(self):
+        """
+        Load again the catalogs which projects files changed. Catalogs are
+        modified in place, so it must not be called while a command is
+        using them.
+        """
+        with self._lock:
+            catalogs = list(self._catalogs.values())
+
+        for catalog in catalogs:
+            try:
+                with self._lock:
+                    catalog.refresh()
+            except (KirkError, ValueError, OSError) as err:
+                self._logger.warning(
+                    "can't reload '%s': %s", catalog.folder, err)
+
+
+def parse_address(address):
+    """
+    Parse a daemon address.
+
+    Args:
+        address(str): "<host>:<port>" for a TCP socket or the path of a Unix
+            socket.
+
+    Returns:
+        str or (str, int): socket path or (host, port).
+    """
+    match = re.match(r"^(?P<host>[\w.-]+):(?P<port>\d+)$", address)
+    if match:
+        return match.group('host'), int(match.group('port'))
+
+    return address
+
+
+def _forward_stdin(sock, stdin):
+    """
+    Send the standard input to the daemon as soon as it's read, followed by
+    the end of file.
+    """
+    try:
+        fd = stdin.fileno()
+    except (AttributeError, ValueError, OSError, io.UnsupportedOperation):
+        fd = None
+
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    try:
+        while True:
+            if fd is None:
+                data = stdin.read(65536)
+                eof = not data
+            else:
+                raw = os.read(fd, 65536)
+                eof = not raw
+                data = decoder.decode(raw, final=eof)
+
+            if data:
+                frame = json.dumps(dict(stdin=data)) + "\n"
+                sock.sendall(frame.encode('utf-8'))
+
+            if eof:
+                break
+    except (OSError, ValueError):
+        # daemon closed the connection or stdin can't be read
+        pass
+
+    try:
+        sock.sendall(b'{"stdin": null}\n')
+    except OSError:
+        pass
+
+
+def send_command(address, argv, cwd=None, timeout=None, token=None,
+                 stdin=None, stdout=None, stderr=None, wait=None):
+    """
+    Send a command to the daemon.
+
+    Args:
+        address(str): daemon address. See :py:func:`parse_address`.
+        argv(list(str)): command line arguments.
+        cwd(str): working directory of the command. If None, the daemon
+            working directory is used.
+        timeout(float): socket timeout in seconds.
+        token(str): token authenticating the client, which is required by
+            TCP sockets.
+        stdin(file): standard input of the command, which is forwarded
+            while it's read. If None, command reads an empty input.
+        stdout(file): stream where the command output is written as soon
+            as it's received. If None, output is returned.
+        stderr(file): stream where the command errors are written as soon
+            as they are received. If None, errors are returned.
+        wait(float): seconds waited for the commands which are running
+            inside the daemon. If None, client waits until they complete.
+
+    Returns:
+        dict: response containing 'exit_code', 'stdout' and 'stderr'.
+        Output written on the given streams is not returned.
+
+    Raises:
+        OSError: raised if daemon can't be reached.
+        :py:class:`DaemonBusyError`: raised if daemon didn't start the
+            command within ``wait`` seconds.
+        :py:class:`KirkError`: raised if connection is lost after the
+            command has been sent, so command could have been executed.
+    """
+    target = parse_address(address)
+    if isinstance(target, tuple):
+        sock = socket.create_connection(target, timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(target)
+
+    with sock:
+        request = dict(argv=list(argv))
+        if cwd:
+            request['cwd'] = cwd
+        if token:
+            request['token'] = token
+        if wait is not None:
+            request['wait'] = wait
+
+        request = json.dumps(request) + "\n"
+        sock.sendall(request.encode('utf-8'))
+
+        streams = dict(stdout=stdout, stderr=stderr)
+        output = dict(stdout=list(), stderr=list())
+        exit_code = None
+        busy = False
+
+        try:
+            with sock.makefile('r', encoding='utf-8') as stream:
+                for line in stream:
+                    frame = json.loads(line)
+                    if 'exit_code' in frame:
+                        exit_code = frame['exit_code']
+                        break
+
+                    if frame.get('busy', False):
+                        busy = True
+
+                    if frame.get('started', False):
+                        # input is read only by commands which started, so
+                        # it's still available if command runs elsewhere
+                        if stdin is None:
+                            sock.sendall(b'{"stdin": null}\n')
+                        else:
+                            forwarder = threading.Thread(
+                                target=_forward_stdin,
+                                args=(sock, stdin),
+                                daemon=True)
+                            forwarder.start()
+
+                    for name, target_stream in streams.items():
+                        if name not in frame:
+                            continue
+
+                        if target_stream is None:
+                            output[name].append(frame[name])
+                        else:
+                            target_stream.write(frame[name])
+                            target_stream.flush()
+        except (OSError, ValueError) as err:
+            raise KirkError("connection with kirk daemon lost: %s" % err)
+
+    if busy:
+        raise DaemonBusyError(
+            "kirk daemon busy for more than %s seconds" % wait)
+
+    if exit_code is None:
+        raise KirkError("connection with kirk daemon lost")
+
+    return dict(
+        exit_code=exit_code,
+        stdout="".join(output['stdout']),
+        stderr="".join(output['stderr']))
+
+
+class _FrameWriter(io.TextIOBase):
+    """
+    Text stream sending each write to the client.
+    """
+
+    def __init__(self, send, name):
+        super().__init__()
+        self._send = send
+        self._name = name
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    @property
+    def errors(self):
+        return "strict"
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        # bytes are refused, so click writes text
+        if not isinstance(text, str):
+            raise TypeError("write() argument must be str")
+
+        if text:
+            self._send({self._name: text})
+
+        return len(text)
+
+
+class _FrameReader(io.TextIOBase):
+    """
+    Text stream reading the standard input forwarded by the client. Input
+    is read only when command needs it.
+    """
+
+    def __init__(self, rfile):
+        super().__init__()
+        self._rfile = rfile
+        self._buffer = ""
+        self._eof = False
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    @property
+    def errors(self):
+        return "strict"
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        """
+        Read the next input frame.
+        """
+        line = self._rfile.readline()
+        try:
+            data = json.loads(line.decode('utf-8'))['stdin'] if line else None
+        except (ValueError, KeyError, TypeError):
+            data = None
+
+        if data is None:
+            self._eof = True
+        else:
+            self._buffer += str(data)
+
+    def readline(self, size=-1):
+        while "\n" not in self._buffer and not self._eof:
+            self._fill()
+
+        end = self._buffer.find("\n") + 1 or len(self._buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+
+        line, self._buffer = self._buffer[:end], self._buffer[end:]
+        return line
+
+    def read(self, size=-1):
+        while not self._eof and (
+                size is None or size < 0 or len(self._buffer) < size):
+            self._fill()
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handle a single command request.
+    """
+
+    # seconds waited for the client to close the connection
+    DRAIN_TIMEOUT = 5.0
+
+    def _drain(self):
+        """
+        Read the client input which has not been used by the command, until
+        the client closes the connection. Closing a connection with unread
+        data resets it, and the client could lose the response.
+        """
+        try:
+            self.request.shutdown(socket.SHUT_WR)
+            self.request.settimeout(self.DRAIN_TIMEOUT)
+            while self.rfile.read1(65536):
+                pass
+        except OSError:
+            pass
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        lock = threading.Lock()
+
+        def _send(frame):
+            data = json.dumps(frame) + "\n"
+            with lock:
+                self.wfile.write(data.encode('utf-8'))
+                self.wfile.flush()
+
+        try:
+            request = json.loads(line.decode('utf-8'))
+            argv = [str(arg) for arg in request['argv']]
+            cwd = request.get('cwd', None)
+            token = request.get('token', None)
+            wait = request.get('wait', None)
+            if wait is not None:
+                wait = max(float(wait), 0)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            response = dict(
+                exit_code=2,
+                stdout="",
+                stderr="invalid request\n")
+        else:
+            if self.server.daemon.authorize(self.request, token):
+                response = self.server.daemon.execute(
+                    argv,
+                    cwd=cwd,
+                    stdout=_FrameWriter(_send, 'stdout'),
+                    stderr=_FrameWriter(_send, 'stderr'),
+                    stdin=_FrameReader(self.rfile),
+                    wait=wait,
+                    started=lambda: _send(dict(started=True)))
+            else:
+                response = dict(
+                    exit_code=1,
+                    stdout="",
+                    stderr="permission denied\n")
+
+        try:
+            if response.get('busy', False):
+                _send(dict(busy=True))
+
+            for name in ('stdout', 'stderr'):
+                if response[name]:
+                    _send({name: response[name]})
+
+            _send(dict(exit_code=response['exit_code']))
+        except OSError as err:
+            self.server.daemon.logger.warning(
+                "can't send response: %s", err)
+            return
+
+        self._drain()
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+def _peer_uid(sock):
+    """
+    Return the user id of the process connected to a Unix socket or None
+    if it can't be read.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+
+    try:
+        creds = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    except OSError:
+        return None
+
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+class KirkDaemon:
+    """
+    A daemon serving kirk commands on a Unix socket or on a local TCP port.
+    Each request is a JSON line ``{"argv": [...], "cwd": str,
+    "token": str}``, followed by the standard input lines ``{"stdin": str}``
+    ending with ``{"stdin": null}``. The command output is sent while it's
+    written, using ``{"stdout": str}`` and ``{"stderr": str}`` lines, and
+    the response ends with ``{"exit_code": int}``.
+
+    Commands run with the daemon owner credentials, so only the owner can
+    send them: the Unix socket can be opened by the owner only and peers
+    of other users are rejected, while TCP clients must send the daemon
+    token.
+
+    Commands are executed one at a time by ``handler``, inside the client
+    working directory, while a thread polls projects folders in order to
+    keep catalogs updated. Commands change the working directory and the
+    standard streams of the daemon process, so even the ones which only
+    read catalogs, like ``list`` or ``search``, wait for the running ones.
+    A request can contain the ``"wait"`` seconds a client waits for them:
+    after that, daemon answers ``{"busy": true}`` and the command is not
+    executed. Otherwise ``{"started": true}`` is sent when command starts,
+    and then the client sends the standard input.
+    """
+
+    def __init__(self, handler, state, socket_path=None, port=None,
+                 host="127.0.0.1", poll=2.0, token=None):
+        """
+        Args:
+            handler(callable): function executing a command. It receives the
+                list of arguments and the ``stdout``, ``stderr`` and
+                ``stdin`` streams of the command, and it returns
+                (exit_code, stdout, stderr) with the output which has not
+                been written on the streams.
+            state(:py:class:`WarmState`): objects shared between commands.
+            socket_path(str): Unix socket path.
+            port(int): TCP port. If given, ``socket_path`` is not used.
+            host(str): TCP address (default: 127.0.0.1).
+            poll(float): seconds between two projects folders checks. If 0,
+                folders are checked only when a command is received.
+            token(str): token that clients must send. It's required by
+                TCP sockets and optional for Unix sockets.
+        """
+        if not socket_path and port is None:
+            raise ValueError("socket path or port must be given")
+
+        if port is not None and not token:
+            raise ValueError("token is required by TCP sockets")
+
+        self._logger = logging.getLogger("daemon")
+        self._handler = handler
+        self._state = state
+        self._socket_path = socket_path
+        self._port = port
+        self._host = host
+        self._poll = poll
+        self._token = token
+        self._server = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        :py:class:`WarmState`: objects shared between commands.
+        """
+        return self._state
+
+    @property
+    def logger(self):
+        """
+        logging.Logger: daemon logger.
+        """
+        return self._logger
+
+    @property
+    def address(self):
+        """
+        str: address that clients use to connect to the daemon.
+        """
+        if self._server and self._port is not None:
+            host, port = self._server.server_address[:2]
+            return "%s:%d" % (host, port)
+
+        if self._port is not None:
+            return "%s:%d" % (self._host, self._port)
+
+        return self._socket_path
+
+    def authorize(self, sock, token):
+        """
+        Check if a client can send commands.
+
+        Args:
+            sock(socket.socket): client connection.
+            token(str): token sent by the client.
+
+        Returns:
+            bool: True if client is authorized.
+        """
+        if self._port is None:
+            uid = _peer_uid(sock)
+            if uid is not None and uid != os.geteuid():
+                self._logger.warning("rejected command of user %d", uid)
+                return False
+
+        if self._token:
+            if not hmac.compare_digest(
+                    str(token or "").encode('utf-8'),
+                    self._token.encode('utf-8')):
+                self._logger.warning("rejected command with wrong token")
+                return False
+
+        return True
+
+    def execute(self, argv, cwd=None, stdout=None, stderr=None, stdin=None,
+                wait=None, started=None):
+        """
+        Execute a command, after the running ones completed.
+
+        Args:
+            argv(list(str)): command line arguments.
+            cwd(str): working directory of the command. If None, the daemon
+                working directory is used.
+            stdout(file): stream receiving the command output. If None,
+                output is returned.
+            stderr(file): stream receiving the command errors. If None,
+                errors are returned.
+            stdin(file): standard input of the command.
+            wait(float): seconds waited for the running commands. If None,
+                command waits until they complete.
+            started(callable): function called when command starts.
+
+        Returns:
+            dict: response containing 'exit_code', 'stdout' and 'stderr'.
+            If command was not executed within ``wait`` seconds, 'busy' is
+            True.
+        """
+        if not self._lock.acquire(timeout=-1 if wait is None else wait):
+            self._logger.info("busy, not executing %s", argv)
+            return dict(busy=True, exit_code=1, stdout="", stderr="")
+
+        self._logger.info("executing %s", argv)
+
+        try:
+            curdir = os.getcwd()
+            try:
+                if started:
+                    started()
+                if cwd:
+                    os.chdir(cwd)
+                exit_code, out, err = self._handler(
+                    argv, stdout=stdout, stderr=stderr, stdin=stdin)
+            except OSError as error:
+                exit_code, out, err = 1, "", "%s\n" % error
+            finally:
+                os.chdir(curdir)
+        finally:
+            self._lock.release()
+
+        return dict(exit_code=exit_code, stdout=out, stderr=err)
+
+    def _poll_loop(self):
+        """
+        Check projects folders periodically.
+        """
+        while not self._stop.wait(self._poll):
+            # commands use catalogs without locking them, so they are never
+            # reloaded while a command is running
+            with self._lock:
+                self._state.refresh()
+
+    def start(self):
+        """
+        Open the daemon socket.
+
+        Raises:
+            :py:class:`KirkError`: raised if socket can't be opened.
+        """
+        try:
+            if self._port is not None:
+                self._server = _TCPServer(
+                    (self._host, self._port), _RequestHandler)
+            else:
+                if _UnixServer is None:
+                    raise KirkError("Unix sockets are not supported")
+
+                if os.path.exists(self._socket_path):
+                    os.remove(self._socket_path)
+
+                # socket is never accessible by other users
+                umask = os.umask(0o177)
+                try:
+                    self._server = _UnixServer(
+                        self._socket_path, _RequestHandler)
+                finally:
+                    os.umask(umask)
+
+                os.chmod(self._socket_path, 0o600)
+        except OSError as err:
+            raise KirkError(err)
+
+        self._server.daemon = self
+
+    def serve_forever(self):
+        """
+        Serve commands until :py:meth:`shutdown` is called.
+        """
+        if not self._server:
+            self.start()
+
+        poller = None
+        if self._poll:
+            poller = threading.Thread(target=self._poll_loop, daemon=True)
+            poller.start()
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            if self._port is None and os.path.exists(self._socket_path):
+                os.remove(self._socket_path)
+
+    def shutdown(self):
+        """
+        Stop serving commands.
+        """
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
@@ -0,0 +1,298 @@
+"""
+.. module:: garbage
+   :platform: Multiplatform
+   :synopsis: garbage collection of the developers seeds
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import time
+import logging
+import collections
+import concurrent.futures
+import jenkins
+from kirk import KirkError
+from kirk.throttle import TokenBucket
+
+
+class StaleItem:
+    """
+    A developer seed, or a whole developer folder, which can be deleted.
+    """
+
+    EXPIRED = "expired"
+    NEVER_BUILT = "never built"
+    ORPHAN = "orphan"
+
+    def __init__(self, server, location, user, reason, timestamp=None,
+                 folder=False):
+        """
+        Args:
+            server(str): jenkins server url.
+            location(str): item location on jenkins server.
+            user(str): developer owning the item.
+            reason(str): one of EXPIRED, NEVER_BUILT or ORPHAN.
+            timestamp(float): last build time in seconds or None.
+            folder(bool): True if item is a developer folder.
+        """
+        self._server = server
+        self._location = location
+        self._user = user
+        self._reason = reason
+        self._timestamp = timestamp
+        self._folder = folder
+        self.error = None
+
+    def __repr__(self):
+        return self._location
+
+    @property
+    def server(self):
+        """
+        str: jenkins server url.
+        """
+        return self._server
+
+    @property
+    def location(self):
+        """
+        str: item location on jenkins server.
+        """
+        return self._location
+
+    @property
+    def user(self):
+        """
+        str: developer owning the item.
+        """
+        return self._user
+
+    @property
+    def reason(self):
+        """
+        str: why the item can be deleted.
+        """
+        return self._reason
+
+    @property
+    def timestamp(self):
+        """
+        float: last build time in seconds or None.
+        """
+        return self._timestamp
+
+    @property
+    def folder(self):
+        """
+        bool: True if item is a developer folder.
+        """
+        return self._folder
+
+
+class Collector:
+    """
+    Find and delete developers seeds which have not been built for a while,
+    or which don't belong to any job anymore. The developers folder of each
+    project is read with a single request.
+    """
+
+    # developers folder tree: users folders, their seeds and last builds
+    TREE_QUERY = "?tree=jobs[name,_class," \
+        "jobs[name,_class,inQueue,lastBuild[timestamp]]]"
+
+    def __init__(self, pool, ttl=30 * 86400, rate=5.0, workers=4,
+                 dev_folder="dev", never_built=False):
+        """
+        Args:
+            pool(:py:class:`kirk.connection.ConnectionPool`): connections
+                to the jenkins servers.
+            ttl(float): seconds after the last build when a seed expires.
+            rate(float): maximum number of deletions per second. If 0,
+                deletions are not limited.
+            workers(int): maximum number of requests at the same time.
+            dev_folder(str): folder containing developers jobs.
+            never_built(bool): if True, seeds which have never been built
+                are deleted as well. Jenkins doesn't tell when they have
+                been created, so they could have been just created by
+                'kirk sync' or by a 'kirk run' which is still running.
+        """
+        if workers < 1:
+            raise ValueError("workers must be greater than zero")
+
+        if ttl < 0:
+            raise ValueError("ttl must be positive")
+
+        self._logger = logging.getLogger("gc")
+        self._pool = pool
+        self._ttl = ttl
+        self._rate = rate
+        self._workers = workers
+        self._dev_folder = dev_folder
+        self._never_built = never_built
+
+    def _map(self, func, items):
+        """
+        Call ``func`` on each item using a threads pool and return the
+        results in the same order of ``items``.
+        """
+        items = list(items)
+        if not items:
+            return list()
+
+        workers = min(self._workers, len(items))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    def _is_folder(item):
+        """
+        True if a tree item is a folder.
+        """
+        return "folder" in item.get("_class", "").lower()
+
+    def _read_tree(self, server, folder):
+        """
+        Return the developers folder tree or an empty list if it doesn't
+        exist.
+        """
+        item = "job/" + "/job/".join(folder.split("/"))
+        try:
+            info = self._pool.get(server).get_info(
+                item=item, query=self.TREE_QUERY)
+        except jenkins.NotFoundException:
+            return list()
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+        return info.get("jobs", list()) or list()
+
+    def scan(self, jobs, now=None, known=None):
+        """
+        Find the stale developers seeds of the projects owning ``jobs``.
+        When all the seeds of a developer are stale, the developer folder
+        is returned instead of its seeds. Seeds having a build inside the
+        queue are never stale.
+
+        Args:
+            jobs(list(:py:class:`kirk.project.JobItem`)): jobs of the
+                projects to clean.
+            now(float): current time in seconds. If None, current time is
+                used.
+            known(list(:py:class:`kirk.project.JobItem`)): all the jobs of
+                the catalog. Seeds which don't belong to any of them are
+                orphans. If None, ``jobs`` are used, so they must contain
+                all the jobs sharing the projects locations.
+
+        Returns:
+            list(:py:class:`StaleItem`): items to delete.
+
+        Raises:
+            :py:class:`KirkError`: raised if servers can't be read.
+        """
+        if now is None:
+            now = time.time()
+
+        names = collections.OrderedDict()
+        for job in jobs:
+            key = (job.server, job.project.location)
+            names.setdefault(key, set())
+
+        # projects sharing a location share the developers folders
+        for job in jobs if known is None else known:
+            key = (job.server, job.project.location)
+            if key in names:
+                names[key].add(job.name)
+
+        def _scan(item):
+            (server, location), job_names = item
+            folder = "/".join([location, self._dev_folder])
+
+            stale = list()
+            for user_item in self._read_tree(server, folder):
+                if not self._is_folder(user_item):
+                    continue
+
+                user = user_item["name"]
+                user_folder = "/".join([folder, user])
+
+                seeds = list()
+                total = 0
+                for seed in user_item.get("jobs", list()) or list():
+                    if self._is_folder(seed):
+                        continue
+
+                    total += 1
+                    seed_location = "/".join([user_folder, seed["name"]])
+
+                    if seed.get("inQueue", False):
+                        # a build is going to start
+                        continue
+
+                    last_build = seed.get("lastBuild", None)
+                    timestamp = None
+                    if last_build and last_build.get("timestamp"):
+                        timestamp = last_build["timestamp"] / 1000.0
+
+                    if seed["name"] not in job_names:
+                        reason = StaleItem.ORPHAN
+                    elif timestamp is None:
+                        if not self._never_built:
+                            continue
+                        reason = StaleItem.NEVER_BUILT
+                    elif now - timestamp > self._ttl:
+                        reason = StaleItem.EXPIRED
+                    else:
+                        continue
+
+                    seeds.append(StaleItem(
+                        server, seed_location, user, reason,
+                        timestamp=timestamp))
+
+                if seeds and len(seeds) == total:
+                    # all the seeds are stale: delete the whole folder
+                    timestamps = [seed.timestamp for seed in seeds
+                                  if seed.timestamp is not None]
+                    reasons = set(seed.reason for seed in seeds)
+                    stale.append(StaleItem(
+                        server, user_folder, user,
+                        reasons.pop() if len(reasons) == 1 else
+                        StaleItem.EXPIRED,
+                        timestamp=max(timestamps) if timestamps else None,
+                        folder=True))
+                else:
+                    stale.extend(seeds)
+
+            return stale
+
+        found = list()
+        for stale in self._map(_scan, names.items()):
+            found.extend(stale)
+
+        return found
+
+    def delete(self, items):
+        """
+        Delete stale items concurrently, with the configured rate limit.
+        Errors are stored inside the ``error`` attribute of the items.
+
+        Args:
+            items(list(:py:class:`StaleItem`)): items returned by
+                :py:meth:`scan`.
+
+        Returns:
+            list(:py:class:`StaleItem`): the deleted items.
+        """
+        bucket = TokenBucket(self._rate)
+
+        def _delete(item):
+            bucket.acquire()
+            self._logger.info("deleting '%s'", item.location)
+            try:
+                self._pool.get(item.server).delete_job(item.location)
+            except jenkins.NotFoundException:
+                # already deleted by someone else
+                pass
+            except jenkins.JenkinsException as err:
+                item.error = str(err)
+
+        self._map(_delete, items)
+
+        return items
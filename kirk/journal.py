@@ -0,0 +1,403 @@
+"""
+.. module:: journal
+   :platform: Multiplatform
+   :synopsis: run journal used to resume interrupted runs
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import json
+import time
+import threading
+from kirk import __version__
+from kirk import KirkError
+from kirk.runner import Build
+
+# job found inside the catalog
+RESOLVED = "resolved"
+
+# seed created or reconfigured
+SEEDED = "seeded"
+
+# build request is going to be sent
+TRIGGERING = "triggering"
+
+# build has been started
+TRIGGERED = "triggered"
+
+# build completed
+FINISHED = "finished"
+
+# an error occured. Job state is the one reached before the error
+FAILED = "failed"
+
+STATES = (RESOLVED, SEEDED, TRIGGERING, TRIGGERED, FINISHED, FAILED)
+
+# journal file format version
+FORMAT = 1
+
+
+class RunJournal:
+    """
+    Append-only journal of a run. The first line describes the run and
+    each following line records a job state change, so an interrupted run
+    can be resumed reading the latest state of each job. Lines are JSON
+    objects and they are written to disk before moving on, so a journal
+    is never behind the server.
+
+    Usage:
+
+        journal = RunJournal("run.journal")
+        journal.create(["myproject::mytest"], user="myuser")
+        journal.record("myproject::mytest", RESOLVED)
+
+        journal = RunJournal("run.journal").load()
+        journal.entry("myproject::mytest")
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path(str): journal file path.
+        """
+        if not path:
+            raise ValueError("path is empty")
+
+        self._path = path
+        self._lock = threading.Lock()
+        self._header = None
+        self._entries = dict()
+
+    @property
+    def path(self):
+        """
+        str: journal file path.
+        """
+        return self._path
+
+    @property
+    def tokens(self):
+        """
+        list(str): tokens of the jobs to run, in the requested order.
+        """
+        return list(self._header['tokens']) if self._header else list()
+
+    @property
+    def user(self):
+        """
+        str: developer running the jobs.
+        """
+        return self._header['user'] if self._header else None
+
+    @property
+    def shared(self):
+        """
+        bool: True if shared seeds are run.
+        """
+        return self._header['shared'] if self._header else False
+
+    def entry(self, token):
+        """
+        Return the latest state of a job.
+
+        Args:
+            token(str): job token.
+
+        Returns:
+            dict: 'state', 'error' and the fields recorded with the states,
+            such as the seed 'location' or the build 'url'. An empty
+            dictionary if nothing has been recorded.
+        """
+        with self._lock:
+            return dict(self._entries.get(token, dict()))
+
+    def _write(self, data):
+        """
+        Append a line to the journal and write it to disk.
+        """
+        try:
+            with open(self._path, 'a') as journal_file:
+                journal_file.write(json.dumps(data, sort_keys=True) + "\n")
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+        except OSError as err:
+            raise KirkError("can't write journal: %s" % err)
+
+    def _update(self, data):
+        """
+        Update the state of a job with a journal record.
+        """
+        entry = self._entries.setdefault(data['token'], dict())
+        for key, value in data.items():
+            if key not in ('token', 'time'):
+                entry[key] = value
+
+        if data['state'] == FAILED:
+            # keep the state reached before the error
+            entry['state'] = data.get('previous', None)
+        else:
+            entry['error'] = None
+
+        entry.pop('previous', None)
+
+    def create(self, tokens, user=None, shared=False):
+        """
+        Create a new journal.
+
+        Args:
+            tokens(list(str)): tokens of the jobs to run.
+            user(str): developer running the jobs.
+            shared(bool): if True, shared seeds are run.
+
+        Raises:
+            :py:class:`KirkError`: raised if journal already exists or it
+                can't be written.
+        """
+        if os.path.exists(self._path):
+            raise KirkError("journal '%s' already exists" % self._path)
+
+        header = dict(
+            journal=FORMAT,
+            version=__version__,
+            time=time.time(),
+            tokens=list(tokens),
+            user=user or None,
+            shared=bool(shared))
+
+        with self._lock:
+            self._write(header)
+            self._header = header
+            self._entries = dict()
+
+    def load(self):
+        """
+        Read an existing journal. An incomplete last line, written when
+        kirk has been killed, is removed.
+
+        Returns:
+            :py:class:`RunJournal`: the journal itself.
+
+        Raises:
+            :py:class:`KirkError`: raised if journal can't be read or it's
+                not valid.
+        """
+        try:
+            with open(self._path, 'rb') as journal_file:
+                content = journal_file.read()
+        except OSError as err:
+            raise KirkError("can't read journal: %s" % err)
+
+        lines = content.split(b"\n")
+        if lines[-1]:
+            # remove the incomplete line, so new records are not appended
+            # to it
+            try:
+                with open(self._path, 'ab') as journal_file:
+                    journal_file.truncate(len(content) - len(lines[-1]))
+            except OSError as err:
+                raise KirkError("can't write journal: %s" % err)
+
+        records = list()
+        for num, line in enumerate(lines[:-1], 1):
+            if not line.strip():
+                continue
+
+            try:
+                records.append(json.loads(line.decode("utf-8")))
+            except ValueError:
+                raise KirkError(
+                    "invalid journal '%s' at line %d" % (self._path, num))
+
+        if not records or not all(isinstance(rec, dict) for rec in records) \
+                or records[0].get('journal', None) != FORMAT:
+            raise KirkError("'%s' is not a run journal" % self._path)
+
+        header = records[0]
+        entries = dict()
+
+        with self._lock:
+            self._entries = entries
+            for record in records[1:]:
+                if record.get('state', None) not in STATES or \
+                        record.get('token', None) not in header['tokens']:
+                    raise KirkError(
+                        "invalid journal record in '%s'" % self._path)
+
+                self._update(record)
+
+            self._header = header
+
+        return self
+
+    def record(self, token, state, **fields):
+        """
+        Record the new state of a job.
+
+        Args:
+            token(str): job token.
+            state(str): one of the :py:data:`STATES`.
+            fields(dict): informations to record, such as 'location' or
+                'error'.
+
+        Raises:
+            :py:class:`KirkError`: raised if journal can't be written.
+        """
+        if state not in STATES:
+            raise ValueError("unknown state '%s'" % state)
+
+        with self._lock:
+            if self._header is None:
+                raise KirkError("journal has not been created or loaded")
+
+            data = dict(fields)
+            data['token'] = token
+            data['state'] = state
+            data['time'] = time.time()
+
+            if state == FAILED:
+                data['previous'] = self._entries.get(
+                    token, dict()).get('state', None)
+
+            self._write(data)
+            self._update(data)
+
+
+def _build_fields(build):
+    """
+    Return the fields recorded for a build.
+    """
+    return dict(
+        server=build.server,
+        location=build.location,
+        number=build.number,
+        url=build.url,
+        queue_id=build.queue_id)
+
+
+class JournaledRunner:
+    """
+    Run jobs recording their progress inside a :py:class:`RunJournal`. A
+    job which has been already handled by a previous run continues from
+    the state it reached: finished builds are skipped, builds which have
+    been started are attached and seeds are not created again.
+
+    When kirk was interrupted after sending a build request, before it
+    could record the started build, the seed is checked for a build which
+    is queued or a build number which moved forward. In this case, the
+    build is considered started and it's never triggered twice.
+    """
+
+    # job has been started
+    STARTED = "started"
+
+    # job has been started by a previous run and it's still running
+    RUNNING = "running"
+
+    # job build completed
+    FINISHED = "finished"
+
+    def __init__(self, runner, journal):
+        """
+        Args:
+            runner(:py:class:`kirk.runner.JobRunner`): jobs runner.
+            journal(:py:class:`RunJournal`): created or loaded journal.
+        """
+        self._runner = runner
+        self._journal = journal
+
+    def _attach(self, token, entry):
+        """
+        Read the result of a build started by a previous run.
+        """
+        build = Build(
+            entry['server'],
+            entry['location'],
+            entry['number'],
+            entry['url'],
+            queue_id=entry.get('queue_id', None))
+
+        result = self._runner.get_result(build)
+        if result:
+            self._journal.record(
+                token, FINISHED, result=result, **_build_fields(build))
+            return self.FINISHED, build, result
+
+        if entry['number'] != build.number or entry['url'] != build.url:
+            # build left the queue
+            self._journal.record(token, TRIGGERED, **_build_fields(build))
+
+        return self.RUNNING, build, None
+
+    def _run(self, token, job, user, shared):
+        """
+        Run a job from the state it reached.
+        """
+        entry = self._journal.entry(token)
+        state = entry.get('state', None)
+
+        if state == FINISHED:
+            build = Build(
+                entry['server'],
+                entry['location'],
+                entry['number'],
+                entry['url'])
+            return self.FINISHED, build, entry.get('result', None)
+
+        if state == TRIGGERING:
+            build = self._runner.find_build(
+                job, entry['location'], entry['number'],
+                user=user, shared=shared)
+            if build:
+                self._journal.record(
+                    token, TRIGGERED, **_build_fields(build))
+                entry = self._journal.entry(token)
+                state = TRIGGERED
+            else:
+                state = SEEDED
+
+        if state == TRIGGERED:
+            return self._attach(token, entry)
+
+        if state == SEEDED:
+            location = entry['location']
+        else:
+            if state is None:
+                self._journal.record(token, RESOLVED, server=job.server)
+
+            location = self._runner.setup(job, user=user, shared=shared)
+            self._journal.record(token, SEEDED, location=location)
+
+        self._journal.record(
+            token,
+            TRIGGERING,
+            location=location,
+            number=self._runner.next_build(job, location))
+
+        build = self._runner.trigger(job, location, user=user, shared=shared)
+        self._journal.record(token, TRIGGERED, **_build_fields(build))
+
+        return self.STARTED, build, None
+
+    def run(self, token, job, user=None, shared=False):
+        """
+        Run a job, or continue it if it has been handled by a previous run.
+
+        Args:
+            token(str): job token recorded inside the journal.
+            job(:py:class:`kirk.project.JobItem`): job to run.
+            user(str): developer running the job.
+            shared(bool): if True, run the shared seed.
+
+        Returns:
+            (str, :py:class:`kirk.runner.Build`, str): :py:data:`STARTED`,
+            :py:data:`RUNNING` or :py:data:`FINISHED`, the build and its
+            result if it completed.
+
+        Raises:
+            :py:class:`KirkError`: raised when job can't be run. The error
+                is recorded inside the journal.
+        """
+        try:
+            return self._run(token, job, user, shared)
+        except KirkError as err:
+            self._journal.record(token, FAILED, error=str(err))
+            raise
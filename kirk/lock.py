@@ -0,0 +1,114 @@
+"""
+.. module:: lock
+   :platform: Multiplatform
+   :synopsis: inter-process locks based on files
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive lock shared by the processes of the same host, using a lock
+    file. The lock is released when the process exits, even if it crashes.
+    Threads of the same process are serialized as well.
+
+    Usage:
+
+        with FileLock("/tmp/kirk.lock"):
+            ...
+    """
+
+    # locks of the current process, since file locks are per process
+    _thread_locks = dict()
+    _thread_locks_lock = threading.Lock()
+
+    def __init__(self, path):
+        """
+        Args:
+            path(str): lock file path.
+        """
+        self._path = path
+        self._fd = None
+
+        with self._thread_locks_lock:
+            self._tlock = self._thread_locks.setdefault(
+                os.path.abspath(path), threading.Lock())
+
+    @property
+    def path(self):
+        """
+        str: lock file path.
+        """
+        return self._path
+
+    def acquire(self):
+        """
+        Wait until the lock is acquired.
+
+        Raises:
+            OSError: raised if lock file can't be opened.
+        """
+        self._tlock.acquire()
+        try:
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:  # pragma: no cover
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            except OSError:
+                os.close(fd)
+                raise
+        except OSError:
+            self._tlock.release()
+            raise
+
+        self._fd = fd
+
+    def release(self):
+        """
+        Release the lock.
+        """
+        if self._fd is None:
+            return
+
+        try:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._tlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.release()
+
+
+def lock_path(folder, *keys):
+    """
+    Return the path of the lock file identified by ``keys``.
+
+    Args:
+        folder(str): folder containing lock files.
+        keys(list(str)): strings identifying the locked resource.
+
+    Returns:
+        str: lock file path.
+    """
+    digest = hashlib.sha1("\0".join(keys).encode('utf-8')).hexdigest()
+    return os.path.join(folder, "kirk-%s.lock" % digest)
@@ -0,0 +1,305 @@
+"""
+.. module:: metrics
+   :platform: Multiplatform
+   :synopsis: Prometheus textfile metrics of kirk runs
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import time
+import bisect
+import tempfile
+import threading
+import collections
+from kirk import KirkError
+
+# upper bounds of the requests duration histogram, in seconds
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    """
+    Escape a label value.
+    """
+    return str(value).replace("\\", "\\\\").replace(
+        "\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    """
+    Format the labels of a sample.
+    """
+    if not labels:
+        return ""
+
+    return "{%s}" % ",".join(
+        '%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def _number(value):
+    """
+    Format a sample value.
+    """
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+
+    return str(value)
+
+
+def write_textfile(path, text):
+    """
+    Write a metrics file atomically, so the node-exporter textfile
+    collector never reads a partial file.
+
+    Args:
+        path(str): metrics file path.
+        text(str): file content.
+
+    Raises:
+        :py:class:`KirkError`: raised if file can't be written.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=folder, prefix=".kirk-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(text)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+    except OSError as err:
+        raise KirkError("can't write metrics: %s" % err)
+
+
+class MetricsCollector:
+    """
+    Collect the metrics of kirk runs and render them using the Prometheus
+    text format read by the node-exporter textfile collector. The collector
+    is a :py:class:`kirk.stats.Instrumentation` hook measuring requests,
+    while jobs and catalogs are reported by the commands. Admitted builds
+    and requests retries are read from the registered connections pools.
+
+    Usage:
+
+        metrics = MetricsCollector()
+        metrics.add_pool(pool)
+        pool.instrumentation.add_hook(metrics)
+        ...
+        write_textfile("/var/lib/node_exporter/kirk.prom", metrics.render())
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        """
+        Args:
+            buckets(list(float)): upper bounds of the requests duration
+                histogram, in seconds.
+        """
+        self._buckets = tuple(sorted(buckets))
+        self._requests = collections.Counter()
+        self._durations = dict()
+        self._jobs = collections.Counter()
+        self._failures = collections.Counter()
+        self._catalog_time = None
+        self._pools = list()
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            status = record.status if record.status else "error"
+            self._requests[(
+                record.server, record.method, record.endpoint,
+                str(status))] += 1
+
+            item = self._durations.get(record.server, None)
+            if item is None:
+                item = [[0] * (len(self._buckets) + 1), 0.0, 0]
+                self._durations[record.server] = item
+
+            item[0][bisect.bisect_left(self._buckets, record.duration)] += 1
+            item[1] += record.duration
+            item[2] += 1
+
+    def add_pool(self, pool):
+        """
+        Read the admitted builds and the requests retries of a pool.
+
+        Args:
+            pool(:py:class:`kirk.connection.ConnectionPool`): connections
+                pool.
+        """
+        with self._lock:
+            if pool not in self._pools:
+                self._pools.append(pool)
+
+    def job_done(self, server, failed=False):
+        """
+        Count a triggered job, or a job which couldn't be triggered.
+
+        Args:
+            server(str): jenkins server url.
+            failed(bool): True if job couldn't be triggered.
+        """
+        with self._lock:
+            if failed:
+                self._failures[server] += 1
+            else:
+                self._jobs[server] += 1
+
+    def catalog_loaded(self, seconds):
+        """
+        Set the catalog load time.
+
+        Args:
+            seconds(float): time spent loading the catalog.
+        """
+        with self._lock:
+            self._catalog_time = seconds
+
+    def _sources(self):
+        """
+        Return the throttles and retry policies of the pools, once each.
+        """
+        throttles = list()
+        policies = list()
+        for pool in self._pools:
+            if pool.throttle and pool.throttle not in throttles:
+                throttles.append(pool.throttle)
+            if pool.policy and pool.policy not in policies:
+                policies.append(pool.policy)
+
+        return throttles, policies
+
+    def render(self, now=None):
+        """
+        Render the metrics.
+
+        Args:
+            now(float): current time in seconds. If None, current time is
+                used.
+
+        Returns:
+            str: metrics in Prometheus text format.
+        """
+        lines = list()
+
+        def _family(name, kind, text, samples):
+            lines.append("# HELP %s %s" % (name, text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for sample_name, labels, value in samples:
+                lines.append("%s%s %s" % (
+                    sample_name, _labels(labels), _number(value)))
+
+        with self._lock:
+            throttles, policies = self._sources()
+            servers = sorted(set(self._jobs) | set(self._failures))
+
+            _family(
+                "kirk_jobs_triggered_total", "counter",
+                "Jobs triggered by kirk.",
+                [("kirk_jobs_triggered_total", [("server", server)],
+                  self._jobs[server])
+                 for server in servers])
+
+            _family(
+                "kirk_jobs_failed_total", "counter",
+                "Jobs which kirk failed to trigger.",
+                [("kirk_jobs_failed_total", [("server", server)],
+                  self._failures[server])
+                 for server in servers])
+
+            _family(
+                "kirk_requests_total", "counter",
+                "Requests sent to Jenkins servers.",
+                [("kirk_requests_total",
+                  [("server", key[0]), ("method", key[1]),
+                   ("endpoint", key[2]), ("code", key[3])], value)
+                 for key, value in sorted(self._requests.items())])
+
+            samples = list()
+            for server, item in sorted(self._durations.items()):
+                count = 0
+                for index, bound in enumerate(self._buckets):
+                    count += item[0][index]
+                    samples.append((
+                        "kirk_request_duration_seconds_bucket",
+                        [("server", server), ("le", _number(float(bound)))],
+                        count))
+
+                samples.append((
+                    "kirk_request_duration_seconds_bucket",
+                    [("server", server), ("le", "+Inf")],
+                    item[2]))
+                samples.append((
+                    "kirk_request_duration_seconds_sum",
+                    [("server", server)], item[1]))
+                samples.append((
+                    "kirk_request_duration_seconds_count",
+                    [("server", server)], item[2]))
+
+            _family(
+                "kirk_request_duration_seconds", "histogram",
+                "Duration of the requests sent to Jenkins servers.",
+                samples)
+
+            retries = collections.Counter()
+            rejected = collections.Counter()
+            for policy in policies:
+                for server, stats in policy.stats().items():
+                    retries[server] += stats['retries']
+                    rejected[server] += stats['rejected']
+
+            _family(
+                "kirk_request_retries_total", "counter",
+                "Requests sent again after a transient error.",
+                [("kirk_request_retries_total", [("server", server)], value)
+                 for server, value in sorted(retries.items())])
+
+            _family(
+                "kirk_request_rejected_total", "counter",
+                "Requests not sent because server circuit was open.",
+                [("kirk_request_rejected_total", [("server", server)], value)
+                 for server, value in sorted(rejected.items())])
+
+            waits = collections.OrderedDict()
+            for throttle in throttles:
+                for server, item in throttle.admissions().items():
+                    total = waits.setdefault(server, [0, 0.0])
+                    total[0] += item['builds']
+                    total[1] += item['wait']
+
+            samples = list()
+            for server, item in sorted(waits.items()):
+                samples.append((
+                    "kirk_queue_wait_seconds_sum",
+                    [("server", server)], item[1]))
+                samples.append((
+                    "kirk_queue_wait_seconds_count",
+                    [("server", server)], item[0]))
+
+            _family(
+                "kirk_queue_wait_seconds", "summary",
+                "Time builds waited for the server queue to get shorter.",
+                samples)
+
+            if self._catalog_time is not None:
+                _family(
+                    "kirk_catalog_load_seconds", "gauge",
+                    "Time spent loading the projects catalog.",
+                    [("kirk_catalog_load_seconds", None,
+                      float(self._catalog_time))])
+
+        _family(
+            "kirk_last_update_timestamp_seconds", "gauge",
+            "Time when metrics have been written.",
+            [("kirk_last_update_timestamp_seconds", None,
+              float(time.time() if now is None else now))])
+
+        return "\n".join(lines) + "\n"
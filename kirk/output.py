@@ -0,0 +1,217 @@
+"""
+.. module:: output
+   :platform: Multiplatform
+   :synopsis: jobs output formatters
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import json
+import click
+
+
+def job_record(job):
+    """
+    Convert a job into a dictionary that can be serialized.
+
+    Args:
+        job(:py:class:`kirk.project.JobItem`): job to convert.
+
+    Returns:
+        dict: job informations.
+    """
+    params = dict()
+    for param in job.parameters:
+        params[param.name] = param.value
+
+    record = dict(
+        token=repr(job),
+        project=job.project.name,
+        job=job.name,
+        server=job.server,
+        location=job.project.location,
+        pipeline=job.pipeline,
+        parameters=params,
+        depends=job.dependences,
+    )
+    return record
+
+
+class JobWriter:
+    """
+    Base class for a jobs writer. Jobs are formatted one by one as they
+    arrive and the output is written in chunks of :py:attr:`BUFFER_SIZE`
+    characters.
+    """
+
+    BUFFER_SIZE = 65536
+
+    def __init__(self, stream=None):
+        """
+        Args:
+            stream(file): output stream. If None, stdout is used.
+        """
+        self._stream = stream
+        self._buffer = list()
+        self._size = 0
+
+    def _emit(self, data):
+        """
+        Append ``data`` to the output buffer.
+        """
+        self._buffer.append(data)
+        self._size += len(data)
+        if self._size >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered data into the output stream.
+        """
+        if not self._buffer:
+            return
+
+        click.echo("".join(self._buffer), file=self._stream, nl=False)
+        self._buffer = list()
+        self._size = 0
+
+    def begin(self):
+        """
+        Start the output.
+        """
+
+    def write(self, job):
+        """
+        Write a job.
+
+        Args:
+            job(:py:class:`kirk.project.JobItem`): job to write.
+        """
+        raise NotImplementedError()
+
+    def end(self):
+        """
+        Complete the output and flush it.
+        """
+        self.flush()
+
+
+class TextWriter(JobWriter):
+    """
+    Write jobs representations, one for each line.
+    """
+
+    def __init__(self, stream=None, prefix="  "):
+        """
+        Args:
+            stream(file): output stream. If None, stdout is used.
+            prefix(str): string written before each job.
+        """
+        super().__init__(stream=stream)
+        self._prefix = prefix
+
+    def write(self, job):
+        self._emit("%s%s\n" % (self._prefix, repr(job)))
+
+    def write_line(self, line):
+        """
+        Write a line of text which is not a job.
+
+        Args:
+            line(str): text to write.
+        """
+        self._emit("%s\n" % line)
+
+
+class JsonWriter(JobWriter):
+    """
+    Write jobs as a JSON list of records.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream=stream)
+        self._first = True
+
+    def begin(self):
+        self._first = True
+        self._emit("[")
+
+    def write(self, job):
+        if not self._first:
+            self._emit(",")
+        self._first = False
+
+        self._emit("\n")
+        self._emit(json.dumps(job_record(job)))
+
+    def end(self):
+        self._emit("\n]\n")
+        super().end()
+
+
+class NdjsonWriter(JobWriter):
+    """
+    Write jobs as newline delimited JSON records.
+    """
+
+    def write(self, job):
+        self._emit(json.dumps(job_record(job)))
+        self._emit("\n")
+
+
+class TsvWriter(JobWriter):
+    """
+    Write jobs as tab separated values, with a header line.
+    """
+
+    COLUMNS = ("token", "project", "job", "server", "location", "pipeline")
+
+    @staticmethod
+    def _escape(value):
+        """
+        Escape characters which can break a TSV line.
+        """
+        value = str(value)
+        value = value.replace("\\", "\\\\")
+        value = value.replace("\t", "\\t")
+        value = value.replace("\n", "\\n")
+        value = value.replace("\r", "\\r")
+        return value
+
+    def begin(self):
+        self._emit("\t".join(self.COLUMNS))
+        self._emit("\n")
+
+    def write(self, job):
+        record = job_record(job)
+        values = [self._escape(record[column]) for column in self.COLUMNS]
+        self._emit("\t".join(values))
+        self._emit("\n")
+
+
+_WRITERS = dict(
+    text=TextWriter,
+    json=JsonWriter,
+    ndjson=NdjsonWriter,
+    tsv=TsvWriter,
+)
+
+FORMATS = tuple(_WRITERS.keys())
+
+
+def get_writer(fmt, stream=None):
+    """
+    Return the jobs writer for the given format.
+
+    Args:
+        fmt(str): one of :py:data:`FORMATS`.
+        stream(file): output stream. If None, stdout is used.
+
+    Returns:
+        :py:class:`JobWriter`: jobs writer.
+
+    Raises:
+        ValueError: if format is not supported.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError("'%s' format is not supported" % fmt)
+
+    return _WRITERS[fmt](stream=stream)
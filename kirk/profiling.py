@@ -0,0 +1,132 @@
+"""
+.. module:: profiling
+   :platform: Multiplatform
+   :synopsis: CPU and memory profiling of kirk commands
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import cProfile
+import tracemalloc
+from kirk import KirkError
+
+
+class Profiler:
+    """
+    Profile the CPU time spent by the current thread using cProfile and
+    write the result as a pstats file, which can be read by
+    :py:mod:`pstats`, snakeviz or gprof2dot.
+
+    Usage:
+
+        profiler = Profiler("kirk.pstats")
+        profiler.start()
+        ...
+        profiler.stop()
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path(str): pstats file path.
+        """
+        self._path = path
+        self._profile = None
+
+    @property
+    def path(self):
+        """
+        str: pstats file path.
+        """
+        return self._path
+
+    def start(self):
+        """
+        Start profiling.
+
+        Raises:
+            :py:class:`KirkError`: raised if another profiler is running.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as err:
+            raise KirkError("can't start profiler: %s" % err)
+
+        self._profile = profile
+
+    def stop(self):
+        """
+        Stop profiling and write the pstats file.
+
+        Raises:
+            :py:class:`KirkError`: raised if file can't be written.
+        """
+        if not self._profile:
+            return
+
+        profile = self._profile
+        self._profile = None
+        profile.disable()
+
+        try:
+            profile.dump_stats(self._path)
+        except OSError as err:
+            raise KirkError("can't write profile: %s" % err)
+
+
+class MemoryProfiler:
+    """
+    Trace memory allocations using tracemalloc, in order to report the
+    sources lines which allocated most of the memory still in use.
+    """
+
+    def __init__(self, limit=10):
+        """
+        Args:
+            limit(int): number of allocation sites reported.
+        """
+        if limit < 1:
+            raise ValueError("limit must be greater than zero")
+
+        self._limit = limit
+        self._started = False
+
+    def start(self):
+        """
+        Start tracing allocations. If tracemalloc is already tracing, it's
+        left running when profiler stops.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def stop(self):
+        """
+        Stop tracing allocations.
+
+        Returns:
+            dict: 'current' and 'peak' traced memory in bytes and the 'top'
+            allocation sites, which is a list of (filename, lineno, size,
+            count) sorted by size.
+        """
+        if not tracemalloc.is_tracing():
+            return dict(current=0, peak=0, top=list())
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+        top = list()
+        for stat in snapshot.statistics('lineno')[:self._limit]:
+            frame = stat.traceback[0]
+            top.append((frame.filename, frame.lineno, stat.size, stat.count))
+
+        return dict(current=current, peak=peak, top=top)
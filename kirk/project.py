@@ -5,12 +5,14 @@
 .. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
 """
 import os
+import copy
 import logging
 from pykwalify.core import Core
 from pykwalify.errors import PyKwalifyException
 import kirk.yaml_env as yaml_env
 from kirk import KirkError
 from kirk.tokenizer import JobTokenizer
+from kirk.trace import span
 
 
 class JobParameter:
@@ -18,12 +20,19 @@ class JobParameter:
     Jenkins job parameter.
     """
 
-    def __init__(self, params_cfg):
+    def __init__(self, params_cfg, on_change=None):
+        """
+        Args:
+            params_cfg(dict): parameter configuration.
+            on_change(callable): function called with the parameter as
+                argument when its value changes (default: None).
+        """
         self._name = params_cfg['name']
         self._label = params_cfg['label']
         self._default = params_cfg.get('default', '')
         self._value = params_cfg.get('default', '')
         self._show = params_cfg.get('show', True)
+        self._on_change = on_change
 
     def __str__(self):
         param = "%s=%s" % (self._name, self._value)
@@ -66,16 +75,27 @@ class JobParameter:
 
     @value.setter
     def value(self, value):
-        self._value = str(value)
+        value = str(value)
+        if value == self._value:
+            return
+
+        self._value = value
+        if self._on_change:
+            self._on_change(self)
 
 
 class JobItem:
     """
-    A generic job loaded from a project.
+    A generic job loaded from a project. Its string and representation
+    tokens are encoded once and the representation is encoded again only
+    when the value of a shown parameter changes.
     """
 
+    _tokenizer = JobTokenizer()
+
     def __init__(self, defaults_cfg, job_cfg, project):
-        self._tokenizer = JobTokenizer()
+        self._str = None
+        self._repr = None
 
         # read server url
         # TODO: validate url syntax
@@ -120,43 +140,82 @@ class JobItem:
 
         if def_params:
             # ..then to default parameters
+            names = set(param['name'] for param in parameters)
             for def_param in def_params:
-                conflict = False
-
-                for param in parameters:
-                    if param['name'] == def_param['name']:
-                        conflict = True
-                        break
-
-                if not conflict:
+                if def_param['name'] not in names:
                     parameters.append(def_param)
 
         # create parameters list
         self._parameters = list()
         for param in parameters:
-            self._parameters.append(JobParameter(param))
+            self._parameters.append(
+                JobParameter(param, on_change=self._param_changed))
+
+    def copy(self):
+        """
+        Return a copy of the job, which parameters values can be changed
+        without modifying this job.
+
+        Returns:
+            :py:class:`JobItem`: the job copy.
+        """
+        job = copy.copy(self)
+        job._parameters = list()
+        for param in self._parameters:
+            item = JobParameter(
+                dict(
+                    name=param.name,
+                    label=param.label,
+                    default=param.default,
+                    show=param.show),
+                on_change=job._param_changed)
+            item.value = param.value
+            job._parameters.append(item)
+
+        return job
+
+    def _param_changed(self, param):
+        """
+        Invalidate the cached representation when a shown parameter changes.
+        """
+        if param.show:
+            self._repr = None
 
     def __str__(self):
-        return self._tokenizer.encode(
-            self.project.name,
-            self.name,
-            None)
+        if self._str is None:
+            self._str = self._tokenizer.encode(
+                self.project.name,
+                self.name,
+                None)
+
+        return self._str
 
     def __repr__(self):
-        params = dict()
-        for param in self.parameters:
-            if param.show:
-                params[param.name] = param.value
+        if self._repr is None:
+            params = dict()
+            for param in self.parameters:
+                if param.show:
+                    params[param.name] = param.value
 
-        return self._tokenizer.encode(
-            self.project.name,
-            self.name,
-            params)
+            self._repr = self._tokenizer.encode(
+                self.project.name,
+                self.name,
+                params)
+
+        return self._repr
 
     def __eq__(self, value):
-        # TODO: better equality
+        if isinstance(value, JobItem):
+            return self.name == value.name and \
+                self.project.name == value.project.name
+
         return str(self) == str(value)
 
+    def __hash__(self):
+        # jobs are identified by (project, name), which is what the string
+        # token encodes, so a job and its token have the same hash
+        return hash(str(self))
+
     @property
     def name(self):
         """
@@ -239,18 +298,42 @@ class Project:
         # load project file
         self._logger.info("loading file '%s'", path)
 
-        file_def = yaml_env.load(path)
+        with span("load project", category="catalog", path=path):
+            with span("parse yaml", category="catalog", path=path):
+                file_def = yaml_env.load(path)
 
-        # validate project file
-        self._logger.info("validating file '%s'", path)
+            self.load_definition(file_def)
+
+    def load_definition(self, file_def, validate=True):
+        """
+        Load a project configuration which has been already read from a
+        project file.
+
+        Args:
+            file_def(dict): project file content.
+            validate(bool): if True, ``file_def`` is validated against the
+                projects schema (default: True).
 
-        try:
-            currdir = os.path.abspath(os.path.dirname(__file__))
-            schemafile = os.path.join(currdir, "files", "schema.yml")
-            validator = Core(source_data=file_def, schema_files=[schemafile])
-            validator.validate(raise_exception=True)
-        except PyKwalifyException as err:
-            raise KirkError(err)
+        Raises:
+            KirkError: if project definition is not valid.
+        """
+        if not file_def:
+            raise KirkError("project definition is empty")
+
+        # validate project file
+        if validate:
+            self._logger.info("validating project definition")
+
+            try:
+                currdir = os.path.abspath(os.path.dirname(__file__))
+                schemafile = os.path.join(currdir, "files", "schema.yml")
+                with span("validate schema", category="catalog"):
+                    validator = Core(
+                        source_data=file_def,
+                        schema_files=[schemafile])
+                    validator.validate(raise_exception=True)
+            except PyKwalifyException as err:
+                raise KirkError(err)
 
         # load project informations
         self._name = file_def['name']
@@ -267,14 +350,15 @@ class Project:
         defaults_cfg = file_def['defaults']
 
         self._jobs.clear()
+        names = set()
         for job_cfg in jobs:
             new_job = JobItem(defaults_cfg, job_cfg, self)
-            for job in self._jobs:
-                if job.name == new_job.name:
-                    raise KirkError(
-                        "Two jobs with the same name '%s' for project '%s'" %
-                        (job.name, self._name))
+            if new_job.name in names:
+                raise KirkError(
+                    "Two jobs with the same name '%s' for project '%s'" %
+                    (new_job.name, self._name))
 
+            names.add(new_job.name)
             self._jobs.append(new_job)
 
         self._logger.info("project file loaded")
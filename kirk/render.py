@@ -0,0 +1,278 @@
+"""
+.. module:: render
+   :platform: Multiplatform
+   :synopsis: offline rendering of the jobs seeds
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import io
+import gzip
+import tarfile
+import collections
+import concurrent.futures
+import jenkins
+from kirk import KirkError
+from kirk.sync import Synchronizer
+from kirk.workflow import WorkflowBuilder
+
+ARCHIVE_EXTENSIONS = ('.tar', '.tar.gz', '.tgz')
+
+
+def _render_project(project, names, user, dev_folder):
+    """
+    Render the seeds of the given jobs of a project. It's executed by the
+    workers processes, so the project is serialized only once.
+    """
+    builder = WorkflowBuilder()
+
+    seeds = list()
+    for job in project.jobs:
+        if job.name not in names:
+            continue
+
+        try:
+            xml_str = builder.build_xml(job)
+        except (KirkError, OSError) as err:
+            raise KirkError("%s: %s" % (str(job), err))
+
+        location = Synchronizer.location(
+            job, user=user, dev_folder=dev_folder)
+        seeds.append((str(job), location, xml_str))
+
+    return seeds
+
+
+class SeedRenderer:
+    """
+    Render the seeds of many jobs. Large catalogs are rendered by a pool of
+    processes, one project at a time.
+    """
+
+    # minimum number of jobs rendered by the processes pool
+    POOL_THRESHOLD = 200
+
+    def __init__(self, workers=None, user=None, dev_folder="dev",
+                 threshold=None):
+        """
+        Args:
+            workers(int): number of processes. If None, the number of CPUs
+                is used. If 1, seeds are rendered by the current process.
+            user(str): developer owning the seeds.
+            dev_folder(str): folder containing developers jobs.
+            threshold(int): minimum number of jobs rendered by the
+                processes pool. If None, ``POOL_THRESHOLD`` is used.
+        """
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be greater than zero")
+
+        self._workers = workers or os.cpu_count() or 1
+        self._user = user
+        self._dev_folder = dev_folder
+        self._threshold = threshold
+
+    def pool_size(self, jobs):
+        """
+        Return the number of processes rendering the seeds of the given
+        jobs. Each project is rendered by a single process.
+
+        Args:
+            jobs(list(:py:class:`kirk.project.JobItem`)): jobs to render.
+
+        Returns:
+            int: number of processes. If 1, seeds are rendered by the
+            current process.
+        """
+        threshold = self._threshold
+        if threshold is None:
+            threshold = self.POOL_THRESHOLD
+
+        if self._workers == 1 or len(jobs) < threshold:
+            return 1
+
+        projects = set(id(job.project) for job in jobs)
+        return min(self._workers, len(projects))
+
+    def render(self, jobs):
+        """
+        Render the seeds of the given jobs.
+
+        Args:
+            jobs(list(:py:class:`kirk.project.JobItem`)): jobs to render.
+
+        Returns:
+            list((str, str)): list of (location, xml), in the same order of
+            ``jobs``.
+
+        Raises:
+            :py:class:`KirkError`: raised if a seed can't be rendered.
+        """
+        projects = collections.OrderedDict()
+        for job in jobs:
+            item = projects.setdefault(
+                id(job.project), (job.project, set()))
+            item[1].add(job.name)
+
+        seeds = dict()
+        args = [(project, names, self._user, self._dev_folder)
+                for project, names in projects.values()]
+
+        workers = self.pool_size(jobs)
+        if workers == 1:
+            results = [_render_project(*arg) for arg in args]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = [executor.submit(_render_project, *arg)
+                           for arg in args]
+                results = [future.result() for future in futures]
+
+        for result in results:
+            for token, location, xml_str in result:
+                seeds[(token, location)] = xml_str
+
+        rendered = list()
+        for job in jobs:
+            location = Synchronizer.location(
+                job, user=self._user, dev_folder=self._dev_folder)
+            rendered.append((location, seeds[(str(job), location)]))
+
+        return rendered
+
+
+def seed_files(seeds):
+    """
+    Return the files of a Jenkins home folder containing the given seeds.
+    Each folder of the "a/b/seed" location becomes "jobs/a/jobs/b" with its
+    own configuration, and the seed configuration is stored inside
+    "jobs/a/jobs/b/jobs/seed/config.xml".
+
+    Args:
+        seeds(list((str, str))): list of (location, xml).
+
+    Returns:
+        dict: files contents, indexed by their relative paths, sorted by
+        path.
+    """
+    files = dict()
+    for location, xml_str in seeds:
+        names = location.split("/")
+
+        for index in range(1, len(names)):
+            path = "/".join(
+                "jobs/%s" % name for name in names[:index]) + "/config.xml"
+            files[path] = jenkins.EMPTY_FOLDER_XML
+
+        path = "/".join("jobs/%s" % name for name in names) + "/config.xml"
+        files[path] = xml_str
+
+    return collections.OrderedDict(sorted(files.items()))
+
+
+def _prune(folders, top):
+    """
+    Remove the given folders when they are empty, together with their
+    parents which become empty, up to ``top`` which is never removed.
+    """
+    top = os.path.abspath(top)
+
+    # deepest folders first, so parents are empty when they are checked
+    for current in sorted(folders, key=len, reverse=True):
+        current = os.path.abspath(current)
+        while current != top and current.startswith(top + os.sep):
+            if not os.path.isdir(current) or os.listdir(current):
+                break
+
+            os.rmdir(current)
+            current = os.path.dirname(current)
+
+
+def write_tree(files, folder, clean=False):
+    """
+    Write files inside a folder. Files which didn't change are not written,
+    so their modification time is kept.
+
+    Args:
+        files(dict): files contents, indexed by their relative paths.
+        folder(str): destination folder.
+        clean(bool): if True, 'config.xml' files inside ``folder`` that
+            are not in ``files`` are removed, together with the folders
+            they leave empty.
+
+    Returns:
+        (int, int): number of written and removed files.
+
+    Raises:
+        :py:class:`KirkError`: raised if files can't be written.
+    """
+    written = 0
+    removed = 0
+
+    try:
+        for path, content in files.items():
+            dest = os.path.join(folder, *path.split("/"))
+            data = content.encode('utf-8')
+
+            if os.path.isfile(dest):
+                with open(dest, 'rb') as dest_file:
+                    if dest_file.read() == data:
+                        continue
+
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, 'wb') as dest_file:
+                dest_file.write(data)
+            written += 1
+
+        if clean:
+            cleaned = set()
+            for root, _, names in os.walk(folder):
+                for name in names:
+                    if name != "config.xml":
+                        continue
+
+                    dest = os.path.join(root, name)
+                    path = os.path.relpath(dest, folder).replace(os.sep, "/")
+                    if path not in files:
+                        os.remove(dest)
+                        cleaned.add(root)
+                        removed += 1
+
+            _prune(cleaned, folder)
+    except OSError as err:
+        raise KirkError(err)
+
+    return written, removed
+
+
+def write_archive(files, path):
+    """
+    Write files inside a tar archive, which is compressed with gzip when
+    ``path`` ends with '.tar.gz' or '.tgz'. Files are sorted and their
+    metadata are fixed, so the same files always create the same archive.
+
+    Args:
+        files(dict): files contents, indexed by their relative paths.
+        path(str): archive path.
+
+    Raises:
+        :py:class:`KirkError`: raised if archive can't be written.
+    """
+    try:
+        with open(path, 'wb') as dest:
+            stream = dest
+            if path.endswith(('.tar.gz', '.tgz')):
+                stream = gzip.GzipFile(
+                    filename="", mode='wb', fileobj=dest, mtime=0)
+
+            with tarfile.open(fileobj=stream, mode='w',
+                              format=tarfile.PAX_FORMAT) as tar:
+                for name in sorted(files.keys()):
+                    data = files[name].encode('utf-8')
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    info.mode = 0o644
+                    info.mtime = 0
+                    tar.addfile(info, io.BytesIO(data))
+
+            if stream is not dest:
+                stream.close()
+    except OSError as err:
+        raise KirkError(err)
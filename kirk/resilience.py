@@ -0,0 +1,309 @@
+"""
+.. module:: resilience
+   :platform: Multiplatform
+   :synopsis: retries and circuit breakers for Jenkins requests
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import time
+import random
+import logging
+import threading
+import collections
+import requests
+import jenkins
+from kirk.trace import span
+
+# HTTP status codes sent by overloaded servers and proxies
+TRANSIENT_STATUS = (429, 502, 503, 504)
+
+
+class CircuitOpenError(jenkins.JenkinsException):
+    """
+    Raised when a request is not sent because the server is failing.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to a server after ``threshold`` consecutive
+    failures. After ``reset`` seconds one request is allowed again: if it
+    succeeds requests are sent as usual, otherwise the circuit stays open
+    for another ``reset`` seconds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold=5, reset=30.0):
+        """
+        Args:
+            threshold(int): consecutive failures opening the circuit. If 0,
+                circuit is never opened.
+            reset(float): seconds before a request is allowed again.
+        """
+        if threshold < 0:
+            raise ValueError("threshold can't be negative")
+
+        if reset < 0:
+            raise ValueError("reset can't be negative")
+
+        self._threshold = threshold
+        self._reset = reset
+        self._failures = 0
+        self._opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        str: one of CLOSED, OPEN or HALF_OPEN.
+        """
+        with self._lock:
+            if self._opened is None:
+                return self.CLOSED
+
+            if self._trial or \
+                    time.monotonic() - self._opened >= self._reset:
+                return self.HALF_OPEN
+
+            return self.OPEN
+
+    def allow(self):
+        """
+        Check if a request can be sent.
+
+        Returns:
+            bool: True if request can be sent.
+        """
+        with self._lock:
+            if self._opened is None:
+                return True
+
+            if self._trial:
+                # another request is checking the server
+                return False
+
+            if time.monotonic() - self._opened < self._reset:
+                return False
+
+            self._trial = True
+            return True
+
+    def success(self):
+        """
+        Report a request which reached the server.
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._trial = False
+
+    def failure(self):
+        """
+        Report a request which didn't reach the server.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial or \
+                    (self._threshold and self._failures >= self._threshold):
+                self._opened = time.monotonic()
+                self._trial = False
+
+
+class RetryPolicy:
+    """
+    Policy applied to the requests sent to Jenkins servers. Requests which
+    don't modify the server are sent again with an exponential backoff when
+    they fail with transient errors, such as timeouts or 503 responses.
+    Each server has its own :py:class:`CircuitBreaker`, so requests fail
+    fast while a server is down. Requests outcomes are counted for each
+    server.
+    """
+
+    # methods which can be sent more than once
+    IDEMPOTENT = ("GET", "HEAD")
+
+    def __init__(self, timeout=None, retries=3, delay=0.5, threshold=5,
+                 reset=30.0):
+        """
+        Args:
+            timeout(float): seconds before a request is aborted. If None,
+                python-jenkins default is used.
+            retries(int): maximum number of times a request is sent again.
+            delay(float): maximum waiting time before the first retry,
+                which is doubled at each retry.
+            threshold(int): consecutive failures opening a server circuit.
+                If 0, circuit is never opened.
+            reset(float): seconds before an open circuit is tried again.
+        """
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be greater than zero")
+
+        if retries < 0:
+            raise ValueError("retries can't be negative")
+
+        # check arguments once, before creating breakers
+        CircuitBreaker(threshold, reset)
+
+        self._logger = logging.getLogger("resilience")
+        self._timeout = timeout
+        self._retries = retries
+        self._delay = delay
+        self._threshold = threshold
+        self._reset = reset
+        self._breakers = dict()
+        self._stats = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        """
+        float: seconds before a request is aborted or None.
+        """
+        return self._timeout
+
+    @property
+    def retries(self):
+        """
+        int: maximum number of times a request is sent again.
+        """
+        return self._retries
+
+    def breaker(self, server):
+        """
+        Return the circuit breaker of ``server``.
+
+        Args:
+            server(str): jenkins server url.
+
+        Returns:
+            :py:class:`CircuitBreaker`: server circuit breaker.
+        """
+        with self._lock:
+            breaker = self._breakers.get(server, None)
+            if breaker is None:
+                breaker = CircuitBreaker(self._threshold, self._reset)
+                self._breakers[server] = breaker
+
+        return breaker
+
+    def _count(self, server, name):
+        """
+        Increment an outcome counter of ``server``.
+        """
+        with self._lock:
+            stats = self._stats.get(server, None)
+            if stats is None:
+                stats = collections.OrderedDict()
+                for key in ('requests', 'retries', 'failures', 'rejected'):
+                    stats[key] = 0
+                self._stats[server] = stats
+
+            stats[name] += 1
+
+    def stats(self):
+        """
+        Return the requests outcomes.
+
+        Returns:
+            dict: for each server, the number of sent 'requests', the
+            'retries', the requests which definitely 'failures' and the
+            'rejected' ones, which were not sent because circuit was open.
+        """
+        with self._lock:
+            return collections.OrderedDict(
+                (server, collections.OrderedDict(stats))
+                for server, stats in sorted(self._stats.items()))
+
+    @staticmethod
+    def transient(err):
+        """
+        Check if an error can disappear sending the request again.
+
+        Args:
+            err(Exception): error raised by a request.
+
+        Returns:
+            bool: True if error is transient.
+        """
+        if isinstance(err, jenkins.TimeoutException):
+            return True
+
+        if isinstance(err, requests.exceptions.HTTPError):
+            response = err.response
+            return response is not None and \
+                response.status_code in TRANSIENT_STATUS
+
+        return isinstance(err, (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout))
+
+    def call(self, server, func, idempotent=True):
+        """
+        Send a request to ``server`` according with the policy.
+
+        Args:
+            server(str): jenkins server url.
+            func(callable): function sending the request.
+            idempotent(bool): if True, request can be sent more than once.
+
+        Returns:
+            object: the value returned by ``func``.
+
+        Raises:
+            :py:class:`CircuitOpenError`: raised if server circuit is open.
+            jenkins.JenkinsException: raised if request failed. Errors
+                raised by the HTTP library are converted. The ``retried``
+                attribute of transient errors is True when the request has
+                been already sent again, so callers don't retry it twice.
+        """
+        breaker = self.breaker(server)
+        attempts = self._retries + 1 if idempotent else 1
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                self._count(server, 'rejected')
+                raise CircuitOpenError(
+                    "'%s' is not responding: request not sent" % server)
+
+            self._count(server, 'requests')
+            try:
+                result = func()
+            except (jenkins.JenkinsException,
+                    requests.exceptions.RequestException) as err:
+                if not self.transient(err):
+                    # server answered
+                    breaker.success()
+                    if isinstance(err, jenkins.JenkinsException):
+                        raise
+                    raise jenkins.JenkinsException(
+                        "Error in request: %s" % err) from err
+
+                breaker.failure()
+
+                if attempt == attempts - 1:
+                    self._count(server, 'failures')
+                    if isinstance(err, jenkins.JenkinsException):
+                        err.retried = attempts > 1
+                        raise
+
+                    error = jenkins.JenkinsException(
+                        "Error in request: %s" % err)
+                    error.retried = attempts > 1
+                    raise error from err
+
+                wait = random.uniform(0, self._delay * (2 ** attempt))
+                self._logger.info(
+                    "'%s': %s: retrying in %.2f seconds", server, err, wait)
+
+                self._count(server, 'retries')
+                with span("retry backoff", category="wait", server=server,
+                          attempt=attempt + 1):
+                    time.sleep(wait)
+            else:
+                breaker.success()
+                return result
+
+        return None
@@ -4,11 +4,21 @@
    :synopsis: Module containing source code for jenkins job executions
 .. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
 """
+import os
 import logging
+import contextlib
 import jenkins
 from kirk import __version__
 from kirk import KirkError
 from kirk.workflow import WorkflowBuilder
+from kirk.connection import ConnectionPool
+from kirk.connection import retry
+from kirk.lock import FileLock
+from kirk.lock import lock_path
+from kirk.sync import SeedAction
+from kirk.sync import ensure_folder
+from kirk.sync import ensure_seed
+from kirk.trace import span
 
 
 class Runner:
@@ -16,7 +26,7 @@ class Runner:
     Base class for Jenkins job runner.
     """
 
-    def run(self, job, user=None, dev_folder="dev"):
+    def run(self, job, user=None, dev_folder="dev", shared=False):
         """
         Run a jenkins job for the given user. If ``user`` is given, the ending
         url will change according with ``dev_folder`` as following:
@@ -27,11 +37,16 @@ class Runner:
 
                ``myjenkins.com:8080/job/myproject/job/dev/job/myuser/``
 
+        If ``shared`` is True, developers folders are not used and all users
+        run the project seed, which receives ``user`` inside the
+        ``KIRK_USER`` parameter.
+
         Args:
             job(:py:class:`kirk.project.JobItem`): job to run.
             user(str): user running the job.
             dev_folder(str): folder name where ``user`` jobs are stored
                 (default: 'dev')
+            shared(bool): if True, run the shared seed (default: False)
 
         Returns:
             str: url of the job which is building in the jenkins server.
@@ -42,12 +57,91 @@ class Runner:
         raise NotImplementedError()
 
 
+class Build:
+    """
+    A build started by :py:class:`JobRunner`.
+    """
+
+    def __init__(self, server, location, number, url, queue_id=None):
+        """
+        Args:
+            server(str): jenkins server url.
+            location(str): seed location on jenkins server.
+            number(int): expected build number.
+            url(str): expected build url.
+            queue_id(int): queue item of the build.
+        """
+        self._server = server
+        self._location = location
+        self._number = number
+        self._url = url
+        self._queue_id = queue_id
+
+    def __repr__(self):
+        return self._url
+
+    @property
+    def server(self):
+        """
+        str: jenkins server url.
+        """
+        return self._server
+
+    @property
+    def location(self):
+        """
+        str: seed location on jenkins server.
+        """
+        return self._location
+
+    @property
+    def number(self):
+        """
+        int: build number.
+        """
+        return self._number
+
+    @property
+    def url(self):
+        """
+        str: build url.
+        """
+        return self._url
+
+    @property
+    def queue_id(self):
+        """
+        int: queue item of the build or None.
+        """
+        return self._queue_id
+
+    def started(self, number, url):
+        """
+        Set the build number assigned by Jenkins when the build left the
+        queue, which can differ from the expected one when many users run
+        the same seed.
+
+        Args:
+            number(int): build number.
+            url(str): build url.
+        """
+        self._number = number
+        self._url = url
+        self._queue_id = None
+
+
 class JobRunner(Runner):
     """
-    Jenkins job runner.
+    Jenkins job runner. Jobs can be run by many threads and processes at
+    the same time: folders and seeds created by someone else in the
+    meanwhile are reused.
     """
 
-    def __init__(self, credentials, owner="kirk"):
+    # maximum waiting time after the first failed seed setup
+    RETRY_DELAY = 0.5
+
+    def __init__(self, credentials, owner="kirk", pool=None, retries=3,
+                 lock_dir=None):
         """
         Class constructor.
 
@@ -55,12 +149,32 @@ class JobRunner(Runner):
             credentials(:py:class:`Credentials`): credentials handler object.
             owner(str): owner name that handles REST API communication with
                 the jenkins server.
+            pool(:py:class:`kirk.connection.ConnectionPool`): connections
+                shared with other objects. If None, a new pool is created.
+            retries(int): maximum number of seed setup attempts.
+            lock_dir(str): folder containing the lock files shared by the
+                kirk processes running on the same host. If given, the
+                same seed is setup by one process at time.
         """
+        if retries < 1:
+            raise ValueError("retries must be greater than zero")
+
         self._logger = logging.getLogger("runner")
         self._credentials = credentials
         self._owner = owner
-        self._server = None
         self._workflow = WorkflowBuilder()
+        self._pool = pool
+        if not self._pool:
+            self._pool = ConnectionPool(credentials, owner=owner)
+        self._retries = retries
+        self._lock_dir = lock_dir
+
+    @property
+    def pool(self):
+        """
+        :py:class:`kirk.connection.ConnectionPool`: connections pool.
+        """
+        return self._pool
 
     def _open_connection(self, job):
         """
@@ -72,18 +186,14 @@ class JobRunner(Runner):
         Returns:
             jenkins.Jenkins: Jenkins communication object.
         """
-        self._logger.info("getting '%s' credentials", self._owner)
-        password = self._credentials.get_password(job.server, self._owner)
-
-        self._logger.info("connecting to '%s'", job.server)
-        server = jenkins.Jenkins(job.server, self._owner, password)
-        return server
+        return self._pool.get(job.server)
 
-    def _setup_project_folder(self, job, user=None, dev_folder="dev"):
+    def _setup_project_folder(self, server, job, user=None, dev_folder="dev"):
         """
         Setup a project folder creating directories and seed job.
 
         Args:
+            server(jenkins.Jenkins): Jenkins communication object.
             job(:py:class:`kirk.project.JobItem`): job to run.
             user(str): developer name.
             dev_folder(str): folder userd by developers.
@@ -106,78 +216,471 @@ class JobRunner(Runner):
                 base = "/".join([base, folder])
             else:
                 base = folder
-            if not self._server.job_exists(base):
-                self._logger.info("create '%s'", base)
-                self._server.create_job(base, jenkins.EMPTY_FOLDER_XML)
+            if ensure_folder(server, base):
+                self._logger.info("created '%s'", base)
 
         return dev_location
 
-    def _create_seed(self, location, job):
+    def _create_seed(self, server, location, job, shared=False):
         """
         Create the job seed location.
 
         Args:
+            server(jenkins.Jenkins): Jenkins communication object.
             location(str): job location on jenkins server.
             job(:py:class:`kirk.project.JobItem`): job to run.
+            shared(bool): if True, seed is shared by all the developers.
 
         Returns:
             str: location on jenkins server.
         """
         # load the xml configuration according with scm
-        seed_xml = self._workflow.build_xml(job)
+        seed_xml = self._workflow.build_xml(job, shared=shared)
 
         # create job seed
         seed_location = "/".join([location, job.name])
 
-        if not self._server.job_exists(seed_location):
-            self._logger.info("creating '%s'", seed_location)
-            self._server.create_job(seed_location, seed_xml)
+        action = ensure_seed(server, seed_location, seed_xml)
+        if action == SeedAction.UNCHANGED:
+            self._logger.info("'%s' is up to date", seed_location)
         else:
-            self._logger.info("reconfigure '%s'", seed_location)
-            self._server.reconfig_job(seed_location, seed_xml)
+            self._logger.info("%s '%s'", action, seed_location)
 
         return seed_location
 
-    def run(self, job, user=None, dev_folder="dev"):
+    def _lock(self, job, location):
+        """
+        Return the lock protecting the setup of a seed.
+        """
+        if not self._lock_dir:
+            return contextlib.nullcontext()
+
+        try:
+            os.makedirs(self._lock_dir, exist_ok=True)
+        except OSError as err:
+            raise KirkError(err)
+
+        return FileLock(lock_path(self._lock_dir, job.server, location))
+
+    def _prepare(self, server, job, user, dev_folder, shared=False):
+        """
+        Setup the project folder and the seed of a job, retrying when the
+        server fails temporarily or someone else is creating them.
+
+        Returns:
+            str: seed location on jenkins server.
+        """
+        location = job.project.location
+        if user:
+            location = "/".join([location, dev_folder, user])
+
+        def _setup():
+            proj_folder = self._setup_project_folder(
+                server,
+                job,
+                user=user,
+                dev_folder=dev_folder)
+
+            return self._create_seed(server, proj_folder, job, shared=shared)
+
+        try:
+            with span("setup seed", category="runner", location=location), \
+                    self._lock(job, "/".join([location, job.name])):
+                return retry(
+                    _setup,
+                    attempts=self._retries,
+                    delay=self.RETRY_DELAY,
+                    logger=self._logger)
+        except OSError as err:
+            raise KirkError(err)
+
+    @staticmethod
+    def _check_args(job, dev_folder):
+        """
+        Check jobs arguments.
+        """
         if not job:
             raise ValueError("job is empty")
 
         if not dev_folder:
             raise ValueError("dev_folder is empty")
 
-        url = ""
+    def setup(self, job, user=None, dev_folder="dev", shared=False):
+        """
+        Create or reconfigure the seed of a job, without running it.
+        Arguments are the same of :py:meth:`run`.
+
+        Returns:
+            str: seed location on jenkins server.
+
+        Raises:
+            :py:class:`KirkError`: raised when some errors occur.
+        """
+        self._check_args(job, dev_folder)
 
-        self._server = self._open_connection(job)
+        server = self._open_connection(job)
         try:
-            proj_folder = None
+            seed_location = self._prepare(
+                server,
+                job,
+                None if shared else user,
+                dev_folder,
+                shared=shared)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
 
-            # create project folder
-            proj_folder = self._setup_project_folder(
+        return seed_location
+
+    def start(self, job, user=None, dev_folder="dev", shared=False):
+        """
+        Start a job. Arguments are the same of :py:meth:`run`.
+
+        Returns:
+            :py:class:`Build`: the started build.
+
+        Raises:
+            :py:class:`KirkError`: raised when some errors occur before/during job run.
+        """
+        self._check_args(job, dev_folder)
+
+        with span("start job", category="runner", job=str(job),
+                  server=job.server):
+            return self._start(job, user, dev_folder, shared)
+
+    def _start(self, job, user, dev_folder, shared):
+        """
+        Start a job which arguments have been already checked.
+        """
+        server = self._open_connection(job)
+        try:
+            # create project folder and seed
+            seed_location = self._prepare(
+                server,
                 job,
-                user=user,
-                dev_folder=dev_folder)
+                None if shared else user,
+                dev_folder,
+                shared=shared)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
 
-            # create seed
-            seed_location = self._create_seed(proj_folder, job)
+        return self._trigger(server, job, seed_location, user, shared)
 
-            # run seed
-            params = dict(
-                KIRK_VERSION=__version__
-            )
-            for param in job.parameters:
-                if not param.value:
-                    params[param.name] = ""
-                else:
-                    params[param.name] = param.value
+    @staticmethod
+    def _build_params(job, user, shared):
+        """
+        Return the parameters of a job build.
+        """
+        params = dict(
+            KIRK_VERSION=__version__
+        )
+        if shared and user:
+            params["KIRK_USER"] = user
+
+        for param in job.parameters:
+            if not param.value:
+                params[param.name] = ""
+            else:
+                params[param.name] = param.value
+
+        return params
 
-            self._server.build_job(seed_location, parameters=params)
+    @staticmethod
+    def _same_params(actions, params):
+        """
+        True if the parameters found inside the ``actions`` of a build or
+        of a queue item are the given ``params``.
+        """
+        found = dict()
+        for action in actions or list():
+            for param in (action or dict()).get("parameters", None) or []:
+                found[param.get("name")] = param.get("value")
+
+        return all(
+            str(found.get(name, "") or "") == str(value or "")
+            for name, value in params.items())
+
+    def _trigger(self, server, job, seed_location, user, shared):
+        """
+        Run a seed which has been already created.
+        """
+        params = self._build_params(job, user, shared)
+
+        try:
+            # don't overload the server queue
+            self._pool.admit(job.server)
+
+            queue_id = server.build_job(seed_location, parameters=params)
+            if not isinstance(queue_id, int):
+                queue_id = None
+
+            if shared and queue_id is not None:
+                # other developers run the same seed, so the next build
+                # number can belong to someone else
+                return self._queued_build(
+                    server, job, seed_location, queue_id)
 
             # get seed build url
-            job_info = self._server.get_job_info(seed_location)
-            url = job_info["url"] + ("%s/" % str(job_info["nextBuildNumber"]))
+            job_info = server.get_job_info(seed_location)
+            number = job_info["nextBuildNumber"]
+            url = job_info["url"] + ("%s/" % str(number))
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+        return Build(job.server, seed_location, number, url, queue_id=queue_id)
+
+    @staticmethod
+    def _queued_build(server, job, location, queue_id):
+        """
+        Return the build of a queue item. Until the build leaves the queue,
+        its number is None and its url is the queue item one.
+        """
+        item = server.get_queue_item(queue_id)
+        executable = item.get("executable", None)
+        if executable:
+            return Build(
+                job.server, location, executable["number"],
+                executable["url"])
+
+        url = "%s/queue/item/%d/" % (job.server.rstrip("/"), queue_id)
+        return Build(job.server, location, None, url, queue_id=queue_id)
+
+    def trigger(self, job, location, user=None, shared=False):
+        """
+        Run the seed of a job created by :py:meth:`setup`, without
+        configuring it again. Arguments are the same of :py:meth:`run`.
+
+        Args:
+            location(str): seed location returned by :py:meth:`setup`.
+
+        Returns:
+            :py:class:`Build`: the started build.
+
+        Raises:
+            :py:class:`KirkError`: raised when job can't be run.
+        """
+        if not location:
+            raise ValueError("location is empty")
+
+        with span("start job", category="runner", job=str(job),
+                  server=job.server):
+            return self._trigger(
+                self._open_connection(job), job, location, user, shared)
+
+    def next_build(self, job, location):
+        """
+        Return the number that Jenkins will assign to the next build of a
+        seed.
+
+        Args:
+            job(:py:class:`kirk.project.JobItem`): job owning the seed.
+            location(str): seed location on jenkins server.
+
+        Returns:
+            int: next build number.
+
+        Raises:
+            :py:class:`KirkError`: raised when seed can't be read.
+        """
+        try:
+            info = self._open_connection(job).get_job_info(location)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+        return info["nextBuildNumber"]
+
+    def find_build(self, job, location, number, user=None, shared=False):
+        """
+        Search the build of a seed which has been possibly started, when
+        its next build number was ``number``. A build is found if the seed
+        has a build waiting inside the queue or if the next build number
+        moved forward. Since other developers start the builds of a shared
+        seed, only a build having the parameters of ``job`` and ``user`` is
+        found on it. When the build can't be identified, None is returned,
+        so job is triggered again.
+
+        Args:
+            job(:py:class:`kirk.project.JobItem`): job owning the seed.
+            location(str): seed location on jenkins server.
+            number(int): next build number before the build was started.
+            user(str): developer running the job.
+            shared(bool): if True, seed is the shared one.
+
+        Returns:
+            :py:class:`Build`: the build or None if it has not been started.
+
+        Raises:
+            :py:class:`KirkError`: raised when seed can't be read.
+        """
+        server = self._open_connection(job)
+        try:
+            if shared:
+                return self._find_shared_build(
+                    server, job, location, number, user)
+
+            info = server.get_job_info(location)
+        except jenkins.NotFoundException:
+            return None
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+        url = info["url"] + ("%s/" % str(number))
+
+        if info.get("inQueue", False):
+            item = info.get("queueItem", None) or dict()
+            return Build(job.server, location, number, url,
+                         queue_id=item.get("id", None))
+
+        if info["nextBuildNumber"] > number:
+            return Build(job.server, location, number, url)
+
+        return None
+
+    def _find_shared_build(self, server, job, location, number, user):
+        """
+        Search the build of a shared seed by its parameters.
+        """
+        params = self._build_params(job, user, True)
+        if "KIRK_USER" not in params:
+            # builds can't be told apart from the other developers ones
+            return None
+
+        info = server.get_job_info(location, depth=1)
+
+        # builds are listed from the latest one
+        for item in reversed(info.get("builds", None) or []):
+            if item.get("number", 0) >= number and \
+                    self._same_params(item.get("actions", None), params):
+                return Build(
+                    job.server, location, item["number"], item["url"])
+
+        if not info.get("inQueue", False):
+            return None
+
+        for item in server.get_queue_info():
+            task = item.get("task", None) or dict()
+            if task.get("url", None) == info["url"] and \
+                    self._same_params(item.get("actions", None), params):
+                return self._queued_build(server, job, location, item["id"])
+
+        return None
+
+    def run(self, job, user=None, dev_folder="dev", shared=False):
+        return self.start(
+            job,
+            user=user,
+            dev_folder=dev_folder,
+            shared=shared).url
+
+    @staticmethod
+    def _left_queue(server, build):
+        """
+        Return the number and the url of a build which left the queue, when
+        Jenkins forgot its queue item.
+        """
+        if build.number is not None:
+            return dict(number=build.number, url=build.url)
+
+        info = server.get_job_info(build.location, depth=1)
+        for item in info.get("builds", None) or []:
+            if item.get("queueId", None) == build.queue_id:
+                return dict(number=item["number"], url=item["url"])
+
+        return None
+
+    def get_result(self, build):
+        """
+        Return the result of a build.
+
+        Args:
+            build(:py:class:`Build`): build started by :py:meth:`start`.
+
+        Returns:
+            str: build result, such as 'SUCCESS' or 'FAILURE', or None if
+            build is queued or running.
+
+        Raises:
+            :py:class:`KirkError`: raised when build information can't be
+                read.
+        """
+        server = self._pool.get(build.server)
+        try:
+            if build.queue_id is not None:
+                # build number is known only when build leaves the queue
+                try:
+                    item = server.get_queue_item(build.queue_id)
+                except jenkins.NotFoundException:
+                    # Jenkins forgets queue items some minutes after they
+                    # left the queue, so the expected build is read
+                    item = dict(executable=self._left_queue(server, build))
+
+                executable = item.get("executable", None)
+                if not executable:
+                    return None
+
+                build.started(executable["number"], executable["url"])
+
+            info = server.get_build_info(build.location, build.number)
+        except jenkins.NotFoundException:
+            # build is still inside the queue
+            return None
         except jenkins.JenkinsException as err:
             raise KirkError(err)
-        finally:
-            del self._server
 
-        return url
+        if info.get("building", False):
+            return None
+
+        return info.get("result", None)
+
+    def get_builds(self, job, user=None, dev_folder="dev", shared=False,
+                   limit=10):
+        """
+        Return the latest builds of a job seed. Arguments are the same of
+        :py:meth:`run`, so the seed used by ``user`` is read. On a shared
+        seed, only the builds started by ``user`` are returned.
+
+        Args:
+            limit(int): maximum number of builds. If 0, all the builds
+                read from the server are returned.
+
+        Returns:
+            list(dict): builds informations, containing 'number', 'url',
+            'result', 'building' and 'user'. Latest builds come first.
+
+        Raises:
+            :py:class:`KirkError`: raised when builds can't be read.
+        """
+        self._check_args(job, dev_folder)
+
+        location = job.project.location
+        if user and not shared:
+            location = "/".join([location, dev_folder, user])
+        location = "/".join([location, job.name])
+
+        server = self._open_connection(job)
+        try:
+            info = server.get_job_info(location, depth=1)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+        builds = list()
+        for item in info.get("builds", list()) or list():
+            params = dict()
+            for action in item.get("actions", list()) or list():
+                for param in (action or dict()).get("parameters", list()):
+                    params[param.get("name")] = param.get("value")
+
+            build_user = params.get("KIRK_USER", "") or ""
+            if shared and user and build_user != user:
+                continue
+
+            builds.append(dict(
+                number=item.get("number"),
+                url=item.get("url"),
+                result=item.get("result"),
+                building=item.get("building", False),
+                user=build_user))
+
+            if limit and len(builds) >= limit:
+                break
+
+        return builds
@@ -0,0 +1,343 @@
+"""
+.. module:: search
+   :platform: Multiplatform
+   :synopsis: jobs search index
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import re
+import heapq
+import bisect
+
+
+class JobIndex:
+    """
+    Search index over projects names, jobs names, parameters names and
+    descriptions. The index supports prefix, substring and fuzzy queries
+    and its content can be exported into a dictionary, so it can be stored
+    inside the catalog cache.
+
+    Every searchable term is lowercase and it's associated to a field rank:
+
+        * ``0``: job token, project name and job name
+        * ``1``: parts of the job name and parameters names
+        * ``2``: descriptions, parameters labels and their words
+
+    Results with a lower rank are shown first.
+    """
+
+    VERSION = 1
+
+    MODES = ('prefix', 'substring', 'fuzzy')
+
+    def __init__(self):
+        # job tokens, where position is the entry id
+        self._entries = list()
+        # sorted unique terms, where position is the term id
+        self._terms = list()
+        # term id -> [entry id, rank, entry id, rank, ...]
+        self._postings = list()
+        # trigram -> list of term ids, built on first usage
+        self._grams = None
+        self._re_words = re.compile(r"[^\W_]+")
+
+    @staticmethod
+    def _trigrams(term):
+        """
+        Return the trigrams of a padded term.
+        """
+        padded = "$$%s$$" % term
+        return {padded[i:i + 3] for i in range(0, len(padded) - 2)}
+
+    def _job_terms(self, job):
+        """
+        Return the searchable terms of a job with their rank.
+        """
+        terms = list()
+        terms.append((str(job), 0))
+        terms.append((job.project.name, 0))
+        terms.append((job.name, 0))
+
+        for word in self._re_words.findall(job.name):
+            terms.append((word, 1))
+
+        for param in job.parameters:
+            terms.append((param.name, 1))
+            if param.label:
+                terms.append((param.label, 2))
+                for word in self._re_words.findall(param.label):
+                    terms.append((word, 2))
+
+        description = job.project.description
+        if description:
+            terms.append((description, 2))
+            for word in self._re_words.findall(description):
+                terms.append((word, 2))
+
+        return terms
+
+    def build(self, jobs):
+        """
+        Build the index for the given jobs.
+
+        Args:
+            jobs(list(:py:class:`kirk.project.JobItem`)): jobs to index.
+        """
+        postings = dict()
+
+        self._entries = list()
+        for job in jobs:
+            entry = len(self._entries)
+            self._entries.append(str(job))
+
+            for term, rank in self._job_terms(job):
+                term = str(term).lower()
+                term_postings = postings.setdefault(term, dict())
+                if term_postings.get(entry, rank) >= rank:
+                    term_postings[entry] = rank
+
+        self._terms = sorted(postings.keys())
+        self._postings = list()
+        for term in self._terms:
+            flat = list()
+            for entry, rank in postings[term].items():
+                flat.extend((entry, rank))
+            self._postings.append(flat)
+
+        self._grams = None
+
+    def _get_grams(self):
+        """
+        Return the trigrams lookup table, building it if needed.
+        """
+        if self._grams is None:
+            grams = dict()
+            for term_id, term in enumerate(self._terms):
+                for gram in self._trigrams(term):
+                    grams.setdefault(gram, list()).append(term_id)
+            self._grams = grams
+
+        return self._grams
+
+    def dump(self):
+        """
+        Export the index content.
+
+        Returns:
+            dict: a JSON serializable dictionary.
+        """
+        data = dict(
+            version=self.VERSION,
+            entries=self._entries,
+            terms=self._terms,
+            postings=self._postings,
+        )
+        return data
+
+    def load(self, data):
+        """
+        Import the index content previously exported by :py:meth:`dump`.
+
+        Args:
+            data(dict): index content.
+
+        Returns:
+            bool: False if data cannot be imported.
+        """
+        if not data or data.get('version') != self.VERSION:
+            return False
+
+        self._entries = data['entries']
+        self._terms = data['terms']
+        self._postings = data['postings']
+        self._grams = None
+
+        return True
+
+    @property
+    def entries(self):
+        """
+        list(str): tokens of the indexed jobs.
+        """
+        return self._entries
+
+    def _prefix_terms(self, query):
+        """
+        Return (term id, score) of terms starting with ``query``.
+        """
+        found = list()
+        start = bisect.bisect_left(self._terms, query)
+        for term_id in range(start, len(self._terms)):
+            term = self._terms[term_id]
+            if not term.startswith(query):
+                break
+            found.append((term_id, 0 if term == query else 1))
+
+        return found
+
+    def _substring_terms(self, query):
+        """
+        Return (term id, score) of terms containing ``query``.
+        """
+        if len(query) < 3:
+            candidates = range(0, len(self._terms))
+        else:
+            grams = self._trigrams(query)
+            # remove padded grams, since query can be in the middle of a term
+            grams = [gram for gram in grams if '$' not in gram]
+            table = self._get_grams()
+            postings = sorted(
+                (table.get(gram, []) for gram in grams),
+                key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    break
+
+        found = list()
+        for term_id in candidates:
+            term = self._terms[term_id]
+            pos = term.find(query)
+            if pos < 0:
+                continue
+
+            if term == query:
+                score = 0
+            elif pos == 0:
+                score = 1
+            else:
+                score = 2
+            found.append((term_id, score))
+
+        return found
+
+    @staticmethod
+    def _distance(first, second, limit):
+        """
+        Levenshtein distance between two strings, computed only inside the
+        diagonal band of width ``limit``. If distance is bigger than
+        ``limit``, ``limit + 1`` is returned.
+        """
+        if abs(len(first) - len(second)) > limit:
+            return limit + 1
+
+        over = limit + 1
+        previous = list(range(0, len(second) + 1))
+        for i in range(1, len(first) + 1):
+            char_first = first[i - 1]
+            start = max(1, i - limit)
+            stop = min(len(second), i + limit)
+
+            current = [over] * (len(second) + 1)
+            if start == 1:
+                current[0] = i
+
+            row_min = over
+            for j in range(start, stop + 1):
+                cost = 0 if char_first == second[j - 1] else 1
+                value = min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + cost)
+                current[j] = value
+                if value < row_min:
+                    row_min = value
+
+            if row_min > limit:
+                return over
+
+            previous = current
+
+        return min(previous[-1], over)
+
+    def _fuzzy_terms(self, query, max_distance):
+        """
+        Return (term id, distance) of terms close to ``query``.
+        """
+        grams = self._trigrams(query)
+        table = self._get_grams()
+
+        # q-gram lemma: every edit removes at most 3 trigrams, so a close
+        # term must share at least ``threshold`` trigrams with the query and
+        # then it must contain at least one of its rarest trigrams
+        threshold = max(1, len(grams) - 3 * max_distance)
+        rarest = sorted(grams, key=lambda gram: len(table.get(gram, [])))
+
+        candidates = set()
+        for gram in rarest[:len(grams) - threshold + 1]:
+            candidates.update(table.get(gram, []))
+
+        found = list()
+        for term_id in candidates:
+            term = self._terms[term_id]
+            if abs(len(term) - len(query)) > max_distance:
+                continue
+
+            if len(grams.intersection(self._trigrams(term))) < threshold:
+                continue
+
+            distance = self._distance(query, term, max_distance)
+            if distance <= max_distance:
+                found.append((term_id, distance))
+
+        return found
+
+    def search(self, query, mode="fuzzy", limit=0, max_distance=None):
+        """
+        Search for jobs inside the index.
+
+        Args:
+            query(str): string to search.
+            mode(str): one between 'prefix', 'substring' or 'fuzzy'
+                (default: 'fuzzy').
+            limit(int): maximum number of results. If 0, all results are
+                returned (default: 0).
+            max_distance(int): maximum edit distance accepted by the fuzzy
+                search. If None, it depends on the query length and it's
+                never bigger than 2.
+
+        Returns:
+            list(str): ranked list of jobs tokens.
+
+        Raises:
+            ValueError: raised when input arguments are not valid.
+        """
+        if not query:
+            raise ValueError("query is empty")
+
+        if mode not in self.MODES:
+            raise ValueError("'%s' search mode is not supported" % mode)
+
+        query = query.lower()
+
+        if mode == 'prefix':
+            terms = self._prefix_terms(query)
+        elif mode == 'substring':
+            terms = self._substring_terms(query)
+        else:
+            if max_distance is None:
+                max_distance = min(2, max(1, len(query) // 4))
+            terms = self._fuzzy_terms(query, max_distance)
+
+        # keep the best (score, rank, term length) for each entry
+        best = dict()
+        for term_id, score in terms:
+            term_len = len(self._terms[term_id])
+            postings = self._postings[term_id]
+            for i in range(0, len(postings), 2):
+                entry = postings[i]
+                key = (score, postings[i + 1], term_len)
+                current = best.get(entry)
+                if current is None or key < current:
+                    best[entry] = key
+
+        def _key(item):
+            return item[1], item[0]
+
+        if limit > 0:
+            ranked = heapq.nsmallest(limit, best.items(), key=_key)
+        else:
+            ranked = sorted(best.items(), key=_key)
+
+        found = [self._entries[entry] for entry, _ in ranked]
+        return found
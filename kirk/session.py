@@ -0,0 +1,473 @@
+"""
+.. module:: session
+   :platform: Multiplatform
+   :synopsis: programmatic interface to kirk
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import time
+import asyncio
+import logging
+import functools
+import concurrent.futures
+from kirk import KirkError
+from kirk.catalog import Catalog
+from kirk.connection import ConnectionPool
+from kirk.project import JobItem
+from kirk.runner import JobRunner
+from kirk.tokenizer import JobTokenizer
+from kirk.credentials import CachedCredentials
+from kirk.credentials import get_credentials
+
+
+class JobResult:
+    """
+    Result of an operation on a job. Errors are stored inside the result,
+    so a failing job doesn't stop the others.
+    """
+
+    def __init__(self, token, job=None):
+        """
+        Args:
+            token(str): job token as it has been requested.
+            job(:py:class:`kirk.project.JobItem`): the requested job.
+        """
+        self._token = token
+        self._job = job
+        self.build = None
+        self.location = None
+        self.result = None
+        self.error = None
+
+    def __repr__(self):
+        return "JobResult(%s)" % self._token
+
+    @property
+    def token(self):
+        """
+        str: job token as it has been requested.
+        """
+        return self._token
+
+    @property
+    def job(self):
+        """
+        :py:class:`kirk.project.JobItem`: the requested job or None if it
+        has not been found.
+        """
+        return self._job
+
+    @property
+    def url(self):
+        """
+        str: url of the started build or None.
+        """
+        if self.build:
+            return self.build.url
+
+        return None
+
+    @property
+    def started(self):
+        """
+        bool: True if no errors occured and build has been started.
+        """
+        return not self.error and self.build is not None
+
+    @property
+    def ok(self):
+        """
+        bool: True if no errors occured and build completed successfully.
+        A build which is still running is not ok yet.
+        """
+        return not self.error and self.result == "SUCCESS"
+
+    def as_dict(self):
+        """
+        Return the result as a dictionary that can be serialized.
+
+        Returns:
+            dict: result informations.
+        """
+        return dict(
+            token=self._token,
+            location=self.location,
+            url=self.url,
+            number=self.build.number if self.build else None,
+            result=self.result,
+            error=self.error,
+        )
+
+
+class Session:
+    """
+    A kirk session owning projects catalog, credentials and runner, which
+    are created once and reused by all the operations. Batch operations run
+    jobs concurrently and return one :py:class:`JobResult` for each job, in
+    the same order of the request. Every batch method has an ``*_async``
+    version which can be awaited inside an asyncio event loop.
+
+    Usage:
+
+        session = kirk.Session(projects="projects")
+        results = session.run_many(["myproject::mytest[PARAM=1]"])
+        results = session.wait_many(results, timeout=3600)
+    """
+
+    def __init__(self,
+                 projects="projects",
+                 credentials="credentials.cfg",
+                 owner="kirk",
+                 backend="keyring",
+                 ttl=300,
+                 cache=None,
+                 workers=8,
+                 lock_dir=None,
+                 throttle=None,
+                 policy=None,
+                 instrumentation=None):
+        """
+        Args:
+            projects(str): folder containing projects definitions.
+            credentials(str): keyrings or tokens file path.
+            owner(str): Jenkins user that creates and builds jobs.
+            backend(str): credentials backend. See
+                :py:data:`kirk.credentials.BACKENDS`.
+            ttl(float): seconds before a cached credential expires.
+            cache(str): catalog cache file. If None, cache is not used.
+            workers(int): maximum number of jobs handled at the same time.
+            lock_dir(str): folder containing the lock files shared by the
+                kirk processes running on the same host. See
+                :py:class:`kirk.runner.JobRunner`.
+            throttle(:py:class:`kirk.throttle.Throttle`): limits on the
+                requests and builds sent to each server. If None, load is
+                not limited.
+            policy(:py:class:`kirk.resilience.RetryPolicy`): timeouts,
+                retries and circuit breakers of the requests. If None, each
+                request is sent once.
+            instrumentation(:py:class:`kirk.stats.Instrumentation`):
+                instrumentation measuring the requests. If None, a new one
+                is created and it's available from the runner pool.
+        """
+        if workers < 1:
+            raise ValueError("workers must be greater than zero")
+
+        self._logger = logging.getLogger("session")
+        self._owner = owner
+        self._workers = workers
+        self._tokenizer = JobTokenizer()
+        self._catalog = Catalog(projects, cache=cache)
+        self._loaded = False
+        self._credentials = CachedCredentials(
+            get_credentials(backend, credentials),
+            ttl=ttl)
+        self._runner = JobRunner(
+            self._credentials,
+            owner=owner,
+            pool=ConnectionPool(
+                self._credentials,
+                owner=owner,
+                throttle=throttle,
+                policy=policy,
+                instrumentation=instrumentation),
+            lock_dir=lock_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    @property
+    def owner(self):
+        """
+        str: Jenkins user that creates and builds jobs.
+        """
+        return self._owner
+
+    @property
+    def catalog(self):
+        """
+        :py:class:`kirk.catalog.Catalog`: projects catalog, loaded the first
+        time it's used.
+        """
+        if not self._loaded:
+            self._catalog.load()
+            self._loaded = True
+
+        return self._catalog
+
+    @property
+    def credentials(self):
+        """
+        :py:class:`kirk.credentials.CachedCredentials`: credentials handler.
+        """
+        return self._credentials
+
+    @property
+    def runner(self):
+        """
+        :py:class:`kirk.runner.JobRunner`: jobs runner.
+        """
+        return self._runner
+
+    def reload(self):
+        """
+        Load again the projects files which changed.
+
+        Returns:
+            bool: True if catalog has been loaded again.
+        """
+        if not self._loaded:
+            self._catalog.load()
+            self._loaded = True
+            return True
+
+        return self._catalog.refresh()
+
+    def close(self):
+        """
+        Close Jenkins connections and forget cached credentials.
+        """
+        self._runner.pool.clear()
+        self._credentials.clear()
+
+    def get_job(self, token):
+        """
+        Return a copy of the job identified by ``token``, with the token
+        parameters applied. The catalog jobs are never modified.
+
+        Args:
+            token(str or :py:class:`kirk.project.JobItem`): job token in the
+                "<project>::<job>[<parameters>]" format, or a job.
+
+        Returns:
+            :py:class:`kirk.project.JobItem`: the job.
+
+        Raises:
+            :py:class:`KirkError`: raised if token is not valid or job is
+                not found.
+        """
+        if isinstance(token, JobItem):
+            return token.copy()
+
+        decoded = self._tokenizer.decode(token)
+        if not decoded:
+            raise KirkError("invalid job token '%s'" % token)
+
+        project, name, params = decoded
+
+        found = self.catalog.get_job(self._tokenizer.encode(project, name))
+        if not found:
+            raise KirkError("cannot find '%s'" % token)
+
+        job = found.copy()
+        for param_name, value in params.items():
+            for param in job.parameters:
+                if param.name == param_name:
+                    param.value = value
+                    break
+
+        return job
+
+    def jobs(self, selection=None):
+        """
+        Return the jobs of a selection.
+
+        Args:
+            selection(list(str)): jobs tokens. If None, all the jobs of the
+                catalog are returned.
+
+        Returns:
+            list(str or :py:class:`kirk.project.JobItem`): jobs to handle.
+        """
+        if selection is None:
+            return list(self.catalog.jobs)
+
+        return list(selection)
+
+    def _resolve(self, tokens):
+        """
+        Create the results of the requested jobs and read their credentials.
+        """
+        results = list()
+        for token in tokens:
+            try:
+                result = JobResult(str(token), self.get_job(token))
+            except KirkError as err:
+                result = JobResult(str(token))
+                result.error = str(err)
+
+            results.append(result)
+
+        servers = set(res.job.server for res in results if res.job)
+        try:
+            self._credentials.prefetch(
+                [(server, self._owner) for server in servers])
+        except KirkError as err:
+            # reported by each job
+            self._logger.warning("can't read credentials: %s", err)
+
+        return results
+
+    def _map(self, func, items, workers):
+        """
+        Call ``func`` on each item using a threads pool.
+        """
+        items = list(items)
+        if not items:
+            return
+
+        workers = min(workers or self._workers, len(items))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            for _ in executor.map(func, items):
+                pass
+
+    def run(self, token, user=None, dev_folder="dev", shared=False):
+        """
+        Run a single job. See :py:meth:`run_many`.
+
+        Returns:
+            :py:class:`JobResult`: job result.
+        """
+        return self.run_many(
+            [token],
+            user=user,
+            dev_folder=dev_folder,
+            shared=shared)[0]
+
+    def run_many(self, tokens, user=None, dev_folder="dev", shared=False,
+                 workers=None):
+        """
+        Run many jobs concurrently.
+
+        Args:
+            tokens(list(str)): jobs tokens or jobs.
+            user(str): developer running the jobs.
+            dev_folder(str): folder containing developers jobs.
+            shared(bool): if True, run the shared seeds passing ``user``
+                inside the KIRK_USER parameter.
+            workers(int): maximum number of jobs started at the same time.
+                If None, the session workers are used.
+
+        Returns:
+            list(:py:class:`JobResult`): results, having ``build`` set for
+            the started jobs and ``error`` set for the failed ones.
+        """
+        results = self._resolve(tokens)
+
+        def _run(result):
+            try:
+                result.build = self._runner.start(
+                    result.job,
+                    user=user,
+                    dev_folder=dev_folder,
+                    shared=shared)
+                result.location = result.build.location
+            except (KirkError, ValueError) as err:
+                result.error = str(err)
+
+        self._map(_run, [res for res in results if res.job], workers)
+
+        return results
+
+    def wait_many(self, results, timeout=None, poll=5.0, workers=None):
+        """
+        Wait for the builds started by :py:meth:`run_many` to complete.
+
+        Args:
+            results(list(:py:class:`JobResult`)): results of the started
+                jobs. They are updated and returned.
+            timeout(float): maximum seconds to wait. If None, wait forever.
+                Builds still running after timeout have ``result`` None.
+            poll(float): seconds between two checks.
+            workers(int): maximum number of builds checked at the same time.
+                If None, the session workers are used.
+
+        Returns:
+            list(:py:class:`JobResult`): results, having ``result`` set to
+            the build result.
+        """
+        start = time.monotonic()
+
+        def _check(result):
+            try:
+                result.result = self._runner.get_result(result.build)
+            except KirkError as err:
+                result.error = str(err)
+
+        while True:
+            pending = [
+                res for res in results
+                if res.build and res.result is None and not res.error]
+
+            self._map(_check, pending, workers)
+
+            pending = [res for res in pending
+                       if res.result is None and not res.error]
+            if not pending:
+                break
+
+            if timeout is not None and time.monotonic() - start >= timeout:
+                break
+
+            time.sleep(poll)
+
+        return results
+
+    def sync(self, selection=None, user=None, dev_folder="dev",
+             workers=None):
+        """
+        Create or reconfigure the seeds of many jobs concurrently, without
+        running them.
+
+        Args:
+            selection(list(str)): jobs tokens or jobs. If None, all the jobs
+                of the catalog are synchronized.
+            user(str): developer owning the jobs.
+            dev_folder(str): folder containing developers jobs.
+            workers(int): maximum number of seeds handled at the same time.
+                If None, the session workers are used.
+
+        Returns:
+            list(:py:class:`JobResult`): results, having ``location`` set to
+            the seeds location.
+        """
+        results = self._resolve(self.jobs(selection))
+
+        def _setup(result):
+            try:
+                result.location = self._runner.setup(
+                    result.job, user=user, dev_folder=dev_folder)
+            except (KirkError, ValueError) as err:
+                result.error = str(err)
+
+        self._map(_setup, [res for res in results if res.job], workers)
+
+        return results
+
+    @staticmethod
+    async def _async(func, *args, **kwargs):
+        """
+        Run a blocking method inside the event loop executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(func, *args, **kwargs))
+
+    async def run_many_async(self, tokens, **kwargs):
+        """
+        Awaitable version of :py:meth:`run_many`.
+        """
+        return await self._async(self.run_many, tokens, **kwargs)
+
+    async def wait_many_async(self, results, **kwargs):
+        """
+        Awaitable version of :py:meth:`wait_many`.
+        """
+        return await self._async(self.wait_many, results, **kwargs)
+
+    async def sync_async(self, selection=None, **kwargs):
+        """
+        Awaitable version of :py:meth:`sync`.
+        """
+        return await self._async(self.sync, selection, **kwargs)
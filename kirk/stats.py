@@ -0,0 +1,328 @@
+"""
+.. module:: stats
+   :platform: Multiplatform
+   :synopsis: instrumentation of the requests sent to Jenkins servers
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import re
+import math
+import time
+import logging
+import threading
+import collections
+import urllib.parse
+import requests
+import jenkins
+
+# percentiles shown by the statistics summary
+PERCENTILES = (50, 95, 99)
+
+
+def endpoint_name(url, base=None):
+    """
+    Return the endpoint of a request url, where jobs names and numbers are
+    replaced by '*', so requests to different jobs are grouped together.
+
+    Args:
+        url(str): request url.
+        base(str): server url, which path is removed from ``url``.
+
+    Returns:
+        str: endpoint, such as '/job/*/job/*/api/json'.
+    """
+    path = urllib.parse.urlsplit(url or "").path or "/"
+
+    if base:
+        prefix = urllib.parse.urlsplit(base).path.rstrip("/")
+        if prefix and path.startswith(prefix + "/"):
+            path = path[len(prefix):]
+
+    path = re.sub(r'/job/[^/]+', '/job/*', path)
+    path = re.sub(r'/\d+(?=/|$)', '/*', path)
+
+    return path
+
+
+def percentile(values, pct):
+    """
+    Return a percentile using the nearest-rank method.
+
+    Args:
+        values(list(float)): sorted values.
+        pct(float): percentile between 0 and 100.
+
+    Returns:
+        float: percentile or None if there are no values.
+    """
+    if not values:
+        return None
+
+    rank = int(math.ceil(pct / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+class RequestRecord:
+    """
+    A request sent to a Jenkins server.
+    """
+
+    def __init__(self, server, method, endpoint, status, size, duration,
+                 error=None):
+        """
+        Args:
+            server(str): jenkins server url.
+            method(str): HTTP method.
+            endpoint(str): requested endpoint. See :py:func:`endpoint_name`.
+            status(int): HTTP status code or None if it's unknown.
+            size(int): response body size in bytes.
+            duration(float): request duration in seconds.
+            error(str): error message or None if request succeeded.
+        """
+        self._server = server
+        self._method = method
+        self._endpoint = endpoint
+        self._status = status
+        self._size = size
+        self._duration = duration
+        self._error = error
+
+    def __repr__(self):
+        return "%s %s%s %s %.3fs" % (
+            self._method, self._server.rstrip("/"), self._endpoint,
+            self._status, self._duration)
+
+    @property
+    def server(self):
+        """
+        str: jenkins server url.
+        """
+        return self._server
+
+    @property
+    def method(self):
+        """
+        str: HTTP method.
+        """
+        return self._method
+
+    @property
+    def endpoint(self):
+        """
+        str: requested endpoint.
+        """
+        return self._endpoint
+
+    @property
+    def status(self):
+        """
+        int: HTTP status code or None.
+        """
+        return self._status
+
+    @property
+    def size(self):
+        """
+        int: response body size in bytes.
+        """
+        return self._size
+
+    @property
+    def duration(self):
+        """
+        float: request duration in seconds.
+        """
+        return self._duration
+
+    @property
+    def error(self):
+        """
+        str: error message or None.
+        """
+        return self._error
+
+
+class Instrumentation:
+    """
+    Measure the requests sent to Jenkins servers and pass a
+    :py:class:`RequestRecord` to the registered hooks. Hooks are called by
+    the threads sending the requests, so they must be thread safe, and
+    their errors are logged and ignored.
+
+    Usage:
+
+        instrumentation = Instrumentation()
+        instrumentation.add_hook(lambda record: print(record))
+        pool = ConnectionPool(credentials, instrumentation=instrumentation)
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger("stats")
+        self._hooks = list()
+        self._lock = threading.Lock()
+
+    @property
+    def hooks(self):
+        """
+        list(callable): registered hooks.
+        """
+        with self._lock:
+            return list(self._hooks)
+
+    def add_hook(self, hook):
+        """
+        Register a hook.
+
+        Args:
+            hook(callable): function receiving a :py:class:`RequestRecord`.
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        Unregister a hook.
+
+        Args:
+            hook(callable): registered hook.
+        """
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def emit(self, record):
+        """
+        Pass a record to the hooks.
+
+        Args:
+            record(:py:class:`RequestRecord`): request record.
+        """
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception as err:  # pylint: disable=broad-except
+                self._logger.warning("request hook failed: %s", err)
+
+    def measure(self, server, req, func):
+        """
+        Send a request measuring it.
+
+        Args:
+            server(str): jenkins server url.
+            req(requests.Request): request to send.
+            func(callable): function sending the request and returning the
+                response.
+
+        Returns:
+            requests.Response: the response returned by ``func``.
+        """
+        endpoint = endpoint_name(req.url, base=server)
+        status = None
+        size = 0
+        error = None
+
+        start = time.monotonic()
+        try:
+            response = func()
+            status = getattr(response, 'status_code', None)
+
+            # streamed responses body is not read yet
+            content = getattr(response, '_content', False)
+            if content is False:
+                size = int(response.headers.get('Content-Length', 0) or 0)
+            else:
+                size = len(content or b"")
+
+            return response
+        except jenkins.NotFoundException as err:
+            status = 404
+            error = str(err) or err.__class__.__name__
+            raise
+        except requests.exceptions.HTTPError as err:
+            if err.response is not None:
+                status = err.response.status_code
+            error = str(err) or err.__class__.__name__
+            raise
+        except Exception as err:
+            error = str(err) or err.__class__.__name__
+            raise
+        finally:
+            self.emit(RequestRecord(
+                server,
+                (req.method or "").upper(),
+                endpoint,
+                status,
+                size,
+                time.monotonic() - start,
+                error=error))
+
+
+class LatencyStats:
+    """
+    Hook collecting the requests durations, in order to show latency
+    percentiles for each server and endpoint.
+    """
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self._records = list()
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    @property
+    def records(self):
+        """
+        list(:py:class:`RequestRecord`): collected records.
+        """
+        with self._lock:
+            return list(self._records)
+
+    @staticmethod
+    def _summarize(records):
+        """
+        Return the statistics of a group of records.
+        """
+        durations = sorted(record.duration for record in records)
+
+        stats = collections.OrderedDict()
+        stats['requests'] = len(records)
+        stats['errors'] = len([rec for rec in records if rec.error])
+        stats['bytes'] = sum(record.size for record in records)
+        stats['total'] = sum(durations)
+        for pct in PERCENTILES:
+            stats['p%d' % pct] = percentile(durations, pct)
+
+        return stats
+
+    def summary(self):
+        """
+        Return the statistics of the collected records.
+
+        Returns:
+            dict: 'elapsed' seconds since statistics creation, 'servers'
+            and 'endpoints' statistics, indexed by server url and by
+            (method, endpoint). Each statistic contains the number of
+            'requests' and 'errors', the received 'bytes', the 'total'
+            requests duration and the 'p50', 'p95' and 'p99' latencies.
+        """
+        records = self.records
+
+        servers = collections.OrderedDict()
+        endpoints = collections.OrderedDict()
+        for record in records:
+            servers.setdefault(record.server, list()).append(record)
+            endpoints.setdefault(
+                (record.method, record.endpoint), list()).append(record)
+
+        summary = dict()
+        summary['elapsed'] = time.monotonic() - self._started
+        summary['servers'] = collections.OrderedDict(
+            (key, self._summarize(value))
+            for key, value in sorted(servers.items()))
+        summary['endpoints'] = collections.OrderedDict(
+            (key, self._summarize(value))
+            for key, value in sorted(endpoints.items()))
+
+        return summary
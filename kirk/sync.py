@@ -0,0 +1,522 @@
+"""
+.. module:: sync
+   :platform: Multiplatform
+   :synopsis: bulk synchronization of the jobs seeds
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import difflib
+import logging
+import threading
+import collections
+import concurrent.futures
+import xml.etree.ElementTree as ET
+import jenkins
+from kirk import KirkError
+from kirk.workflow import WorkflowBuilder
+
+
+def canonical_xml(xml_str):
+    """
+    Return the canonical form of a job configuration, so configurations
+    rendered by kirk can be compared with the ones stored by Jenkins.
+    Whitespaces between elements, plugins versions and the job description
+    are not part of the canonical form.
+
+    Args:
+        xml_str(str): job configuration.
+
+    Returns:
+        str: canonical configuration, one element per line.
+
+    Raises:
+        :py:class:`KirkError`: raised if configuration is not valid XML.
+    """
+    try:
+        root = ET.fromstring(xml_str.encode('utf-8'))
+    except ET.ParseError as err:
+        raise KirkError("invalid job configuration: %s" % err)
+
+    for item in list(root):
+        if item.tag == "description":
+            root.remove(item)
+
+    lines = list()
+
+    def _walk(element, depth):
+        attrs = sorted(
+            (key, value) for key, value in element.attrib.items()
+            if key != "plugin")
+        attrs_str = "".join(' %s="%s"' % item for item in attrs)
+        text = (element.text or "").strip()
+
+        lines.append(
+            "%s<%s%s>%s" % ("  " * depth, element.tag, attrs_str, text))
+        for child in element:
+            _walk(child, depth + 1)
+
+    _walk(root, 0)
+
+    return "\n".join(lines) + "\n"
+
+
+def same_config(current, rendered):
+    """
+    Check if a configuration stored by Jenkins is equivalent to a rendered
+    one. See :py:func:`canonical_xml`.
+
+    Args:
+        current(str): configuration stored by Jenkins.
+        rendered(str): configuration rendered by kirk.
+
+    Returns:
+        bool: True if configurations are equivalent. False if they differ
+        or if one of them is not valid.
+    """
+    if not isinstance(current, str) or not isinstance(rendered, str):
+        return False
+
+    if current == rendered:
+        return True
+
+    try:
+        return canonical_xml(current) == canonical_xml(rendered)
+    except KirkError:
+        return False
+
+
+def ensure_folder(conn, location):
+    """
+    Create a folder if it doesn't exist. A folder created by another
+    process in the meanwhile is not an error.
+
+    Args:
+        conn(jenkins.Jenkins): Jenkins communication object.
+        location(str): folder location on jenkins server.
+
+    Returns:
+        bool: True if folder has been created by this call.
+
+    Raises:
+        jenkins.JenkinsException: raised if folder can't be created.
+    """
+    if conn.job_exists(location):
+        return False
+
+    try:
+        conn.create_job(location, jenkins.EMPTY_FOLDER_XML)
+    except jenkins.JenkinsException:
+        if not conn.job_exists(location):
+            raise
+
+        return False
+
+    return True
+
+
+def ensure_seed(conn, location, xml_str, exists=None):
+    """
+    Create a seed or reconfigure it when its configuration differs from
+    ``xml_str``. When another process creates the seed in the meanwhile,
+    the seed is reconfigured instead of failing.
+
+    Args:
+        conn(jenkins.Jenkins): Jenkins communication object.
+        location(str): seed location on jenkins server.
+        xml_str(str): seed configuration.
+        exists(bool): if the seed exists. If None, server is asked.
+
+    Returns:
+        str: executed :py:class:`SeedAction` action, which is one of CREATE,
+        RECONFIGURE or UNCHANGED.
+
+    Raises:
+        jenkins.JenkinsException: raised if seed can't be configured.
+    """
+    if exists is None:
+        exists = conn.job_exists(location)
+
+    if not exists:
+        try:
+            conn.create_job(location, xml_str)
+            return SeedAction.CREATE
+        except jenkins.JenkinsException:
+            if not conn.job_exists(location):
+                raise
+
+    # reconfiguring causes Jenkins to store the job again, which is
+    # slower than reading its configuration
+    if same_config(conn.get_job_config(location), xml_str):
+        return SeedAction.UNCHANGED
+
+    conn.reconfig_job(location, xml_str)
+
+    return SeedAction.RECONFIGURE
+
+
+class SeedAction:
+    """
+    An action needed to synchronize a job seed with the server.
+    """
+
+    CREATE = "create"
+    RECONFIGURE = "reconfigure"
+    DELETE = "delete"
+    UNCHANGED = "unchanged"
+
+    def __init__(self, action, server, location, job=None, xml=None,
+                 current=None):
+        """
+        Args:
+            action(str): one of CREATE, RECONFIGURE, DELETE or UNCHANGED.
+            server(str): jenkins server url.
+            location(str): seed location on jenkins server.
+            job(:py:class:`kirk.project.JobItem`): job of the seed. It's None
+                for seeds to delete.
+            xml(str): rendered seed configuration.
+            current(str): configuration stored by the server.
+        """
+        self._action = action
+        self._server = server
+        self._location = location
+        self._job = job
+        self._xml = xml
+        self._current = current
+        self.error = None
+
+    def __repr__(self):
+        return "%s %s" % (self._action, self._location)
+
+    @property
+    def action(self):
+        """
+        str: action to execute.
+        """
+        return self._action
+
+    @property
+    def server(self):
+        """
+        str: jenkins server url.
+        """
+        return self._server
+
+    @property
+    def location(self):
+        """
+        str: seed location on jenkins server.
+        """
+        return self._location
+
+    @property
+    def job(self):
+        """
+        :py:class:`kirk.project.JobItem`: job of the seed.
+        """
+        return self._job
+
+    @property
+    def xml(self):
+        """
+        str: rendered seed configuration.
+        """
+        return self._xml
+
+    def diff(self):
+        """
+        Return the differences between the server configuration and the
+        rendered one.
+
+        Returns:
+            str: unified diff of the canonical configurations.
+        """
+        current = ""
+        if self._current:
+            current = canonical_xml(self._current)
+
+        rendered = ""
+        if self._xml:
+            rendered = canonical_xml(self._xml)
+
+        lines = difflib.unified_diff(
+            current.splitlines(True),
+            rendered.splitlines(True),
+            fromfile="%s (server)" % self._location,
+            tofile="%s (kirk)" % self._location)
+
+        return "".join(lines)
+
+
+class Synchronizer:
+    """
+    Synchronize the jobs seeds with Jenkins servers. Seeds configurations
+    are fetched and updated concurrently, with a maximum number of requests
+    sent to each server at the same time.
+    """
+
+    def __init__(self, pool, workers=8, per_server=4):
+        """
+        Args:
+            pool(:py:class:`kirk.connection.ConnectionPool`): connections
+                to the jenkins servers.
+            workers(int): maximum number of requests at the same time.
+            per_server(int): maximum number of requests sent to the same
+                server at the same time.
+        """
+        if workers < 1:
+            raise ValueError("workers must be greater than zero")
+
+        if per_server < 1:
+            raise ValueError("per_server must be greater than zero")
+
+        self._logger = logging.getLogger("sync")
+        self._pool = pool
+        self._workers = workers
+        self._per_server = per_server
+        self._workflow = WorkflowBuilder()
+        self._limits = dict()
+        self._lock = threading.Lock()
+
+    def _limit(self, server):
+        """
+        Return the semaphore limiting the requests sent to ``server``.
+        """
+        with self._lock:
+            sem = self._limits.get(server, None)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self._per_server)
+                self._limits[server] = sem
+
+        return sem
+
+    def _map(self, func, items):
+        """
+        Call ``func`` on each item using a threads pool and return the
+        results in the same order of ``items``.
+        """
+        items = list(items)
+        if not items:
+            return list()
+
+        workers = min(self._workers, len(items))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    def location(job, user=None, dev_folder="dev"):
+        """
+        Return the seed location of a job.
+
+        Args:
+            job(:py:class:`kirk.project.JobItem`): the job.
+            user(str): developer owning the seed.
+            dev_folder(str): folder containing developers jobs.
+
+        Returns:
+            str: seed location on jenkins server.
+        """
+        folder = job.project.location
+        if user:
+            folder = "/".join([folder, dev_folder, user])
+
+        return "/".join([folder, job.name])
+
+    def _fetch(self, server, location):
+        """
+        Return the configuration of a seed or None if it doesn't exist.
+        """
+        with self._limit(server):
+            try:
+                return self._pool.get(server).get_job_config(location)
+            except jenkins.NotFoundException:
+                return None
+            except jenkins.JenkinsException as err:
+                raise KirkError(err)
+
+    def _list_seeds(self, server, folder):
+        """
+        Return the names of the seeds inside a folder. Sub folders, such as
+        developers folders, are not returned.
+        """
+        with self._limit(server):
+            try:
+                info = self._pool.get(server).get_job_info(folder)
+            except jenkins.NotFoundException:
+                return list()
+            except jenkins.JenkinsException as err:
+                raise KirkError(err)
+
+        names = list()
+        for item in info.get("jobs", list()):
+            if "folder" in item.get("_class", "").lower():
+                continue
+
+            names.append(item["name"])
+
+        return names
+
+    def plan(self, jobs, user=None, dev_folder="dev", delete=False,
+             known=None):
+        """
+        Compare the rendered seeds with the server ones.
+
+        Args:
+            jobs(list(:py:class:`kirk.project.JobItem`)): jobs to
+                synchronize.
+            user(str): developer owning the seeds.
+            dev_folder(str): folder containing developers jobs.
+            delete(bool): if True, seeds inside the jobs folders which don't
+                belong to any of the ``known`` jobs are deleted.
+            known(list(:py:class:`kirk.project.JobItem`)): all the jobs of
+                the catalog, which is required by ``delete``. Seeds of jobs
+                which are not selected are never deleted.
+
+        Returns:
+            list(:py:class:`SeedAction`): actions, in the same order of the
+            jobs, followed by the deletions.
+
+        Raises:
+            :py:class:`KirkError`: raised if a seed can't be rendered or
+                server can't be reached.
+        """
+        if delete and known is None:
+            raise ValueError("known jobs are required to delete seeds")
+
+        seeds = list()
+        for job in jobs:
+            location = self.location(job, user=user, dev_folder=dev_folder)
+            seeds.append((job, location, self._workflow.build_xml(job)))
+
+        def _compare(item):
+            job, location, xml_str = item
+            current = self._fetch(job.server, location)
+            if current is None:
+                return SeedAction(
+                    SeedAction.CREATE, job.server, location,
+                    job=job, xml=xml_str)
+
+            action = SeedAction.UNCHANGED
+            if not same_config(current, xml_str):
+                action = SeedAction.RECONFIGURE
+
+            return SeedAction(
+                action, job.server, location,
+                job=job, xml=xml_str, current=current)
+
+        actions = self._map(_compare, seeds)
+
+        if delete:
+            expected = collections.OrderedDict()
+            for job, location, _ in seeds:
+                folder = location.rsplit("/", 1)[0]
+                expected.setdefault((job.server, folder), set())
+
+            for job in list(known) + list(jobs):
+                location = self.location(
+                    job, user=user, dev_folder=dev_folder)
+                folder = location.rsplit("/", 1)[0]
+                if (job.server, folder) in expected:
+                    expected[(job.server, folder)].add(job.name)
+
+            def _orphans(item):
+                (server, folder), names = item
+                return [
+                    SeedAction(
+                        SeedAction.DELETE, server, "/".join([folder, name]))
+                    for name in self._list_seeds(server, folder)
+                    if name not in names]
+
+            for orphans in self._map(_orphans, expected.items()):
+                actions.extend(orphans)
+
+        return actions
+
+    def _create_folders(self, actions):
+        """
+        Create the folders of the seeds to create.
+        """
+        folders = collections.OrderedDict()
+        for action in actions:
+            if action.action == SeedAction.CREATE:
+                folder = action.location.rsplit("/", 1)[0]
+                folders[(action.server, folder)] = None
+
+        created = set()
+        for server, folder in folders:
+            base = ""
+            for name in folder.split("/"):
+                base = "/".join([base, name]) if base else name
+                if (server, base) in created:
+                    continue
+
+                if ensure_folder(self._pool.get(server), base):
+                    self._logger.info("created '%s'", base)
+
+                created.add((server, base))
+
+    def apply(self, actions):
+        """
+        Execute the synchronization actions. Errors are stored inside the
+        ``error`` attribute of the failed actions.
+
+        Args:
+            actions(list(:py:class:`SeedAction`)): actions returned by
+                :py:meth:`plan`.
+
+        Returns:
+            list(:py:class:`SeedAction`): the executed actions.
+
+        Raises:
+            :py:class:`KirkError`: raised if seeds folders can't be created.
+        """
+        try:
+            self._create_folders(actions)
+        except jenkins.JenkinsException as err:
+            raise KirkError(err)
+
+        def _execute(action):
+            with self._limit(action.server):
+                conn = self._pool.get(action.server)
+                try:
+                    if action.action == SeedAction.CREATE:
+                        self._logger.info("creating '%s'", action.location)
+                        ensure_seed(
+                            conn, action.location, action.xml, exists=False)
+                    elif action.action == SeedAction.RECONFIGURE:
+                        self._logger.info("reconfigure '%s'", action.location)
+                        conn.reconfig_job(action.location, action.xml)
+                    elif action.action == SeedAction.DELETE:
+                        self._logger.info("deleting '%s'", action.location)
+                        conn.delete_job(action.location)
+                except jenkins.JenkinsException as err:
+                    action.error = str(err)
+
+        self._map(
+            _execute,
+            [act for act in actions if act.action != SeedAction.UNCHANGED])
+
+        return actions
+
+
+def summary(actions):
+    """
+    Count the synchronization actions.
+
+    Args:
+        actions(list(:py:class:`SeedAction`)): synchronization actions.
+
+    Returns:
+        dict: number of actions for each type, plus the 'failed' ones.
+    """
+    counts = collections.OrderedDict()
+    for name in (SeedAction.CREATE, SeedAction.RECONFIGURE,
+                 SeedAction.DELETE, SeedAction.UNCHANGED):
+        counts[name] = 0
+    counts['failed'] = 0
+
+    for action in actions:
+        if action.error:
+            counts['failed'] += 1
+        else:
+            counts[action.action] += 1
+
+    return counts
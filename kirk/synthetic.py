@@ -0,0 +1,232 @@
+"""
+.. module:: synthetic
+   :platform: Multiplatform
+   :synopsis: synthetic projects catalogs for scale testing
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import random
+from kirk import KirkError
+
+# supported SCM configurations
+SCM_TYPES = ('git', 'perforce', 'none')
+
+# prefix of the environment variables used by '!ENV' values
+ENV_PREFIX = "KIRK_SYNTH_"
+
+
+class CatalogGenerator:
+    """
+    Generate projects files which are valid according with the projects
+    schema, so catalogs of any size can be loaded, rendered and run without
+    sharing real projects definitions. The same ``seed`` always generates
+    the same catalog.
+
+    Usage:
+
+        generator = CatalogGenerator(projects=1000, jobs=20)
+        paths = generator.generate("/tmp/catalog")
+    """
+
+    def __init__(self, projects=10, jobs=10, parameters=3, depends=0.1,
+                 scm=None, env=0.0, servers=None, seed=0):
+        """
+        Args:
+            projects(int): number of projects files.
+            jobs(int): number of jobs of each project.
+            parameters(int): number of parameters of each job.
+            depends(float): probability that a job depends on each of the
+                jobs defined before it in the same project.
+            scm(dict): relative weight of each SCM type used by the projects.
+                If None, only 'git' is used.
+            env(float): fraction of the parameters which default value is
+                read from an environment variable using '!ENV'.
+            servers(list(str)): servers where jobs run. Jobs are spread over
+                them. If None, 'http://localhost:8080' is used.
+            seed(int): random generator seed.
+
+        Raises:
+            ValueError: raised if arguments are not valid.
+        """
+        if projects < 0:
+            raise ValueError("projects can't be negative")
+
+        if jobs < 1:
+            raise ValueError("jobs must be greater than zero")
+
+        if parameters < 0:
+            raise ValueError("parameters can't be negative")
+
+        if not 0.0 <= depends <= 1.0:
+            raise ValueError("depends must be between 0 and 1")
+
+        if not 0.0 <= env <= 1.0:
+            raise ValueError("env must be between 0 and 1")
+
+        scm = scm or dict(git=1)
+        for name, weight in scm.items():
+            if name not in SCM_TYPES:
+                raise ValueError("unsupported SCM '%s'" % name)
+            if weight < 0:
+                raise ValueError("SCM weights can't be negative")
+
+        if not sum(scm.values()):
+            raise ValueError("at least one SCM must have a weight")
+
+        self._projects = projects
+        self._jobs = jobs
+        self._parameters = parameters
+        self._depends = depends
+        self._scm = scm
+        self._env = env
+        self._servers = list(servers or ["http://localhost:8080"])
+        self._seed = seed
+
+    @property
+    def env_vars(self):
+        """
+        dict: environment variables which can be read by the generated
+        projects, with the values to set.
+        """
+        return {
+            "%sPARAM_%d" % (ENV_PREFIX, index): "value_%d" % index
+            for index in range(self._parameters)
+        }
+
+    def _scm_yaml(self, rnd, kind, script):
+        """
+        Return the SCM section of a project.
+        """
+        if kind == "git":
+            return (
+                "        git:\n"
+                "            url: https://git.example.com/repo_%d.git\n"
+                "            credential: git-credential\n"
+                "            label: master\n" % rnd.randrange(1000))
+
+        if kind == "perforce":
+            return (
+                "        perforce:\n"
+                "            stream: //depot/stream_%d\n"
+                "            workspace: workspace_%d\n"
+                "            credential: p4-credential\n"
+                "            changelist: %d\n" % (
+                    rnd.randrange(1000),
+                    rnd.randrange(1000),
+                    rnd.randrange(1, 1000000)))
+
+        return (
+            "        none:\n"
+            "            script: %s\n"
+            "            sandbox: true\n" % script)
+
+    def _parameter(self, rnd, index, indent):
+        """
+        Return a job parameter.
+        """
+        if rnd.random() < self._env:
+            default = "!ENV ${%sPARAM_%d}" % (ENV_PREFIX, index)
+        else:
+            default = "value_%d" % rnd.randrange(100)
+
+        return (
+            "%s- name: PARAM_%d\n"
+            "%s  label: Parameter %d\n"
+            "%s  default: %s\n"
+            "%s  show: %s\n" % (
+                indent, index,
+                indent, index,
+                indent, default,
+                indent, "true" if rnd.random() < 0.5 else "false"))
+
+    def project(self, index, script=None):
+        """
+        Return the content of a project file.
+
+        Args:
+            index(int): project index.
+            script(str): path of the script used by projects which don't
+                use any SCM.
+
+        Returns:
+            str: project file content.
+        """
+        rnd = random.Random("%s-%d" % (self._seed, index))
+
+        kinds = [kind for kind in SCM_TYPES if self._scm.get(kind, 0)]
+        kind = rnd.choices(
+            kinds, weights=[self._scm[name] for name in kinds])[0]
+
+        lines = [
+            "name: synthetic_%05d" % index,
+            "description: synthetic project %d" % index,
+            "author: kirk",
+            "year: 2020",
+            "version: 1.0",
+            "location: synthetic/project_%05d" % index,
+            "defaults:",
+            "    server: %s" % self._servers[index % len(self._servers)],
+            "    scm:",
+        ]
+
+        content = "\n".join(lines) + "\n"
+        content += self._scm_yaml(rnd, kind, script or "pipeline.groovy")
+        content += "jobs:\n"
+
+        for job in range(self._jobs):
+            content += "    - name: job_%04d\n" % job
+            content += "      pipeline: pipelines/job_%04d.groovy\n" % job
+
+            # some jobs don't run on the project server
+            if len(self._servers) > 1 and rnd.random() < 0.1:
+                content += "      server: %s\n" % rnd.choice(self._servers)
+
+            if self._parameters:
+                content += "      parameters:\n"
+                for param in range(self._parameters):
+                    content += self._parameter(rnd, param, " " * 8)
+
+            depends = [
+                "job_%04d" % other for other in range(job)
+                if rnd.random() < self._depends]
+            if depends:
+                content += "      depends:\n"
+                for name in depends:
+                    content += "        - %s\n" % name
+
+        return content
+
+    def generate(self, folder):
+        """
+        Write the projects files inside ``folder``, which is created if it
+        doesn't exist. Projects which don't use any SCM run the
+        'pipeline.groovy' script stored in the same folder.
+
+        Args:
+            folder(str): output folder.
+
+        Returns:
+            list(str): projects files paths.
+
+        Raises:
+            :py:class:`KirkError`: raised if files can't be written.
+        """
+        try:
+            os.makedirs(folder, exist_ok=True)
+
+            script = os.path.abspath(os.path.join(folder, "pipeline.groovy"))
+            if self._scm.get("none", 0):
+                with open(script, "w") as script_file:
+                    script_file.write("node {\n    echo 'synthetic'\n}\n")
+
+            paths = list()
+            for index in range(self._projects):
+                path = os.path.join(folder, "project_%05d.yml" % index)
+                with open(path, "w") as project_file:
+                    project_file.write(self.project(index, script=script))
+
+                paths.append(path)
+        except OSError as err:
+            raise KirkError("can't generate catalog: %s" % err)
+
+        return paths
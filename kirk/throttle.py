@@ -0,0 +1,238 @@
+"""
+.. module:: throttle
+   :platform: Multiplatform
+   :synopsis: limits on the load generated on Jenkins servers
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import time
+import logging
+import threading
+import collections
+import jenkins
+
+
+class TokenBucket:
+    """
+    Token bucket allowing ``rate`` operations per second on average, with
+    bursts of at most ``burst`` operations. It can be used by many threads
+    at the same time.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate(float): tokens added to the bucket every second. If 0,
+                operations are not limited.
+            burst(int): bucket size.
+        """
+        if rate < 0:
+            raise ValueError("rate can't be negative")
+
+        if burst < 1:
+            raise ValueError("burst must be greater than zero")
+
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """
+        float: tokens added to the bucket every second.
+        """
+        return self._rate
+
+    @property
+    def burst(self):
+        """
+        int: bucket size.
+        """
+        return self._burst
+
+    def acquire(self):
+        """
+        Take a token from the bucket, waiting until it's available. Tokens
+        are reserved in the same order of the calls.
+
+        Returns:
+            float: seconds spent waiting.
+        """
+        if not self._rate:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self._burst),
+                self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            self._tokens -= 1
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+
+class Throttle:
+    """
+    Limit the load generated on each Jenkins server. Requests sent to a
+    server are limited by a token bucket, while new builds are admitted only
+    when the server queue is shorter than ``max_queue``. Queue length is read
+    at most once every ``poll`` seconds for each server and builds admitted
+    in the meanwhile are counted as queued.
+    """
+
+    def __init__(self, rate=0, burst=10, max_queue=0, poll=5.0):
+        """
+        Args:
+            rate(float): maximum number of requests per second sent to each
+                server. If 0, requests are not limited.
+            burst(int): maximum number of requests sent at once.
+            max_queue(int): maximum number of items inside a server queue
+                before new builds are delayed. If 0, builds are not delayed.
+            poll(float): seconds between two reads of a server queue.
+        """
+        if max_queue < 0:
+            raise ValueError("max_queue can't be negative")
+
+        if poll <= 0:
+            raise ValueError("poll must be greater than zero")
+
+        # check arguments once, before creating buckets
+        TokenBucket(rate, burst)
+
+        self._logger = logging.getLogger("throttle")
+        self._rate = rate
+        self._burst = burst
+        self._max_queue = max_queue
+        self._poll = poll
+        self._buckets = dict()
+        self._queues = dict()
+        self._admissions = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """
+        float: maximum number of requests per second sent to each server.
+        """
+        return self._rate
+
+    @property
+    def burst(self):
+        """
+        int: maximum number of requests sent at once.
+        """
+        return self._burst
+
+    @property
+    def max_queue(self):
+        """
+        int: maximum length of a server queue before builds are delayed.
+        """
+        return self._max_queue
+
+    def wait(self, server):
+        """
+        Wait until a request can be sent to ``server``.
+
+        Args:
+            server(str): jenkins server url.
+
+        Returns:
+            float: seconds spent waiting.
+        """
+        if not self._rate:
+            return 0.0
+
+        with self._lock:
+            bucket = self._buckets.get(server, None)
+            if bucket is None:
+                bucket = TokenBucket(self._rate, self._burst)
+                self._buckets[server] = bucket
+
+        return bucket.acquire()
+
+    def admissions(self):
+        """
+        Return the admitted builds.
+
+        Returns:
+            dict: for each server, the number of admitted 'builds' and the
+            total 'wait' time in seconds.
+        """
+        with self._lock:
+            return collections.OrderedDict(
+                (server, dict(builds=item[0], wait=item[1]))
+                for server, item in sorted(self._admissions.items()))
+
+    def _admitted(self, server, waited):
+        """
+        Count an admitted build.
+        """
+        with self._lock:
+            item = self._admissions.setdefault(server, [0, 0.0])
+            item[0] += 1
+            item[1] += waited
+
+    def _queue(self, server):
+        """
+        Return the queue state of ``server``, which is a list of
+        [lock, length, read time].
+        """
+        with self._lock:
+            state = self._queues.get(server, None)
+            if state is None:
+                state = [threading.Lock(), 0, None]
+                self._queues[server] = state
+
+        return state
+
+    def admit(self, conn, server):
+        """
+        Wait until a new build can be queued on ``server``. If the queue
+        can't be read, build is admitted.
+
+        Args:
+            conn(jenkins.Jenkins): Jenkins communication object.
+            server(str): jenkins server url.
+
+        Returns:
+            float: seconds spent waiting.
+        """
+        if not self._max_queue:
+            return 0.0
+
+        state = self._queue(server)
+        waited = 0.0
+
+        while True:
+            with state[0]:
+                now = time.monotonic()
+                if state[2] is None or now - state[2] >= self._poll:
+                    try:
+                        info = conn.get_info(
+                            item="queue", query="?tree=items[id]")
+                        state[1] = len(info.get("items", list()))
+                    except jenkins.JenkinsException as err:
+                        self._logger.warning(
+                            "can't read '%s' queue: %s", server, err)
+                        state[1] = 0
+
+                    state[2] = now
+
+                if state[1] < self._max_queue:
+                    state[1] += 1
+                    self._admitted(server, waited)
+                    return waited
+
+            self._logger.info(
+                "'%s' queue contains %d items: waiting %.1f seconds",
+                server, state[1], self._poll)
+
+            time.sleep(self._poll)
+            waited += self._poll
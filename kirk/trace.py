@@ -0,0 +1,335 @@
+"""
+.. module:: trace
+   :platform: Multiplatform
+   :synopsis: spans recording of a kirk session
+.. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
+"""
+import os
+import json
+import time
+import random
+import threading
+from kirk import KirkError
+
+FORMATS = ('chrome', 'otlp')
+
+# tracer recording the spans of the current process
+_TRACER = None
+
+
+class _NullSpan:
+    """
+    Span used when tracing is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+    def set(self, **kwargs):
+        """
+        Ignore span arguments.
+        """
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    Span recorded by a :py:class:`Tracer`.
+    """
+
+    def __init__(self, tracer, name, category, args):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start = None
+        self._span_id = None
+        self._parent_id = None
+
+    def __enter__(self):
+        self._span_id, self._parent_id = self._tracer.push()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        end = time.perf_counter()
+        self._tracer.pop()
+
+        if exc_value is not None:
+            self._args['error'] = str(exc_value) or exc_type.__name__
+
+        self._tracer.add(
+            self._name,
+            self._category,
+            self._start,
+            end,
+            self._args,
+            span_id=self._span_id,
+            parent_id=self._parent_id)
+
+        return False
+
+    def set(self, **kwargs):
+        """
+        Add arguments to the span.
+        """
+        self._args.update(kwargs)
+
+
+class Tracer:
+    """
+    Record the spans of a kirk session from all threads, in order to write
+    them as Chrome trace events, which can be opened with Perfetto or
+    chrome://tracing, or as OTLP JSON.
+    """
+
+    def __init__(self):
+        self._perf_start = time.perf_counter()
+        self._wall_start = time.time_ns()
+        self._trace_id = "%032x" % random.getrandbits(128)
+        self._pid = os.getpid()
+        self._events = list()
+        self._threads = dict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def events(self):
+        """
+        list(dict): recorded spans as Chrome complete events.
+        """
+        with self._lock:
+            return list(self._events)
+
+    def push(self):
+        """
+        Open a span in the current thread.
+
+        Returns:
+            (str, str): span id and parent span id, which is None for the
+            first span of a thread.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = list()
+            self._local.stack = stack
+
+        span_id = "%016x" % random.getrandbits(64)
+        parent_id = stack[-1] if stack else None
+        stack.append(span_id)
+
+        return span_id, parent_id
+
+    def pop(self):
+        """
+        Close the last span opened in the current thread.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            stack.pop()
+
+    def add(self, name, category, start, end, args=None, span_id=None,
+            parent_id=None):
+        """
+        Record a span.
+
+        Args:
+            name(str): span name.
+            category(str): span category.
+            start(float): :py:func:`time.perf_counter` value at span start.
+            end(float): :py:func:`time.perf_counter` value at span end.
+            args(dict): span arguments.
+            span_id(str): span id.
+            parent_id(str): parent span id.
+        """
+        thread = threading.current_thread()
+        event = dict(
+            name=name,
+            cat=category,
+            ph="X",
+            ts=(start - self._perf_start) * 1e6,
+            dur=(end - start) * 1e6,
+            pid=self._pid,
+            tid=thread.ident,
+            args=dict(args or dict()),
+        )
+
+        if span_id:
+            event['id'] = span_id
+        if parent_id:
+            event['parent'] = parent_id
+
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self._events.append(event)
+
+    def to_chrome(self):
+        """
+        Return the spans as Chrome trace events.
+
+        Returns:
+            dict: Chrome trace JSON object.
+        """
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+
+        meta = [dict(
+            name="process_name",
+            ph="M",
+            pid=self._pid,
+            tid=0,
+            args=dict(name="kirk"))]
+
+        for tid, name in sorted(threads.items()):
+            meta.append(dict(
+                name="thread_name",
+                ph="M",
+                pid=self._pid,
+                tid=tid,
+                args=dict(name=name)))
+
+        return dict(traceEvents=meta + events, displayTimeUnit="ms")
+
+    def to_otlp(self):
+        """
+        Return the spans as OTLP JSON, as exported by OpenTelemetry.
+
+        Returns:
+            dict: OTLP JSON object.
+        """
+        def _value(value):
+            if isinstance(value, bool):
+                return dict(boolValue=value)
+            if isinstance(value, int):
+                return dict(intValue=str(value))
+            if isinstance(value, float):
+                return dict(doubleValue=value)
+            return dict(stringValue=str(value))
+
+        spans = list()
+        for event in self.events:
+            start = self._wall_start + int(event['ts'] * 1000)
+            attributes = [
+                dict(key=key, value=_value(value))
+                for key, value in sorted(event['args'].items())]
+            attributes.append(dict(
+                key="kirk.category", value=_value(event['cat'])))
+            attributes.append(dict(
+                key="thread.id", value=_value(event['tid'])))
+
+            span = dict(
+                traceId=self._trace_id,
+                spanId=event.get('id', "%016x" % random.getrandbits(64)),
+                name=event['name'],
+                kind=1,
+                startTimeUnixNano=str(start),
+                endTimeUnixNano=str(start + int(event['dur'] * 1000)),
+                attributes=attributes,
+            )
+            if event.get('parent'):
+                span['parentSpanId'] = event['parent']
+            if 'error' in event['args']:
+                span['status'] = dict(
+                    code=2, message=str(event['args']['error']))
+
+            spans.append(span)
+
+        resource = dict(attributes=[
+            dict(key="service.name", value=dict(stringValue="kirk"))])
+
+        return dict(resourceSpans=[dict(
+            resource=resource,
+            scopeSpans=[dict(scope=dict(name="kirk"), spans=spans)])])
+
+    def write(self, path, fmt="chrome"):
+        """
+        Write the spans into a file.
+
+        Args:
+            path(str): trace file path.
+            fmt(str): one of :py:data:`FORMATS`.
+
+        Raises:
+            ValueError: raised if format is not supported.
+            :py:class:`KirkError`: raised if file can't be written.
+        """
+        if fmt not in FORMATS:
+            raise ValueError("unsupported trace format '%s'" % fmt)
+
+        data = self.to_chrome() if fmt == "chrome" else self.to_otlp()
+
+        try:
+            with open(path, 'w') as trace_file:
+                json.dump(data, trace_file)
+        except OSError as err:
+            raise KirkError("can't write trace: %s" % err)
+
+
+def start_tracing(tracer=None):
+    """
+    Start recording the spans of the current process.
+
+    Args:
+        tracer(:py:class:`Tracer`): tracer recording spans. If None, a new
+            one is created.
+
+    Returns:
+        :py:class:`Tracer`: the active tracer.
+    """
+    global _TRACER  # pylint: disable=global-statement
+    _TRACER = tracer or Tracer()
+    return _TRACER
+
+
+def stop_tracing():
+    """
+    Stop recording spans.
+
+    Returns:
+        :py:class:`Tracer`: the tracer which was active or None.
+    """
+    global _TRACER  # pylint: disable=global-statement
+    tracer = _TRACER
+    _TRACER = None
+    return tracer
+
+
+def get_tracer():
+    """
+    Return the active tracer.
+
+    Returns:
+        :py:class:`Tracer`: the active tracer or None.
+    """
+    return _TRACER
+
+
+def span(name, category="kirk", **args):
+    """
+    Return a context manager recording a span, which does nothing when
+    tracing is not active.
+
+    Usage:
+
+        with span("render xml", category="render", job=str(job)):
+            ...
+
+    Args:
+        name(str): span name.
+        category(str): span category.
+        args(dict): span arguments.
+
+    Returns:
+        object: context manager.
+    """
+    tracer = _TRACER
+    if tracer is None:
+        return _NULL_SPAN
+
+    return _Span(tracer, name, category, args)
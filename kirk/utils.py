@@ -4,10 +4,8 @@
    :synopsis: various utilities
 .. moduleauthor:: Andrea Cervesato <andrea.cervesato@mailbox.org>
 """
-import os
 import re
-from kirk import KirkError
-from kirk.project import Project
+from kirk.catalog import Catalog
 
 
 def get_projects_from_folder(folder):
@@ -24,31 +22,10 @@ def get_projects_from_folder(folder):
         ValueError: raised when folder argument is empty or folder doesn't exist.
         :py:class:`KirkError`: raised when there are two projects with the same name.
     """
-    if not folder:
-        raise ValueError("folder is empty")
+    catalog = Catalog(folder)
+    catalog.load()
 
-    if not os.path.isdir(folder):
-        raise ValueError("project folder doesn't exist")
-
-    projects = list()
-
-    for currfile in os.listdir(folder):
-        _, file_ext = os.path.splitext(currfile)
-        if file_ext not in ('.yml', '.yaml'):
-            continue
-
-        projectfile = folder + "/" + currfile
-
-        project = Project()
-        project.load(projectfile)
-
-        for proj in projects:
-            if proj.name == project.name:
-                raise KirkError("Two projects with the same name")
-
-        projects.append(project)
-
-    return projects
+    return catalog.projects
 
 
 def get_jobs_from_folder(folder):
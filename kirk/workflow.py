@@ -7,8 +7,8 @@
 import os
 import re
 import xml.dom.minidom
-from datetime import date
 from kirk import KirkError
+from kirk.trace import span
 
 
 class XmlBuilder:
@@ -17,6 +17,10 @@ class XmlBuilder:
     a XML string.
     """
 
+    # seeds description. It doesn't contain variable informations, such as
+    # the creation date, so the same job is always rendered in the same way
+    DESCRIPTION = "Created by kirk"
+
     def __init__(self):
         self._re_pattern = re.compile(r'(?P<variable>KIRK_\w+)')
 
@@ -35,7 +39,7 @@ class XmlBuilder:
         """ % (name, label, value)
         return xml_str
 
-    def _create_params_xml(self, job):
+    def _create_params_xml(self, job, shared=False):
         """
         create the xml for job parameters
         """
@@ -50,6 +54,15 @@ class XmlBuilder:
             '0.0')
         xml_params.append(xml_version_str)
 
+        # user triggering a shared seed. Other seeds don't declare it, so
+        # their configuration doesn't change
+        if shared:
+            xml_user_str = self._create_param_xml(
+                'KIRK_USER',
+                'Kirk user',
+                '')
+            xml_params.append(xml_user_str)
+
         if job.parameters:
             for param in job.parameters:
                 xml_str = self._create_param_xml(
@@ -74,12 +87,15 @@ class XmlBuilder:
 
         return seed_xml
 
-    def build_xml(self, job):
+    def build_xml(self, job, shared=False):
         """
         Converts the ``job`` item into a Jenkins job XML configuration.
 
         Args:
             job(:py:class:`kirk.project.JobItem`): job item to convert.
+            shared(bool): if True, the configuration of the seed shared by
+                all the developers is returned, which declares the
+                ``KIRK_USER`` parameter.
 
         Returns:
             str: Jenkins job XML configuration.
@@ -127,7 +143,7 @@ class _GitSCMFlow(XmlBuilder):
         </flow-definition>
     """
 
-    def build_xml(self, job):
+    def build_xml(self, job, shared=False):
         if not job.scm:
             return None
 
@@ -139,12 +155,12 @@ class _GitSCMFlow(XmlBuilder):
             commit = job.scm['git']['label']
 
         params = dict()
-        params["KIRK_DESCRIPTION"] = "Created by kirk in date %s" % date.today()
+        params["KIRK_DESCRIPTION"] = self.DESCRIPTION
         params["KIRK_SCRIPT_PATH"] = job.pipeline
         params["KIRK_GIT_CREDENTIAL"] = job.scm["git"].get("credential", "")
         params["KIRK_GIT_URL"] = job.scm["git"]["url"]
         params["KIRK_GIT_CHECKOUT"] = commit
-        params['KIRK_PARAMETERS'] = self._create_params_xml(job)
+        params['KIRK_PARAMETERS'] = self._create_params_xml(job, shared=shared)
 
         seed_xml = self._replace_xml_params(self.SEED_XML, params)
         return seed_xml
@@ -211,7 +227,7 @@ class _PerforceSCMFlow(XmlBuilder):
         </flow-definition>
     """
 
-    def build_xml(self, job):
+    def build_xml(self, job, shared=False):
         if not job.scm:
             return None
 
@@ -223,13 +239,13 @@ class _PerforceSCMFlow(XmlBuilder):
             changelist = str(job.scm['perforce']['changelist'])
 
         params = dict()
-        params["KIRK_DESCRIPTION"] = "Created by kirk in date %s" % date.today()
+        params["KIRK_DESCRIPTION"] = self.DESCRIPTION
         params["KIRK_SCRIPT_PATH"] = job.pipeline
         params["KIRK_P4_CREDENTIAL"] = job.scm["perforce"]["credential"]
         params["KIRK_P4_CL"] = changelist
         params["KIRK_P4_WORKSPACE"] = job.scm["perforce"]["workspace"]
         params["KIRK_P4_STREAM"] = job.scm["perforce"]["stream"]
-        params['KIRK_PARAMETERS'] = self._create_params_xml(job)
+        params['KIRK_PARAMETERS'] = self._create_params_xml(job, shared=shared)
 
         seed_xml = self._replace_xml_params(self.SEED_XML, params)
         return seed_xml
@@ -258,13 +274,13 @@ class _ScriptFlow(XmlBuilder):
         </flow-definition>
     """
 
-    def build_xml(self, job):
+    def build_xml(self, job, shared=False):
         if job.scm is None or 'none' not in job.scm:
             return None
 
         params = dict()
-        params["KIRK_DESCRIPTION"] = "Created by kirk in date %s" % date.today()
-        params['KIRK_PARAMETERS'] = self._create_params_xml(job)
+        params["KIRK_DESCRIPTION"] = self.DESCRIPTION
+        params['KIRK_PARAMETERS'] = self._create_params_xml(job, shared=shared)
         params["KIRK_SCRIPT_CODE"] = ""
 
         # read script data
@@ -295,22 +311,23 @@ class WorkflowBuilder(XmlBuilder):
         _ScriptFlow()
     ]
 
-    def build_xml(self, job):
-        xml_str = None
-        for builder in self._BUILDERS:
-            xml_str = builder.build_xml(job)
-            if xml_str:
-                break
+    def build_xml(self, job, shared=False):
+        with span("render xml", category="render", job=str(job)):
+            xml_str = None
+            for builder in self._BUILDERS:
+                xml_str = builder.build_xml(job, shared=shared)
+                if xml_str:
+                    break
 
-        if not xml_str:
-            raise KirkError(
-                "Unsupported SCM configuration:\n%s" % str(job.scm))
+            if not xml_str:
+                raise KirkError(
+                    "Unsupported SCM configuration:\n%s" % str(job.scm))
 
-        dom = xml.dom.minidom.parseString(xml_str)
-        pretty_xml = dom.toprettyxml()
+            dom = xml.dom.minidom.parseString(xml_str)
+            pretty_xml = dom.toprettyxml()
 
-        # remove the double newline which is terrible in toprettyxml
-        pretty_xml = os.linesep.join(
-            [s for s in pretty_xml.splitlines() if s.strip()])
+            # remove the double newline which is terrible in toprettyxml
+            pretty_xml = os.linesep.join(
+                [s for s in pretty_xml.splitlines() if s.strip()])
 
-        return pretty_xml
+            return pretty_xml
@@ -9,6 +9,9 @@ import os
 import yaml
 from kirk import KirkError
 
+# tags which have been already registered inside the yaml loader
+_REGISTERED_TAGS = set()
+
 
 def _yaml_constructor(loader, node):
     """
@@ -57,11 +60,14 @@ def load(path, tag="!ENV"):
     if file_ext not in ('.yml', '.yaml'):
         raise KirkError("'%s' file type is not supported" % file_ext)
 
-    # check for environment tags
-    imp_pattern = re.compile(r'%s .*?\${(\w+)}.*?' % tag)
+    # check for environment tags. Resolvers are registered only once, since
+    # yaml loader appends them to a list each time they are added
+    if tag not in _REGISTERED_TAGS:
+        imp_pattern = re.compile(r'%s .*?\${(\w+)}.*?' % tag)
 
-    yaml.SafeLoader.add_implicit_resolver(tag, imp_pattern, None)
-    yaml.SafeLoader.add_constructor(tag, _yaml_constructor)
+        yaml.SafeLoader.add_implicit_resolver(tag, imp_pattern, None)
+        yaml.SafeLoader.add_constructor(tag, _yaml_constructor)
+        _REGISTERED_TAGS.add(tag)
 
     # load project file
     file_def = dict()
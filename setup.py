@@ -37,7 +37,7 @@ setup(
     include_package_data=True,
     entry_points={
         'console_scripts': [
-            'kirk=kirk.commands:command_kirk',
+            'kirk=kirk.client:main',
             'kirk-check=kirk.commands:command_check',
             'kirk-credential=kirk.commands:command_credential',
         ],
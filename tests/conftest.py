@@ -0,0 +1,71 @@
+"""
+Shared fixtures.
+"""
+import pytest
+import kirk.utils
+from fake_jenkins import FakeJenkins
+
+
+class ManualClock:
+    """
+    Clock moved forward by tests.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        """
+        Move the clock forward.
+        """
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """
+    Clock used by the fake Jenkins server.
+    """
+    return ManualClock()
+
+
+@pytest.fixture
+def fake_jenkins(clock):
+    """
+    Fake Jenkins server accepting the 'kirk' user with 'password'.
+    """
+    with FakeJenkins(users=dict(kirk="password"), clock=clock) as server:
+        yield server
+
+
+@pytest.fixture
+def fake_jobs(tmp_path, fake_jenkins):
+    """
+    Jobs running on the fake Jenkins server
+    """
+    project_file = tmp_path / "project0.yml"
+    project_file.write_text("""
+        name: project0
+        description: my project 0
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: %s
+            scm:
+                git:
+                    url: https://github.com/acerv/marvin.git
+        jobs:
+            - name: test_name0
+              pipeline: pipeline.groovy
+              parameters:
+                - name: MY_PARAM
+                  label: Parameter XYZ
+                  default: ABC
+                  show: true
+    """ % fake_jenkins.url.rstrip("/"))
+    return kirk.utils.get_jobs_from_folder(str(tmp_path))
@@ -0,0 +1,860 @@
+"""
+In-process fake Jenkins server used by tests and benchmarks.
+
+The server implements the REST endpoints used by kirk: folders, jobs
+creation and configuration, builds with parameters, queue items, builds
+information and (progressive) console logs. Basic authentication, CSRF
+crumbs, latency and errors injection can be configured, so the whole HTTP
+path of python-jenkins is exercised without a real Jenkins instance.
+
+Time is read from ``clock``, so tests can move queue items and builds
+forward deterministically.
+"""
+import re
+import json
+import time
+import base64
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+FOLDER_CLASS = "com.cloudbees.hudson.plugins.folder.Folder"
+JOB_CLASS = "org.jenkinsci.plugins.workflow.job.WorkflowJob"
+
+# plugins returned by default, which satisfy 'kirk check'
+DEFAULT_PLUGINS = (
+    "workflow-job",
+    "workflow-cps",
+    "workflow-aggregator",
+    "git",
+    "p4",
+    "cloudbees-folder",
+    "credentials",
+)
+
+
+class HTTPError(Exception):
+    """
+    Raised by handlers to send an error response.
+    """
+
+    def __init__(self, status, message=""):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _Item:
+    """
+    A folder or a job.
+    """
+
+    def __init__(self, name, config, folder):
+        self.name = name
+        self.config = config
+        self.folder = folder
+        self.children = dict()
+        self.builds = list()
+        self.next_build = 1
+
+
+class _Build:
+    """
+    A job build, which is queued, running or completed.
+    """
+
+    def __init__(self, queue_id, params, created):
+        self.queue_id = queue_id
+        self.params = params
+        self.created = created
+        self.number = None
+        self.started = None
+        self.result = None
+        self.cancelled = False
+
+
+class FakeJenkins:
+    """
+    Fake Jenkins server running in a background thread.
+
+    Usage:
+
+        with FakeJenkins(users=dict(kirk="password")) as server:
+            conn = jenkins.Jenkins(server.url, "kirk", "password")
+            conn.create_job("myjob", xml)
+            server.inject(503, method="POST", path="/build", count=1)
+    """
+
+    def __init__(self, users=None, crumb=True, latency=0.0, queue_delay=0.0,
+                 build_duration=0.0, result="SUCCESS", plugins=DEFAULT_PLUGINS,
+                 clock=time.monotonic, version="2.263.1"):
+        """
+        Args:
+            users(dict): username and password of the allowed users. If
+                None, authentication is not required.
+            crumb(bool): if True, POST requests require a CSRF crumb.
+            latency(float): seconds spent before handling a request.
+            queue_delay(float): seconds spent by a build inside the queue.
+            build_duration(float): seconds spent by a build running. If
+                None, builds run until :py:meth:`finish` is called.
+            result(str): result of completed builds.
+            plugins(list(str)): short names of the installed plugins.
+            clock(callable): function returning the current time in seconds.
+            version(str): Jenkins version.
+        """
+        self.users = dict(users) if users else None
+        self.crumb = crumb
+        self.latency = latency
+        self.queue_delay = queue_delay
+        self.build_duration = build_duration
+        self.result = result
+        self.plugins = list(plugins)
+        self.version = version
+
+        self._clock = clock
+        self._root = _Item("", "", True)
+        self._queue = dict()
+        self._active = list()
+        self._next_queue_id = 1
+        self._errors = list()
+        self._requests = list()
+        self._lock = threading.RLock()
+        self._crumb = "fake-crumb"
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    @property
+    def url(self):
+        """
+        str: server url, ending with '/'.
+        """
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d/" % (host, port)
+
+    @property
+    def requests(self):
+        """
+        list((str, str)): method and path of the received requests.
+        """
+        with self._lock:
+            return list(self._requests)
+
+    def start(self):
+        """
+        Start the server on a free local port.
+        """
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        server.daemon_threads = True
+        server.fake = self
+
+        self._server = server
+        self._thread = threading.Thread(
+            target=server.serve_forever,
+            kwargs=dict(poll_interval=0.05),
+            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if not self._server:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def inject(self, status, method=None, path=None, count=1, delay=0.0):
+        """
+        Answer with an error the next matching requests.
+
+        Args:
+            status(int): HTTP status code.
+            method(str): HTTP method of the matching requests. If None, all
+                the methods match.
+            path(str): regular expression searched inside the path of the
+                matching requests. If None, all the paths match.
+            count(int): number of matching requests failing. If None, all
+                of them fail until :py:meth:`clear_errors` is called.
+            delay(float): seconds spent before answering.
+        """
+        with self._lock:
+            self._errors.append(dict(
+                status=status,
+                method=method.upper() if method else None,
+                path=re.compile(path) if path else None,
+                count=count,
+                delay=delay))
+
+    def clear_errors(self):
+        """
+        Remove the injected errors.
+        """
+        with self._lock:
+            self._errors = list()
+
+    def _find(self, location):
+        """
+        Return the item at ``location`` or None.
+        """
+        item = self._root
+        for name in [part for part in location.split("/") if part]:
+            if not item.folder:
+                return None
+            item = item.children.get(name, None)
+            if item is None:
+                return None
+
+        return item
+
+    def exists(self, location):
+        """
+        Check if a folder or a job exists.
+
+        Args:
+            location(str): item location, such as 'folder/job'.
+
+        Returns:
+            bool: True if item exists.
+        """
+        with self._lock:
+            return self._find(location) is not None
+
+    def is_folder(self, location):
+        """
+        Check if an item is a folder.
+
+        Args:
+            location(str): item location.
+
+        Returns:
+            bool: True if item exists and it's a folder.
+        """
+        with self._lock:
+            item = self._find(location)
+            return item is not None and item.folder
+
+    def get_config(self, location):
+        """
+        Return the configuration of an item.
+
+        Args:
+            location(str): item location.
+
+        Returns:
+            str: XML configuration or None if item doesn't exist.
+        """
+        with self._lock:
+            item = self._find(location)
+            return item.config if item else None
+
+    def add_item(self, location, config=None, folder=False):
+        """
+        Create an item, creating the missing parent folders.
+
+        Args:
+            location(str): item location.
+            config(str): XML configuration.
+            folder(bool): if True, item is a folder.
+        """
+        with self._lock:
+            parent = self._root
+            names = [part for part in location.split("/") if part]
+            for name in names[:-1]:
+                child = parent.children.get(name, None)
+                if child is None:
+                    child = _Item(name, "", True)
+                    parent.children[name] = child
+                parent = child
+
+            parent.children[names[-1]] = _Item(names[-1], config or "", folder)
+
+    def builds(self, location):
+        """
+        Return the builds of a job, which left the queue.
+
+        Args:
+            location(str): job location.
+
+        Returns:
+            list(dict): builds with 'number', 'params', 'result' and
+            'building'. Latest builds come first.
+        """
+        with self._lock:
+            self._advance()
+            item = self._find(location)
+            if item is None:
+                return list()
+
+            return [
+                dict(
+                    number=build.number,
+                    params=dict(build.params),
+                    result=build.result,
+                    building=build.result is None)
+                for build in reversed(item.builds) if build.number]
+
+    def queued(self):
+        """
+        Return the number of builds inside the queue.
+
+        Returns:
+            int: queue length.
+        """
+        with self._lock:
+            self._advance()
+            return len(self._waiting())
+
+    def finish(self, location, number, result="SUCCESS"):
+        """
+        Complete a running build.
+
+        Args:
+            location(str): job location.
+            number(int): build number.
+            result(str): build result.
+        """
+        with self._lock:
+            self._advance()
+            item = self._find(location)
+            for build in item.builds:
+                if build.number == number:
+                    build.result = result
+
+    def _waiting(self):
+        """
+        Return the builds inside the queue.
+        """
+        return [
+            (item, build) for item, build in self._active
+            if build.number is None and not build.cancelled]
+
+    def _advance(self):
+        """
+        Move queued and running builds forward according with the clock.
+        """
+        now = self._clock()
+
+        # completed builds are not checked anymore
+        active = list()
+        for item, build in self._active:
+            if build.cancelled:
+                continue
+
+            if build.number is None:
+                if now - build.created < self.queue_delay:
+                    active.append((item, build))
+                    continue
+
+                build.number = item.next_build
+                build.started = build.created + self.queue_delay
+                item.next_build += 1
+
+            if build.result is None and self.build_duration is not None:
+                if now - build.started >= self.build_duration:
+                    build.result = self.result
+
+            if build.result is None:
+                active.append((item, build))
+
+        self._active = active
+
+    def _log(self, item, build):
+        """
+        Return the console log of a build.
+        """
+        lines = ["Started by user kirk"]
+        lines.append("Running %s #%d" % (item.name, build.number))
+        for key, value in sorted(build.params.items()):
+            lines.append("%s=%s" % (key, value))
+        if build.result:
+            lines.append("Finished: %s" % build.result)
+
+        return "\n".join(lines) + "\n"
+
+    def _build_url(self, location, number=None):
+        """
+        Return the url of a job or of a build.
+        """
+        url = self.url
+        for name in [part for part in location.split("/") if part]:
+            url += "job/%s/" % urllib.parse.quote(name)
+        if number is not None:
+            url += "%d/" % number
+
+        return url
+
+    def _build_info(self, location, item, build):
+        """
+        Return the information of a build.
+        """
+        params = [
+            dict(name=key, value=value)
+            for key, value in sorted(build.params.items())]
+
+        return dict(
+            _class="org.jenkinsci.plugins.workflow.job.WorkflowRun",
+            number=build.number,
+            url=self._build_url(location, build.number),
+            building=build.result is None,
+            result=build.result,
+            timestamp=int(build.started * 1000),
+            duration=0,
+            queueId=build.queue_id,
+            actions=[dict(
+                _class="hudson.model.ParametersAction",
+                parameters=params)])
+
+    def _item_info(self, location, item, depth=0):
+        """
+        Return the information of a folder or of a job.
+        """
+        info = dict(
+            name=item.name,
+            fullName=location,
+            url=self._build_url(location))
+
+        if item.folder:
+            info['_class'] = FOLDER_CLASS
+            info['jobs'] = list()
+            for name, child in sorted(item.children.items()):
+                child_location = "/".join([location, name]).strip("/")
+                info['jobs'].append(
+                    self._item_info(child_location, child, depth))
+            return info
+
+        builds = [build for build in item.builds if build.number]
+        completed = [build for build in builds if build.result]
+
+        def _ref(build):
+            if not build:
+                return None
+            ref = dict(
+                number=build.number,
+                url=self._build_url(location, build.number),
+                timestamp=int(build.started * 1000))
+            return ref
+
+        info['_class'] = JOB_CLASS
+        info['color'] = "blue"
+        info['nextBuildNumber'] = item.next_build
+        queued = [
+            build for build in item.builds
+            if build.number is None and not build.cancelled]
+        info['inQueue'] = bool(queued)
+        info['queueItem'] = dict(id=queued[0].queue_id) if queued else None
+        info['lastBuild'] = _ref(builds[-1] if builds else None)
+        info['lastCompletedBuild'] = _ref(
+            completed[-1] if completed else None)
+
+        # like Jenkins, only the latest 100 builds are listed
+        latest = list(reversed(builds))[:100]
+        if depth > 0:
+            info['builds'] = [
+                self._build_info(location, item, build) for build in latest]
+        else:
+            info['builds'] = [_ref(build) for build in latest]
+
+        return info
+
+    def handle(self, method, path, query, headers, body):
+        """
+        Handle a request.
+
+        Args:
+            method(str): HTTP method.
+            path(str): request path.
+            query(dict): query parameters.
+            headers(dict): request headers.
+            body(bytes): request body.
+
+        Returns:
+            (int, object, dict): status code, response body and headers.
+            Body is serialized as JSON when it's not a string.
+
+        Raises:
+            :py:class:`HTTPError`: raised to answer with an error.
+        """
+        with self._lock:
+            self._requests.append((method, path))
+
+            delay = 0.0
+            for rule in list(self._errors):
+                if rule['method'] and rule['method'] != method:
+                    continue
+                if rule['path'] and not rule['path'].search(path):
+                    continue
+
+                if rule['count'] is not None:
+                    rule['count'] -= 1
+                    if rule['count'] <= 0:
+                        self._errors.remove(rule)
+
+                delay = rule['delay']
+                error = HTTPError(rule['status'], "injected error")
+                break
+            else:
+                error = None
+
+        if self.latency:
+            time.sleep(self.latency)
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise error
+
+        self._authenticate(headers)
+
+        if method == "POST" and self.crumb and \
+                headers.get("jenkins-crumb") != self._crumb:
+            raise HTTPError(403, "No valid crumb was included")
+
+        segments = [
+            urllib.parse.unquote(part) for part in path.split("/") if part]
+
+        names = list()
+        while len(segments) >= 2 and segments[0] == "job":
+            names.append(segments[1])
+            segments = segments[2:]
+
+        with self._lock:
+            self._advance()
+
+            if names:
+                return self._handle_item(
+                    method, "/".join(names), segments, query, body)
+
+            return self._handle_root(method, segments, query, body, headers)
+
+    def _authenticate(self, headers):
+        """
+        Check the basic authentication of a request.
+        """
+        if self.users is None:
+            return
+
+        auth = headers.get("authorization", "")
+        if auth.startswith("Basic "):
+            try:
+                decoded = base64.b64decode(auth[6:]).decode("utf-8")
+            except ValueError:
+                decoded = ""
+
+            username, _, password = decoded.partition(":")
+            if username in self.users and \
+                    self.users[username] == password:
+                return
+
+        raise HTTPError(401, "Invalid password/token for user")
+
+    def _username(self, headers):
+        """
+        Return the user sending a request.
+        """
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Basic "):
+            return "anonymous"
+
+        return base64.b64decode(auth[6:]).decode("utf-8").partition(":")[0]
+
+    def _create(self, location, query, body):
+        """
+        Create an item inside the ``location`` folder.
+        """
+        parent = self._find(location)
+        if parent is None or not parent.folder:
+            raise HTTPError(404)
+
+        name = query.get("name", "")
+        if not name:
+            raise HTTPError(400, "Query parameter 'name' is required")
+
+        if name in parent.children:
+            raise HTTPError(
+                400, "A job already exists with the name '%s'" % name)
+
+        config = body.decode("utf-8")
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            raise HTTPError(500, "Invalid configuration")
+
+        parent.children[name] = _Item(
+            name, config, "folder" in root.tag.lower())
+
+        return 200, "", dict()
+
+    def _handle_root(self, method, segments, query, body, headers):
+        """
+        Handle the requests which are not sent to an item.
+        """
+        if not segments:
+            if method in ("GET", "HEAD"):
+                return 200, "", {"X-Jenkins": self.version}
+            raise HTTPError(405)
+
+        if segments == ["api", "json"] and method == "GET":
+            info = self._item_info("", self._root)
+            info['_class'] = "hudson.model.Hudson"
+            return 200, info, dict()
+
+        if segments == ["crumbIssuer", "api", "json"]:
+            if not self.crumb:
+                raise HTTPError(404)
+            return 200, dict(
+                crumb=self._crumb,
+                crumbRequestField="Jenkins-Crumb"), dict()
+
+        if segments == ["me", "api", "json"]:
+            name = self._username(headers)
+            return 200, dict(id=name, fullName=name), dict()
+
+        if segments == ["pluginManager", "api", "json"]:
+            return 200, dict(plugins=[
+                dict(shortName=name, longName=name, version="1.0",
+                     active=True, enabled=True)
+                for name in self.plugins]), dict()
+
+        if segments == ["createItem"] and method == "POST":
+            return self._create("", query, body)
+
+        if segments == ["queue", "api", "json"]:
+            items = list()
+            for item, build in self._waiting():
+                params = [
+                    dict(name=key, value=value)
+                    for key, value in sorted(build.params.items())]
+                items.append(dict(
+                    id=build.queue_id,
+                    task=dict(
+                        name=item.name,
+                        url=self._build_url(self._location_of(item))),
+                    actions=[dict(
+                        _class="hudson.model.ParametersAction",
+                        parameters=params)],
+                    why="Waiting for next available executor"))
+            return 200, dict(items=items), dict()
+
+        if segments[:2] == ["queue", "item"] and len(segments) >= 3 and \
+                segments[3:] == ["api", "json"]:
+            return self._handle_queue_item(int(segments[2]))
+
+        if segments == ["queue", "cancelItem"] and method == "POST":
+            pair = self._queue.get(int(query.get("id", 0)), None)
+            if pair is None:
+                raise HTTPError(404)
+            if pair[1].number is None:
+                pair[1].cancelled = True
+            return 200, "", dict()
+
+        raise HTTPError(404)
+
+    def _handle_queue_item(self, queue_id):
+        """
+        Return a queue item.
+        """
+        pair = self._queue.get(queue_id, None)
+        if pair is None:
+            raise HTTPError(404)
+
+        item, build = pair
+        info = dict(
+            id=queue_id,
+            task=dict(name=item.name),
+            cancelled=build.cancelled,
+            blocked=False,
+            buildable=build.number is None,
+            why=None if build.number else "In the quiet period")
+
+        if build.number:
+            info['executable'] = dict(
+                number=build.number,
+                url=self._build_url(self._location_of(item), build.number))
+
+        return 200, info, dict()
+
+    def _location_of(self, target):
+        """
+        Return the location of an item.
+        """
+        def _search(item, prefix):
+            for name, child in item.children.items():
+                location = "/".join([prefix, name]).strip("/")
+                if child is target:
+                    return location
+                if child.folder:
+                    found = _search(child, location)
+                    if found:
+                        return found
+            return None
+
+        return _search(self._root, "")
+
+    def _handle_item(self, method, location, segments, query, body):
+        """
+        Handle the requests sent to a folder or to a job.
+        """
+        item = self._find(location)
+        if item is None:
+            raise HTTPError(404)
+
+        if segments == ["api", "json"] and method == "GET":
+            depth = int(query.get("depth", 0) or 0)
+            return 200, self._item_info(location, item, depth), dict()
+
+        if segments == ["config.xml"]:
+            if method == "GET":
+                return 200, item.config, {"Content-Type": "application/xml"}
+            if method == "POST":
+                item.config = body.decode("utf-8")
+                return 200, "", dict()
+
+        if segments == ["createItem"] and method == "POST":
+            return self._create(location, query, body)
+
+        if segments == ["doDelete"] and method == "POST":
+            parent = self._find("/".join(location.split("/")[:-1]))
+            del parent.children[item.name]
+            return 200, "", dict()
+
+        if segments in (["build"], ["buildWithParameters"]) and \
+                method == "POST":
+            if item.folder:
+                raise HTTPError(405)
+
+            params = {
+                key: value for key, value in query.items()
+                if key not in ("token", "delay")}
+
+            queue_id = self._next_queue_id
+            self._next_queue_id += 1
+
+            build = _Build(queue_id, params, self._clock())
+            item.builds.append(build)
+            self._queue[queue_id] = (item, build)
+            self._active.append((item, build))
+            self._advance()
+
+            return 201, "", {"Location": "%squeue/item/%d/" % (
+                self.url, queue_id)}
+
+        if segments and segments[0].isdigit():
+            return self._handle_build(
+                method, location, item, int(segments[0]), segments[1:],
+                query)
+
+        raise HTTPError(404)
+
+    def _handle_build(self, method, location, item, number, segments, query):
+        """
+        Handle the requests sent to a build.
+        """
+        build = None
+        for candidate in item.builds:
+            if candidate.number == number:
+                build = candidate
+        if build is None:
+            raise HTTPError(404)
+
+        if segments == ["api", "json"]:
+            return 200, self._build_info(location, item, build), dict()
+
+        if segments == ["consoleText"]:
+            return 200, self._log(item, build), {"Content-Type": "text/plain"}
+
+        if segments == ["logText", "progressiveText"]:
+            log = self._log(item, build)
+            start = int(query.get("start", 0) or 0)
+            headers = {
+                "Content-Type": "text/plain",
+                "X-Text-Size": str(len(log)),
+            }
+            if build.result is None:
+                headers["X-More-Data"] = "true"
+            return 200, log[start:], headers
+
+        if segments == ["stop"] and method == "POST":
+            if build.result is None:
+                build.result = "ABORTED"
+            return 200, "", dict()
+
+        raise HTTPError(404)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    HTTP handler forwarding requests to :py:class:`FakeJenkins`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _dispatch(self, method):
+        fake = self.server.fake
+
+        split = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(
+            split.query, keep_blank_values=True))
+        headers = {key.lower(): value for key, value in self.headers.items()}
+
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length) if length else b""
+
+        try:
+            status, data, extra = fake.handle(
+                method, split.path, query, headers, body)
+        except HTTPError as err:
+            status = err.status
+            data = err.message
+            extra = dict()
+            if status == 401:
+                extra["WWW-Authenticate"] = 'Basic realm="Jenkins"'
+        except Exception as err:  # pylint: disable=broad-except
+            status = 500
+            data = "fake server error: %s" % err
+            extra = dict()
+
+        if isinstance(data, str):
+            payload = data.encode("utf-8")
+            content_type = "text/html;charset=utf-8"
+        else:
+            payload = json.dumps(data).encode("utf-8")
+            content_type = "application/json;charset=utf-8"
+
+        content_type = extra.pop("Content-Type", content_type)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for key, value in extra.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+
+        if method != "HEAD":
+            self.wfile.write(payload)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self._dispatch("GET")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self._dispatch("POST")
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self._dispatch("HEAD")
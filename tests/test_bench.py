@@ -0,0 +1,98 @@
+"""
+bench module tests.
+"""
+import pytest
+from kirk import KirkError
+from kirk.bench import TriggerBench
+from kirk.bench import bench_catalog
+from kirk.bench import bench_render
+from kirk.connection import ConnectionPool
+from kirk.synthetic import CatalogGenerator
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    Synthetic catalog folder.
+    """
+    folder = str(tmp_path / "catalog")
+    CatalogGenerator(projects=3, jobs=4).generate(folder)
+    return folder
+
+
+def test_bench_catalog(catalog):
+    """
+    Test bench_catalog function.
+    """
+    with pytest.raises(ValueError):
+        bench_catalog(catalog, repeat=0)
+
+    result = bench_catalog(catalog, repeat=2)
+    assert result['projects'] == 3
+    assert result['jobs'] == 12
+    assert result['runs'] == 2
+    assert result['min'] <= result['median'] <= result['max']
+    assert len(result['catalog'].jobs) == 12
+
+
+def test_bench_render(catalog):
+    """
+    Test bench_render function.
+    """
+    jobs = bench_catalog(catalog, repeat=1)['catalog'].jobs
+
+    with pytest.raises(ValueError):
+        bench_render(jobs, repeat=0)
+
+    result = bench_render(jobs, workers=1, repeat=2)
+    assert result['seeds'] == 12
+    assert result['workers'] == 1
+    assert result['runs'] == 2
+    assert result['rate'] > 0
+
+    # pool is used by small catalogs too, one process for each project
+    result = bench_render(jobs, workers=8, repeat=1)
+    assert result['seeds'] == 12
+    assert result['workers'] == 3
+
+
+def test_trigger_bench(mocker, fake_jenkins):
+    """
+    Test TriggerBench class on the fake Jenkins server.
+    """
+    credentials = mocker.Mock()
+    credentials.get_password.return_value = "password"
+    pool = ConnectionPool(credentials)
+
+    tester = TriggerBench(pool, fake_jenkins.url)
+    tester.setup()
+    assert fake_jenkins.exists(TriggerBench.SEED)
+
+    with pytest.raises(ValueError):
+        tester.run(0, 1)
+
+    result = tester.run(4, 10)
+    assert result['concurrency'] == 4
+    assert result['builds'] == 10
+    assert result['errors'] == 0
+    assert result['rate'] > 0
+    assert result['p50'] <= result['p99']
+    builds = fake_jenkins.builds(TriggerBench.SEED)
+    assert len(builds) == 10
+
+    # each build has its own parameter, so Jenkins can't merge them
+    sequences = set(
+        build['params'][TriggerBench.SEQUENCE] for build in builds)
+    assert len(sequences) == 10
+
+    fake_jenkins.inject(500, method="POST", path="/build", count=2)
+    result = tester.run(1, 5)
+    assert result['builds'] == 3
+    assert result['errors'] == 2
+    assert result['error']
+
+    tester.cleanup()
+    assert not fake_jenkins.exists(TriggerBench.SEED)
+
+    with pytest.raises(KirkError):
+        tester.cleanup()
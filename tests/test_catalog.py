@@ -0,0 +1,257 @@
+"""
+catalog module tests.
+"""
+import os
+import json
+import pytest
+import kirk.yaml_env
+from kirk import KirkError
+from kirk.catalog import Catalog
+
+
+@pytest.fixture
+def projects(tmp_path):
+    """
+    Folder with projects files.
+    """
+    folder = tmp_path / "projects"
+    folder.mkdir()
+
+    project_file0 = folder / "project0.yml"
+    project_file0.write_text("""
+        name: project0
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: !ENV ${KIRK_TEST_LOCATION}
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: test_name0
+              pipeline: pipeline.groovy
+    """)
+    project_file1 = folder / "project1.yml"
+    project_file1.write_text("""
+        name: project1
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject1
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: test_name0
+              pipeline: pipeline.groovy
+            - name: test_name1
+              pipeline: pipeline.groovy
+    """)
+    return folder
+
+
+def test_catalog_errors(tmp_path):
+    """
+    Test load method when raises exceptions.
+    """
+    with pytest.raises(ValueError, match="folder is empty"):
+        Catalog(None).load()
+
+    with pytest.raises(ValueError, match="project folder doesn't exist"):
+        Catalog(str(tmp_path / "asda3fasds")).load()
+
+    for i in range(0, 2):
+        project_file = tmp_path / ("project%d.yml" % i)
+        project_file.write_text("""
+            name: project
+            description: my project
+            author: pippo
+            year: 3010
+            version: 1.0
+            location: myProject
+            defaults:
+                server: http://localhost:8080
+            jobs:
+                - name: test_name0
+        """)
+
+    with pytest.raises(KirkError, match="Two projects with the same name"):
+        Catalog(str(tmp_path)).load()
+
+
+def test_catalog_load(projects):
+    """
+    Test load method without cache.
+    """
+    catalog = Catalog(str(projects))
+    catalog.load()
+
+    assert [proj.name for proj in catalog.projects] == \
+        ["project0", "project1"]
+    assert [str(job) for job in catalog.jobs] == [
+        "project0::test_name0",
+        "project1::test_name0",
+        "project1::test_name1",
+    ]
+    assert catalog.get_job("project1::test_name1") == catalog.jobs[2]
+    assert catalog.get_job("project1::test_name2") is None
+
+    found = catalog.search("test_nam1", mode="fuzzy")
+    assert found[0] == catalog.jobs[2]
+
+
+def test_catalog_cache(mocker, tmp_path, projects):
+    """
+    Test load method with cache.
+    """
+    cache = str(tmp_path / "cache.json")
+
+    catalog = Catalog(str(projects), cache=cache)
+    catalog.load()
+    assert os.path.isfile(cache)
+
+    with open(cache, 'r') as cache_file:
+        data = json.load(cache_file)
+    assert sorted(data['files'].keys()) == ["project0.yml", "project1.yml"]
+
+    # project0 uses environment variables, so it's not stored
+    assert 'definition' not in data['files']['project0.yml']
+    assert data['files']['project1.yml']['definition']['name'] == "project1"
+    assert data['index'] is None
+
+    # unchanged files are not parsed anymore
+    mocker.spy(kirk.yaml_env, 'load')
+
+    catalog = Catalog(str(projects), cache=cache)
+    catalog.load()
+    assert kirk.yaml_env.load.call_count == 1
+    assert len(catalog.jobs) == 3
+    assert catalog.search("project1::", mode="prefix") == catalog.jobs[1:]
+
+    # modified files are parsed again
+    project_file = projects / "project1.yml"
+    project_file.write_text(project_file.read_text().replace(
+        "test_name1", "test_name2"))
+    os.utime(str(project_file), ns=(0, 0))
+
+    catalog = Catalog(str(projects), cache=cache)
+    catalog.load()
+    assert kirk.yaml_env.load.call_count == 3
+    assert catalog.get_job("project1::test_name2")
+    assert catalog.search("project1::", mode="prefix") == catalog.jobs[1:]
+
+
+def test_catalog_cache_env(mocker, tmp_path, projects):
+    """
+    Test that cache is invalidated when environment variables change.
+    """
+    cache = str(tmp_path / "cache.json")
+    mocker.patch.dict(os.environ, {"KIRK_TEST_LOCATION": "location0"})
+
+    catalog = Catalog(str(projects), cache=cache)
+    catalog.load()
+    assert catalog.projects[0].location == "location0"
+
+    mocker.patch.dict(os.environ, {"KIRK_TEST_LOCATION": "location1"})
+
+    catalog = Catalog(str(projects), cache=cache)
+    catalog.load()
+    assert catalog.projects[0].location == "location1"
+
+
+def test_catalog_cache_secret(mocker, tmp_path, projects):
+    """
+    Test that environment variables values are not stored inside cache.
+    """
+    cache = tmp_path / "cache.json"
+    mocker.patch.dict(os.environ, {"KIRK_TEST_LOCATION": "s3cr3t"})
+
+    catalog = Catalog(str(projects), cache=str(cache))
+    catalog.load()
+    assert catalog.projects[0].location == "s3cr3t"
+    assert "s3cr3t" not in cache.read_text()
+
+    # unchanged cache is not written again
+    os.utime(str(cache), ns=(0, 0))
+
+    catalog = Catalog(str(projects), cache=str(cache))
+    catalog.load()
+    assert catalog.projects[0].location == "s3cr3t"
+    assert os.stat(str(cache)).st_mtime_ns == 0
+
+
+def test_catalog_cache_corrupted(tmp_path, projects):
+    """
+    Test load method with a corrupted cache file.
+    """
+    cache = tmp_path / "cache.json"
+    cache.write_text("{ this is not json")
+
+    catalog = Catalog(str(projects), cache=str(cache))
+    catalog.load()
+    assert len(catalog.jobs) == 3
+
+    with open(str(cache), 'r') as cache_file:
+        data = json.load(cache_file)
+    assert data['version'] == Catalog.CACHE_VERSION
+
+
+def test_catalog_load_projects(mocker, tmp_path, projects):
+    """
+    Test load method loading some projects only.
+    """
+    mocker.spy(kirk.yaml_env, 'load')
+
+    catalog = Catalog(str(projects))
+    catalog.load(projects=["project1"])
+    assert [proj.name for proj in catalog.projects] == ["project1"]
+    assert kirk.yaml_env.load.call_count == 1
+
+    # project name read from cache
+    cache = str(tmp_path / "cache.json")
+    Catalog(str(projects), cache=cache).load()
+    assert kirk.yaml_env.load.call_count == 3
+
+    catalog = Catalog(str(projects), cache=cache)
+    catalog.load(projects=["project1"])
+    assert [str(job) for job in catalog.jobs] == [
+        "project1::test_name0",
+        "project1::test_name1",
+    ]
+    assert kirk.yaml_env.load.call_count == 3
+
+    catalog = Catalog(str(projects))
+    catalog.load(projects=["project2"])
+    assert not catalog.projects
+
+
+def test_catalog_refresh(mocker, projects):
+    """
+    Test refresh method.
+    """
+    catalog = Catalog(str(projects))
+    assert catalog.changed()
+
+    catalog.load()
+    assert not catalog.changed()
+
+    mocker.spy(kirk.yaml_env, 'load')
+    assert not catalog.refresh()
+    assert kirk.yaml_env.load.call_count == 0
+
+    # only the modified file is parsed again
+    project_file = projects / "project1.yml"
+    project_file.write_text(project_file.read_text().replace(
+        "test_name1", "test_name2"))
+    os.utime(str(project_file), ns=(0, 0))
+
+    assert catalog.changed()
+    assert catalog.refresh()
+    assert kirk.yaml_env.load.call_count == 1
+    assert catalog.get_job("project1::test_name2")
+    assert not catalog.get_job("project1::test_name1")
+
+    # removed files are removed from catalog
+    project_file.unlink()
+    assert catalog.refresh()
+    assert [proj.name for proj in catalog.projects] == ["project0"]
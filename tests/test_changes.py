@@ -0,0 +1,153 @@
+"""
+changes module tests.
+"""
+import os
+import subprocess
+import pytest
+import kirk.utils
+from kirk import KirkError
+from kirk.changes import PathIndex
+from kirk.changes import normalize_path
+from kirk.changes import default_root
+from kirk.changes import git_root
+from kirk.changes import git_changes
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    """
+    Jobs using pipelines and scripts.
+    """
+    script = tmp_path / "scripts" / "build.groovy"
+    script.parent.mkdir()
+    script.write_text("node { }")
+
+    folder = tmp_path / "projects"
+    folder.mkdir()
+
+    project_file0 = folder / "project0.yml"
+    project_file0.write_text("""
+        name: project0
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+            scm:
+                git:
+                    url: https://github.com/acerv/marvin.git
+        jobs:
+            - name: test_name0
+              pipeline: ci/unittest.groovy
+            - name: test_name1
+              pipeline: ./ci/unittest.groovy
+            - name: test_name2
+              pipeline: ci/build.groovy
+    """)
+    project_file1 = folder / "project1.yml"
+    project_file1.write_text("""
+        name: project1
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+            scm:
+                none:
+                    script: %s
+        jobs:
+            - name: test_name0
+    """ % str(script))
+
+    return kirk.utils.get_jobs_from_folder(str(folder))
+
+
+def test_normalize_path(tmp_path):
+    """
+    Test normalize_path function.
+    """
+    assert normalize_path("ci/build.groovy") == "ci/build.groovy"
+    assert normalize_path("./ci//build.groovy") == "ci/build.groovy"
+    assert normalize_path("ci/../ci/build.groovy") == "ci/build.groovy"
+    assert normalize_path(
+        str(tmp_path / "ci" / "build.groovy"),
+        root=str(tmp_path)) == "ci/build.groovy"
+
+
+def test_path_index(tmp_path, jobs):
+    """
+    Test PathIndex class.
+    """
+    index = PathIndex(root=str(tmp_path))
+    index.build(jobs)
+
+    assert index.paths == [
+        "ci/build.groovy",
+        "ci/unittest.groovy",
+        "scripts/build.groovy",
+    ]
+
+    found = index.select(["ci/unittest.groovy", "README.md"])
+    assert [str(job) for job in found] == [
+        "project0::test_name0",
+        "project0::test_name1",
+    ]
+
+    found = index.select([
+        "scripts/build.groovy",
+        "./ci/build.groovy",
+        "ci/build.groovy",
+    ])
+    assert [str(job) for job in found] == [
+        "project1::test_name0",
+        "project0::test_name2",
+    ]
+
+    assert not index.select([])
+
+
+def test_default_root(tmp_path):
+    """
+    Test default_root function outside of git repositories.
+    """
+    assert default_root(cwd=str(tmp_path)) == str(tmp_path)
+
+
+def test_git_changes(tmp_path):
+    """
+    Test git_changes function.
+    """
+    def _git(*args):
+        subprocess.run(
+            ["git", "-c", "user.name=kirk", "-c", "user.email=kirk@kirk"] +
+            list(args),
+            cwd=str(tmp_path),
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+
+    _git("init", "-q")
+    (tmp_path / "a.txt").write_text("a")
+    _git("add", "a.txt")
+    _git("commit", "-q", "-m", "first")
+
+    (tmp_path / "ci").mkdir()
+    (tmp_path / "ci" / "build.groovy").write_text("node { }")
+    _git("add", "ci/build.groovy")
+    _git("commit", "-q", "-m", "second")
+
+    root = git_root(cwd=str(tmp_path / "ci"))
+    assert os.path.samefile(root, str(tmp_path))
+
+    root = default_root(cwd=str(tmp_path / "ci"))
+    assert os.path.samefile(root, str(tmp_path))
+
+    changes = git_changes("HEAD~1..HEAD", cwd=str(tmp_path))
+    assert changes == ["ci/build.groovy"]
+
+    with pytest.raises(KirkError):
+        git_changes("not_existing..HEAD", cwd=str(tmp_path))
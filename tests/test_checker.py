@@ -6,6 +6,7 @@ import yaml
 import pytest
 import jenkins
 from kirk.checker import JenkinsTester
+from kirk.checker import check_credentials
 from kirk import KirkError
 
 
@@ -208,3 +209,66 @@ def test_job_delete_exception(mocker, tester):
 
     with pytest.raises(KirkError, match="mocked exception"):
         tester.test_job_delete()
+
+
+def test_check_credentials(mocker, tester):
+    """
+    Test check_credentials function
+    """
+    credentials = mocker.Mock()
+    credentials.get_password.side_effect = \
+        lambda url, user: None if user == "nobody" else "password"
+
+    results = check_credentials(
+        [
+            ("http://localhost:8080", "admin"),
+            ("http://localhost:8080", "kirk"),
+            ("http://localhost:8080", "nobody"),
+        ],
+        credentials,
+        workers=2)
+
+    assert results[0] == ("http://localhost:8080", "admin", None)
+    assert results[1][2] == "read username 'admin' != 'kirk'"
+    assert results[2][2] == "password not found"
+
+
+def test_fake_server(fake_jenkins):
+    """
+    Test JenkinsTester on the fake Jenkins server
+    """
+    tester = JenkinsTester(fake_jenkins.url, "kirk", "password")
+    tester.test_connection()
+    tester.test_plugins()
+    tester.test_job_create()
+    assert fake_jenkins.exists(JenkinsTester.TEST_JOB)
+
+    tester.test_job_config()
+    assert "NAME" in fake_jenkins.get_config(JenkinsTester.TEST_JOB)
+
+    tester.test_job_info()
+    tester.test_job_build()
+    assert fake_jenkins.builds(JenkinsTester.TEST_JOB)[0]['params'] == \
+        dict(NAME="pluto")
+
+    tester.test_job_delete()
+    assert not fake_jenkins.exists(JenkinsTester.TEST_JOB)
+
+
+def test_fake_server_errors(fake_jenkins):
+    """
+    Test JenkinsTester on a failing fake Jenkins server
+    """
+    tester = JenkinsTester(fake_jenkins.url, "kirk", "wrong")
+    with pytest.raises(KirkError):
+        tester.test_connection()
+
+    fake_jenkins.plugins = ["git"]
+    tester = JenkinsTester(fake_jenkins.url, "kirk", "password")
+    with pytest.raises(KirkError, match="plugin is required"):
+        tester.test_plugins()
+
+    fake_jenkins.inject(500, method="POST", path="createItem")
+    with pytest.raises(KirkError):
+        tester.test_job_create()
+    assert not fake_jenkins.exists(JenkinsTester.TEST_JOB)
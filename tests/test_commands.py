@@ -2,10 +2,22 @@
 Test kirk command defined in the cmd module
 """
 import os
+import json
+import subprocess
 import pytest
+import jenkins
 from click.testing import CliRunner
+import kirk
 import kirk.commands
+import kirk.utils
+import kirk.credentials
+import kirk.yaml_env
 import kirk.runner
+import kirk.sync
+import kirk.garbage
+import kirk.stats
+import kirk.synthetic
+import kirk.trace
 
 
 @pytest.fixture
@@ -174,6 +186,61 @@ def test_kirk_list_projects(create_projects):
         assert 'project_1::mytest_1[PARAM_0=zero]' in ret.output
 
 
+def test_kirk_list_format(create_projects):
+    """
+    test for "kirk list --format" command
+    """
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['list', '--format', 'json'])
+        assert ret.exit_code == 0
+        data = json.loads(ret.stdout)
+        assert [item['token'] for item in data] == [
+            'project_0::mytest_0[PARAM_0=zero]',
+            'project_0::mytest_1[PARAM_0=zero]',
+            'project_1::mytest_0',
+            'project_1::mytest_1[PARAM_0=zero]',
+        ]
+        assert "session started" in ret.stderr
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['list', '--format', 'ndjson', '--project', 'project_1'])
+        assert ret.exit_code == 0
+        lines = ret.stdout.splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[1])['parameters'] == dict(
+            PARAM_0='zero', PARAM_1='one')
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['list', '--format', 'tsv', '--project', 'project_0'])
+        assert ret.exit_code == 0
+        lines = ret.stdout.splitlines()
+        assert len(lines) == 3
+        assert lines[1].startswith('project_0::mytest_0[PARAM_0=zero]\t')
+
+
+def test_kirk_list_project(mocker, create_projects):
+    """
+    test for "kirk list --project" command
+    """
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        mocker.spy(kirk.yaml_env, 'load')
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['list', '--project', 'project_1'])
+        assert ret.exit_code == 0
+        assert 'project_0' not in ret.output
+        assert 'project_1::mytest_0' in ret.output
+        assert kirk.yaml_env.load.call_count == 1
+
+
 def test_kirk_search(create_projects):
     """
     test for "kirk show" command
@@ -194,6 +261,58 @@ def test_kirk_search(create_projects):
         assert 'project_1::mytest_1[PARAM_0=zero]' in ret.output
 
 
+def test_kirk_search_fuzzy(create_projects):
+    """
+    test for "kirk search --mode fuzzy" command
+    """
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            [
+                '--cache',
+                'cache.json',
+                'search',
+                '--mode',
+                'fuzzy',
+                '--limit',
+                '2',
+                'mytst_0'
+            ]
+        )
+        assert ret.exit_code == 0
+        assert os.path.isfile('cache.json')
+        assert 'project_0::mytest_0' in ret.output
+        assert 'project_1::mytest_0' in ret.output
+        assert 'mytest_1' not in ret.output
+
+
+def test_kirk_search_format(create_projects):
+    """
+    test for "kirk search --format" command
+    """
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['search', '--format', 'ndjson', '.*mytest_1'])
+        assert ret.exit_code == 0
+        tokens = [json.loads(line)['token']
+                  for line in ret.stdout.splitlines()]
+        assert tokens == [
+            'project_0::mytest_1[PARAM_0=zero]',
+            'project_1::mytest_1[PARAM_0=zero]',
+        ]
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['search', '--format', 'json', '.*this_job_doesnt_exist'])
+        assert ret.exit_code == 0
+        assert json.loads(ret.stdout) == []
+
+
 def test_kirk_search_no_jobs(create_projects):
     """
     test for "kirk show" command when no jobs are found
@@ -237,6 +356,77 @@ def test_kirk_credential(mocker):
         )
 
 
+def test_kirk_credential_missing_args():
+    """
+    test for "kirk credential" command without url and user
+    """
+    runner = CliRunner()
+    ret = runner.invoke(kirk.commands.command_credential, [])
+    assert ret.exit_code == 2
+    assert "URL and USER are required" in ret.output
+
+
+def test_kirk_credential_batch(mocker):
+    """
+    test for "kirk credential --batch" command
+    """
+    mocker.patch('kirk.credentials.CredentialsHandler.set_passwords')
+
+    runner = CliRunner()
+    ret = runner.invoke(
+        kirk.commands.command_credential,
+        ['--batch', '-'],
+        input="http://localhost:8080 admin password\n"
+        "http://localhost:8081 kirk secret\n")
+    assert ret.exit_code == 0
+    assert "2 credentials saved" in ret.output
+    kirk.credentials.CredentialsHandler.set_passwords.assert_called_with([
+        ("http://localhost:8080", "admin", "password"),
+        ("http://localhost:8081", "kirk", "secret"),
+    ])
+
+    ret = runner.invoke(
+        kirk.commands.command_credential,
+        ['--batch', '-'],
+        input="http://localhost:8080 admin\n")
+    assert ret.exit_code == 1
+    assert "line 1" in ret.output
+
+
+def test_kirk_credential_verify(mocker):
+    """
+    test for "kirk credential --list/--verify" command
+    """
+    mocker.patch(
+        'kirk.credentials.CredentialsHandler.list_entries',
+        return_value=[
+            ("http://localhost:8080", "admin"),
+            ("http://localhost:8081", "kirk"),
+        ])
+    mocker.patch(
+        'kirk.commands.check_credentials',
+        return_value=[
+            ("http://localhost:8080", "admin", None),
+            ("http://localhost:8081", "kirk", "connection refused"),
+        ])
+
+    runner = CliRunner()
+    ret = runner.invoke(kirk.commands.command_credential, ['--list'])
+    assert ret.exit_code == 0
+    assert "http://localhost:8081  kirk" in ret.output
+    kirk.commands.check_credentials.assert_not_called()
+
+    ret = runner.invoke(
+        kirk.commands.command_credential,
+        ['--verify', '--workers', '4'])
+    assert ret.exit_code == 1
+    assert "http://localhost:8080  admin  PASSED" in ret.output
+    assert "FAILED (connection refused)" in ret.output
+    assert "1 credentials failed" in ret.output
+    kirk.commands.check_credentials.assert_called_with(
+        mocker.ANY, mocker.ANY, workers=4)
+
+
 def test_kirk_run_job_with_bad_format(mocker, create_projects):
     """
     test for 'kirk run' command with bad job format string
@@ -368,6 +558,32 @@ def test_kirk_run_with_user(mocker, create_projects):
         )
 
 
+def test_kirk_run_env_credentials(mocker, create_projects):
+    """
+    test for 'kirk run' command reading credentials from environment
+    """
+    mocker.patch('kirk.runner.JobRunner.run')
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+    mocker.spy(kirk.credentials.EnvCredentials, 'get_password')
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            [
+                '--credentials-backend',
+                'env',
+                'run',
+                'project_0::mytest_0',
+                'project_0::mytest_1',
+            ],
+        )
+        assert ret.exit_code == 0
+        # credentials are prefetched once for each server
+        assert kirk.credentials.EnvCredentials.get_password.call_count == 1
+
+
 def test_kirk_run_job_not_found(mocker, create_projects):
     """
     test for 'kirk run' command when job is not found
@@ -419,3 +635,689 @@ def test_kirk_check(mocker):
     kirk.checker.JenkinsTester.test_job_info.assert_called_once()
     kirk.checker.JenkinsTester.test_job_build.assert_called_once()
     kirk.checker.JenkinsTester.test_job_delete.assert_called_once()
+
+
+def test_kirk_changes(mocker):
+    """
+    test for 'kirk changes' command
+    """
+    mocker.patch('kirk.runner.JobRunner.run', return_value="url")
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        os.mkdir("projects")
+        with open("projects/project0.yml", "w+") as projfile:
+            projfile.write("""
+                name: project_0
+                description: my project 0
+                author: pippo
+                year: 3010
+                version: 1.0
+                location: myProject_0
+                defaults:
+                    server: http://localhost:8080
+                jobs:
+                    - name: mytest_0
+                      pipeline: ci/unittest.groovy
+                    - name: mytest_1
+                      pipeline: ci/build.groovy
+            """)
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['changes', '--format', 'ndjson', 'ci/build.groovy', 'other'])
+        assert ret.exit_code == 0
+        records = [json.loads(line) for line in ret.stdout.splitlines()]
+        assert [rec['token'] for rec in records] == ["project_0::mytest_1"]
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['changes', '--run', '-'],
+            input="ci/unittest.groovy\nci/build.groovy\n")
+        assert ret.exit_code == 0
+        assert kirk.runner.JobRunner.run.call_count == 2
+        assert "project_0::mytest_0" in ret.stdout
+
+        ret = runner.invoke(kirk.commands.command_kirk, ['changes'])
+        assert ret.exit_code == 2
+
+
+def test_kirk_changes_root():
+    """
+    test for 'kirk changes' command inside a git repository folder
+    """
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        subprocess.run(
+            ["git", "init", "-q"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+
+        os.mkdir("scripts")
+        with open("scripts/test.groovy", "w+") as script:
+            script.write("node { }")
+
+        os.mkdir("projects")
+        with open("projects/project0.yml", "w+") as projfile:
+            projfile.write("""
+                name: project_0
+                description: my project 0
+                author: pippo
+                year: 3010
+                version: 1.0
+                location: myProject_0
+                defaults:
+                    server: http://localhost:8080
+                    scm:
+                        none:
+                            script: %s
+                jobs:
+                    - name: mytest_0
+            """ % os.path.abspath("scripts/test.groovy"))
+
+        os.mkdir("ci")
+        os.chdir("ci")
+
+        # files are relative to the repository root, like git ones
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--projects', '../projects', 'changes', 'scripts/test.groovy'])
+        assert ret.exit_code == 0
+        assert "project_0::mytest_0" in ret.stdout
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--projects', '../projects', 'changes', '--root', '.',
+             'scripts/test.groovy'])
+        assert ret.exit_code == 0
+        assert "project_0::mytest_0" not in ret.stdout
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--projects', '../projects', 'changes', '--root', '.',
+             '../scripts/test.groovy'])
+        assert ret.exit_code == 0
+        assert "project_0::mytest_0" in ret.stdout
+
+
+def test_kirk_sync(mocker, create_projects):
+    """
+    test for 'kirk sync' command
+    """
+    plan = mocker.patch('kirk.sync.Synchronizer.plan', return_value=[])
+    apply = mocker.patch('kirk.sync.Synchronizer.apply')
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'sync', '--dry-run',
+             'project_1::mytest_0'])
+        assert ret.exit_code == 0
+        assert [str(job) for job in plan.call_args[0][0]] == \
+            ["project_1::mytest_0"]
+        apply.assert_not_called()
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'sync', '--project', 'project_0'])
+        assert ret.exit_code == 0
+        assert [str(job) for job in plan.call_args[0][0]] == \
+            ["project_0::mytest_0", "project_0::mytest_1"]
+        apply.assert_called_once()
+        assert "0 create" in ret.output
+
+        # all the catalog jobs are known when seeds are deleted
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'sync', '--delete',
+             'project_0::mytest_0'])
+        assert ret.exit_code == 0
+        assert [str(job) for job in plan.call_args[0][0]] == \
+            ["project_0::mytest_0"]
+        assert len(plan.call_args[1]['known']) == 4
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'sync', 'project_0::mytest_5'])
+        assert ret.exit_code == 1
+
+
+def test_kirk_render(create_projects):
+    """
+    test for 'kirk render' command
+    """
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        with open("projects/project2.yml", "w+") as projfile:
+            projfile.write("""
+                name: project_2
+                description: my project 2
+                author: pippo
+                year: 3010
+                version: 1.0
+                location: myProject_2
+                defaults:
+                    server: http://localhost:8080
+                    scm:
+                        git:
+                            url: https://github.com/acerv/marvin.git
+                jobs:
+                    - name: mytest_0
+                      pipeline: pipeline.groovy
+            """)
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['render', '--project', 'project_2', '-o', 'out'])
+        assert ret.exit_code == 0
+        assert os.path.isfile("out/jobs/myProject_2/config.xml")
+        assert os.path.isfile(
+            "out/jobs/myProject_2/jobs/mytest_0/config.xml")
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['render', 'project_2::mytest_0', '-o', 'seeds.tar'])
+        assert ret.exit_code == 0
+        assert os.path.isfile("seeds.tar")
+
+        # jobs without scm can't be rendered
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['render', '--project', 'project_0'])
+        assert ret.exit_code == 1
+
+
+def test_kirk_diff(mocker, create_projects):
+    """
+    test for 'kirk diff' command
+    """
+    def _plan(jobs, user=None):
+        return [
+            kirk.sync.SeedAction(
+                kirk.sync.SeedAction.UNCHANGED, job.server, str(job),
+                job=job)
+            for job in jobs[:-1]
+        ] + [
+            kirk.sync.SeedAction(
+                kirk.sync.SeedAction.RECONFIGURE, jobs[-1].server,
+                "myProject_0/mytest_1", job=jobs[-1],
+                xml="<job><a>1</a></job>", current="<job><a>0</a></job>")
+        ]
+
+    mocker.patch('kirk.sync.Synchronizer.plan', side_effect=_plan)
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'diff', '--project',
+             'project_0', '--patch'])
+        assert ret.exit_code == 0
+        assert "modified  myProject_0/mytest_1" in ret.stdout
+        assert "+  <a>1" in ret.stdout
+        assert "1 seeds differ out of 2" in ret.stderr
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'diff', '--project',
+             'project_0', '--format', 'json', '--exit-code'])
+        assert ret.exit_code == 1
+        assert json.loads(ret.stdout) == [dict(
+            token="project_0::mytest_1",
+            server="http://localhost:8080",
+            location="myProject_0/mytest_1",
+            status="modified")]
+
+
+def test_kirk_run_shared(mocker, create_projects):
+    """
+    test for 'kirk run --shared' command
+    """
+    mocker.patch('kirk.runner.JobRunner.run')
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['run', '--shared', '-u', 'admin', 'project_1::mytest_1'])
+        assert ret.exit_code == 0
+        kirk.runner.JobRunner.run.assert_called_with(
+            mocker.ANY,
+            user="admin",
+            shared=True)
+
+
+def test_kirk_builds(mocker, create_projects):
+    """
+    test for 'kirk builds' command
+    """
+    mocker.patch(
+        'kirk.runner.JobRunner.get_builds',
+        return_value=[
+            dict(number=2, url="http://localhost:8080/job/x/2/",
+                 result=None, building=True, user="admin"),
+            dict(number=1, url="http://localhost:8080/job/x/1/",
+                 result="FAILURE", building=False, user="admin"),
+        ])
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['builds', '--shared', '-u', 'admin', 'project_1::mytest_1'])
+        assert ret.exit_code == 0
+        assert "BUILDING" in ret.output
+        assert "FAILURE" in ret.output
+        assert "http://localhost:8080/job/x/1/" in ret.output
+        kirk.runner.JobRunner.get_builds.assert_called_with(
+            mocker.ANY,
+            user="admin",
+            shared=True,
+            limit=10)
+
+
+def test_kirk_gc(mocker, create_projects):
+    """
+    test for 'kirk gc' command
+    """
+    items = [
+        kirk.garbage.StaleItem(
+            "http://localhost:8080", "myProject_0/dev/user0/mytest_0",
+            "user0", kirk.garbage.StaleItem.EXPIRED),
+    ]
+    mocker.patch('kirk.garbage.Collector.scan', return_value=items)
+    mocker.patch('kirk.garbage.Collector.delete')
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'gc', '--dry-run'])
+        assert ret.exit_code == 0
+        assert "myProject_0/dev/user0/mytest_0" in ret.output
+        assert "1 stale items found, 0 deleted" in ret.output
+        kirk.garbage.Collector.delete.assert_not_called()
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'gc', '--ttl', '7'])
+        assert ret.exit_code == 0
+        assert "1 stale items found, 1 deleted" in ret.output
+        kirk.garbage.Collector.delete.assert_called_once_with(items)
+
+        init = mocker.spy(kirk.garbage.Collector, '__init__')
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'gc', '--never-built', '-n'])
+        assert ret.exit_code == 0
+        assert init.call_args[1]['never_built']
+
+        # projects sharing a location don't make the other seeds orphans
+        with open("projects/project2.yml", "w+") as projfile:
+            projfile.write("""
+                name: project_2
+                description: my project 2
+                author: pippo
+                year: 3010
+                version: 1.0
+                location: myProject_0
+                defaults:
+                    server: http://localhost:8080
+                jobs:
+                    - name: mytest_2
+            """)
+
+        kirk.garbage.Collector.scan.reset_mock()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'gc', '--project', 'project_0',
+             '-n'])
+        assert ret.exit_code == 0
+
+        jobs = kirk.garbage.Collector.scan.call_args[0][0]
+        known = kirk.garbage.Collector.scan.call_args[1]['known']
+        assert sorted(str(job) for job in jobs) == [
+            "project_0::mytest_0",
+            "project_0::mytest_1",
+        ]
+        assert "project_2::mytest_2" in [str(job) for job in known]
+
+
+def test_kirk_run_throttle(mocker, create_projects):
+    """
+    test for 'kirk run' command with limited load
+    """
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch(
+        'kirk.runner.JobRunner._prepare',
+        return_value="myProject_0/mytest_0")
+    mocker.patch('jenkins.Jenkins.build_job', return_value=1)
+    mocker.patch(
+        'jenkins.Jenkins.get_job_info',
+        return_value=dict(nextBuildNumber=1, url="http://localhost/job/"))
+    mocker.patch(
+        'jenkins.Jenkins.get_info',
+        return_value=dict(items=[]))
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            [
+                '--credentials-backend', 'env',
+                '--max-rate', '100',
+                '--max-queue', '10',
+                'run',
+                'project_0::mytest_0',
+            ],
+        )
+        assert ret.exit_code == 0
+        jenkins.Jenkins.get_info.assert_called_once_with(
+            item="queue", query="?tree=items[id]")
+        jenkins.Jenkins.build_job.assert_called_once()
+
+
+def test_kirk_run_failures(mocker, create_projects):
+    """
+    test that 'kirk run' command runs all the jobs when some of them fail
+    """
+    mocker.patch(
+        'kirk.runner.JobRunner.run',
+        side_effect=[kirk.KirkError("server error"), "http://url/1/"])
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['run', 'project_0::mytest_0', 'project_0::mytest_1'])
+        assert ret.exit_code == 1
+        assert kirk.runner.JobRunner.run.call_count == 2
+        assert "failed project_0::mytest_0: server error" in ret.stdout
+        assert "configured http://url/1/" in ret.stdout
+        assert "1 started, 1 failed" in ret.stderr
+        assert "1 jobs failed: project_0::mytest_0" in ret.stderr
+
+
+def test_kirk_stats(mocker, create_projects):
+    """
+    test for 'kirk --stats' option
+    """
+    def _run(job, user=None):
+        instrumentation.emit(kirk.stats.RequestRecord(
+            "http://localhost:8080", "GET", "/api/json", 200, 10, 0.01))
+        return "http://url/1/"
+
+    instrumentation = kirk.stats.Instrumentation()
+    mocker.patch(
+        'kirk.commands.ConnectionPool.instrumentation',
+        new_callable=mocker.PropertyMock,
+        return_value=instrumentation)
+    mocker.patch('kirk.runner.JobRunner.run', side_effect=_run)
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--stats', 'run', 'project_0::mytest_0'])
+        assert ret.exit_code == 0
+        assert "requests statistics" in ret.stderr
+        assert "GET /api/json" in ret.stderr
+        assert "http://localhost:8080" in ret.stderr
+        assert not instrumentation.hooks
+
+
+def test_kirk_run_metrics(mocker, create_projects):
+    """
+    test for 'kirk --metrics-file' option
+    """
+    mocker.patch(
+        'kirk.runner.JobRunner.run',
+        side_effect=["http://url/1/", kirk.KirkError("error")])
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--metrics-file', 'kirk.prom',
+             'run', 'project_0::mytest_0', 'project_0::mytest_1'])
+        assert ret.exit_code == 1
+
+        with open("kirk.prom", "r") as metrics_file:
+            lines = metrics_file.read().splitlines()
+
+        assert 'kirk_jobs_triggered_total{server="http://localhost:8080"} 1' \
+            in lines
+        assert 'kirk_jobs_failed_total{server="http://localhost:8080"} 1' \
+            in lines
+        assert any(line.startswith("kirk_catalog_load_seconds ")
+                   for line in lines)
+
+
+def test_kirk_trace(mocker, create_projects):
+    """
+    test for 'kirk --trace' option
+    """
+    mocker.patch('kirk.runner.JobRunner.run', return_value="http://url/1/")
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--trace', 'kirk.json', 'run', 'project_0::mytest_0'])
+        assert ret.exit_code == 0
+        assert kirk.trace.get_tracer() is None
+
+        with open("kirk.json", "r") as trace_file:
+            data = json.load(trace_file)
+
+        names = [event['name'] for event in data['traceEvents']]
+        assert "load project" in names
+        assert "validate schema" in names
+
+
+def test_kirk_profile(mocker, create_projects):
+    """
+    test for 'kirk --profile' and 'kirk --memprofile' options
+    """
+    mocker.patch('kirk.runner.JobRunner.run', return_value="http://url/1/")
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        create_projects()
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--profile', 'kirk.pstats', '--memprofile',
+             'run', 'project_0::mytest_0'])
+        assert ret.exit_code == 0
+        assert "profile written to kirk.pstats" in ret.stderr
+        assert "memory profile" in ret.stderr
+        assert os.path.isfile("kirk.pstats")
+
+
+def test_kirk_generate():
+    """
+    test for 'kirk generate' command
+    """
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        # projects folder is not needed to generate a catalog
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['generate', '--num-projects', '3', '--jobs', '2',
+             '--scm', 'git=2,none', '--env', '0.5', 'catalog'])
+        assert ret.exit_code == 0
+        assert "3 projects with 6 jobs generated in catalog" in ret.stdout
+        assert "export KIRK_SYNTH_PARAM_0=value_0" in ret.stdout
+        assert len(kirk.utils.get_jobs_from_folder("catalog")) == 6
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['generate', '--scm', 'git=x', 'catalog'])
+        assert ret.exit_code == 1
+        assert "invalid weight 'git=x'" in ret.stderr
+
+        # other commands still need it
+        ret = runner.invoke(kirk.commands.command_kirk, ['list'])
+        assert ret.exit_code == 2
+        assert "'projects' does not exist" in ret.stderr
+
+
+def test_kirk_bench(mocker, fake_jenkins):
+    """
+    test for 'kirk bench' command
+    """
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        kirk.synthetic.CatalogGenerator(projects=2, jobs=3).generate(
+            "projects")
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env',
+             'bench', '--repeat', '1', '--render-workers', '1',
+             '--server', fake_jenkins.url, '--concurrency', '1,2',
+             '--triggers', '3'])
+        assert ret.exit_code == 0
+        assert "2 projects, 6 jobs" in ret.stdout
+        assert "6 seeds" in ret.stdout
+        assert "2 concurrent: 3 builds, 0 errors" in ret.stdout
+        assert not fake_jenkins.exists("__kirk_bench")
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['bench', '--repeat', '1', '--render-workers', '1',
+             '-f', 'json'])
+        assert ret.exit_code == 0
+        report = json.loads(ret.stdout)
+        assert report['catalog']['jobs'] == 6
+        assert report['render'][0]['seeds'] == 6
+        assert 'trigger' not in report
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['bench', '--concurrency', '0'])
+        assert ret.exit_code == 1
+        assert "invalid count '0'" in ret.stderr
+
+        # cleanup errors don't hide the benchmark error
+        mocker.patch(
+            'kirk.bench.TriggerBench.run',
+            side_effect=kirk.KirkError("trigger failed"))
+        mocker.patch(
+            'kirk.bench.TriggerBench.cleanup',
+            side_effect=kirk.KirkError("delete failed"))
+
+        ret = runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env',
+             'bench', '--repeat', '1', '--render-workers', '1',
+             '--server', fake_jenkins.url])
+        assert ret.exit_code == 1
+        assert "delete failed" in ret.stderr
+        assert "trigger failed" in ret.stderr
+
+
+def test_kirk_run_resume(mocker, fake_jenkins, clock):
+    """
+    test for 'kirk run --resume' command
+    """
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+    fake_jenkins.queue_delay = 5.0
+
+    def _run(*argv):
+        return runner.invoke(
+            kirk.commands.command_kirk,
+            ['--credentials-backend', 'env', 'run'] + list(argv))
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        os.mkdir("projects")
+        with open("projects/project0.yml", "w+") as projfile:
+            projfile.write("""
+                name: project_0
+                description: my project 0
+                author: pippo
+                year: 3010
+                version: 1.0
+                location: myProject_0
+                defaults:
+                    server: %s
+                    scm:
+                        git:
+                            url: https://github.com/acerv/marvin.git
+                jobs:
+                    - name: mytest_0
+                    - name: mytest_1
+            """ % fake_jenkins.url.rstrip("/"))
+
+        # second build request fails
+        fake_jenkins.inject(
+            500, method="POST", path="mytest_1/build", count=1)
+
+        ret = _run('--journal', 'run.journal',
+                   'project_0::mytest_0', 'project_0::mytest_1')
+        assert ret.exit_code == 1
+        assert "1 started, 0 resumed, 1 failed" in ret.stderr
+        assert "kirk run --resume run.journal" in ret.stderr
+
+        ret = _run('--journal', 'run.journal', 'project_0::mytest_0')
+        assert ret.exit_code == 1
+        assert "already exists" in ret.stderr
+
+        ret = _run('--resume', 'run.journal', 'project_0::mytest_0')
+        assert ret.exit_code == 2
+
+        # started build is attached and failed one is run
+        ret = _run('--resume', 'run.journal')
+        assert ret.exit_code == 0
+        assert "-> attached %sjob/myProject_0/job/mytest_0/1/" % \
+            fake_jenkins.url in ret.stdout
+        assert "1 started, 1 resumed, 0 failed" in ret.stderr
+        assert fake_jenkins.queued() == 2
+
+        clock.advance(5.0)
+        ret = _run('--resume', 'run.journal')
+        assert ret.exit_code == 0
+        assert "-> finished %sjob/myProject_0/job/mytest_1/1/ (SUCCESS)" % \
+            fake_jenkins.url in ret.stdout
+        assert "0 started, 2 resumed, 0 failed" in ret.stderr
+
+        assert len(fake_jenkins.builds("myProject_0/mytest_0")) == 1
+        assert len(fake_jenkins.builds("myProject_0/mytest_1")) == 1
+
+
+def test_kirk_serve_token(mocker):
+    """
+    test for 'kirk serve' command on a TCP port without token
+    """
+    mocker.patch.dict(os.environ)
+    os.environ.pop("KIRK_DAEMON_TOKEN", None)
+    serve = mocker.patch('kirk.daemon.KirkDaemon.serve_forever')
+
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        os.mkdir("projects")
+        ret = runner.invoke(
+            kirk.commands.command_kirk, ['serve', '--port', '0'])
+        assert ret.exit_code == 2
+        assert "--port requires --token" in ret.stderr
+        serve.assert_not_called()
@@ -0,0 +1,258 @@
+"""
+connection module tests.
+"""
+import time
+import pytest
+import requests
+import jenkins
+from kirk.connection import ConnectionPool
+from kirk.connection import retry
+from kirk.connection import retryable
+from kirk.resilience import CircuitOpenError
+from kirk.resilience import RetryPolicy
+from kirk.credentials import Credentials
+
+
+class _Credentials(Credentials):
+    """
+    In-memory credentials.
+    """
+
+    def __init__(self):
+        self.passwords = dict()
+
+    def get_password(self, section, username):
+        return self.passwords.get((section, username), None)
+
+    def set_password(self, section, username, password):
+        self.passwords[(section, username)] = password
+
+
+def test_pool_get(mocker):
+    """
+    Test get method.
+    """
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+
+    credentials = _Credentials()
+    credentials.set_password("http://localhost:8080", "kirk", "password")
+    credentials.set_password("http://localhost:8081", "kirk", "password")
+
+    pool = ConnectionPool(credentials)
+    assert pool.owner == "kirk"
+    assert pool.credentials == credentials
+
+    with pytest.raises(ValueError):
+        pool.get("")
+
+    conn0 = pool.get("http://localhost:8080")
+    assert pool.get("http://localhost:8080") is conn0
+    jenkins.Jenkins.__init__.assert_called_once_with(
+        "http://localhost:8080", "kirk", "password")
+
+    conn1 = pool.get("http://localhost:8081")
+    assert conn1 is not conn0
+    assert sorted(pool.servers) == [
+        "http://localhost:8080",
+        "http://localhost:8081"]
+
+    # connection is created again when password changes
+    credentials.set_password("http://localhost:8080", "kirk", "password1")
+    assert pool.get("http://localhost:8080") is not conn0
+
+    pool.clear()
+    assert not pool.servers
+
+
+def test_retry(mocker):
+    """
+    Test retry function.
+    """
+    mocker.patch('time.sleep')
+
+    calls = list()
+
+    def _func():
+        calls.append(None)
+        if len(calls) < 3:
+            raise jenkins.TimeoutException("timed out")
+        return "done"
+
+    assert retry(_func, attempts=3) == "done"
+    assert len(calls) == 3
+    assert time.sleep.call_count == 2
+
+    calls.clear()
+    with pytest.raises(jenkins.JenkinsException):
+        retry(_func, attempts=2)
+    assert len(calls) == 2
+
+    with pytest.raises(ValueError):
+        retry(_func, attempts=0)
+
+
+def _http_error(status, text=""):
+    """
+    Return the HTTP error raised by requests for ``status``.
+    """
+    response = requests.models.Response()
+    response.status_code = status
+    response._content = text.encode()  # pylint: disable=protected-access
+    return requests.exceptions.HTTPError(response=response)
+
+
+def test_retryable():
+    """
+    Test retryable function.
+    """
+    assert retryable(jenkins.TimeoutException("timed out"))
+    assert retryable(_http_error(503))
+    assert retryable(jenkins.JenkinsException("job[a] already exists"))
+    assert retryable(_http_error(400, "A job already exists"))
+    assert not retryable(jenkins.JenkinsException("error"))
+    assert not retryable(_http_error(403))
+    assert not retryable(CircuitOpenError("not responding"))
+
+    try:
+        raise jenkins.JenkinsException("Error in request") \
+            from _http_error(502)
+    except jenkins.JenkinsException as err:
+        assert retryable(err)
+
+        # already retried by the policy
+        err.retried = True
+        assert not retryable(err)
+
+    try:
+        try:
+            raise _http_error(401)
+        except requests.exceptions.HTTPError:
+            raise jenkins.JenkinsException("authentication failed")
+    except jenkins.JenkinsException as err:
+        assert not retryable(err)
+
+
+def test_retry_permanent_errors(mocker):
+    """
+    Test that retry function doesn't retry errors which can't disappear.
+    """
+    mocker.patch('time.sleep')
+    func = mocker.Mock(side_effect=jenkins.JenkinsException("forbidden"))
+
+    with pytest.raises(jenkins.JenkinsException):
+        retry(func, attempts=3)
+
+    func.assert_called_once()
+
+    func = mocker.Mock(side_effect=CircuitOpenError("not responding"))
+    with pytest.raises(CircuitOpenError):
+        retry(func, attempts=3)
+
+    func.assert_called_once()
+
+    time.sleep.assert_not_called()
+
+
+def test_retry_other_errors(mocker):
+    """
+    Test that retry function doesn't retry errors which are not raised by
+    Jenkins.
+    """
+    mocker.patch('time.sleep')
+    func = mocker.Mock(side_effect=OSError("error"))
+
+    with pytest.raises(OSError):
+        retry(func, attempts=3)
+
+    func.assert_called_once()
+    time.sleep.assert_not_called()
+
+
+def test_pool_throttle(mocker):
+    """
+    Test that pool connections wait for the throttle.
+    """
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch('jenkins.Jenkins.jenkins_request', return_value="response")
+
+    credentials = _Credentials()
+    credentials.set_password("http://localhost:8080", "kirk", "password")
+
+    throttle = mocker.Mock()
+    throttle.admit.return_value = 0.0
+
+    pool = ConnectionPool(credentials, throttle=throttle)
+    assert pool.throttle == throttle
+
+    conn = pool.get("http://localhost:8080")
+    assert conn.throttle == throttle
+    assert conn.jenkins_request("request") == "response"
+    throttle.wait.assert_called_once_with("http://localhost:8080")
+
+    assert pool.admit("http://localhost:8080") == 0.0
+    throttle.admit.assert_called_once_with(conn, "http://localhost:8080")
+
+    assert ConnectionPool(credentials).admit("http://localhost:8080") == 0
+
+
+def test_pool_policy(mocker):
+    """
+    Test that pool connections send requests with the retry policy.
+    """
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch(
+        'jenkins.Jenkins.jenkins_request',
+        side_effect=[jenkins.TimeoutException("timeout"), "response"])
+    mocker.patch('time.sleep')
+
+    credentials = _Credentials()
+    credentials.set_password("http://localhost:8080", "kirk", "password")
+
+    policy = RetryPolicy(timeout=10, retries=1)
+    pool = ConnectionPool(credentials, policy=policy)
+    assert pool.policy == policy
+
+    conn = pool.get("http://localhost:8080")
+    assert conn.policy == policy
+    assert conn.timeout == 10
+
+    request = requests.Request('GET', "http://localhost:8080/api/json")
+    assert conn.jenkins_request(request) == "response"
+    assert jenkins.Jenkins.jenkins_request.call_count == 2
+
+    # POST requests are not sent again
+    jenkins.Jenkins.jenkins_request.side_effect = \
+        jenkins.TimeoutException("timeout")
+    request = requests.Request('POST', "http://localhost:8080/build")
+    with pytest.raises(jenkins.TimeoutException):
+        conn.jenkins_request(request)
+    assert jenkins.Jenkins.jenkins_request.call_count == 3
+
+
+def test_pool_instrumentation(mocker):
+    """
+    Test that pool connections measure the requests.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b"{}"
+
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch('jenkins.Jenkins.jenkins_request', return_value=response)
+
+    credentials = _Credentials()
+    credentials.set_password("http://localhost:8080", "kirk", "password")
+
+    pool = ConnectionPool(credentials)
+    records = list()
+    pool.instrumentation.add_hook(records.append)
+
+    conn = pool.get("http://localhost:8080")
+    assert conn.instrumentation == pool.instrumentation
+
+    request = requests.Request('GET', "http://localhost:8080/api/json")
+    assert conn.jenkins_request(request) == response
+
+    assert len(records) == 1
+    assert records[0].endpoint == "/api/json"
+    assert records[0].size == 2
@@ -1,10 +1,17 @@
 """
 Test credentials module
 """
+import io
+import os
 import pytest
 import keyring.errors
 import keyrings.alt.file
 from kirk.credentials import CredentialsHandler
+from kirk.credentials import CachedCredentials
+from kirk.credentials import EnvCredentials
+from kirk.credentials import TokenFileCredentials
+from kirk.credentials import get_credentials
+from kirk.credentials import read_entries
 from kirk import KirkError
 
 
@@ -65,3 +72,189 @@ def test_get_password(credentials):
         "kirk"
     )
     assert password == "12345"
+
+
+def test_env_credentials(mocker):
+    """
+    Test EnvCredentials implementation
+    """
+    credentials = EnvCredentials()
+    variable = credentials.variable("http://localhost:8080", "kirk")
+    assert variable == "KIRK_TOKEN_HTTP___LOCALHOST_8080_KIRK"
+
+    mocker.patch.dict(os.environ, clear=True)
+    assert credentials.get_password("http://localhost:8080", "kirk") is None
+
+    os.environ["KIRK_TOKEN"] = "generic"
+    assert credentials.get_password("http://localhost:8080", "kirk") == \
+        "generic"
+
+    os.environ[variable] = "12345"
+    assert credentials.get_password("http://localhost:8080", "kirk") == \
+        "12345"
+
+    with pytest.raises(KirkError, match="read-only"):
+        credentials.set_password("http://localhost:8080", "kirk", "12345")
+
+
+def test_read_entries():
+    """
+    Test read_entries function
+    """
+    stream = io.StringIO(
+        "# comment\n"
+        "\n"
+        "http://localhost:8080 kirk 12345\n"
+        "  http://jenkins.xyz.org   admin  my secret \n")
+
+    entries = read_entries(stream)
+    assert entries == [
+        ("http://localhost:8080", "kirk", "12345"),
+        ("http://jenkins.xyz.org", "admin", "my secret"),
+    ]
+
+    with pytest.raises(KirkError, match="line 2"):
+        read_entries(io.StringIO("\nhttp://localhost:8080 kirk\n"))
+
+
+def test_token_file_credentials(tmp_path):
+    """
+    Test TokenFileCredentials implementation
+    """
+    tokens = tmp_path / "tokens.txt"
+    tokens.write_text("http://localhost:8080 kirk 12345\n")
+
+    credentials = TokenFileCredentials(str(tokens))
+    assert credentials.get_password("http://localhost:8080", "kirk") == \
+        "12345"
+
+    # file is parsed only once
+    tokens.write_text("http://localhost:8080 kirk 67890\n")
+    assert credentials.get_password("http://localhost:8080", "kirk") == \
+        "12345"
+    assert credentials.get_password("http://localhost:8080", "admin") is None
+
+    with pytest.raises(KirkError, match="read-only"):
+        credentials.set_password("http://localhost:8080", "kirk", "12345")
+
+    credentials = TokenFileCredentials(str(tmp_path / "missing.txt"))
+    with pytest.raises(KirkError):
+        credentials.get_password("http://localhost:8080", "kirk")
+
+
+def test_cached_credentials(mocker):
+    """
+    Test CachedCredentials implementation
+    """
+    handler = mocker.Mock()
+    handler.get_password.return_value = "12345"
+
+    monotonic = mocker.patch('time.monotonic', return_value=100.0)
+
+    credentials = CachedCredentials(handler, ttl=10)
+    credentials.prefetch([
+        ("http://localhost:8080", "kirk"),
+        ("http://localhost:8080", "kirk"),
+        ("http://jenkins.xyz.org", "kirk"),
+    ])
+    assert handler.get_password.call_count == 2
+
+    assert credentials.get_password("http://localhost:8080", "kirk") == \
+        "12345"
+    assert handler.get_password.call_count == 2
+
+    # expired password
+    monotonic.return_value = 111.0
+    assert credentials.get_password("http://localhost:8080", "kirk") == \
+        "12345"
+    assert handler.get_password.call_count == 3
+
+    # set password invalidates the cache
+    credentials.set_password("http://localhost:8080", "kirk", "67890")
+    handler.set_password.assert_called_with(
+        "http://localhost:8080", "kirk", "67890")
+    credentials.get_password("http://localhost:8080", "kirk")
+    assert handler.get_password.call_count == 4
+
+    # not found passwords are not cached
+    handler.get_password.return_value = None
+    assert credentials.get_password("http://localhost:8080", "admin") is None
+    assert credentials.get_password("http://localhost:8080", "admin") is None
+    assert handler.get_password.call_count == 6
+
+
+def test_get_credentials(tmp_path):
+    """
+    Test get_credentials function
+    """
+    path = str(tmp_path / "credentials.cfg")
+    assert isinstance(get_credentials("keyring", path), CredentialsHandler)
+    assert isinstance(get_credentials("env"), EnvCredentials)
+    assert isinstance(get_credentials("file", path), TokenFileCredentials)
+
+    with pytest.raises(ValueError, match="not supported"):
+        get_credentials("vault")
+
+
+def test_set_passwords(tmp_path, mocker):
+    """
+    Test set_passwords and list_entries methods
+    """
+    path = str(tmp_path / "credentials.cfg")
+
+    handler = CredentialsHandler(path)
+    handler.set_password("http://localhost:8080", "kirk", "00000")
+
+    mocker.spy(keyrings.alt.file.PlaintextKeyring, '_write_config_value')
+
+    handler.set_passwords([
+        ("http://localhost:8080", "kirk", "12345"),
+        ("http://localhost:8080", "admin", "67890"),
+        ("http://jenkins.xyz.org", "kirk", "abcde"),
+    ])
+    # file is written once, without using keyring writing method
+    assert keyrings.alt.file.PlaintextKeyring._write_config_value.\
+        call_count == 0
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+    handler = CredentialsHandler(path)
+    assert handler.get_password("http://localhost:8080", "kirk") == "12345"
+    assert handler.get_password("http://localhost:8080", "admin") == "67890"
+    assert handler.get_password("http://jenkins.xyz.org", "kirk") == "abcde"
+
+    assert sorted(handler.list_entries()) == [
+        ("http://jenkins.xyz.org", "kirk"),
+        ("http://localhost:8080", "admin"),
+        ("http://localhost:8080", "kirk"),
+    ]
+
+
+def test_set_passwords_invalid(tmp_path):
+    """
+    Test set_passwords method with invalid entries
+    """
+    path = tmp_path / "credentials.cfg"
+
+    handler = CredentialsHandler(str(path))
+    handler.set_password("http://localhost:8080", "kirk", "00000")
+    content = path.read_text()
+
+    with pytest.raises(KirkError):
+        handler.set_passwords([
+            ("http://localhost:8080", "kirk", "12345"),
+            ("http://localhost:8080", "", "67890"),
+        ])
+
+    with pytest.raises(KirkError):
+        handler.set_passwords([("http://localhost:8080", "kirk", b"12345")])
+
+    # nothing is written when an entry is not valid
+    assert path.read_text() == content
+
+
+def test_list_entries_empty(tmp_path):
+    """
+    Test list_entries method without keyrings file
+    """
+    handler = CredentialsHandler(str(tmp_path / "credentials.cfg"))
+    assert handler.list_entries() == []
@@ -0,0 +1,497 @@
+"""
+daemon module tests.
+"""
+import io
+import os
+import stat
+import threading
+import pytest
+import kirk
+import kirk.client
+import kirk.commands
+from kirk.commands import execute_command
+from kirk.daemon import DaemonBusyError
+from kirk.daemon import KirkDaemon
+from kirk.daemon import WarmState
+from kirk.daemon import parse_address
+from kirk.daemon import send_command
+from kirk.metrics import MetricsCollector
+
+
+@pytest.fixture
+def projects(tmp_path):
+    """
+    Folder with projects files.
+    """
+    folder = tmp_path / "projects"
+    folder.mkdir()
+
+    project_file = folder / "project0.yml"
+    project_file.write_text("""
+        name: project0
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myproject
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: test_name0
+              pipeline: pipeline.groovy
+              parameters:
+                - name: param0
+                  default: value0
+                  label: param0
+                  show: true
+    """)
+
+    return folder
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """
+    Daemon serving commands on a temporary Unix socket.
+    """
+    state = WarmState()
+
+    def _handler(argv, **streams):
+        return execute_command(argv, state=state, **streams)
+
+    server = KirkDaemon(
+        _handler,
+        state,
+        socket_path=str(tmp_path / "kirk.sock"),
+        poll=0)
+    server.start()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    thread.join()
+
+
+def test_parse_address():
+    """
+    Test parse_address function.
+    """
+    assert parse_address("localhost:8000") == ("localhost", 8000)
+    assert parse_address("127.0.0.1:0") == ("127.0.0.1", 0)
+    assert parse_address("/tmp/kirk.sock") == "/tmp/kirk.sock"
+    assert parse_address("kirk.sock") == "kirk.sock"
+
+
+def test_daemon_errors():
+    """
+    Test daemon errors.
+    """
+    with pytest.raises(ValueError):
+        KirkDaemon(lambda argv: (0, "", ""), WarmState())
+
+    with pytest.raises(ValueError):
+        KirkDaemon(lambda argv: (0, "", ""), WarmState(), port=0)
+
+
+def test_warm_state(projects):
+    """
+    Test that WarmState reuses objects.
+    """
+    state = WarmState()
+
+    catalog = state.get_catalog(str(projects))
+    assert state.get_catalog(str(projects)) is catalog
+    assert len(catalog.jobs) == 1
+
+    credentials = state.get_credentials("env", None, 300)
+    assert state.get_credentials("env", None, 300) is credentials
+    assert state.get_credentials("env", None, 0) is not credentials
+
+    pool = state.get_pool(credentials, "kirk")
+    assert state.get_pool(credentials, "kirk") is pool
+    assert state.get_pool(credentials, "other") is not pool
+    assert state.metrics is None
+
+
+def test_warm_state_metrics():
+    """
+    Test that WarmState measures the requests of its pools.
+    """
+    metrics = MetricsCollector()
+    state = WarmState(metrics=metrics)
+    assert state.metrics is metrics
+
+    credentials = state.get_credentials("env", None, 300)
+    pool = state.get_pool(credentials, "kirk")
+    assert pool.instrumentation.hooks == [metrics]
+
+    throttle = state.get_throttle(10, 5, 0)
+    assert state.get_throttle(10, 5, 0) is throttle
+    assert state.get_throttle(0, 5, 0) is None
+
+    policy = state.get_policy(60, 3, 5)
+    assert state.get_policy(60, 3, 5) is policy
+    assert state.get_pool(
+        credentials, "kirk", throttle=throttle, policy=policy) is not pool
+
+
+def test_daemon_command(daemon, projects):
+    """
+    Test commands sent to the daemon.
+    """
+    argv = ["--projects", str(projects), "list", "--jobs"]
+
+    response = send_command(daemon.address, argv)
+    assert response['exit_code'] == 0
+    assert "project0::test_name0[param0=value0]" in response['stdout']
+    assert "collected 1 jobs" in response['stderr']
+
+    # catalog is kept in memory
+    catalog = daemon.state.get_catalog(str(projects))
+    response = send_command(daemon.address, argv)
+    assert response['exit_code'] == 0
+    assert daemon.state.get_catalog(str(projects)) is catalog
+
+    # modified files are loaded again
+    project_file = projects / "project0.yml"
+    project_file.write_text(project_file.read_text().replace(
+        "test_name0", "test_name1"))
+    os.utime(str(project_file), ns=(0, 0))
+
+    response = send_command(daemon.address, argv)
+    assert "project0::test_name1[param0=value0]" in response['stdout']
+
+    # errors don't stop the daemon
+    response = send_command(daemon.address, ["run", "invalid"])
+    assert response['exit_code'] != 0
+
+    response = send_command(daemon.address, ["serve"])
+    assert response['exit_code'] == 2
+
+    response = send_command(daemon.address, ["--help"])
+    assert response['exit_code'] == 0
+    assert "Usage" in response['stdout']
+
+
+def test_daemon_cwd(daemon, projects):
+    """
+    Test that commands are executed inside the client folder.
+    """
+    response = send_command(
+        daemon.address,
+        ["list", "--jobs"],
+        cwd=str(projects.parent))
+    assert response['exit_code'] == 0
+    assert "project0::test_name0" in response['stdout']
+
+
+def test_daemon_stdin(daemon, projects):
+    """
+    Test that standard input is forwarded to the daemon commands.
+    """
+    response = send_command(
+        daemon.address,
+        ["changes", "--format", "ndjson", "-"],
+        cwd=str(projects.parent),
+        stdin=io.StringIO("other.groovy\npipeline.groovy\n"))
+    assert response['exit_code'] == 0
+    assert "project0::test_name0" in response['stdout']
+
+    # without stdin, commands read an empty input
+    response = send_command(
+        daemon.address,
+        ["changes", "-"],
+        cwd=str(projects.parent))
+    assert response['exit_code'] == 2
+    assert "FILES or --git are required" in response['stderr']
+
+
+def test_daemon_streaming(tmp_path):
+    """
+    Test that output is received while the command is running.
+    """
+    received = threading.Event()
+    streamed = list()
+
+    class _Stream(io.StringIO):
+        def write(self, text):
+            received.set()
+            return super().write(text)
+
+    def _handler(argv, stdout=None, stderr=None, stdin=None):
+        stdout.write("first\n")
+        streamed.append(received.wait(5))
+        stderr.write(stdin.readline())
+        return 0, "", ""
+
+    server = KirkDaemon(
+        _handler,
+        WarmState(),
+        socket_path=str(tmp_path / "kirk.sock"),
+        poll=0)
+    server.start()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        stdout = _Stream()
+        response = send_command(
+            server.address,
+            ["list"],
+            stdin=io.StringIO("input line\nignored\n"),
+            stdout=stdout)
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert streamed == [True]
+    assert stdout.getvalue() == "first\n"
+    assert response == dict(exit_code=0, stdout="", stderr="input line\n")
+
+
+def test_client(mocker, capsys, daemon, projects):
+    """
+    Test client forwarding commands to the daemon.
+    """
+    mocker.patch.dict(os.environ, {"KIRK_DAEMON": daemon.address})
+
+    with pytest.raises(SystemExit) as exit_info:
+        kirk.client.main(["--projects", str(projects), "list", "--jobs"])
+
+    assert exit_info.value.code == 0
+    captured = capsys.readouterr()
+    assert "project0::test_name0" in captured.out
+
+
+def test_client_subcommand():
+    """
+    Test client finding the command name among kirk options.
+    """
+    assert kirk.client.subcommand(["serve"]) == "serve"
+    assert kirk.client.subcommand(["-d", "--stats", "serve"]) == "serve"
+    assert kirk.client.subcommand(["--projects", "serve", "list"]) == "list"
+    assert kirk.client.subcommand(["-p", "serve", "list"]) == "list"
+    assert kirk.client.subcommand(["-dp", "serve", "list"]) == "list"
+    assert kirk.client.subcommand(["-pserve", "list"]) == "list"
+    assert kirk.client.subcommand(["--projects=serve", "list"]) == "list"
+    assert kirk.client.subcommand(["list", "serve"]) == "list"
+    assert kirk.client.subcommand(["run", "serve::job"]) == "run"
+    assert kirk.client.subcommand(["--", "serve"]) == "serve"
+    assert kirk.client.subcommand(["--owner"]) is None
+    assert kirk.client.subcommand([]) is None
+
+    # client knows every flag of the kirk group
+    flags = set()
+    for param in kirk.commands.command_kirk.params:
+        if param.is_flag:
+            flags.update(param.opts)
+    assert flags.issubset(kirk.client.FLAGS)
+
+
+def test_client_fallback(mocker, capsys, tmp_path, projects):
+    """
+    Test client running commands locally when daemon is not available.
+    """
+    mocker.patch.dict(
+        os.environ,
+        {"KIRK_DAEMON": str(tmp_path / "missing.sock")})
+
+    with pytest.raises(SystemExit) as exit_info:
+        kirk.client.main(["--projects", str(projects), "list", "--jobs"])
+
+    assert exit_info.value.code == 0
+    captured = capsys.readouterr()
+    assert "running locally" in captured.err
+    assert "project0::test_name0" in captured.out
+
+
+def test_daemon_socket_owner(mocker, daemon, projects):
+    """
+    Test that only the daemon owner can send commands on the Unix socket.
+    """
+    mode = os.stat(daemon.address).st_mode
+    assert stat.S_IMODE(mode) == 0o600
+
+    mocker.patch('kirk.daemon._peer_uid', return_value=os.geteuid() + 1)
+    response = send_command(
+        daemon.address,
+        ["--projects", str(projects), "list"])
+    assert response['exit_code'] == 1
+    assert response['stderr'] == "permission denied\n"
+
+
+def test_daemon_tcp_token(projects):
+    """
+    Test that TCP clients must send the daemon token.
+    """
+    state = WarmState()
+
+    def _handler(argv, **streams):
+        return execute_command(argv, state=state, **streams)
+
+    server = KirkDaemon(_handler, state, port=0, poll=0, token="secret")
+    server.start()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        argv = ["--projects", str(projects), "list", "--jobs"]
+
+        response = send_command(server.address, argv)
+        assert response['exit_code'] == 1
+        assert response['stderr'] == "permission denied\n"
+
+        response = send_command(server.address, argv, token="wrong")
+        assert response['exit_code'] == 1
+
+        response = send_command(server.address, argv, token="secret")
+        assert response['exit_code'] == 0
+        assert "project0::test_name0" in response['stdout']
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def test_daemon_poll_lock(mocker, tmp_path):
+    """
+    Test that catalogs are not reloaded while a command is running.
+    """
+    state = WarmState()
+    running = threading.Event()
+    release = threading.Event()
+    overlaps = list()
+
+    def _refresh():
+        overlaps.append(running.is_set())
+
+    mocker.patch.object(state, 'refresh', side_effect=_refresh)
+
+    def _handler(argv, **_):
+        running.set()
+        release.wait(5)
+        running.clear()
+        return 0, "", ""
+
+    server = KirkDaemon(
+        _handler,
+        state,
+        socket_path=str(tmp_path / "kirk.sock"),
+        poll=0.01)
+    server.start()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        client = threading.Thread(
+            target=send_command, args=(server.address, ["list"]))
+        client.start()
+
+        assert running.wait(5)
+        threading.Event().wait(0.1)
+        release.set()
+        client.join()
+
+        threading.Event().wait(0.05)
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert overlaps
+    assert not any(overlaps)
+
+
+def test_daemon_busy(tmp_path):
+    """
+    Test that commands are not executed when daemon is busy for more than
+    the time client waits.
+    """
+    running = threading.Event()
+    release = threading.Event()
+    executed = list()
+
+    def _handler(argv, stdin=None, **_):
+        executed.append(argv)
+        running.set()
+        release.wait(5)
+        stdin.read()
+        return 0, "", ""
+
+    server = KirkDaemon(
+        _handler,
+        WarmState(),
+        socket_path=str(tmp_path / "kirk.sock"),
+        poll=0)
+    server.start()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        client = threading.Thread(
+            target=send_command, args=(server.address, ["run"]))
+        client.start()
+        assert running.wait(5)
+
+        stdin = io.StringIO("input line\n")
+        with pytest.raises(DaemonBusyError):
+            send_command(server.address, ["list"], stdin=stdin, wait=0.05)
+
+        # input is left to the command running locally
+        assert stdin.read() == "input line\n"
+
+        release.set()
+        client.join()
+
+        response = send_command(server.address, ["list"], wait=0.05)
+        assert response['exit_code'] == 0
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert executed == [["run"], ["list"]]
+
+
+def test_client_busy(mocker, capsys, projects):
+    """
+    Test client running commands locally when daemon is busy.
+    """
+    mocker.patch.dict(
+        os.environ,
+        {"KIRK_DAEMON": "/tmp/kirk.sock", "KIRK_DAEMON_WAIT": "0.5"})
+    send = mocker.patch(
+        'kirk.daemon.send_command',
+        side_effect=DaemonBusyError("kirk daemon busy"))
+
+    with pytest.raises(SystemExit) as exit_info:
+        kirk.client.main(["--projects", str(projects), "list", "--jobs"])
+
+    assert exit_info.value.code == 0
+    assert send.call_args[1]['wait'] == 0.5
+    captured = capsys.readouterr()
+    assert "running locally" in captured.err
+    assert "project0::test_name0" in captured.out
+
+
+def test_client_connection_lost(mocker, capsys, projects):
+    """
+    Test client not running commands again when daemon connection is lost
+    after sending them.
+    """
+    mocker.patch.dict(os.environ, {"KIRK_DAEMON": "/tmp/kirk.sock"})
+    mocker.patch(
+        'kirk.daemon.send_command',
+        side_effect=kirk.KirkError("connection with kirk daemon lost"))
+
+    with pytest.raises(SystemExit) as exit_info:
+        kirk.client.main(["--projects", str(projects), "list", "--jobs"])
+
+    assert exit_info.value.code == 1
+    captured = capsys.readouterr()
+    assert "connection with kirk daemon lost" in captured.err
+    assert "project0::test_name0" not in captured.out
@@ -0,0 +1,192 @@
+"""
+garbage module tests.
+"""
+import time
+import pytest
+import jenkins
+import kirk.utils
+from kirk.connection import ConnectionPool
+from kirk.credentials import EnvCredentials
+from kirk.garbage import Collector
+from kirk.garbage import StaleItem
+
+NOW = 1000 * 86400
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    """
+    Catalog jobs.
+    """
+    project_file = tmp_path / "project0.yml"
+    project_file.write_text("""
+        name: project0
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: test_name0
+            - name: test_name1
+    """)
+    return kirk.utils.get_jobs_from_folder(str(tmp_path))
+
+
+@pytest.fixture
+def pool(mocker):
+    """
+    Connections to a mocked Jenkins server.
+    """
+    def _seed(name, days=None, queued=False):
+        seed = dict(
+            name=name, _class="WorkflowJob", lastBuild=None, inQueue=queued)
+        if days is not None:
+            seed['lastBuild'] = dict(timestamp=(NOW - days * 86400) * 1000)
+        return seed
+
+    folder = "com.cloudbees.hudson.plugins.folder.Folder"
+    tree = dict(jobs=[
+        dict(name="user0", _class=folder, jobs=[
+            _seed("test_name0", days=1),
+            _seed("test_name1", days=40),
+            _seed("removed_job", days=1),
+        ]),
+        dict(name="user1", _class=folder, jobs=[
+            _seed("test_name0", days=50),
+            _seed("test_name1"),
+        ]),
+        dict(name="user2", _class=folder, jobs=[
+            _seed("test_name0", days=2),
+        ]),
+        dict(name="user3", _class=folder, jobs=[
+            _seed("test_name0", days=60, queued=True),
+            _seed("removed_job", queued=True),
+        ]),
+        dict(name="not_a_folder", _class="WorkflowJob"),
+    ])
+
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch('jenkins.Jenkins.get_info', return_value=tree)
+    mocker.patch('jenkins.Jenkins.delete_job')
+    mocker.patch.dict("os.environ", {"KIRK_TOKEN": "password"})
+
+    return ConnectionPool(EnvCredentials())
+
+
+def test_collector_errors(pool):
+    """
+    Test Collector errors.
+    """
+    with pytest.raises(ValueError):
+        Collector(pool, workers=0)
+
+    with pytest.raises(ValueError):
+        Collector(pool, ttl=-1)
+
+
+def test_collector_scan(pool, jobs):
+    """
+    Test scan method.
+    """
+    collector = Collector(pool, ttl=30 * 86400)
+    items = collector.scan(jobs, now=NOW)
+
+    # seeds which have never been built or which are queued are kept
+    assert [(repr(item), item.reason, item.folder) for item in items] == [
+        ("myProject/dev/user0/test_name1", StaleItem.EXPIRED, False),
+        ("myProject/dev/user0/removed_job", StaleItem.ORPHAN, False),
+        ("myProject/dev/user1/test_name0", StaleItem.EXPIRED, False),
+    ]
+    assert items[0].user == "user0"
+    assert items[0].timestamp == NOW - 40 * 86400
+
+    collector = Collector(pool, ttl=30 * 86400, never_built=True)
+    items = collector.scan(jobs, now=NOW)
+
+    assert [(repr(item), item.reason, item.folder) for item in items] == [
+        ("myProject/dev/user0/test_name1", StaleItem.EXPIRED, False),
+        ("myProject/dev/user0/removed_job", StaleItem.ORPHAN, False),
+        ("myProject/dev/user1", StaleItem.EXPIRED, True),
+    ]
+    assert items[2].timestamp == NOW - 50 * 86400
+
+    # developers folder is read with one request for each scan
+    assert jenkins.Jenkins.get_info.call_count == 2
+    jenkins.Jenkins.get_info.assert_called_with(
+        item="job/myProject/job/dev", query=Collector.TREE_QUERY)
+
+
+def test_collector_scan_shared_location(pool, jobs, tmp_path):
+    """
+    Test scan method cleaning a project which shares its location with
+    another project.
+    """
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "project1.yml").write_text("""
+        name: project1
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: removed_job
+    """)
+    known = jobs + kirk.utils.get_jobs_from_folder(str(other))
+
+    collector = Collector(pool, ttl=30 * 86400, never_built=True)
+    items = collector.scan(jobs, now=NOW, known=known)
+
+    # seeds of the other project are not orphans
+    assert [(repr(item), item.reason, item.folder) for item in items] == [
+        ("myProject/dev/user0/test_name1", StaleItem.EXPIRED, False),
+        ("myProject/dev/user1", StaleItem.EXPIRED, True),
+    ]
+
+
+def test_collector_scan_not_found(mocker, pool, jobs):
+    """
+    Test scan method when developers folder doesn't exist.
+    """
+    mocker.patch(
+        'jenkins.Jenkins.get_info',
+        side_effect=jenkins.NotFoundException("not found"))
+
+    assert not Collector(pool).scan(jobs)
+
+
+def test_collector_delete(pool, jobs):
+    """
+    Test delete method.
+    """
+    jenkins.Jenkins.delete_job.side_effect = [
+        None,
+        jenkins.NotFoundException("not found"),
+        jenkins.JenkinsException("mocked exception"),
+    ]
+
+    collector = Collector(pool, ttl=30 * 86400, rate=100, workers=1)
+    items = collector.delete(collector.scan(jobs, now=NOW))
+
+    assert jenkins.Jenkins.delete_job.call_count == 3
+    jenkins.Jenkins.delete_job.assert_any_call(
+        "myProject/dev/user1/test_name0")
+    assert [item.error for item in items] == [None, None, "mocked exception"]
+
+
+def test_collector_rate(pool, jobs):
+    """
+    Test that deletions are rate limited.
+    """
+    collector = Collector(pool, ttl=30 * 86400, rate=20, workers=3)
+    items = collector.scan(jobs, now=NOW)
+
+    start = time.monotonic()
+    collector.delete(items)
+    assert time.monotonic() - start >= 0.09
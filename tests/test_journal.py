@@ -0,0 +1,308 @@
+"""
+journal module tests.
+"""
+import pytest
+import jenkins
+from kirk import KirkError
+from kirk.journal import FAILED
+from kirk.journal import FINISHED
+from kirk.journal import RESOLVED
+from kirk.journal import SEEDED
+from kirk.journal import TRIGGERED
+from kirk.journal import TRIGGERING
+from kirk.journal import JournaledRunner
+from kirk.journal import RunJournal
+from kirk.runner import Build
+from kirk.runner import JobRunner
+
+
+@pytest.fixture
+def runner(mocker):
+    """
+    Runner connecting to the fake Jenkins server.
+    """
+    credentials = mocker.Mock()
+    credentials.get_password.return_value = "password"
+    return JobRunner(credentials)
+
+
+def test_journal(tmp_path):
+    """
+    Test RunJournal class.
+    """
+    path = str(tmp_path / "run.journal")
+
+    with pytest.raises(ValueError):
+        RunJournal("")
+
+    journal = RunJournal(path)
+    with pytest.raises(KirkError):
+        journal.record("prj::job0", RESOLVED)
+
+    journal.create(["prj::job0", "prj::job1[A=1]"], user="myuser")
+    assert journal.tokens == ["prj::job0", "prj::job1[A=1]"]
+    assert journal.user == "myuser"
+    assert not journal.shared
+    assert journal.entry("prj::job0") == dict()
+
+    with pytest.raises(ValueError):
+        journal.record("prj::job0", "unknown")
+
+    journal.record("prj::job0", RESOLVED, server="http://localhost:8080")
+    journal.record("prj::job0", SEEDED, location="prj/dev/myuser/job0")
+    journal.record("prj::job0", FAILED, error="server error")
+    assert journal.entry("prj::job0") == dict(
+        state=SEEDED,
+        server="http://localhost:8080",
+        location="prj/dev/myuser/job0",
+        error="server error")
+
+    journal.record("prj::job1[A=1]", RESOLVED)
+
+    # journal can't be created twice
+    with pytest.raises(KirkError):
+        RunJournal(path).create(["prj::job0"])
+
+    loaded = RunJournal(path).load()
+    assert loaded.tokens == journal.tokens
+    assert loaded.user == "myuser"
+    assert loaded.entry("prj::job0") == journal.entry("prj::job0")
+    assert loaded.entry("prj::job1[A=1]")['state'] == RESOLVED
+
+    # a line written while kirk was killed is ignored
+    with open(path, "a") as journal_file:
+        journal_file.write('{"token": "prj::job0", "sta')
+
+    loaded = RunJournal(path).load()
+    assert loaded.entry("prj::job0")['state'] == SEEDED
+
+    # incomplete line has been removed
+    loaded.record("prj::job0", TRIGGERING, number=1)
+    loaded = RunJournal(path).load()
+    assert loaded.entry("prj::job0")['state'] == TRIGGERING
+    assert loaded.entry("prj::job0")['number'] == 1
+
+    with open(path, "a") as journal_file:
+        journal_file.write('{"token": \n')
+        journal_file.write('{"token": "prj::job0", "state": "seeded"}\n')
+
+    with pytest.raises(KirkError):
+        RunJournal(path).load()
+
+
+def test_journal_invalid(tmp_path):
+    """
+    Test RunJournal class loading invalid journals.
+    """
+    path = tmp_path / "run.journal"
+
+    with pytest.raises(KirkError):
+        RunJournal(str(path)).load()
+
+    path.write_text("")
+    with pytest.raises(KirkError):
+        RunJournal(str(path)).load()
+
+    path.write_text('{"name": "project"}\n')
+    with pytest.raises(KirkError):
+        RunJournal(str(path)).load()
+
+    path.write_text('["project"]\n')
+    with pytest.raises(KirkError):
+        RunJournal(str(path)).load()
+
+    journal = RunJournal(str(path) + ".new")
+    journal.create(["prj::job0"])
+    with open(journal.path, "a") as journal_file:
+        journal_file.write('{"token": "prj::job1", "state": "resolved"}\n')
+
+    with pytest.raises(KirkError):
+        RunJournal(journal.path).load()
+
+
+def test_journaled_runner(tmp_path, runner, fake_jenkins, fake_jobs, clock):
+    """
+    Test JournaledRunner class on the fake Jenkins server.
+    """
+    fake_jenkins.queue_delay = 5.0
+    location = "myProject/dev/admin/test_name0"
+
+    journal = RunJournal(str(tmp_path / "run.journal"))
+    journal.create(["project0::test_name0"], user="admin")
+
+    journaled = JournaledRunner(runner, journal)
+    action, build, result = journaled.run(
+        "project0::test_name0", fake_jobs[0], user="admin")
+    assert action == JournaledRunner.STARTED
+    assert build.number == 1
+    assert result is None
+    assert fake_jenkins.queued() == 1
+
+    entry = journal.entry("project0::test_name0")
+    assert entry['state'] == TRIGGERED
+    assert entry['location'] == location
+    assert entry['queue_id'] == build.queue_id
+
+    # resume attaches the build inside the queue
+    journaled = JournaledRunner(runner, RunJournal(journal.path).load())
+    action, build, result = journaled.run(
+        "project0::test_name0", fake_jobs[0], user="admin")
+    assert action == JournaledRunner.RUNNING
+    assert result is None
+    assert fake_jenkins.queued() == 1
+
+    clock.advance(5.0)
+    action, build, result = journaled.run(
+        "project0::test_name0", fake_jobs[0], user="admin")
+    assert action == JournaledRunner.FINISHED
+    assert result == "SUCCESS"
+    assert build.url.endswith("/job/test_name0/1/")
+
+    # finished jobs are not read again
+    requests = len(fake_jenkins.requests)
+    journaled = JournaledRunner(runner, RunJournal(journal.path).load())
+    action, build, result = journaled.run(
+        "project0::test_name0", fake_jobs[0], user="admin")
+    assert action == JournaledRunner.FINISHED
+    assert result == "SUCCESS"
+    assert build.number == 1
+    assert len(fake_jenkins.requests) == requests
+    assert len(fake_jenkins.builds(location)) == 1
+
+
+def test_journaled_runner_interrupted(tmp_path, runner, fake_jenkins,
+                                      fake_jobs, clock):
+    """
+    Test JournaledRunner class when a run has been interrupted after the
+    build request.
+    """
+    fake_jenkins.queue_delay = 5.0
+    job = fake_jobs[0]
+
+    journal = RunJournal(str(tmp_path / "run.journal"))
+    journal.create(["project0::test_name0"])
+
+    # build is started, but kirk is killed before recording it
+    location = runner.setup(job)
+    journal.record("project0::test_name0", RESOLVED, server=job.server)
+    journal.record("project0::test_name0", SEEDED, location=location)
+    journal.record(
+        "project0::test_name0",
+        TRIGGERING,
+        location=location,
+        number=runner.next_build(job, location))
+    runner.trigger(job, location)
+
+    journaled = JournaledRunner(runner, RunJournal(journal.path).load())
+    action, build, _ = journaled.run("project0::test_name0", job)
+    assert action == JournaledRunner.RUNNING
+    assert build.number == 1
+    assert fake_jenkins.queued() == 1
+
+    loaded = RunJournal(journal.path).load()
+    assert loaded.entry("project0::test_name0")['state'] == TRIGGERED
+
+    clock.advance(5.0)
+
+    # build request failed, so the seed is run again without setting it up
+    fake_jenkins.inject(500, method="POST", path="buildWithParameters")
+
+    journal = RunJournal(str(tmp_path / "other.journal"))
+    journal.create(["project0::test_name0"])
+    journaled = JournaledRunner(runner, journal)
+    with pytest.raises(KirkError):
+        journaled.run("project0::test_name0", job)
+
+    entry = journal.entry("project0::test_name0")
+    assert entry['state'] == TRIGGERING
+    assert entry['error']
+    assert fake_jenkins.queued() == 0
+
+    fake_jenkins.clear_errors()
+    requests = len(fake_jenkins.requests)
+    action, build, _ = journaled.run("project0::test_name0", job)
+    assert action == JournaledRunner.STARTED
+    assert build.number == 2
+    assert fake_jenkins.queued() == 1
+    assert ("POST", "/job/myProject/job/test_name0/config.xml") \
+        not in fake_jenkins.requests[requests:]
+
+    entry = journal.entry("project0::test_name0")
+    assert entry['state'] == TRIGGERED
+    assert entry['error'] is None
+
+
+def test_journaled_runner_finished_queue(tmp_path, runner, fake_jenkins,
+                                         fake_jobs, clock, mocker):
+    """
+    Test JournaledRunner class when Jenkins forgot the queue item of a
+    completed build.
+    """
+    journal = RunJournal(str(tmp_path / "run.journal"))
+    journal.create(["project0::test_name0"])
+
+    fake_jenkins.queue_delay = 5.0
+    journaled = JournaledRunner(runner, journal)
+    journaled.run("project0::test_name0", fake_jobs[0])
+
+    clock.advance(5.0)
+    mocker.patch(
+        'jenkins.Jenkins.get_queue_item',
+        side_effect=jenkins.NotFoundException())
+
+    action, build, result = journaled.run(
+        "project0::test_name0", fake_jobs[0])
+    assert action == JournaledRunner.FINISHED
+    assert result == "SUCCESS"
+    assert build.number == 1
+    assert journal.entry("project0::test_name0")['state'] == FINISHED
+
+
+def test_journaled_runner_interrupted_shared(tmp_path, runner, fake_jenkins,
+                                             fake_jobs, clock, mocker):
+    """
+    Test JournaledRunner class when a run on a shared seed has been
+    interrupted and another developer started a build in the meanwhile.
+    """
+    fake_jenkins.queue_delay = 5.0
+    job = fake_jobs[0]
+
+    journal = RunJournal(str(tmp_path / "run.journal"))
+    journal.create(["project0::test_name0"], user="admin", shared=True)
+
+    location = runner.setup(job, shared=True)
+    journal.record("project0::test_name0", RESOLVED, server=job.server)
+    journal.record("project0::test_name0", SEEDED, location=location)
+    journal.record(
+        "project0::test_name0",
+        TRIGGERING,
+        location=location,
+        number=runner.next_build(job, location))
+
+    # kirk is killed before the build request, while someone else is
+    # running the same seed
+    runner.trigger(job, location, user="other", shared=True)
+
+    journaled = JournaledRunner(runner, RunJournal(journal.path).load())
+    action, build, _ = journaled.run(
+        "project0::test_name0", job, user="admin", shared=True)
+    assert action == JournaledRunner.STARTED
+    assert fake_jenkins.queued() == 2
+    queue_id = build.queue_id
+
+    clock.advance(5.0)
+    assert runner.get_result(build) == "SUCCESS"
+    users = [
+        item['params'].get('KIRK_USER')
+        for item in fake_jenkins.builds(location)
+        if item['number'] == build.number]
+    assert users == ["admin"]
+
+    # build is found when Jenkins forgot its queue item
+    mocker.patch(
+        'jenkins.Jenkins.get_queue_item',
+        side_effect=jenkins.NotFoundException())
+
+    lost = Build(build.server, location, None, "", queue_id=queue_id)
+    assert runner.get_result(lost) == "SUCCESS"
+    assert lost.number == build.number
@@ -0,0 +1,63 @@
+"""
+lock module tests.
+"""
+import os
+import time
+import threading
+from kirk.lock import FileLock
+from kirk.lock import lock_path
+
+
+def test_lock_path(tmp_path):
+    """
+    Test lock_path function.
+    """
+    path0 = lock_path(str(tmp_path), "http://localhost:8080", "a/b")
+    path1 = lock_path(str(tmp_path), "http://localhost:8080", "a/c")
+
+    assert path0 == lock_path(str(tmp_path), "http://localhost:8080", "a/b")
+    assert path0 != path1
+    assert os.path.dirname(path0) == str(tmp_path)
+
+
+def test_lock(tmp_path):
+    """
+    Test that lock serializes its owners.
+    """
+    path = str(tmp_path / "test.lock")
+    events = list()
+
+    def _worker(name):
+        with FileLock(path) as lock:
+            assert lock.path == path
+            events.append((name, "in"))
+            time.sleep(0.05)
+            events.append((name, "out"))
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(events) == 8
+    for index in range(0, 8, 2):
+        assert events[index][0] == events[index + 1][0]
+        assert events[index][1] == "in"
+        assert events[index + 1][1] == "out"
+
+    assert os.path.isfile(path)
+
+
+def test_lock_release(tmp_path):
+    """
+    Test that lock can be acquired again once released.
+    """
+    lock = FileLock(str(tmp_path / "test.lock"))
+    lock.release()
+
+    lock.acquire()
+    lock.release()
+
+    with lock:
+        pass
@@ -0,0 +1,124 @@
+"""
+metrics module tests.
+"""
+import os
+import stat
+import pytest
+from kirk import KirkError
+from kirk.metrics import MetricsCollector
+from kirk.metrics import write_textfile
+from kirk.stats import RequestRecord
+
+
+def test_metrics_render(mocker):
+    """
+    Test metrics rendering.
+    """
+    metrics = MetricsCollector(buckets=(0.1, 1.0))
+    metrics(RequestRecord(
+        "http://localhost:8080", "GET", "/api/json", 200, 10, 0.05))
+    metrics(RequestRecord(
+        "http://localhost:8080", "GET", "/api/json", 200, 10, 0.5))
+    metrics(RequestRecord(
+        "http://localhost:8080", "POST", "/job/*/build", None, 0, 5.0,
+        error="timeout"))
+
+    metrics.job_done("http://localhost:8080")
+    metrics.job_done("http://localhost:8080", failed=True)
+    metrics.catalog_loaded(0.25)
+
+    pool = mocker.Mock()
+    pool.throttle.admissions.return_value = {
+        "http://localhost:8080": dict(builds=2, wait=10.0)}
+    pool.policy.stats.return_value = {
+        "http://localhost:8080": dict(
+            requests=3, retries=1, failures=1, rejected=2)}
+    metrics.add_pool(pool)
+    metrics.add_pool(pool)
+
+    text = metrics.render(now=1000.0)
+    lines = text.splitlines()
+
+    assert '# TYPE kirk_jobs_triggered_total counter' in lines
+    assert 'kirk_jobs_triggered_total{server="http://localhost:8080"} 1' \
+        in lines
+    assert 'kirk_jobs_failed_total{server="http://localhost:8080"} 1' \
+        in lines
+    assert 'kirk_requests_total{server="http://localhost:8080",' \
+        'method="GET",endpoint="/api/json",code="200"} 2' in lines
+    assert 'kirk_requests_total{server="http://localhost:8080",' \
+        'method="POST",endpoint="/job/*/build",code="error"} 1' in lines
+    assert '# TYPE kirk_request_duration_seconds histogram' in lines
+    assert 'kirk_request_duration_seconds_bucket{' \
+        'server="http://localhost:8080",le="0.1"} 1' in lines
+    assert 'kirk_request_duration_seconds_bucket{' \
+        'server="http://localhost:8080",le="1.0"} 2' in lines
+    assert 'kirk_request_duration_seconds_bucket{' \
+        'server="http://localhost:8080",le="+Inf"} 3' in lines
+    assert 'kirk_request_duration_seconds_sum{' \
+        'server="http://localhost:8080"} 5.55' in lines
+    assert 'kirk_request_duration_seconds_count{' \
+        'server="http://localhost:8080"} 3' in lines
+    assert 'kirk_request_retries_total{server="http://localhost:8080"} 1' \
+        in lines
+    assert 'kirk_request_rejected_total{server="http://localhost:8080"} 2' \
+        in lines
+    assert 'kirk_queue_wait_seconds_sum{server="http://localhost:8080"} ' \
+        '10.0' in lines
+    assert 'kirk_queue_wait_seconds_count{server="http://localhost:8080"} 2' \
+        in lines
+    assert 'kirk_catalog_load_seconds 0.25' in lines
+    assert 'kirk_last_update_timestamp_seconds 1000.0' in lines
+    assert text.endswith("\n")
+
+
+def test_metrics_render_empty():
+    """
+    Test metrics rendering without data.
+    """
+    text = MetricsCollector().render()
+
+    assert "kirk_catalog_load_seconds " not in text
+    assert "kirk_last_update_timestamp_seconds " in text
+
+
+def test_metrics_escape():
+    """
+    Test that labels values are escaped.
+    """
+    metrics = MetricsCollector()
+    metrics.job_done('http://a"b\\c')
+
+    assert 'server="http://a\\"b\\\\c"' in metrics.render()
+
+
+def test_metrics_failed_only():
+    """
+    Test that jobs which couldn't be triggered are not counted as
+    triggered.
+    """
+    metrics = MetricsCollector()
+    metrics.job_done("http://localhost:8080", failed=True)
+
+    lines = metrics.render().splitlines()
+    assert 'kirk_jobs_triggered_total{server="http://localhost:8080"} 0' \
+        in lines
+    assert 'kirk_jobs_failed_total{server="http://localhost:8080"} 1' \
+        in lines
+
+
+def test_write_textfile(tmp_path):
+    """
+    Test write_textfile function.
+    """
+    path = tmp_path / "kirk.prom"
+    path.write_text("old")
+
+    write_textfile(str(path), "kirk_metric 1\n")
+
+    assert path.read_text() == "kirk_metric 1\n"
+    assert stat.S_IMODE(os.stat(str(path)).st_mode) == 0o644
+    assert os.listdir(str(tmp_path)) == ["kirk.prom"]
+
+    with pytest.raises(KirkError):
+        write_textfile(str(tmp_path / "missing" / "kirk.prom"), "")
@@ -0,0 +1,144 @@
+"""
+output module tests.
+"""
+import io
+import json
+import pytest
+import kirk.utils
+from kirk.output import get_writer
+from kirk.output import job_record
+from kirk.output import JobWriter
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    """
+    Jobs to write.
+    """
+    project_file = tmp_path / "project0.yml"
+    project_file.write_text("""
+        name: project0
+        description: my project 0
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: test_name0
+              pipeline: pipeline.groovy
+              parameters:
+                - name: MY_PARAM
+                  label: Parameter XYZ
+                  default: "A\\tB"
+            - name: test_name1
+              pipeline: pipeline.groovy
+              depends:
+                - test_name0
+    """)
+    return kirk.utils.get_jobs_from_folder(str(tmp_path))
+
+
+def test_get_writer_error():
+    """
+    Test get_writer with an unsupported format.
+    """
+    with pytest.raises(ValueError, match="'xml' format is not supported"):
+        get_writer("xml")
+
+
+def test_job_record(jobs):
+    """
+    Test job_record function.
+    """
+    record = job_record(jobs[1])
+    assert record == dict(
+        token="project0::test_name1",
+        project="project0",
+        job="test_name1",
+        server="http://localhost:8080",
+        location="myProject",
+        pipeline="pipeline.groovy",
+        parameters=dict(),
+        depends=["test_name0"],
+    )
+
+
+def _write(fmt, jobs):
+    """
+    Write jobs with the given format and return the output.
+    """
+    stream = io.StringIO()
+    writer = get_writer(fmt, stream=stream)
+    writer.begin()
+    for job in jobs:
+        writer.write(job)
+    writer.end()
+    return stream.getvalue()
+
+
+def test_text_writer(jobs):
+    """
+    Test text format.
+    """
+    output = _write("text", jobs)
+    assert output == \
+        "  project0::test_name0[MY_PARAM=A\tB]\n" \
+        "  project0::test_name1\n"
+
+
+def test_json_writer(jobs):
+    """
+    Test json format.
+    """
+    data = json.loads(_write("json", jobs))
+    assert data == [job_record(job) for job in jobs]
+
+    assert json.loads(_write("json", [])) == []
+
+
+def test_ndjson_writer(jobs):
+    """
+    Test ndjson format.
+    """
+    lines = _write("ndjson", jobs).splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == job_record(jobs[0])
+    assert json.loads(lines[1]) == job_record(jobs[1])
+
+
+def test_tsv_writer(jobs):
+    """
+    Test tsv format.
+    """
+    lines = _write("tsv", jobs).splitlines()
+    assert len(lines) == 3
+    assert lines[0].split("\t") == [
+        "token", "project", "job", "server", "location", "pipeline"]
+    assert lines[1].split("\t") == [
+        "project0::test_name0[MY_PARAM=A\\tB]",
+        "project0",
+        "test_name0",
+        "http://localhost:8080",
+        "myProject",
+        "pipeline.groovy"]
+
+
+def test_writer_buffer(mocker, jobs):
+    """
+    Test that output is written in chunks.
+    """
+    mocker.patch.object(JobWriter, 'BUFFER_SIZE', 64)
+
+    stream = io.StringIO()
+
+    writer = get_writer("ndjson", stream=stream)
+    writer.begin()
+    assert not stream.getvalue()
+    writer.write(jobs[0])
+    assert len(stream.getvalue().splitlines()) == 1
+    writer.write(jobs[1])
+    writer.end()
+
+    assert len(stream.getvalue().splitlines()) == 2
@@ -0,0 +1,88 @@
+"""
+profiling module tests.
+"""
+import pstats
+import tracemalloc
+import pytest
+from kirk import KirkError
+from kirk.profiling import MemoryProfiler
+from kirk.profiling import Profiler
+
+
+def _work():
+    """
+    Some code to profile.
+    """
+    return [str(i) * 10 for i in range(1000)]
+
+
+def test_profiler(tmpdir):
+    """
+    Test Profiler class.
+    """
+    path = str(tmpdir / "kirk.pstats")
+
+    profiler = Profiler(path)
+    assert profiler.path == path
+
+    profiler.start()
+    _work()
+    profiler.stop()
+
+    stats = pstats.Stats(path)
+    assert any(func[2] == "_work" for func in stats.stats)
+
+    # stop twice does nothing
+    profiler.stop()
+
+
+def test_profiler_error(tmpdir):
+    """
+    Test Profiler when file can't be written.
+    """
+    profiler = Profiler(str(tmpdir / "missing" / "kirk.pstats"))
+    profiler.start()
+
+    with pytest.raises(KirkError):
+        profiler.stop()
+
+
+def test_memory_profiler():
+    """
+    Test MemoryProfiler class.
+    """
+    with pytest.raises(ValueError):
+        MemoryProfiler(limit=0)
+
+    assert not tracemalloc.is_tracing()
+
+    profiler = MemoryProfiler(limit=3)
+    profiler.start()
+    assert tracemalloc.is_tracing()
+
+    data = _work()
+    report = profiler.stop()
+    assert data
+    assert not tracemalloc.is_tracing()
+
+    assert report['current'] > 0
+    assert report['peak'] >= report['current']
+    assert 0 < len(report['top']) <= 3
+    assert any(item[0] == __file__ for item in report['top'])
+
+    sizes = [item[2] for item in report['top']]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_memory_profiler_running():
+    """
+    Test MemoryProfiler when tracemalloc is already tracing.
+    """
+    tracemalloc.start()
+    try:
+        profiler = MemoryProfiler()
+        profiler.start()
+        profiler.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
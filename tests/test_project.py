@@ -592,3 +592,115 @@ def test_project_env_var(tmp_path):
 
     # ensure !ENV is needed in order to read environmental variables
     assert proj.jobs[0].scm["perforce"]["workspace"] == "depot_main_${NODE}_${JOBNAME}"
+
+
+def test_project_job_repr_cache(tmp_path):
+    """
+    Test that job representation follows parameters changes.
+    """
+    project_file = tmp_path / "project.yml"
+    project_file.write_text("""
+        name: project
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: myserver.com
+        jobs:
+            - name: Test_mytest
+              parameters:
+                - name: JK_TEST_0
+                  label: Test name 0
+                  default: test_something_0
+                  show: false
+                - name: JK_TEST_1
+                  label: Test name 1
+                  default: test_something_1
+                  show: true
+    """)
+    proj = Project()
+    proj.load(str(project_file.absolute()))
+
+    job = proj.jobs[0]
+    assert repr(job) == "project::Test_mytest[JK_TEST_1=test_something_1]"
+
+    job.parameters[0].value = "hidden"
+    assert repr(job) == "project::Test_mytest[JK_TEST_1=test_something_1]"
+
+    job.parameters[1].value = "shown"
+    assert repr(job) == "project::Test_mytest[JK_TEST_1=shown]"
+    assert str(job) == "project::Test_mytest"
+
+
+def test_project_job_hash(tmp_path):
+    """
+    Test jobs equality and hashing.
+    """
+    project_file = tmp_path / "project.yml"
+    project_file.write_text("""
+        name: project
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: myserver.com
+        jobs:
+            - name: test_name0
+            - name: test_name1
+    """)
+    proj0 = Project()
+    proj0.load(str(project_file.absolute()))
+    proj1 = Project()
+    proj1.load(str(project_file.absolute()))
+
+    assert proj0.jobs[0] == proj1.jobs[0]
+    assert proj0.jobs[0] != proj1.jobs[1]
+    assert proj0.jobs[0] == "project::test_name0"
+
+    jobs = set(proj0.jobs)
+    assert proj1.jobs[0] in jobs
+    assert proj1.jobs[1] in jobs
+    assert "project::test_name1" in jobs
+    assert len(jobs.union(proj1.jobs)) == 2
+
+
+def test_project_job_copy(tmp_path):
+    """
+    Test that a job copy has its own parameters.
+    """
+    project_file = tmp_path / "project.yml"
+    project_file.write_text("""
+        name: project
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: myserver.com
+        jobs:
+            - name: Test_mytest
+              parameters:
+                - name: JK_TEST_0
+                  label: Test name 0
+                  default: test_something_0
+                  show: true
+    """)
+    proj = Project()
+    proj.load(str(project_file.absolute()))
+
+    job = proj.jobs[0]
+    job.parameters[0].value = "value0"
+
+    job_copy = job.copy()
+    assert job_copy == job
+    assert job_copy.parameters[0].value == "value0"
+    assert job_copy.parameters[0].default == "test_something_0"
+
+    job_copy.parameters[0].value = "value1"
+    assert repr(job_copy) == "project::Test_mytest[JK_TEST_0=value1]"
+    assert repr(job) == "project::Test_mytest[JK_TEST_0=value0]"
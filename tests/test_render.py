@@ -0,0 +1,189 @@
+"""
+render module tests.
+"""
+import os
+import tarfile
+import pytest
+import jenkins
+import kirk.utils
+from kirk import KirkError
+from kirk.workflow import WorkflowBuilder
+from kirk.render import SeedRenderer
+from kirk.render import seed_files
+from kirk.render import write_tree
+from kirk.render import write_archive
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    """
+    Jobs to render.
+    """
+    folder = tmp_path / "projects"
+    folder.mkdir()
+
+    for index in range(2):
+        project_file = folder / ("project%d.yml" % index)
+        project_file.write_text("""
+            name: project%d
+            description: my project
+            author: pippo
+            year: 3010
+            version: 1.0
+            location: folder/project%d
+            defaults:
+                server: http://localhost:8080
+                scm:
+                    git:
+                        url: https://github.com/acerv/marvin.git
+            jobs:
+                - name: test_name0
+                  pipeline: pipeline0.groovy
+                - name: test_name1
+                  pipeline: pipeline1.groovy
+        """ % (index, index))
+
+    return kirk.utils.get_jobs_from_folder(str(folder))
+
+
+def test_renderer_errors():
+    """
+    Test SeedRenderer errors.
+    """
+    with pytest.raises(ValueError):
+        SeedRenderer(workers=0)
+
+
+def test_renderer(jobs):
+    """
+    Test render method.
+    """
+    seeds = SeedRenderer(workers=1).render(jobs)
+
+    assert [location for location, _ in seeds] == [
+        "folder/project0/test_name0",
+        "folder/project0/test_name1",
+        "folder/project1/test_name0",
+        "folder/project1/test_name1",
+    ]
+    assert seeds[0][1] == WorkflowBuilder().build_xml(jobs[0])
+
+    seeds = SeedRenderer(workers=1, user="admin").render(jobs[:1])
+    assert seeds[0][0] == "folder/project0/dev/admin/test_name0"
+
+
+def test_renderer_pool(mocker, jobs):
+    """
+    Test render method using processes.
+    """
+    mocker.patch.object(SeedRenderer, 'POOL_THRESHOLD', 1)
+
+    seeds = SeedRenderer(workers=2).render(jobs)
+    assert seeds == SeedRenderer(workers=1).render(jobs)
+
+
+def test_renderer_pool_size(jobs):
+    """
+    Test pool_size method.
+    """
+    assert SeedRenderer(workers=4).pool_size(jobs) == 1
+    assert SeedRenderer(workers=1, threshold=0).pool_size(jobs) == 1
+    assert SeedRenderer(workers=4, threshold=0).pool_size(jobs) == 2
+    assert SeedRenderer(workers=4, threshold=0).pool_size(jobs[:2]) == 1
+    assert SeedRenderer(workers=4, threshold=5).pool_size(jobs) == 1
+
+
+def test_renderer_invalid_job(tmp_path):
+    """
+    Test render method with a job that can't be rendered.
+    """
+    project_file = tmp_path / "project.yml"
+    project_file.write_text("""
+        name: project
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: folder
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: test_name0
+    """)
+    jobs = kirk.utils.get_jobs_from_folder(str(tmp_path))
+
+    with pytest.raises(KirkError, match="project::test_name0"):
+        SeedRenderer(workers=1).render(jobs)
+
+
+def test_seed_files():
+    """
+    Test seed_files function.
+    """
+    files = seed_files([("a/b/seed", "<xml/>"), ("a/seed", "<xml1/>")])
+    assert list(files.keys()) == [
+        "jobs/a/config.xml",
+        "jobs/a/jobs/b/config.xml",
+        "jobs/a/jobs/b/jobs/seed/config.xml",
+        "jobs/a/jobs/seed/config.xml",
+    ]
+    assert files["jobs/a/config.xml"] == jenkins.EMPTY_FOLDER_XML
+    assert files["jobs/a/jobs/b/jobs/seed/config.xml"] == "<xml/>"
+
+
+def test_write_tree(tmp_path):
+    """
+    Test write_tree function.
+    """
+    folder = str(tmp_path / "seeds")
+    files = seed_files([("a/seed0", "<xml0/>"), ("a/seed1", "<xml1/>")])
+
+    assert write_tree(files, folder) == (3, 0)
+    seed = os.path.join(folder, "jobs", "a", "jobs", "seed0", "config.xml")
+    with open(seed, 'r') as seed_file:
+        assert seed_file.read() == "<xml0/>"
+
+    # unchanged files are not written again
+    assert write_tree(files, folder) == (0, 0)
+
+    files = seed_files([("a/seed0", "<xml2/>")])
+    assert write_tree(files, folder) == (1, 0)
+    assert write_tree(files, folder, clean=True) == (0, 1)
+
+    # cleaned job folders are removed
+    jobs = os.path.join(folder, "jobs", "a", "jobs")
+    assert os.listdir(jobs) == ["seed0"]
+
+    files = seed_files([("b/seed0", "<xml0/>")])
+    assert write_tree(files, folder, clean=True) == (2, 2)
+    assert os.listdir(os.path.join(folder, "jobs")) == ["b"]
+
+    assert write_tree(dict(), folder, clean=True) == (0, 2)
+    assert os.listdir(folder) == []
+
+
+def test_write_archive(tmp_path):
+    """
+    Test write_archive function.
+    """
+    files = seed_files([("a/seed0", "<xml0/>")])
+
+    archive0 = str(tmp_path / "seeds0.tar.gz")
+    archive1 = str(tmp_path / "seeds1.tar.gz")
+    write_archive(files, archive0)
+    write_archive(files, archive1)
+
+    # archives are reproducible
+    with open(archive0, 'rb') as file0, open(archive1, 'rb') as file1:
+        assert file0.read() == file1.read()
+
+    with tarfile.open(archive0, 'r:gz') as tar:
+        assert tar.getnames() == [
+            "jobs/a/config.xml",
+            "jobs/a/jobs/seed0/config.xml",
+        ]
+        member = tar.extractfile("jobs/a/jobs/seed0/config.xml")
+        assert member.read() == b"<xml0/>"
+
+    with pytest.raises(KirkError):
+        write_archive(files, str(tmp_path / "missing" / "seeds.tar"))
@@ -0,0 +1,182 @@
+"""
+resilience module tests.
+"""
+import time
+import pytest
+import requests
+import jenkins
+from kirk.resilience import CircuitBreaker
+from kirk.resilience import CircuitOpenError
+from kirk.resilience import RetryPolicy
+
+
+def _http_error(status):
+    """
+    Return a HTTP error with the given status code.
+    """
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+def test_breaker_errors():
+    """
+    Test CircuitBreaker with wrong arguments.
+    """
+    with pytest.raises(ValueError):
+        CircuitBreaker(threshold=-1)
+
+    with pytest.raises(ValueError):
+        CircuitBreaker(reset=-1)
+
+
+def test_breaker(mocker):
+    """
+    Test CircuitBreaker states.
+    """
+    now = [0.0]
+    mocker.patch('time.monotonic', side_effect=lambda: now[0])
+
+    breaker = CircuitBreaker(threshold=2, reset=10)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    # a single trial request is allowed after reset
+    now[0] = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # trial failed
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_disabled():
+    """
+    Test that CircuitBreaker without threshold is never opened.
+    """
+    breaker = CircuitBreaker(threshold=0)
+    for _ in range(100):
+        breaker.failure()
+
+    assert breaker.allow()
+
+
+def test_policy_errors():
+    """
+    Test RetryPolicy with wrong arguments.
+    """
+    with pytest.raises(ValueError):
+        RetryPolicy(timeout=0)
+
+    with pytest.raises(ValueError):
+        RetryPolicy(retries=-1)
+
+    with pytest.raises(ValueError):
+        RetryPolicy(threshold=-1)
+
+
+def test_policy_transient():
+    """
+    Test transient errors detection.
+    """
+    assert RetryPolicy.transient(jenkins.TimeoutException("timeout"))
+    assert RetryPolicy.transient(requests.exceptions.ConnectionError())
+    assert RetryPolicy.transient(_http_error(503))
+    assert RetryPolicy.transient(_http_error(502))
+    assert not RetryPolicy.transient(_http_error(400))
+    assert not RetryPolicy.transient(jenkins.NotFoundException("error"))
+    assert not RetryPolicy.transient(jenkins.JenkinsException("error"))
+
+
+def test_policy_call_retry(mocker):
+    """
+    Test that idempotent requests are sent again.
+    """
+    mocker.patch('time.sleep')
+
+    func = mocker.Mock(side_effect=[_http_error(503), _http_error(503), 1])
+    policy = RetryPolicy(retries=3)
+    assert policy.call("http://localhost:8080", func) == 1
+    assert func.call_count == 3
+    assert time.sleep.call_count == 2
+
+    stats = policy.stats()["http://localhost:8080"]
+    assert stats == dict(requests=3, retries=2, failures=0, rejected=0)
+
+
+def test_policy_call_not_idempotent(mocker):
+    """
+    Test that not idempotent requests are sent once.
+    """
+    mocker.patch('time.sleep')
+
+    func = mocker.Mock(side_effect=_http_error(503))
+    policy = RetryPolicy(retries=3)
+    with pytest.raises(jenkins.JenkinsException):
+        policy.call("http://localhost:8080", func, idempotent=False)
+
+    func.assert_called_once()
+    assert policy.stats()["http://localhost:8080"]["failures"] == 1
+
+
+def test_policy_call_errors(mocker):
+    """
+    Test that errors which are not transient are raised immediately.
+    """
+    mocker.patch('time.sleep')
+    policy = RetryPolicy(retries=3)
+
+    func = mocker.Mock(side_effect=jenkins.NotFoundException("error"))
+    with pytest.raises(jenkins.NotFoundException):
+        policy.call("http://localhost:8080", func)
+    func.assert_called_once()
+
+    # errors of the HTTP library are converted
+    func = mocker.Mock(side_effect=_http_error(400))
+    with pytest.raises(jenkins.JenkinsException):
+        policy.call("http://localhost:8080", func)
+    func.assert_called_once()
+
+    time.sleep.assert_not_called()
+
+
+def test_policy_call_circuit(mocker):
+    """
+    Test that requests fail fast when circuit is open.
+    """
+    mocker.patch('time.sleep')
+
+    func = mocker.Mock(side_effect=requests.exceptions.ConnectionError())
+    policy = RetryPolicy(retries=1, threshold=2, reset=3600)
+
+    with pytest.raises(jenkins.JenkinsException):
+        policy.call("http://localhost:8080", func)
+    assert func.call_count == 2
+
+    with pytest.raises(CircuitOpenError):
+        policy.call("http://localhost:8080", func)
+    assert func.call_count == 2
+
+    # other servers are not affected
+    func = mocker.Mock(return_value=1)
+    assert policy.call("http://localhost:8081", func) == 1
+
+    stats = policy.stats()
+    assert stats["http://localhost:8080"] == dict(
+        requests=2, retries=1, failures=1, rejected=1)
+    assert stats["http://localhost:8081"] == dict(
+        requests=1, retries=0, failures=0, rejected=0)
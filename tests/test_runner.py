@@ -1,11 +1,16 @@
 """
 runner module tests.
 """
+import os
 import pytest
 import jenkins
+import kirk.lock
 import kirk.utils
 import kirk.credentials
 from kirk.runner import JobRunner
+from kirk.connection import ConnectionPool
+from kirk.resilience import RetryPolicy
+from kirk.workflow import WorkflowBuilder
 from kirk import __version__
 from kirk import KirkError
 
@@ -203,3 +208,337 @@ def test_runner_run_with_parameter(runner, jobs):
         ))
     jenkins.Jenkins.get_job_info.assert_called_with(
         "myProject/test_name0")
+
+
+def test_runner_run_job_up_to_date(mocker, runner, jobs):
+    """
+    Test run method with a job which configuration didn't change
+    """
+    seed_xml = WorkflowBuilder().build_xml(jobs[0])
+    mocker.patch('jenkins.Jenkins.job_exists', return_value=True)
+    mocker.patch('jenkins.Jenkins.get_job_config', return_value=seed_xml)
+
+    runner.run(jobs[0])
+
+    jenkins.Jenkins.get_job_config.assert_called_with("myProject/test_name0")
+    jenkins.Jenkins.reconfig_job.assert_not_called()
+    jenkins.Jenkins.build_job.assert_called()
+
+
+def test_runner_run_shared(runner, jobs):
+    """
+    Test run method with a shared seed
+    """
+    runner.run(jobs[0], user="admin", shared=True)
+
+    jenkins.Jenkins.job_exists.assert_any_call("myProject")
+    jenkins.Jenkins.job_exists.assert_any_call("myProject/test_name0")
+    for call in jenkins.Jenkins.job_exists.call_args_list:
+        assert "dev" not in call[0][0]
+
+    jenkins.Jenkins.build_job.assert_called_with(
+        "myProject/test_name0",
+        parameters=dict(
+            KIRK_VERSION=__version__,
+            KIRK_USER="admin",
+            MY_PARAM='ABC'
+        ))
+
+
+def test_runner_get_result_queue(mocker, runner, jobs):
+    """
+    Test get_result method reading the build number from the queue
+    """
+    mocker.patch('jenkins.Jenkins.build_job', return_value=12)
+    mocker.patch(
+        'jenkins.Jenkins.get_job_info',
+        return_value=dict(url="http://localhost:8080/job/x/",
+                          nextBuildNumber=3))
+    mocker.patch(
+        'jenkins.Jenkins.get_queue_item',
+        side_effect=[
+            dict(why="waiting"),
+            dict(why="waiting"),
+            dict(executable=dict(number=4,
+                                 url="http://localhost:8080/job/x/4/")),
+        ])
+    mocker.patch(
+        'jenkins.Jenkins.get_build_info',
+        return_value=dict(building=False, result="SUCCESS"))
+
+    # next build number of a shared seed can belong to someone else
+    build = runner.start(jobs[0], user="admin", shared=True)
+    assert build.queue_id == 12
+    assert build.number is None
+    assert build.url == "http://localhost:8080/queue/item/12/"
+
+    assert runner.get_result(build) is None
+    assert runner.get_result(build) == "SUCCESS"
+    assert build.number == 4
+    assert build.url == "http://localhost:8080/job/x/4/"
+    jenkins.Jenkins.get_queue_item.assert_called_with(12)
+    jenkins.Jenkins.get_build_info.assert_called_with(
+        "myProject/test_name0", 4)
+
+
+def test_runner_get_builds(mocker, runner, jobs):
+    """
+    Test get_builds method
+    """
+    def _build(number, user):
+        return dict(
+            number=number,
+            url="http://localhost:8080/job/x/%d/" % number,
+            result="SUCCESS",
+            building=False,
+            actions=[
+                dict(),
+                dict(parameters=[dict(name="KIRK_USER", value=user)]),
+            ])
+
+    mocker.patch(
+        'jenkins.Jenkins.get_job_info',
+        return_value=dict(builds=[
+            _build(3, "admin"),
+            _build(2, "other"),
+            _build(1, "admin"),
+        ]))
+
+    builds = runner.get_builds(jobs[0], user="admin", shared=True)
+    assert [build['number'] for build in builds] == [3, 1]
+    assert builds[0]['user'] == "admin"
+    jenkins.Jenkins.get_job_info.assert_called_with(
+        "myProject/test_name0", depth=1)
+
+    builds = runner.get_builds(jobs[0], limit=2)
+    assert [build['number'] for build in builds] == [3, 2]
+
+    runner.get_builds(jobs[0], user="admin")
+    jenkins.Jenkins.get_job_info.assert_called_with(
+        "myProject/dev/admin/test_name0", depth=1)
+
+
+def test_runner_run_created_concurrently(mocker, runner, jobs):
+    """
+    Test run method when another process creates the seed in the meanwhile
+    """
+    # project folder exists, seed is created after the first check
+    mocker.patch(
+        'jenkins.Jenkins.job_exists',
+        side_effect=[True, False, True])
+    mocker.patch(
+        'jenkins.Jenkins.create_job',
+        side_effect=jenkins.JenkinsException("already exists"))
+
+    runner.run(jobs[0])
+
+    jenkins.Jenkins.create_job.assert_called_once()
+    jenkins.Jenkins.reconfig_job.assert_called()
+    jenkins.Jenkins.build_job.assert_called()
+
+
+def test_runner_run_retry(mocker, runner, jobs):
+    """
+    Test that run method retries a failed seed setup
+    """
+    mocker.patch('time.sleep')
+    mocker.patch(
+        'jenkins.Jenkins.create_job',
+        side_effect=[jenkins.TimeoutException("timed out"), None, None])
+
+    runner.run(jobs[0])
+
+    assert jenkins.Jenkins.create_job.call_count == 3
+    jenkins.Jenkins.build_job.assert_called()
+
+
+def test_runner_run_retry_fail(mocker, runner, jobs):
+    """
+    Test run method when seed setup always fails
+    """
+    mocker.patch('time.sleep')
+    mocker.patch(
+        'jenkins.Jenkins.create_job',
+        side_effect=jenkins.TimeoutException("timed out"))
+
+    with pytest.raises(KirkError):
+        runner.run(jobs[0])
+
+    assert jenkins.Jenkins.create_job.call_count == 3
+    jenkins.Jenkins.build_job.assert_not_called()
+
+
+def test_runner_run_retry_permanent(mocker, runner, jobs):
+    """
+    Test that run method doesn't retry errors which can't disappear
+    """
+    mocker.patch('time.sleep')
+    mocker.patch(
+        'jenkins.Jenkins.create_job',
+        side_effect=jenkins.JenkinsException(
+            "Possibly authentication failed [403]"))
+
+    with pytest.raises(KirkError):
+        runner.run(jobs[0])
+
+    jenkins.Jenkins.create_job.assert_called_once()
+
+
+def test_runner_run_lock_dir(mocker, runner, jobs, tmp_path):
+    """
+    Test run method using lock files
+    """
+    lock_dir = tmp_path / "locks"
+    runner = JobRunner(runner.pool.credentials, lock_dir=str(lock_dir))
+    acquire = mocker.spy(kirk.lock.FileLock, 'acquire')
+
+    runner.run(jobs[0])
+
+    acquire.assert_called_once()
+    assert len(os.listdir(str(lock_dir))) == 1
+    jenkins.Jenkins.build_job.assert_called()
+
+
+def test_runner_fake_server(mocker, fake_jenkins, fake_jobs, clock):
+    """
+    Test run and get_result methods on the fake Jenkins server
+    """
+    fake_jenkins.queue_delay = 5.0
+
+    credentials = mocker.Mock()
+    credentials.get_password.return_value = "password"
+    runner = JobRunner(credentials)
+
+    build = runner.start(fake_jobs[0], user="admin")
+    assert fake_jenkins.is_folder("myProject/dev/admin")
+    assert fake_jenkins.exists("myProject/dev/admin/test_name0")
+    assert fake_jenkins.queued() == 1
+    assert build.number == 1
+    assert build.queue_id is not None
+
+    assert runner.get_result(build) is None
+
+    clock.advance(5.0)
+    assert runner.get_result(build) == "SUCCESS"
+    assert build.url == "%sjob/myProject/job/dev/job/admin/job/test_name0/1/" \
+        % fake_jenkins.url
+
+    builds = fake_jenkins.builds("myProject/dev/admin/test_name0")
+    assert builds[0]['params'] == dict(
+        KIRK_VERSION=__version__,
+        MY_PARAM="ABC")
+
+    # the second run reuses folders and seed
+    config = fake_jenkins.get_config("myProject/dev/admin/test_name0")
+    build = runner.start(fake_jobs[0], user="admin")
+    assert build.number == 2
+    assert fake_jenkins.get_config(
+        "myProject/dev/admin/test_name0") == config
+    assert ("POST", "/job/myProject/job/dev/job/admin/createItem") \
+        not in fake_jenkins.requests[-10:]
+
+
+def test_runner_fake_server_errors(mocker, fake_jenkins, fake_jobs):
+    """
+    Test run method when the fake Jenkins server fails
+    """
+    mocker.patch('kirk.runner.JobRunner.RETRY_DELAY', 0)
+    fake_jenkins.queue_delay = 5.0
+
+    credentials = mocker.Mock()
+    credentials.get_password.return_value = "password"
+    runner = JobRunner(credentials)
+
+    # seed creation is retried
+    fake_jenkins.inject(503, method="POST", path="createItem", count=1)
+    build = runner.start(fake_jobs[0])
+    assert build.number == 1
+    assert fake_jenkins.exists("myProject/test_name0")
+
+    # builds are not retried
+    fake_jenkins.inject(500, method="POST", path="buildWithParameters")
+    with pytest.raises(KirkError):
+        runner.start(fake_jobs[0])
+
+    assert fake_jenkins.queued() == 1
+
+    credentials.get_password.return_value = "wrong"
+    runner = JobRunner(credentials)
+    with pytest.raises(KirkError):
+        runner.start(fake_jobs[0])
+
+
+def test_runner_fake_server_policy(mocker, fake_jenkins, fake_jobs):
+    """
+    Test that seed setup doesn't retry the requests already retried by
+    the connections policy
+    """
+    mocker.patch('kirk.runner.JobRunner.RETRY_DELAY', 0)
+    mocker.patch('time.sleep')
+
+    credentials = mocker.Mock()
+    credentials.get_password.return_value = "password"
+    pool = ConnectionPool(credentials, policy=RetryPolicy(retries=2))
+    runner = JobRunner(credentials, pool=pool)
+
+    def _count(method, path):
+        return len([
+            req for req in fake_jenkins.requests
+            if req[0] == method and req[1].endswith(path)])
+
+    # policy retries reading requests only
+    fake_jenkins.inject(
+        503, method="GET", path="job/myProject/api/json", count=None)
+    with pytest.raises(KirkError):
+        runner.start(fake_jobs[0])
+
+    assert _count("GET", "/job/myProject/api/json") == 3
+
+    # creation requests are sent once by the policy
+    fake_jenkins.clear_errors()
+    fake_jenkins.inject(503, method="POST", path="createItem", count=None)
+    with pytest.raises(KirkError):
+        runner.start(fake_jobs[0])
+
+    assert _count("POST", "/createItem") == 3
+
+
+def test_runner_find_shared_build(mocker, fake_jenkins, fake_jobs, clock):
+    """
+    Test find_build method on a seed shared by many developers
+    """
+    fake_jenkins.queue_delay = 5.0
+    job = fake_jobs[0]
+
+    credentials = mocker.Mock()
+    credentials.get_password.return_value = "password"
+    runner = JobRunner(credentials)
+
+    location = runner.setup(job, shared=True)
+    number = runner.next_build(job, location)
+
+    # builds of the other developers are not this job build
+    runner.trigger(job, location, user="other", shared=True)
+    assert runner.find_build(job, location, number) is not None
+    assert runner.find_build(
+        job, location, number, user="admin", shared=True) is None
+
+    build = runner.trigger(job, location, user="admin", shared=True)
+    assert build.number is None
+
+    found = runner.find_build(
+        job, location, number, user="admin", shared=True)
+    assert found.queue_id == build.queue_id
+    assert found.number is None
+
+    # without user, builds can't be told apart
+    assert runner.find_build(job, location, number, shared=True) is None
+
+    clock.advance(5.0)
+    found = runner.find_build(
+        job, location, number, user="admin", shared=True)
+    assert found.number == 2
+    assert found.url.endswith("/job/test_name0/2/")
+
+    assert runner.get_result(build) == "SUCCESS"
+    assert build.number == 2
@@ -0,0 +1,144 @@
+"""
+search module tests.
+"""
+import pytest
+import kirk.utils
+from kirk.search import JobIndex
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    """
+    Jobs to index.
+    """
+    project_file0 = tmp_path / "project0.yml"
+    project_file0.write_text("""
+        name: kernel
+        description: linux kernel validation
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject0
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: run_unittest
+              pipeline: pipeline.groovy
+              parameters:
+                - name: ARCH
+                  label: Target architecture
+                  default: x86_64
+            - name: fullbuild
+              pipeline: pipeline.groovy
+    """)
+    project_file1 = tmp_path / "project1.yml"
+    project_file1.write_text("""
+        name: userspace
+        description: userspace tools
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject1
+        defaults:
+            server: http://localhost:8080
+        jobs:
+            - name: unittest
+              pipeline: pipeline.groovy
+            - name: deploy
+              pipeline: pipeline.groovy
+    """)
+    return kirk.utils.get_jobs_from_folder(str(tmp_path))
+
+
+def test_search_errors(jobs):
+    """
+    Test search method with invalid arguments.
+    """
+    index = JobIndex()
+    index.build(jobs)
+
+    with pytest.raises(ValueError, match="query is empty"):
+        index.search("")
+
+    with pytest.raises(ValueError, match="search mode is not supported"):
+        index.search("unittest", mode="regexp")
+
+
+def test_search_prefix(jobs):
+    """
+    Test prefix search.
+    """
+    index = JobIndex()
+    index.build(jobs)
+
+    found = index.search("kernel::", mode="prefix")
+    assert found == ["kernel::fullbuild", "kernel::run_unittest"]
+
+    found = index.search("UNIT", mode="prefix")
+    assert found == ["userspace::unittest", "kernel::run_unittest"]
+
+    found = index.search("arch", mode="prefix")
+    assert found == ["kernel::run_unittest"]
+
+    assert not index.search("xyz", mode="prefix")
+
+
+def test_search_substring(jobs):
+    """
+    Test substring search.
+    """
+    index = JobIndex()
+    index.build(jobs)
+
+    found = index.search("ittes", mode="substring")
+    assert found == ["userspace::unittest", "kernel::run_unittest"]
+
+    found = index.search("de", mode="substring")
+    assert found[0] == "userspace::deploy"
+
+    found = index.search("validation", mode="substring")
+    assert found == ["kernel::run_unittest", "kernel::fullbuild"]
+
+    found = index.search("architecture", mode="substring")
+    assert found == ["kernel::run_unittest"]
+
+
+def test_search_fuzzy(jobs):
+    """
+    Test fuzzy search.
+    """
+    index = JobIndex()
+    index.build(jobs)
+
+    found = index.search("unitest", mode="fuzzy")
+    assert found == ["userspace::unittest", "kernel::run_unittest"]
+
+    found = index.search("fulbuild", mode="fuzzy")
+    assert found == ["kernel::fullbuild"]
+
+    found = index.search("fulbild", mode="fuzzy")
+    assert not found
+
+    found = index.search("fulbild", mode="fuzzy", max_distance=2)
+    assert found == ["kernel::fullbuild"]
+
+    found = index.search("unitest", mode="fuzzy", limit=1)
+    assert found == ["userspace::unittest"]
+
+
+def test_dump_load(jobs):
+    """
+    Test index export and import.
+    """
+    index = JobIndex()
+    index.build(jobs)
+
+    other = JobIndex()
+    assert not other.load(None)
+    assert not other.load(dict(version=-1))
+    assert other.load(index.dump())
+
+    assert other.entries == index.entries
+    for mode in JobIndex.MODES:
+        assert other.search("unittest", mode=mode) == \
+            index.search("unittest", mode=mode)
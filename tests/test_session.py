@@ -0,0 +1,235 @@
+"""
+session module tests.
+"""
+import os
+import asyncio
+import pytest
+import jenkins
+import kirk
+from kirk import __version__
+from kirk.runner import Build
+from kirk.session import Session
+
+
+@pytest.fixture
+def projects(tmp_path):
+    """
+    Folder with projects files.
+    """
+    folder = tmp_path / "projects"
+    folder.mkdir()
+
+    project_file = folder / "project0.yml"
+    project_file.write_text("""
+        name: project0
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+            scm:
+                git:
+                    url: https://github.com/acerv/marvin.git
+        jobs:
+            - name: test_name0
+              pipeline: pipeline.groovy
+              parameters:
+                - name: MY_PARAM
+                  label: my parameter
+                  default: ABC
+                  show: true
+            - name: test_name1
+              pipeline: pipeline.groovy
+    """)
+
+    return folder
+
+
+@pytest.fixture
+def session(mocker, projects):
+    """
+    Session with mocked Jenkins server.
+    """
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch('jenkins.Jenkins.create_job')
+    mocker.patch('jenkins.Jenkins.reconfig_job')
+    mocker.patch('jenkins.Jenkins.build_job')
+    mocker.patch('jenkins.Jenkins.job_exists', return_value=False)
+    mocker.patch(
+        'jenkins.Jenkins.get_job_info',
+        return_value=dict(url="http://localhost:8080/job/x/",
+                          nextBuildNumber=3))
+    mocker.patch.dict(os.environ, {"KIRK_TOKEN": "password"})
+
+    with Session(projects=str(projects), backend="env", workers=2) as sess:
+        yield sess
+
+
+def test_session_export():
+    """
+    Test that Session is exported by kirk package.
+    """
+    assert kirk.Session is Session
+
+    with pytest.raises(AttributeError):
+        kirk.NotExisting
+
+
+def test_session_errors(projects):
+    """
+    Test Session errors.
+    """
+    with pytest.raises(ValueError):
+        Session(projects=str(projects), workers=0)
+
+
+def test_session_get_job(session):
+    """
+    Test get_job method.
+    """
+    job = session.get_job("project0::test_name0[MY_PARAM=DEF]")
+    assert job.parameters[0].value == "DEF"
+
+    # catalog jobs are not modified
+    catalog_job = session.catalog.get_job("project0::test_name0")
+    assert catalog_job.parameters[0].value == "ABC"
+    assert session.get_job(catalog_job) is not catalog_job
+
+    with pytest.raises(kirk.KirkError, match="invalid job token"):
+        session.get_job("project0")
+
+    with pytest.raises(kirk.KirkError, match="cannot find"):
+        session.get_job("project0::test_name2")
+
+
+def test_session_run_many(session):
+    """
+    Test run_many method.
+    """
+    results = session.run_many([
+        "project0::test_name0[MY_PARAM=DEF]",
+        "project0::test_name2",
+        "project0::test_name1",
+    ])
+
+    assert [res.token for res in results] == [
+        "project0::test_name0[MY_PARAM=DEF]",
+        "project0::test_name2",
+        "project0::test_name1",
+    ]
+    assert results[0].started
+    assert results[0].url == "http://localhost:8080/job/x/3/"
+    assert results[0].location == "myProject/test_name0"
+    assert not results[1].started
+    assert "cannot find" in results[1].error
+    assert results[2].started
+
+    # builds are still running
+    assert not any(res.ok for res in results)
+
+    jenkins.Jenkins.__init__.assert_called_once_with(
+        "http://localhost:8080", "kirk", "password")
+    jenkins.Jenkins.build_job.assert_any_call(
+        "myProject/test_name0",
+        parameters=dict(KIRK_VERSION=__version__, MY_PARAM="DEF"))
+
+    assert results[0].as_dict() == dict(
+        token="project0::test_name0[MY_PARAM=DEF]",
+        location="myProject/test_name0",
+        url="http://localhost:8080/job/x/3/",
+        number=3,
+        result=None,
+        error=None)
+
+
+def test_session_run_error(session):
+    """
+    Test run method when Jenkins fails.
+    """
+    jenkins.Jenkins.build_job.side_effect = \
+        jenkins.JenkinsException("mocked exception")
+
+    result = session.run("project0::test_name0")
+    assert not result.started
+    assert not result.ok
+    assert result.error == "mocked exception"
+
+
+def test_session_wait_many(mocker, session):
+    """
+    Test wait_many method.
+    """
+    infos = [
+        jenkins.NotFoundException("queued"),
+        dict(building=True, result=None),
+        dict(building=False, result="FAILURE"),
+    ]
+    mocker.patch('jenkins.Jenkins.get_build_info', side_effect=infos)
+
+    results = session.run_many(["project0::test_name0"])
+    results = session.wait_many(results, poll=0)
+
+    assert results[0].result == "FAILURE"
+    assert not results[0].ok
+    jenkins.Jenkins.get_build_info.assert_called_with(
+        "myProject/test_name0", 3)
+
+
+def test_session_wait_timeout(mocker, session):
+    """
+    Test wait_many method timeout.
+    """
+    mocker.patch(
+        'jenkins.Jenkins.get_build_info',
+        return_value=dict(building=True, result=None))
+
+    results = session.run_many(["project0::test_name0"])
+    results = session.wait_many(results, timeout=0, poll=0)
+    assert results[0].result is None
+    assert results[0].started
+    assert not results[0].ok
+
+
+def test_session_wait_success(mocker, session):
+    """
+    Test that a job is ok once its build completed successfully.
+    """
+    mocker.patch(
+        'jenkins.Jenkins.get_build_info',
+        return_value=dict(building=False, result="SUCCESS"))
+
+    results = session.run_many(["project0::test_name0"])
+    results = session.wait_many(results, poll=0)
+    assert results[0].result == "SUCCESS"
+    assert results[0].ok
+
+
+def test_session_sync(session):
+    """
+    Test sync method.
+    """
+    results = session.sync()
+    assert [res.location for res in results] == [
+        "myProject/test_name0",
+        "myProject/test_name1",
+    ]
+    assert jenkins.Jenkins.create_job.call_count == 4
+    jenkins.Jenkins.build_job.assert_not_called()
+
+
+def test_session_async(session):
+    """
+    Test async methods.
+    """
+    async def _run():
+        results = await session.sync_async(["project0::test_name1"])
+        assert results[0].location == "myProject/test_name1"
+
+        results = await session.run_many_async(["project0::test_name0"])
+        assert results[0].build.number == 3
+        return results
+
+    results = asyncio.run(_run())
+    assert isinstance(results[0].build, Build)
@@ -0,0 +1,161 @@
+"""
+stats module tests.
+"""
+import pytest
+import requests
+import jenkins
+from kirk.stats import Instrumentation
+from kirk.stats import LatencyStats
+from kirk.stats import RequestRecord
+from kirk.stats import endpoint_name
+from kirk.stats import percentile
+
+
+def _response(status, content=b""):
+    """
+    Return a response with the given status code and content.
+    """
+    response = requests.Response()
+    response.status_code = status
+    response._content = content
+    return response
+
+
+def test_endpoint_name():
+    """
+    Test endpoint_name function.
+    """
+    assert endpoint_name("http://localhost:8080/api/json") == "/api/json"
+    assert endpoint_name(
+        "http://localhost:8080/job/a/job/b/12/api/json?depth=1") == \
+        "/job/*/job/*/*/api/json"
+    assert endpoint_name("http://localhost:8080/queue/item/152/api/json") == \
+        "/queue/item/*/api/json"
+    assert endpoint_name(
+        "http://localhost/jenkins/job/a/config.xml",
+        base="http://localhost/jenkins/") == "/job/*/config.xml"
+    assert endpoint_name("") == "/"
+
+
+def test_percentile():
+    """
+    Test percentile function.
+    """
+    assert percentile([], 50) is None
+
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 0) == 1
+    assert percentile([3], 99) == 3
+
+
+def test_instrumentation_measure():
+    """
+    Test that requests are measured.
+    """
+    records = list()
+
+    instrumentation = Instrumentation()
+    instrumentation.add_hook(records.append)
+    assert instrumentation.hooks == [records.append]
+
+    req = requests.Request('GET', "http://localhost:8080/job/a/api/json")
+    response = instrumentation.measure(
+        "http://localhost:8080", req, lambda: _response(200, b"1234"))
+    assert response.status_code == 200
+
+    assert len(records) == 1
+    assert records[0].server == "http://localhost:8080"
+    assert records[0].method == "GET"
+    assert records[0].endpoint == "/job/*/api/json"
+    assert records[0].status == 200
+    assert records[0].size == 4
+    assert records[0].duration >= 0
+    assert records[0].error is None
+
+    instrumentation.remove_hook(records.append)
+    assert not instrumentation.hooks
+
+
+def test_instrumentation_errors():
+    """
+    Test that failed requests are measured.
+    """
+    records = list()
+
+    instrumentation = Instrumentation()
+    instrumentation.add_hook(records.append)
+
+    def _not_found():
+        raise jenkins.NotFoundException("not found")
+
+    def _unavailable():
+        raise requests.exceptions.HTTPError(response=_response(503))
+
+    req = requests.Request('POST', "http://localhost:8080/createItem")
+    with pytest.raises(jenkins.NotFoundException):
+        instrumentation.measure("http://localhost:8080", req, _not_found)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        instrumentation.measure("http://localhost:8080", req, _unavailable)
+
+    assert [rec.status for rec in records] == [404, 503]
+    assert all(rec.error for rec in records)
+    assert records[0].method == "POST"
+
+
+def test_instrumentation_hook_errors():
+    """
+    Test that hooks errors don't stop the requests.
+    """
+    def _hook(_):
+        raise RuntimeError("error")
+
+    records = list()
+
+    instrumentation = Instrumentation()
+    instrumentation.add_hook(_hook)
+    instrumentation.add_hook(records.append)
+
+    req = requests.Request('GET', "http://localhost:8080/api/json")
+    instrumentation.measure(
+        "http://localhost:8080", req, lambda: _response(200))
+
+    assert len(records) == 1
+
+
+def test_latency_stats():
+    """
+    Test LatencyStats summary.
+    """
+    stats = LatencyStats()
+    for index in range(1, 101):
+        stats(RequestRecord(
+            "http://localhost:8080", "GET", "/api/json", 200, 10,
+            index / 1000.0))
+
+    stats(RequestRecord(
+        "http://localhost:8081", "POST", "/createItem", 500, 0, 1.0,
+        error="error"))
+
+    assert len(stats.records) == 101
+
+    summary = stats.summary()
+    assert summary['elapsed'] >= 0
+    assert list(summary['servers'].keys()) == [
+        "http://localhost:8080", "http://localhost:8081"]
+
+    server = summary['servers']["http://localhost:8080"]
+    assert server['requests'] == 100
+    assert server['errors'] == 0
+    assert server['bytes'] == 1000
+    assert server['p50'] == pytest.approx(0.05)
+    assert server['p95'] == pytest.approx(0.095)
+    assert server['p99'] == pytest.approx(0.099)
+
+    endpoint = summary['endpoints'][("POST", "/createItem")]
+    assert endpoint['requests'] == 1
+    assert endpoint['errors'] == 1
+    assert endpoint['p50'] == 1.0
@@ -0,0 +1,244 @@
+"""
+sync module tests.
+"""
+import pytest
+import jenkins
+import kirk.utils
+from kirk import KirkError
+from kirk.connection import ConnectionPool
+from kirk.credentials import EnvCredentials
+from kirk.workflow import WorkflowBuilder
+from kirk.sync import SeedAction
+from kirk.sync import Synchronizer
+from kirk.sync import canonical_xml
+from kirk.sync import ensure_folder
+from kirk.sync import ensure_seed
+from kirk.sync import summary
+from kirk.sync import same_config
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    """
+    Jobs to synchronize.
+    """
+    project_file = tmp_path / "project0.yml"
+    project_file.write_text("""
+        name: project0
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: http://localhost:8080
+            scm:
+                git:
+                    url: https://github.com/acerv/marvin.git
+        jobs:
+            - name: test_name0
+              pipeline: pipeline0.groovy
+            - name: test_name1
+              pipeline: pipeline1.groovy
+            - name: test_name2
+              pipeline: pipeline2.groovy
+    """)
+    return kirk.utils.get_jobs_from_folder(str(tmp_path))
+
+
+@pytest.fixture
+def server(mocker, jobs):
+    """
+    Mocked Jenkins server, where test_name0 is up to date, test_name1 is
+    outdated and test_name2 doesn't exist.
+    """
+    builder = WorkflowBuilder()
+    configs = {
+        "myProject/test_name0": builder.build_xml(jobs[0]).replace(
+            "plugin=\"workflow-job\"", "plugin=\"workflow-job@2.40\""),
+        "myProject/test_name1": builder.build_xml(jobs[0]),
+    }
+
+    def _get_job_config(name):
+        if name not in configs:
+            raise jenkins.NotFoundException("not found")
+        return configs[name]
+
+    mocker.patch('jenkins.Jenkins.__init__', return_value=None)
+    mocker.patch(
+        'jenkins.Jenkins.get_job_config',
+        side_effect=_get_job_config)
+    mocker.patch('jenkins.Jenkins.job_exists', return_value=True)
+    mocker.patch('jenkins.Jenkins.create_job')
+    mocker.patch('jenkins.Jenkins.reconfig_job')
+    mocker.patch('jenkins.Jenkins.delete_job')
+    mocker.patch(
+        'jenkins.Jenkins.get_job_info',
+        return_value=dict(jobs=[
+            dict(name="test_name0", _class="WorkflowJob"),
+            dict(name="old_job", _class="WorkflowJob"),
+            dict(name="dev", _class="hudson.plugins.folder.Folder"),
+        ]))
+
+    mocker.patch.dict("os.environ", {"KIRK_TOKEN": "password"})
+    return ConnectionPool(EnvCredentials())
+
+
+def test_canonical_xml():
+    """
+    Test canonical_xml function.
+    """
+    xml0 = """<?xml version='1.1' encoding='UTF-8'?>
+        <job plugin="job@1.0">
+            <description>today</description>
+            <name b="1" a="2">  name </name>
+        </job>
+    """
+    xml1 = """<job><description>yesterday</description>
+        <name a="2" b="1">name</name></job>"""
+
+    assert canonical_xml(xml0) == canonical_xml(xml1)
+    assert canonical_xml(xml0) == '<job>\n  <name a="2" b="1">name\n'
+
+    with pytest.raises(KirkError):
+        canonical_xml("<job>")
+
+
+def test_sync_errors(server):
+    """
+    Test Synchronizer errors.
+    """
+    with pytest.raises(ValueError):
+        Synchronizer(server, workers=0)
+
+    with pytest.raises(ValueError):
+        Synchronizer(server, per_server=0)
+
+
+def test_sync_plan(server, jobs):
+    """
+    Test plan method.
+    """
+    syncer = Synchronizer(server)
+
+    actions = syncer.plan(jobs)
+    assert [act.action for act in actions] == [
+        SeedAction.UNCHANGED,
+        SeedAction.RECONFIGURE,
+        SeedAction.CREATE,
+    ]
+    assert "pipeline0.groovy" in actions[1].diff()
+    assert "pipeline1.groovy" in actions[1].diff()
+
+    with pytest.raises(ValueError):
+        syncer.plan(jobs, delete=True)
+
+    actions = syncer.plan(jobs, delete=True, known=jobs)
+    assert [repr(act) for act in actions[3:]] == ["delete myProject/old_job"]
+
+    # seeds of the jobs which are not selected are kept
+    actions = syncer.plan(jobs[:1], delete=True, known=jobs)
+    assert [repr(act) for act in actions[1:]] == ["delete myProject/old_job"]
+
+    actions = syncer.plan(jobs[:1], user="admin")
+    assert actions[0].location == "myProject/dev/admin/test_name0"
+    assert actions[0].action == SeedAction.CREATE
+
+
+def test_sync_apply(server, jobs):
+    """
+    Test apply method.
+    """
+    syncer = Synchronizer(server, workers=2, per_server=1)
+
+    actions = syncer.apply(syncer.plan(jobs, delete=True, known=jobs))
+
+    jenkins.Jenkins.create_job.assert_called_once_with(
+        "myProject/test_name2", actions[2].xml)
+    jenkins.Jenkins.reconfig_job.assert_called_once_with(
+        "myProject/test_name1", actions[1].xml)
+    jenkins.Jenkins.delete_job.assert_called_once_with("myProject/old_job")
+
+    assert summary(actions) == dict(
+        create=1, reconfigure=1, delete=1, unchanged=1, failed=0)
+
+
+def test_sync_apply_errors(server, jobs):
+    """
+    Test apply method when server fails.
+    """
+    jenkins.Jenkins.reconfig_job.side_effect = \
+        jenkins.JenkinsException("mocked exception")
+
+    syncer = Synchronizer(server)
+    actions = syncer.apply(syncer.plan(jobs))
+
+    assert actions[1].error == "mocked exception"
+    assert summary(actions)['failed'] == 1
+    assert summary(actions)['create'] == 1
+
+
+def test_same_config():
+    """
+    Test same_config function.
+    """
+    assert same_config("<a>1</a>", "<a>1</a>")
+    assert same_config("<a plugin='x'> 1 </a>", "<a>1</a>")
+    assert not same_config("<a>1</a>", "<a>2</a>")
+    assert not same_config("<a>", "<a>1</a>")
+    assert not same_config(None, "<a>1</a>")
+
+
+def test_ensure_folder(mocker):
+    """
+    Test ensure_folder function.
+    """
+    conn = mocker.Mock()
+    conn.job_exists.return_value = True
+    assert not ensure_folder(conn, "myProject")
+    conn.create_job.assert_not_called()
+
+    conn.job_exists.return_value = False
+    assert ensure_folder(conn, "myProject")
+    conn.create_job.assert_called_once_with(
+        "myProject", jenkins.EMPTY_FOLDER_XML)
+
+    # created by someone else in the meanwhile
+    conn.job_exists.side_effect = [False, True]
+    conn.create_job.side_effect = jenkins.JenkinsException("exists")
+    assert not ensure_folder(conn, "myProject")
+
+    conn.job_exists.side_effect = None
+    conn.job_exists.return_value = False
+    with pytest.raises(jenkins.JenkinsException):
+        ensure_folder(conn, "myProject")
+
+
+def test_ensure_seed(mocker, jobs):
+    """
+    Test ensure_seed function.
+    """
+    xml_str = WorkflowBuilder().build_xml(jobs[0])
+
+    conn = mocker.Mock()
+    conn.job_exists.return_value = False
+    assert ensure_seed(conn, "a/b", xml_str) == SeedAction.CREATE
+
+    conn.job_exists.return_value = True
+    conn.get_job_config.return_value = xml_str
+    assert ensure_seed(conn, "a/b", xml_str) == SeedAction.UNCHANGED
+    conn.reconfig_job.assert_not_called()
+
+    conn.get_job_config.return_value = "<project/>"
+    assert ensure_seed(conn, "a/b", xml_str) == SeedAction.RECONFIGURE
+    conn.reconfig_job.assert_called_once_with("a/b", xml_str)
+
+    # created by someone else in the meanwhile
+    conn.create_job.side_effect = jenkins.JenkinsException("exists")
+    conn.get_job_config.return_value = xml_str
+    assert ensure_seed(
+        conn, "a/b", xml_str, exists=False) == SeedAction.UNCHANGED
+
+    conn.job_exists.return_value = False
+    with pytest.raises(jenkins.JenkinsException):
+        ensure_seed(conn, "a/b", xml_str, exists=False)
@@ -0,0 +1,94 @@
+"""
+synthetic module tests.
+"""
+import os
+import pytest
+import kirk.utils
+from kirk import KirkError
+from kirk.synthetic import CatalogGenerator
+from kirk.workflow import WorkflowBuilder
+
+
+def test_generator_errors():
+    """
+    Test CatalogGenerator arguments check.
+    """
+    with pytest.raises(ValueError):
+        CatalogGenerator(projects=-1)
+
+    with pytest.raises(ValueError):
+        CatalogGenerator(jobs=0)
+
+    with pytest.raises(ValueError):
+        CatalogGenerator(parameters=-1)
+
+    with pytest.raises(ValueError):
+        CatalogGenerator(depends=2)
+
+    with pytest.raises(ValueError):
+        CatalogGenerator(env=-0.1)
+
+    with pytest.raises(ValueError):
+        CatalogGenerator(scm=dict(svn=1))
+
+    with pytest.raises(ValueError):
+        CatalogGenerator(scm=dict(git=0))
+
+
+def test_generate(tmp_path, monkeypatch):
+    """
+    Test generated catalogs can be loaded and rendered.
+    """
+    generator = CatalogGenerator(
+        projects=12,
+        jobs=4,
+        parameters=2,
+        depends=0.5,
+        scm=dict(git=1, perforce=1, none=1),
+        env=0.5,
+        servers=["http://server0:8080", "http://server1:8080"])
+
+    for name, value in generator.env_vars.items():
+        monkeypatch.setenv(name, value)
+
+    paths = generator.generate(str(tmp_path / "catalog"))
+    assert len(paths) == 12
+    assert all(os.path.isfile(path) for path in paths)
+
+    jobs = kirk.utils.get_jobs_from_folder(str(tmp_path / "catalog"))
+    assert len(jobs) == 48
+    assert {list(job.scm)[0] for job in jobs} == {"git", "perforce", "none"}
+    assert {job.server for job in jobs} == {
+        "http://server0:8080", "http://server1:8080"}
+    assert all(len(job.parameters) == 2 for job in jobs)
+
+    values = {param.value for job in jobs for param in job.parameters}
+    assert set(generator.env_vars.values()) & values
+
+    builder = WorkflowBuilder()
+    for job in jobs:
+        assert builder.build_xml(job)
+
+
+def test_generate_seed(tmp_path):
+    """
+    Test the same seed generates the same catalog.
+    """
+    first = CatalogGenerator(projects=3, depends=0.5, seed=1)
+    second = CatalogGenerator(projects=3, depends=0.5, seed=1)
+    other = CatalogGenerator(projects=3, depends=0.5, seed=2)
+
+    assert first.project(2) == second.project(2)
+    assert first.project(2) != other.project(2)
+    assert first.project(1) != first.project(2)
+
+
+def test_generate_error(tmp_path):
+    """
+    Test generate when folder can't be created.
+    """
+    path = tmp_path / "file"
+    path.write_text("")
+
+    with pytest.raises(KirkError):
+        CatalogGenerator().generate(str(path / "catalog"))
@@ -0,0 +1,159 @@
+"""
+throttle module tests.
+"""
+import time
+import threading
+import pytest
+import jenkins
+from kirk.throttle import Throttle
+from kirk.throttle import TokenBucket
+
+
+def test_bucket_errors():
+    """
+    Test TokenBucket with wrong arguments.
+    """
+    with pytest.raises(ValueError):
+        TokenBucket(-1)
+
+    with pytest.raises(ValueError):
+        TokenBucket(1, burst=0)
+
+
+def test_bucket_unlimited():
+    """
+    Test TokenBucket without rate.
+    """
+    bucket = TokenBucket(0)
+    for _ in range(100):
+        assert bucket.acquire() == 0
+
+
+def test_bucket_rate():
+    """
+    Test that TokenBucket allows a burst, then limits the rate.
+    """
+    bucket = TokenBucket(50, burst=5)
+    assert bucket.rate == 50
+    assert bucket.burst == 5
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+    threads = [
+        threading.Thread(target=bucket.acquire) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 10 tokens at 50 tokens/sec
+    assert time.monotonic() - start >= 0.18
+
+
+def test_throttle_errors():
+    """
+    Test Throttle with wrong arguments.
+    """
+    with pytest.raises(ValueError):
+        Throttle(rate=-1)
+
+    with pytest.raises(ValueError):
+        Throttle(burst=0)
+
+    with pytest.raises(ValueError):
+        Throttle(max_queue=-1)
+
+    with pytest.raises(ValueError):
+        Throttle(poll=0)
+
+
+def test_throttle_wait():
+    """
+    Test that requests are limited for each server.
+    """
+    throttle = Throttle(rate=20, burst=1)
+    assert throttle.rate == 20
+    assert throttle.burst == 1
+    assert throttle.max_queue == 0
+
+    start = time.monotonic()
+    throttle.wait("http://localhost:8080")
+    throttle.wait("http://localhost:8081")
+    assert time.monotonic() - start < 0.05
+
+    throttle.wait("http://localhost:8080")
+    assert time.monotonic() - start >= 0.04
+
+
+def test_throttle_admit(mocker):
+    """
+    Test that builds are delayed while the server queue is full.
+    """
+    mocker.patch('time.sleep')
+
+    conn = mocker.Mock()
+    conn.get_info.side_effect = [
+        dict(items=[dict(id=1), dict(id=2)]),
+        dict(items=[dict(id=1)]),
+        dict(items=[]),
+    ]
+
+    throttle = Throttle(max_queue=2, poll=0.001)
+    assert throttle.admit(conn, "http://localhost:8080") > 0
+
+    conn.get_info.assert_called_with(item="queue", query="?tree=items[id]")
+    assert conn.get_info.call_count == 2
+    time.sleep.assert_called_with(0.001)
+
+
+def test_throttle_admit_counts(mocker):
+    """
+    Test that builds admitted between two queue reads are counted.
+    """
+    mocker.patch('time.sleep')
+
+    conn = mocker.Mock()
+    conn.get_info.return_value = dict(items=[])
+
+    throttle = Throttle(max_queue=2, poll=3600)
+    assert throttle.admit(conn, "http://localhost:8080") == 0
+    assert throttle.admit(conn, "http://localhost:8080") == 0
+    conn.get_info.assert_called_once()
+
+    # queue is full, poll time doesn't pass with mocked sleep
+    time.sleep.side_effect = RuntimeError("sleep")
+    with pytest.raises(RuntimeError):
+        throttle.admit(conn, "http://localhost:8080")
+
+
+def test_throttle_admit_disabled(mocker):
+    """
+    Test that builds are admitted when queue can't be read or admission
+    control is disabled.
+    """
+    conn = mocker.Mock()
+    assert Throttle().admit(conn, "http://localhost:8080") == 0
+    conn.get_info.assert_not_called()
+
+    conn.get_info.side_effect = jenkins.JenkinsException("error")
+    assert Throttle(max_queue=1).admit(conn, "http://localhost:8080") == 0
+
+
+def test_throttle_admissions(mocker):
+    """
+    Test that admitted builds are counted.
+    """
+    mocker.patch('time.sleep')
+
+    conn = mocker.Mock()
+    conn.get_info.side_effect = [dict(items=[dict(id=1)]), dict(items=[])]
+
+    throttle = Throttle(max_queue=1, poll=0.001)
+    assert not throttle.admissions()
+
+    waited = throttle.admit(conn, "http://localhost:8080")
+    assert throttle.admissions() == {
+        "http://localhost:8080": dict(builds=1, wait=waited)}
@@ -0,0 +1,153 @@
+"""
+trace module tests.
+"""
+import json
+import threading
+import pytest
+from kirk import KirkError
+from kirk.trace import Tracer
+from kirk.trace import get_tracer
+from kirk.trace import span
+from kirk.trace import start_tracing
+from kirk.trace import stop_tracing
+
+
+@pytest.fixture(autouse=True)
+def stop_tracer():
+    """
+    Stop the active tracer after each test.
+    """
+    yield
+    stop_tracing()
+
+
+def test_span_disabled():
+    """
+    Test span when tracing is not active.
+    """
+    assert get_tracer() is None
+
+    with span("test") as item:
+        item.set(value=1)
+
+    assert get_tracer() is None
+
+
+def test_span():
+    """
+    Test span nesting and arguments.
+    """
+    tracer = start_tracing()
+    assert get_tracer() is tracer
+
+    with span("outer", category="test", label="a") as outer:
+        outer.set(value=1)
+        with span("inner"):
+            pass
+
+    events = tracer.events
+    assert [event['name'] for event in events] == ["inner", "outer"]
+    assert events[1]['cat'] == "test"
+    assert events[1]['ph'] == "X"
+    assert events[1]['args'] == dict(label="a", value=1)
+    assert events[0]['parent'] == events[1]['id']
+    assert 'parent' not in events[1]
+    assert events[1]['dur'] >= events[0]['dur']
+
+    assert stop_tracing() is tracer
+    assert get_tracer() is None
+
+
+def test_span_error():
+    """
+    Test span recording an error.
+    """
+    tracer = start_tracing()
+
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("wrong value")
+
+    assert tracer.events[0]['args']['error'] == "wrong value"
+
+
+def test_threads():
+    """
+    Test spans recorded by many threads.
+    """
+    tracer = start_tracing()
+
+    def _work():
+        with span("work"):
+            pass
+
+    threads = [threading.Thread(target=_work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = tracer.events
+    assert len(events) == 4
+    assert all('parent' not in event for event in events)
+
+    data = tracer.to_chrome()
+    names = [event for event in data['traceEvents'] if event['ph'] == "M"]
+    assert len(names) >= 2
+
+
+def test_write_chrome(tmpdir):
+    """
+    Test writing Chrome trace events.
+    """
+    tracer = start_tracing()
+    with span("work", path="a.yml"):
+        pass
+
+    path = str(tmpdir / "trace.json")
+    tracer.write(path)
+
+    with open(path, 'r') as trace_file:
+        data = json.load(trace_file)
+
+    event = data['traceEvents'][-1]
+    assert event['name'] == "work"
+    assert event['args']['path'] == "a.yml"
+
+
+def test_write_otlp(tmpdir):
+    """
+    Test writing OTLP JSON.
+    """
+    tracer = start_tracing()
+    with span("outer"):
+        with span("inner", attempt=2):
+            pass
+
+    path = str(tmpdir / "trace.json")
+    tracer.write(path, fmt="otlp")
+
+    with open(path, 'r') as trace_file:
+        data = json.load(trace_file)
+
+    spans = data['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert [item['name'] for item in spans] == ["inner", "outer"]
+    assert spans[0]['parentSpanId'] == spans[1]['spanId']
+    assert spans[0]['traceId'] == spans[1]['traceId']
+    assert int(spans[1]['endTimeUnixNano']) >= \
+        int(spans[1]['startTimeUnixNano'])
+    assert dict(key="attempt", value=dict(intValue="2")) in \
+        spans[0]['attributes']
+
+
+def test_write_errors(tmpdir):
+    """
+    Test write errors.
+    """
+    tracer = Tracer()
+
+    with pytest.raises(ValueError):
+        tracer.write(str(tmpdir / "trace.json"), fmt="xml")
+
+    with pytest.raises(KirkError):
+        tracer.write(str(tmpdir / "missing" / "trace.json"))
@@ -173,3 +173,43 @@ def test_workflow_builder_exception(mocker):
 
     with pytest.raises(KirkError):
         builder.build_xml(FakeJob())
+
+
+def test_workflow_builder_shared(tmp_path):
+    """
+    Test WorkflowBuilder declaring KIRK_USER on shared seeds only
+    """
+    project_file = tmp_path / "project.yml"
+    project_file.write_text("""
+        name: project
+        description: my project
+        author: pippo
+        year: 3010
+        version: 1.0
+        location: myProject
+        defaults:
+            server: myserver.com
+            scm:
+                git:
+                    url: myurl.com/repo.git
+                    label: my_branch
+        jobs:
+            - name: test_seed1
+              pipeline: pipeline.groovy
+    """)
+    proj = Project()
+    proj.load(str(project_file.absolute()))
+
+    builder = WorkflowBuilder()
+
+    def params(xml_str):
+        tree = ET.fromstring(xml_str)
+        return [item.text for item in tree.iter("name")]
+
+    private = params(builder.build_xml(proj.jobs[0]))
+    assert "KIRK_VERSION" in private
+    assert "KIRK_USER" not in private
+
+    shared = params(builder.build_xml(proj.jobs[0], shared=True))
+    assert "KIRK_VERSION" in shared
+    assert "KIRK_USER" in shared